@@ -117,6 +117,9 @@ WSGI_APPLICATION = 'backend_taller.wsgi.application'
 DATABASES = {
     'default': dj_database_url.config(default=os.getenv('DATABASE_URL'))
 }
+# Segunda conexión a la misma base: los trabajos de restauración escriben su
+# progreso por aquí, fuera de la transacción de la importación
+DATABASES['progreso'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -150,6 +153,22 @@ STORAGES = {
     },
 }
 
+# Caché: Redis si REDIS_URL está configurado; si no, memoria local de cada proceso
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -229,3 +248,52 @@ FIREBASE_PROJECT_ID = config('FIREBASE_PROJECT_ID', default='')
 FIREBASE_SERVICE_ACCOUNT_JSON = config('FIREBASE_SERVICE_ACCOUNT_JSON', default='{}')
 # ===========================
 
+
+# ===========================
+# BACKUP / RESTORE EN SEGUNDO PLANO
+# ===========================
+# 'thread': pool de hilos en el proceso web; 'celery': tarea Celery (requiere worker y broker)
+BACKUP_JOBS_BACKEND = config('BACKUP_JOBS_BACKEND', default='thread')
+BACKUP_JOB_WORKERS = config('BACKUP_JOB_WORKERS', default=2, cast=int)
+# Secciones exportadas en paralelo (solo PostgreSQL, mismo snapshot); 1 = en serie
+BACKUP_EXPORT_WORKERS = config('BACKUP_EXPORT_WORKERS', default=1, cast=int)
+# Segundos en EN_PROCESO antes de dar un trabajo por colgado (p. ej. el proceso se reinició)
+BACKUP_JOB_TIMEOUT = config('BACKUP_JOB_TIMEOUT', default=7200, cast=int)
+# ===========================
+
+# ===========================
+# REPORTES
+# ===========================
+# Reutiliza el archivo de un reporte ya generado si la consulta y los datos no cambiaron
+REPORTES_CACHE_ACTIVO = config('REPORTES_CACHE_ACTIVO', default=True, cast=bool)
+# Reportes con "asincrono": true: 'thread' (pool en el proceso web) o 'celery'
+REPORTES_JOBS_BACKEND = config('REPORTES_JOBS_BACKEND', default='thread')
+REPORTES_JOB_WORKERS = config('REPORTES_JOB_WORKERS', default=2, cast=int)
+# Reportes en proceso a la vez por taller y segundos sin progreso antes de darlos por colgados
+REPORTES_MAX_POR_TENANT = config('REPORTES_MAX_POR_TENANT', default=1, cast=int)
+REPORTES_JOB_TIMEOUT = config('REPORTES_JOB_TIMEOUT', default=1800, cast=int)
+# Costo estimado por EXPLAIN (unidades del planificador de PostgreSQL) a partir del
+# cual un reporte personalizado/natural se genera en segundo plano o se rechaza (0 = sin límite)
+REPORTES_COSTO_ASINCRONO = config('REPORTES_COSTO_ASINCRONO', default=50000, cast=float)
+REPORTES_COSTO_MAXIMO = config('REPORTES_COSTO_MAXIMO', default=5000000, cast=float)
+# Guarda junto a cada reporte una copia .gz (si ahorra al menos 10%) que se envía
+# a los clientes con Accept-Encoding: gzip
+REPORTES_VARIANTE_GZIP = config('REPORTES_VARIANTE_GZIP', default=True, cast=bool)
+# Días que se conservan los reportes generados según el plan del taller
+# (Tenant.retencion_reportes_dias lo sobrescribe por taller). Ver depurar_reportes
+REPORTES_RETENCION_DIAS = {
+    'FREE': config('REPORTES_RETENCION_DIAS_FREE', default=7, cast=int),
+    'BASIC': config('REPORTES_RETENCION_DIAS_BASIC', default=30, cast=int),
+    'PRO': config('REPORTES_RETENCION_DIAS_PRO', default=90, cast=int),
+    'ENTERPRISE': config('REPORTES_RETENCION_DIAS_ENTERPRISE', default=365, cast=int),
+}
+REPORTES_RETENCION_DIAS_DEFAULT = config('REPORTES_RETENCION_DIAS_DEFAULT', default=30, cast=int)
+# ===========================
+
+# ===========================
+# DASHBOARD
+# ===========================
+# Segundos que se reutiliza la respuesta de los dashboards (0 = sin caché).
+# Las escrituras en los datos que muestran la invalidan (personal_admin.signals)
+DASHBOARD_CACHE_TTL = config('DASHBOARD_CACHE_TTL', default=30, cast=int)
+# ===========================
@@ -0,0 +1,865 @@
+"""
+Motor de restauración masiva (bulk) para backups de tenant.
+
+A diferencia de import_tenant_data, que crea cada fila con Model.objects.create()
+(un INSERT por fila y, en los detalles, un recálculo del padre por cada línea),
+este motor inserta cada entidad por lotes con bulk_create, reconstruye el mapeo
+de IDs a partir de las PKs devueltas y recalcula los totales de órdenes,
+presupuestos, facturas y nóminas una sola vez al final con consultas agregadas.
+"""
+import json
+import logging
+import tempfile
+from datetime import datetime as dt
+from decimal import Decimal
+from itertools import islice
+
+from django.db import connection, models, transaction
+from django.core.exceptions import ValidationError
+
+from personal_admin.models import Cargo, Empleado, Asistencia
+from personal_admin.model_nomina import Nomina, DetalleNomina
+from clientes_servicios.models import Cliente, Cita
+from operaciones_inventario.modelsVehiculos import Vehiculo, Marca, Modelo
+from operaciones_inventario.modelsOrdenTrabajo import (
+    OrdenTrabajo, DetalleOrdenTrabajo, NotaOrdenTrabajo,
+    TareaOrdenTrabajo, InventarioVehiculo, Inspeccion,
+    PruebaRuta, AsignacionTecnico, ImagenOrdenTrabajo, DetalleInspeccion
+)
+from operaciones_inventario.modelsPresupuesto import presupuesto, detallePresupuesto
+from operaciones_inventario.modelsItem import Item
+from operaciones_inventario.modelsArea import Area
+from operaciones_inventario.modelsProveedor import Proveedor
+from finanzas_facturacion.models import Pago
+from finanzas_facturacion.modelsFactProv import FacturaProveedor
+from finanzas_facturacion.modelsDetallesFactProv import DetalleFacturaProveedor
+from servicios_IA.models import LecturaPlaca, Reporte
+from servicios_IA.utils.reportes_cache import invalidar_tenant
+from personal_admin.metricas_dashboard import invalidar_metricas
+from personal_admin.signals import senales_suspendidas
+
+from .utils import (
+    _clear_tenant_data, _import_groups, _import_users, _import_user_profiles,
+    _new_summary, _new_id_mapping, resolve_backup_chain, iter_backup_registros,
+    validar_cadena, IdsVigentes, BACKUP_INCREMENTAL, INCREMENTAL_SECTIONS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Filas por INSERT; también es el tamaño de lote en que se consumen las secciones
+BULK_BATCH_SIZE = 1000
+
+# Orden de restauración: cada sección va después de aquellas a las que referencia
+RESTORE_ORDER = [
+    'groups', 'users', 'user_profiles',
+    'marcas', 'areas', 'items', 'proveedores', 'modelos', 'cargos',
+    'clientes', 'vehiculos', 'empleados',
+    'presupuestos', 'detalles_presupuestos',
+    'ordenes_trabajo', 'detalles_ordenes', 'notas_ordenes', 'tareas_ordenes',
+    'inventarios_vehiculos', 'inspecciones', 'detalles_inspeccion',
+    'pruebas_ruta', 'asignaciones_tecnicos', 'imagenes_ordenes',
+    'pagos', 'facturas_proveedor', 'detalles_facturas_proveedor',
+    'citas', 'lecturas_placa', 'reportes',
+    'asistencias', 'nominas', 'detalles_nomina',
+]
+
+
+def _batched(rows, size):
+    iterator = iter(rows)
+    while True:
+        lote = list(islice(iterator, size))
+        if not lote:
+            return
+        yield lote
+
+
+def _decimal(valor, default=None):
+    if valor is None or valor == 'None':
+        return default
+    if isinstance(valor, str):
+        return Decimal(valor)
+    return valor
+
+
+def _datetime(valor):
+    if valor and isinstance(valor, str):
+        return dt.fromisoformat(valor)
+    return valor
+
+
+def _date(valor):
+    if valor and isinstance(valor, str):
+        return dt.fromisoformat(valor).date()
+    return valor
+
+
+def _time(valor):
+    # Formato HH:MM:SS o HH:MM:SS.ffffff
+    if valor and isinstance(valor, str):
+        return dt.strptime(valor.split('.')[0], '%H:%M:%S').time()
+    return valor
+
+
+def _convertir(data, campos, conversion):
+    """Aplica la conversión solo a los campos presentes en la fila."""
+    for campo in campos:
+        if campo in data:
+            data[campo] = conversion(data[campo])
+
+
+def _sin_ids(row):
+    """Copia de la fila sin id ni tenant_id (no se modifica el backup original)."""
+    data = dict(row)
+    data.pop('id', None)
+    data.pop('tenant_id', None)
+    return data
+
+
+class BulkRestorer:
+    """
+    Restaura un backup sección por sección usando bulk_create.
+
+    Las secciones pueden alimentarse completas o en trozos (import_section se
+    puede llamar varias veces para la misma sección); el mapeo de IDs se
+    conserva entre llamadas. finish() recalcula los totales de los padres.
+    Debe usarse dentro de una transacción.
+    """
+
+    def __init__(self, target_tenant, batch_size=BULK_BATCH_SIZE):
+        self.tenant = target_tenant
+        self.batch_size = batch_size
+        self.summary = _new_summary()
+        self.id_mapping = _new_id_mapping()
+        self.id_mapping['facturas_proveedor'] = {}
+        # Padres cuyos totales hay que recalcular al terminar
+        self._ordenes_con_detalles = set()
+        self._presupuestos_con_detalles = set()
+        self._facturas_con_detalles = set()
+        self._nominas_con_detalles = set()
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+    def import_section(self, nombre, rows):
+        """Importa las filas de una sección, por lotes de batch_size."""
+        if nombre == 'groups':
+            _import_groups([dict(r) for r in rows], self.id_mapping, self.summary)
+            return
+        if nombre == 'users':
+            _import_users([dict(r) for r in rows], self.id_mapping, self.summary)
+            return
+        if nombre == 'user_profiles':
+            _import_user_profiles([dict(r) for r in rows], self.id_mapping, self.summary, self.tenant)
+            return
+        handler = getattr(self, f'_import_{nombre}', None)
+        if handler is None:
+            return
+        for lote in _batched(rows, self.batch_size):
+            handler(lote)
+
+    def finish(self):
+        """Recalcula una sola vez los totales de los padres afectados."""
+        presupuesto.recalcular_totales_en_lote(self._presupuestos_con_detalles)
+        OrdenTrabajo.recalcular_totales_en_lote(self._ordenes_con_detalles)
+        FacturaProveedor.recalcular_en_lote(self._facturas_con_detalles)
+        Nomina.recalcular_totales_en_lote(self._nominas_con_detalles)
+        # Los INSERT masivos no disparan señales: invalidar reportes cacheados
+        # y métricas del dashboard
+        invalidar_tenant(self.tenant.id)
+        invalidar_metricas(self.tenant.id)
+        return self.summary
+
+    # ------------------------------------------------------------------
+    # Helpers de inserción
+    # ------------------------------------------------------------------
+    def _insert(self, model, objs):
+        """
+        Inserta los objetos sin pasar por save(). En bases que devuelven las
+        PKs del INSERT masivo (PostgreSQL, SQLite >= 3.35) se usa bulk_create;
+        en otras se guarda fila a fila con Model.save base para obtener la PK.
+        """
+        if not objs:
+            return objs
+        if connection.features.can_return_rows_from_bulk_insert:
+            return model.objects.bulk_create(objs, batch_size=self.batch_size)
+        # save() dispara post_save; finish() invalida métricas y cachés
+        with senales_suspendidas():
+            for obj in objs:
+                models.Model.save(obj, force_insert=True)
+        return objs
+
+    def _get_or_create_lote(self, model, lote, mapping_key, key_fields, build):
+        """
+        Equivalente por lotes a get_or_create(<key_fields>, tenant=..., defaults=...).
+
+        Busca en una sola consulta las filas que ya existen en el tenant por su
+        clave natural y crea el resto con bulk_create. Filas repetidas dentro del
+        backup se mapean al mismo registro, igual que con get_or_create.
+        """
+        candidatos = []
+        for row in lote:
+            data = build(row)
+            if data is None:
+                continue
+            clave = tuple(data.get(f) for f in key_fields)
+            candidatos.append((row['id'], clave, data))
+        if not candidatos:
+            return
+
+        filtro = {f'{key_fields[0]}__in': {clave[0] for _, clave, _ in candidatos}}
+        existentes = {
+            tuple(fila[:-1]): fila[-1]
+            for fila in model.objects.filter(tenant=self.tenant, **filtro).values_list(*key_fields, 'id')
+        }
+
+        nuevos = {}
+        for _, clave, data in candidatos:
+            if clave not in existentes and clave not in nuevos:
+                nuevos[clave] = model(tenant=self.tenant, **data)
+        self._insert(model, list(nuevos.values()))
+        for clave, obj in nuevos.items():
+            existentes[clave] = obj.pk
+
+        for old_id, clave, _ in candidatos:
+            self.id_mapping[mapping_key][old_id] = existentes[clave]
+            self.summary[mapping_key] += 1
+
+    def _create_lote(self, model, nombre, objs, old_ids=None):
+        self._insert(model, objs)
+        if old_ids is not None:
+            mapping = self.id_mapping.setdefault(nombre, {})
+            for old_id, obj in zip(old_ids, objs):
+                mapping[old_id] = obj.pk
+        self.summary[nombre] += len(objs)
+
+    def _map(self, entidad, old_id):
+        if old_id is None:
+            return None
+        return self.id_mapping[entidad].get(old_id)
+
+    # ------------------------------------------------------------------
+    # Catálogos (get_or_create por clave natural)
+    # ------------------------------------------------------------------
+    def _import_marcas(self, lote):
+        self._get_or_create_lote(Marca, lote, 'marcas', ['nombre'], _sin_ids)
+
+    def _import_areas(self, lote):
+        self._get_or_create_lote(Area, lote, 'areas', ['nombre'], _sin_ids)
+
+    def _import_items(self, lote):
+        def build(row):
+            data = _sin_ids(row)
+            old_area_id = data.pop('area_id', None)
+            if old_area_id and old_area_id in self.id_mapping['areas']:
+                data['area_id'] = self.id_mapping['areas'][old_area_id]
+            _convertir(data, ['precio', 'costo'], _decimal)
+            return data
+        self._get_or_create_lote(Item, lote, 'items', ['codigo'], build)
+
+    def _import_proveedores(self, lote):
+        self._get_or_create_lote(Proveedor, lote, 'proveedores', ['nombre'], _sin_ids)
+
+    def _import_modelos(self, lote):
+        def build(row):
+            data = _sin_ids(row)
+            old_marca_id = data.pop('marca_id', None)
+            if not old_marca_id or old_marca_id not in self.id_mapping['marcas']:
+                return None
+            data['marca_id'] = self.id_mapping['marcas'][old_marca_id]
+            return data
+        self._get_or_create_lote(Modelo, lote, 'modelos', ['nombre', 'marca_id'], build)
+
+    def _import_cargos(self, lote):
+        def build(row):
+            data = _sin_ids(row)
+            _convertir(data, ['sueldo'], _decimal)
+            return data
+        self._get_or_create_lote(Cargo, lote, 'cargos', ['nombre'], build)
+
+    def _import_clientes(self, lote):
+        def build(row):
+            data = _sin_ids(row)
+            old_usuario_id = data.pop('usuario_id', None)
+            if old_usuario_id and old_usuario_id in self.id_mapping['users']:
+                data['usuario_id'] = self.id_mapping['users'][old_usuario_id]
+            return data
+        self._get_or_create_lote(Cliente, lote, 'clientes', ['nit'], build)
+
+    def _import_vehiculos(self, lote):
+        def build(row):
+            data = _sin_ids(row)
+            for campo, entidad in [('cliente_id', 'clientes'), ('marca_id', 'marcas'), ('modelo_id', 'modelos')]:
+                old_id = data.pop(campo, None)
+                if old_id and old_id in self.id_mapping[entidad]:
+                    data[campo] = self.id_mapping[entidad][old_id]
+            return data
+        self._get_or_create_lote(Vehiculo, lote, 'vehiculos', ['numero_placa'], build)
+
+    def _import_empleados(self, lote):
+        def build(row):
+            data = _sin_ids(row)
+            for campo, entidad in [('cargo_id', 'cargos'), ('area_id', 'areas'), ('usuario_id', 'users')]:
+                old_id = data.pop(campo, None)
+                if old_id and old_id in self.id_mapping[entidad]:
+                    data[campo] = self.id_mapping[entidad][old_id]
+            _convertir(data, ['sueldo'], _decimal)
+            return data
+        self._get_or_create_lote(Empleado, lote, 'empleados', ['ci'], build)
+
+    # ------------------------------------------------------------------
+    # Presupuestos y órdenes
+    # ------------------------------------------------------------------
+    def _import_presupuestos(self, lote):
+        objs, old_ids = [], []
+        for row in lote:
+            data = _sin_ids(row)
+            data['vehiculo_id'] = self._map('vehiculos', data.pop('vehiculo_id', None))
+            data['cliente_id'] = self._map('clientes', data.pop('cliente_id', None))
+            data['impuestos'] = _decimal(data.get('impuestos'), Decimal('0.00'))
+            data['total_descuentos'] = _decimal(data.get('total_descuentos'), Decimal('0.00'))
+            # subtotal/total en None usan los defaults del modelo
+            for field in ['subtotal', 'total']:
+                valor = _decimal(data.pop(field, None))
+                if valor is not None:
+                    data[field] = valor
+            objs.append(presupuesto(tenant=self.tenant, **data))
+            old_ids.append(row['id'])
+        self._create_lote(presupuesto, 'presupuestos', objs, old_ids)
+
+    def _import_detalles_presupuestos(self, lote):
+        objs = []
+        for row in lote:
+            data = _sin_ids(row)
+            old_presup_id = data.pop('presupuesto_id')
+            old_item_id = data.pop('item_id')
+            if old_presup_id not in self.id_mapping['presupuestos'] or old_item_id not in self.id_mapping['items']:
+                continue
+            data['presupuesto_id'] = self.id_mapping['presupuestos'][old_presup_id]
+            data['item_id'] = self.id_mapping['items'][old_item_id]
+            data['precio_unitario'] = _decimal(data.get('precio_unitario'), Decimal('0.00'))
+            data['descuento_porcentaje'] = _decimal(data.get('descuento_porcentaje'), Decimal('0.00'))
+            if data.get('cantidad') is None:
+                data['cantidad'] = 0
+            data.pop('subtotal', None)
+            data.pop('total', None)
+            detalle = detallePresupuesto(tenant=self.tenant, **data)
+            detalle.calcular_importes()
+            objs.append(detalle)
+            self._presupuestos_con_detalles.add(data['presupuesto_id'])
+        self._create_lote(detallePresupuesto, 'detalles_presupuestos', objs)
+
+    def _import_ordenes_trabajo(self, lote):
+        objs, old_ids = [], []
+        for row in lote:
+            data = _sin_ids(row)
+            old_id = row['id']
+            old_cliente_id = data.pop('cliente_id', None)
+            old_vehiculo_id = data.pop('vehiculo_id', None)
+            # cliente y vehículo son campos requeridos
+            if not old_cliente_id or old_cliente_id not in self.id_mapping['clientes']:
+                logger.warning(f"Orden {old_id}: Cliente {old_cliente_id} no encontrado en mapping, omitiendo orden")
+                self.summary['errors'].append(f"Orden {old_id}: Cliente no encontrado")
+                continue
+            if not old_vehiculo_id or old_vehiculo_id not in self.id_mapping['vehiculos']:
+                logger.warning(f"Orden {old_id}: Vehículo {old_vehiculo_id} no encontrado en mapping, omitiendo orden")
+                self.summary['errors'].append(f"Orden {old_id}: Vehículo no encontrado")
+                continue
+            data['cliente_id'] = self.id_mapping['clientes'][old_cliente_id]
+            data['vehiculo_id'] = self.id_mapping['vehiculos'][old_vehiculo_id]
+            for field in ['descuento', 'impuesto', 'subtotal', 'total']:
+                data[field] = _decimal(data.get(field), Decimal('0.00'))
+            kilometraje = data.get('kilometraje')
+            if kilometraje is None or kilometraje == 'None':
+                kilometraje = 0
+            data['kilometraje'] = int(float(kilometraje))
+            _convertir(data, ['fecha_creacion', 'fecha_inicio', 'fecha_finalizacion', 'fecha_entrega'], _datetime)
+            objs.append(OrdenTrabajo(tenant=self.tenant, **data))
+            old_ids.append(old_id)
+        self._create_lote(OrdenTrabajo, 'ordenes_trabajo', objs, old_ids)
+
+    def _import_detalles_ordenes(self, lote):
+        objs = []
+        for row in lote:
+            data = _sin_ids(row)
+            old_orden_id = data.pop('orden_trabajo_id')
+            old_item_id = data.pop('item_id', None)
+            if old_orden_id not in self.id_mapping['ordenes_trabajo']:
+                continue
+            data['orden_trabajo_id'] = self.id_mapping['ordenes_trabajo'][old_orden_id]
+            data['item_id'] = self._map('items', old_item_id)
+            for field in ['descuento_porcentaje', 'descuento', 'subtotal', 'total', 'precio_unitario']:
+                data[field] = _decimal(data.get(field), Decimal('0.00'))
+            if data.get('cantidad') is None or data.get('cantidad') == 'None':
+                data['cantidad'] = 0
+            detalle = DetalleOrdenTrabajo(tenant=self.tenant, **data)
+            detalle.calcular_importes()
+            objs.append(detalle)
+            self._ordenes_con_detalles.add(data['orden_trabajo_id'])
+        self._create_lote(DetalleOrdenTrabajo, 'detalles_ordenes', objs)
+
+    def _hijos_de_orden(self, model, nombre, lote, prepare=None):
+        objs = []
+        for row in lote:
+            data = _sin_ids(row)
+            old_orden_id = data.pop('orden_trabajo_id')
+            if old_orden_id not in self.id_mapping['ordenes_trabajo']:
+                continue
+            data['orden_trabajo_id'] = self.id_mapping['ordenes_trabajo'][old_orden_id]
+            if prepare is not None and prepare(data) is False:
+                continue
+            objs.append(model(tenant=self.tenant, **data))
+        self._create_lote(model, nombre, objs)
+
+    def _map_tecnico(self, data):
+        data['tecnico_id'] = self._map('empleados', data.pop('tecnico_id', None))
+
+    def _import_notas_ordenes(self, lote):
+        self._hijos_de_orden(NotaOrdenTrabajo, 'notas_ordenes', lote)
+
+    def _import_tareas_ordenes(self, lote):
+        self._hijos_de_orden(TareaOrdenTrabajo, 'tareas_ordenes', lote)
+
+    def _import_inventarios_vehiculos(self, lote):
+        self._hijos_de_orden(InventarioVehiculo, 'inventarios_vehiculos', lote)
+
+    def _import_inspecciones(self, lote):
+        objs, old_ids = [], []
+        for row in lote:
+            data = _sin_ids(row)
+            old_orden_id = data.pop('orden_trabajo_id')
+            if old_orden_id not in self.id_mapping['ordenes_trabajo']:
+                continue
+            data['orden_trabajo_id'] = self.id_mapping['ordenes_trabajo'][old_orden_id]
+            self._map_tecnico(data)
+            objs.append(Inspeccion(tenant=self.tenant, **data))
+            old_ids.append(row['id'])
+        self._create_lote(Inspeccion, 'inspecciones', objs, old_ids)
+
+    def _import_detalles_inspeccion(self, lote):
+        objs = []
+        for row in lote:
+            data = _sin_ids(row)
+            old_inspeccion_id = data.pop('inspeccion_id')
+            if old_inspeccion_id not in self.id_mapping['inspecciones']:
+                continue
+            data['inspeccion_id'] = self.id_mapping['inspecciones'][old_inspeccion_id]
+            objs.append(DetalleInspeccion(tenant=self.tenant, **data))
+        self._create_lote(DetalleInspeccion, 'detalles_inspeccion', objs)
+
+    def _import_pruebas_ruta(self, lote):
+        self._hijos_de_orden(PruebaRuta, 'pruebas_ruta', lote, prepare=self._map_tecnico)
+
+    def _import_asignaciones_tecnicos(self, lote):
+        def prepare(data):
+            old_tecnico_id = data.pop('tecnico_id', data.pop('empleado_id', None))
+            if not old_tecnico_id or old_tecnico_id not in self.id_mapping['empleados']:
+                return False
+            data['tecnico_id'] = self.id_mapping['empleados'][old_tecnico_id]
+        self._hijos_de_orden(AsignacionTecnico, 'asignaciones_tecnicos', lote, prepare=prepare)
+
+    def _import_imagenes_ordenes(self, lote):
+        def prepare(data):
+            # Solo metadatos, no archivos
+            data.pop('imagen', None)
+        self._hijos_de_orden(ImagenOrdenTrabajo, 'imagenes_ordenes', lote, prepare=prepare)
+
+    def _import_pagos(self, lote):
+        def prepare(data):
+            data.pop('usuario_id', None)
+            data.pop('stripe_payment_intent_id', None)
+            data.pop('stripe_charge_id', None)
+            _convertir(data, ['monto'], _decimal)
+        self._hijos_de_orden(Pago, 'pagos', lote, prepare=prepare)
+
+    # ------------------------------------------------------------------
+    # Facturas de proveedor
+    # ------------------------------------------------------------------
+    def _import_facturas_proveedor(self, lote):
+        objs, old_ids = [], []
+        for row in lote:
+            data = _sin_ids(row)
+            old_proveedor_id = data.pop('proveedor_id')
+            if not old_proveedor_id or old_proveedor_id not in self.id_mapping['proveedores']:
+                continue
+            data['proveedor_id'] = self.id_mapping['proveedores'][old_proveedor_id]
+            for field in ['descuento_porcentaje', 'impuesto_porcentaje', 'subtotal', 'descuento', 'impuesto', 'total']:
+                valor = _decimal(data.pop(field, None))
+                # Los importes en 0 se exportan como None: usar el default del modelo
+                if valor is not None:
+                    data[field] = valor
+            data.setdefault('subtotal', Decimal('0.00'))
+            factura = FacturaProveedor(tenant=self.tenant, **data)
+            factura.calcular_montos()
+            objs.append(factura)
+            old_ids.append(row['id'])
+        self._create_lote(FacturaProveedor, 'facturas_proveedor', objs, old_ids)
+
+    def _import_detalles_facturas_proveedor(self, lote):
+        objs = []
+        for row in lote:
+            data = _sin_ids(row)
+            old_factura_id = data.pop('factura_id', data.pop('factura_proveedor_id', None))
+            old_item_id = data.pop('item_id')
+            facturas_mapping = self.id_mapping['facturas_proveedor']
+            if old_factura_id not in facturas_mapping or old_item_id not in self.id_mapping['items']:
+                continue
+            data['factura_id'] = facturas_mapping[old_factura_id]
+            data['item_id'] = self.id_mapping['items'][old_item_id]
+            # El backup usa 'precio_unitario'/'descuento_porcentaje'; el modelo 'precio'/'descuento'
+            if 'precio_unitario' in data:
+                data['precio'] = data.pop('precio_unitario')
+            if 'descuento_porcentaje' in data:
+                data['descuento'] = data.pop('descuento_porcentaje')
+            data['precio'] = _decimal(data.get('precio'), Decimal('0.00'))
+            data['descuento'] = _decimal(data.get('descuento'), Decimal('0.00'))
+            if data.get('cantidad') is None:
+                data['cantidad'] = 0
+            subtotal = Decimal(str(data['cantidad'])) * data['precio']
+            data['subtotal'] = subtotal
+            data['total'] = subtotal - data['descuento']
+            objs.append(DetalleFacturaProveedor(tenant=self.tenant, **data))
+            self._facturas_con_detalles.add(data['factura_id'])
+        self._create_lote(DetalleFacturaProveedor, 'detalles_facturas_proveedor', objs)
+
+    # ------------------------------------------------------------------
+    # Citas, lecturas y reportes
+    # ------------------------------------------------------------------
+    def _import_citas(self, lote):
+        objs = []
+        for row in lote:
+            data = _sin_ids(row)
+            # Remover campos que pueden no existir en versiones antiguas
+            data.pop('observaciones', None)
+            for campo, entidad in [('vehiculo_id', 'vehiculos'), ('empleado_id', 'empleados'), ('cliente_id', 'clientes')]:
+                old_id = data.pop(campo, None)
+                if old_id and old_id in self.id_mapping[entidad]:
+                    data[campo] = self.id_mapping[entidad][old_id]
+            objs.append(Cita(tenant=self.tenant, **data))
+        self._create_lote(Cita, 'citas', objs)
+
+    def _import_lecturas_placa(self, lote):
+        objs = []
+        for row in lote:
+            data = _sin_ids(row)
+            old_vehiculo_id = data.pop('vehiculo_id', None)
+            if old_vehiculo_id and old_vehiculo_id in self.id_mapping['vehiculos']:
+                data['vehiculo_id'] = self.id_mapping['vehiculos'][old_vehiculo_id]
+            objs.append(LecturaPlaca(tenant=self.tenant, **data))
+        self._create_lote(LecturaPlaca, 'lecturas_placa', objs)
+
+    def _import_reportes(self, lote):
+        objs = []
+        for row in lote:
+            # Solo metadatos, no archivos
+            data = _sin_ids(row)
+            data.pop('archivo', None)
+            # El usuario es obligatorio: sin él no se puede restaurar el reporte
+            usuario_id = self._map('users', data.pop('usuario_id', None))
+            if usuario_id is None:
+                continue
+            data['usuario_id'] = usuario_id
+            _convertir(data, ['fecha_generacion', 'fecha_inicio'], _datetime)
+            objs.append(Reporte(tenant=self.tenant, **data))
+        self._create_lote(Reporte, 'reportes', objs)
+
+    # ------------------------------------------------------------------
+    # Asistencias y nóminas
+    # ------------------------------------------------------------------
+    def _import_asistencias(self, lote):
+        objs = []
+        for row in lote:
+            data = _sin_ids(row)
+            old_empleado_id = data.pop('empleado_id')
+            if not old_empleado_id or old_empleado_id not in self.id_mapping['empleados']:
+                continue
+            data['empleado_id'] = self.id_mapping['empleados'][old_empleado_id]
+            _convertir(data, ['horas_extras', 'horas_faltantes'], _decimal)
+            _convertir(data, ['fecha'], _date)
+            _convertir(data, ['hora_entrada', 'hora_salida'], _time)
+            _convertir(data, ['fecha_creacion', 'fecha_actualizacion'], _datetime)
+            asistencia = Asistencia(tenant=self.tenant, **data)
+            # Mismo cálculo que Asistencia.save()
+            if asistencia.hora_salida:
+                asistencia.calcular_horas()
+            objs.append(asistencia)
+        self._create_lote(Asistencia, 'asistencias', objs)
+
+    def _import_nominas(self, lote):
+        objs, old_ids = [], []
+        for row in lote:
+            data = _sin_ids(row)
+            _convertir(data, ['total_nomina'], _decimal)
+            _convertir(data, ['fecha_inicio', 'fecha_corte'], _date)
+            _convertir(data, ['fecha_registro'], _datetime)
+            nomina = Nomina(tenant=self.tenant, **data)
+            # Nomina.save() ejecuta full_clean(); se conservan sus validaciones
+            nomina.full_clean(exclude=['tenant'], validate_unique=False)
+            objs.append(nomina)
+            old_ids.append(row['id'])
+        self._create_lote(Nomina, 'nominas', objs, old_ids)
+
+    def _import_detalles_nomina(self, lote):
+        objs = []
+        for row in lote:
+            data = _sin_ids(row)
+            old_nomina_id = data.pop('nomina_id')
+            old_empleado_id = data.pop('empleado_id')
+            if old_nomina_id not in self.id_mapping['nominas'] or old_empleado_id not in self.id_mapping['empleados']:
+                continue
+            data['nomina_id'] = self.id_mapping['nominas'][old_nomina_id]
+            data['empleado_id'] = self.id_mapping['empleados'][old_empleado_id]
+            _convertir(data, ['sueldo', 'horas_extras', 'total_bruto', 'total_descuento', 'sueldo_neto'], _decimal)
+            objs.append(DetalleNomina(tenant=self.tenant, **data))
+            self._nominas_con_detalles.add(data['nomina_id'])
+        # Mismo cálculo que DetalleNomina.save(), a partir de las asistencias ya importadas
+        DetalleNomina.calcular_campos_en_lote(objs)
+        self._create_lote(DetalleNomina, 'detalles_nomina', objs)
+
+
+def bulk_import_tenant_data(backup_data, target_tenant, replace=False, batch_size=BULK_BATCH_SIZE, progress=None):
+    """
+    Importa un backup usando inserciones masivas.
+
+    Mismo formato de entrada y de resumen que import_tenant_data, pero cada
+    entidad se inserta por lotes con bulk_create y los totales de órdenes,
+    presupuestos, facturas y nóminas se recalculan una vez al final.
+
+    Args:
+        backup_data: Diccionario con los datos del backup, o lista con un
+            backup completo seguido de sus incrementales
+        target_tenant: Instancia del Tenant destino
+        replace: Si True, elimina datos existentes antes de importar
+        batch_size: Filas por INSERT
+        progress: Callable opcional progress(seccion, filas) invocado al
+            terminar cada sección
+
+    Returns:
+        dict: Resumen de la importación
+    """
+    with transaction.atomic():
+        try:
+            backup_data = resolve_backup_chain(backup_data)
+
+            # Validar versión del backup
+            if backup_data.get('metadata', {}).get('version') != '1.0':
+                raise ValidationError("Versión de backup no compatible")
+
+            if replace:
+                _clear_tenant_data(target_tenant)
+
+            restorer = BulkRestorer(target_tenant, batch_size=batch_size)
+            for nombre in RESTORE_ORDER:
+                rows = backup_data.get(nombre, [])
+                restorer.import_section(nombre, rows)
+                if progress is not None:
+                    progress(nombre, len(rows))
+            summary = restorer.finish()
+
+            logger.info(f"Backup importado (bulk) exitosamente al tenant: {target_tenant.nombre_taller}")
+            return summary
+        except Exception as e:
+            logger.error(f"Error al importar datos al tenant {target_tenant.id}: {str(e)}", exc_info=True)
+            raise
+
+
+class _SeccionesEnEspera:
+    """
+    Guarda en un archivo temporal los lotes de las secciones que llegan antes
+    que sus dependencias; en memoria solo queda la posición de cada lote.
+    """
+
+    def __init__(self):
+        self._archivo = tempfile.TemporaryFile()
+        self._lotes = {}
+
+    def guardar(self, nombre, rows):
+        datos = json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self._archivo.seek(0, 2)
+        self._lotes.setdefault(nombre, []).append((self._archivo.tell(), len(datos)))
+        self._archivo.write(datos)
+
+    def lotes(self, nombre):
+        for posicion, largo in self._lotes.pop(nombre, []):
+            self._archivo.seek(posicion)
+            yield json.loads(self._archivo.read(largo))
+
+    def close(self):
+        self._archivo.close()
+
+
+def stream_import_tenant_data(archivo, target_tenant, replace=False, batch_size=BULK_BATCH_SIZE, progress=None):
+    """
+    Importa un backup NDJSON (con o sin gzip) o columnar leyéndolo por partes.
+
+    El archivo se descomprime de forma incremental y cada lote de filas pasa
+    directo al BulkRestorer cuando su sección ya puede importarse según
+    RESTORE_ORDER. Los lotes que llegan antes que sus dependencias (el orden
+    del export no es el de restauración) se guardan en un archivo temporal y
+    se importan en cuanto corresponde, así que la memoria usada depende del
+    tamaño de lote y no del tamaño del backup.
+
+    Args:
+        archivo: Objeto tipo archivo en modo binario (p. ej. el archivo subido)
+        target_tenant, replace, batch_size, progress: Igual que en
+            bulk_import_tenant_data
+
+    Returns:
+        dict: Resumen de la importación
+    """
+    registros = iter_backup_registros(archivo)
+    clave, metadata = next(registros, (None, None))
+    if clave != 'metadata':
+        raise ValidationError("Archivo de backup inválido: falta metadata")
+    if metadata.get('version') != '1.0':
+        raise ValidationError("Versión de backup no compatible")
+    if metadata.get('tipo') == BACKUP_INCREMENTAL:
+        raise ValidationError(
+            "Un backup incremental debe restaurarse junto con su cadena (backup completo base e incrementales)"
+        )
+
+    en_espera = _SeccionesEnEspera()
+    with transaction.atomic():
+        try:
+            if replace:
+                _clear_tenant_data(target_tenant)
+
+            restorer = BulkRestorer(target_tenant, batch_size=batch_size)
+            posicion = {nombre: i for i, nombre in enumerate(RESTORE_ORDER)}
+            filas = dict.fromkeys(RESTORE_ORDER, 0)
+            completas = set()
+            siguiente = 0  # Índice en RESTORE_ORDER de la sección que se importa ahora
+            actual = None
+
+            def avanzar():
+                # Cierra las secciones ya completas e importa lo que esperaba por ellas
+                nonlocal siguiente
+                while siguiente < len(RESTORE_ORDER) and RESTORE_ORDER[siguiente] in completas:
+                    nombre = RESTORE_ORDER[siguiente]
+                    if progress is not None:
+                        progress(nombre, filas[nombre])
+                    siguiente += 1
+                    if siguiente < len(RESTORE_ORDER):
+                        for lote in en_espera.lotes(RESTORE_ORDER[siguiente]):
+                            restorer.import_section(RESTORE_ORDER[siguiente], lote)
+
+            for nombre, rows in registros:
+                if nombre not in filas:
+                    continue  # tenant, ids_actuales y secciones que no se restauran
+                if nombre != actual:
+                    # Las secciones llegan en lotes consecutivos: la anterior ya terminó
+                    if actual is not None:
+                        completas.add(actual)
+                        avanzar()
+                    actual = nombre
+                filas[nombre] += len(rows)
+                if posicion[nombre] <= siguiente:
+                    # Todas sus dependencias ya están importadas
+                    restorer.import_section(nombre, rows)
+                else:
+                    en_espera.guardar(nombre, rows)
+
+            completas.update(RESTORE_ORDER)
+            avanzar()
+            summary = restorer.finish()
+
+            logger.info(f"Backup importado (streaming) exitosamente al tenant: {target_tenant.nombre_taller}")
+            return summary
+        except Exception as e:
+            logger.error(f"Error al importar datos al tenant {target_tenant.id}: {str(e)}", exc_info=True)
+            raise
+        finally:
+            en_espera.close()
+
+
+def stream_import_backup_chain(archivos, target_tenant, replace=False, batch_size=BULK_BATCH_SIZE, progress=None):
+    """
+    Importa una cadena de backups NDJSON o columnares (el completo seguido de
+    sus incrementales) leyendo cada archivo por partes.
+
+    Equivale a bulk_import_tenant_data con la cadena cargada en memoria
+    (merge_backup_chain), pero las filas combinadas se guardan en un archivo
+    temporal por sección. Los incrementales se leen dos veces: la primera
+    solo registra qué IDs reemplaza cada uno y sus ids_actuales, así que en
+    memoria quedan IDs y un lote de filas a la vez.
+
+    Args:
+        archivos: Objetos tipo archivo binarios (con seek), en orden de aplicación
+        target_tenant, replace, batch_size, progress: Igual que en
+            bulk_import_tenant_data
+
+    Returns:
+        dict: Resumen de la importación
+    """
+    # Primera pasada: metadata, archivo con la última versión de cada fila de
+    # las secciones incrementales e ids_actuales de cada incremental
+    metadatas = []
+    ultima_version = {nombre: {} for nombre in INCREMENTAL_SECTIONS if nombre in RESTORE_ORDER}
+    vigentes = []
+    for i, archivo in enumerate(archivos):
+        registros = iter_backup_registros(archivo)
+        clave, metadata = next(registros, (None, None))
+        if clave != 'metadata':
+            raise ValidationError("Archivo de backup inválido: falta metadata")
+        metadatas.append(metadata)
+        ids_actuales = {}
+        if i > 0:
+            for clave, valor in registros:
+                if clave == 'ids_actuales':
+                    ids_actuales = {nombre: IdsVigentes(ids) for nombre, ids in valor.items()}
+                elif clave in ultima_version:
+                    for row in valor:
+                        ultima_version[clave][row['id']] = i
+        vigentes.append(ids_actuales)
+        archivo.seek(0)
+    validar_cadena(metadatas)
+    if metadatas[0].get('version') != '1.0':
+        raise ValidationError("Versión de backup no compatible")
+
+    ultimo = len(archivos) - 1
+
+    def conservar(nombre, row, i):
+        # Solo la versión más reciente, si ningún incremental posterior la eliminó
+        if ultima_version[nombre].get(row['id'], 0) != i:
+            return False
+        return all(
+            row['id'] in vigentes[k][nombre]
+            for k in range(i + 1, len(archivos))
+            if nombre in vigentes[k]
+        )
+
+    en_espera = _SeccionesEnEspera()
+    try:
+        # Segunda pasada: filas combinadas al archivo temporal
+        filas = dict.fromkeys(RESTORE_ORDER, 0)
+        for i, archivo in enumerate(archivos):
+            for nombre, rows in iter_backup_registros(archivo):
+                if nombre not in filas:
+                    continue  # metadata, tenant, ids_actuales y secciones que no se restauran
+                if nombre in ultima_version:
+                    rows = [row for row in rows if conservar(nombre, row, i)]
+                elif i != ultimo:
+                    continue  # Las secciones completas se toman del backup más reciente
+                if rows:
+                    en_espera.guardar(nombre, rows)
+                    filas[nombre] += len(rows)
+
+        with transaction.atomic():
+            try:
+                if replace:
+                    _clear_tenant_data(target_tenant)
+
+                restorer = BulkRestorer(target_tenant, batch_size=batch_size)
+                for nombre in RESTORE_ORDER:
+                    for lote in en_espera.lotes(nombre):
+                        restorer.import_section(nombre, lote)
+                    if progress is not None:
+                        progress(nombre, filas[nombre])
+                summary = restorer.finish()
+
+                logger.info(f"Cadena de backups importada (streaming) al tenant: {target_tenant.nombre_taller}")
+                return summary
+            except Exception as e:
+                logger.error(f"Error al importar datos al tenant {target_tenant.id}: {str(e)}", exc_info=True)
+                raise
+    finally:
+        en_espera.close()
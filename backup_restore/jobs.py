@@ -0,0 +1,299 @@
+"""
+Ejecución en segundo plano de trabajos de backup y restauración (BackupJob).
+
+Por defecto los trabajos corren en un pool de hilos del propio proceso web
+(BACKUP_JOBS_BACKEND='thread'). Con BACKUP_JOBS_BACKEND='celery' se encolan
+como tarea Celery (tasks.ejecutar_backup_job), lo que requiere un worker y
+un broker configurados.
+"""
+import json
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import connection, connections, transaction, DatabaseError
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import BackupJob
+from .utils import (
+    EXPORT_SECTIONS, COLUMNAR_FORMAT, iter_tenant_data_ndjson, iter_tenant_data_columnar,
+    iter_gzip, load_backup_content, is_streamable_backup,
+)
+from .bulk_restore import (
+    RESTORE_ORDER, bulk_import_tenant_data, stream_import_tenant_data, stream_import_backup_chain,
+)
+from personal_admin.views import registrar_bitacora
+from personal_admin.models import Bitacora
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BACKUP_JOB_WORKERS', 2),
+                thread_name_prefix='backup-job',
+            )
+        return _executor
+
+
+def enqueue_job(job):
+    """
+    Programa la ejecución del trabajo. Se despacha con on_commit para que el
+    worker nunca lea un BackupJob que todavía no está confirmado.
+    """
+    if getattr(settings, 'BACKUP_JOBS_BACKEND', 'thread') == 'celery':
+        from .tasks import ejecutar_backup_job
+        transaction.on_commit(lambda: ejecutar_backup_job.delay(job.id))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, job.id))
+
+
+# Conexión para el progreso de las restauraciones (ver settings.DATABASES)
+DB_PROGRESO = 'progreso'
+
+
+def _run_in_thread(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        # Cada hilo del pool abre sus propias conexiones; cerrarlas al terminar
+        connection.close()
+        if DB_PROGRESO in settings.DATABASES:
+            connections[DB_PROGRESO].close()
+
+
+def _guardar(job, campos):
+    """
+    Persiste solo los campos indicados del trabajo, siempre que siga
+    EN_PROCESO (si vencer_trabajos_colgados() ya lo dio por colgado no se
+    sobrescribe). También renueva fecha_actualizacion.
+
+    Returns:
+        False si el trabajo ya no estaba EN_PROCESO
+    """
+    valores = {campo: getattr(job, campo) for campo in campos}
+    valores['fecha_actualizacion'] = timezone.now()
+    if not connection.in_atomic_block:
+        return bool(_filtro_en_proceso(job).update(**valores))
+    # Dentro de la transacción de la restauración el UPDATE no sería visible
+    # hasta el commit final; se escribe por la conexión de progreso.
+    # SQLite no admite escrituras concurrentes, así que ahí se omite.
+    if connection.vendor == 'sqlite' or DB_PROGRESO not in settings.DATABASES:
+        if not getattr(job, '_progreso_omitido', False):
+            job._progreso_omitido = True
+            logger.info(
+                f"Progreso del trabajo {job.pk} no disponible hasta que termine: "
+                f"no se puede escribir fuera de la transacción de la restauración "
+                f"(SQLite no admite escrituras concurrentes)"
+            )
+        return True
+    try:
+        return bool(_filtro_en_proceso(job).using(DB_PROGRESO).update(**valores))
+    except DatabaseError as e:
+        logger.warning(f"No se pudo actualizar el progreso del trabajo {job.pk}: {e}")
+        return True
+
+
+def _filtro_en_proceso(job):
+    return BackupJob.objects.filter(pk=job.pk, estado=BackupJob.Estado.EN_PROCESO)
+
+
+def _guardar_final(job, campos):
+    """Último _guardar() del trabajo; avisa si ya se había dado por colgado."""
+    if not _guardar(job, campos):
+        logger.warning(
+            f"El trabajo {job.pk} terminó ({job.estado}) después de darse por colgado; "
+            f"se mantiene el estado ERROR"
+        )
+
+
+def _registrar_progreso(job):
+    def progress(seccion, filas):
+        job.progreso[seccion] = filas
+        job.ultima_seccion = seccion
+        job.secciones_completadas += 1
+        _guardar(job, ['progreso', 'ultima_seccion', 'secciones_completadas'])
+    return progress
+
+
+def vencer_trabajos_colgados(tenant=None):
+    """
+    Marca como ERROR los trabajos EN_PROCESO sin escrituras del worker
+    (fecha_actualizacion) durante BACKUP_JOB_TIMEOUT, p. ej. porque el
+    proceso se reinició a mitad del trabajo
+    """
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'BACKUP_JOB_TIMEOUT', 7200))
+    colgados = BackupJob.objects.filter(estado=BackupJob.Estado.EN_PROCESO).filter(
+        Q(fecha_actualizacion__lt=limite)
+        # Trabajos tomados antes de que existiera fecha_actualizacion
+        | Q(fecha_actualizacion__isnull=True, fecha_inicio__lt=limite)
+    )
+    if tenant is not None:
+        colgados = colgados.filter(tenant=tenant)
+    vencidos = colgados.update(
+        estado=BackupJob.Estado.ERROR,
+        error='Tiempo de ejecución agotado',
+        fecha_fin=timezone.now(),
+    )
+    if vencidos:
+        logger.warning(f"{vencidos} trabajos de backup/restore colgados marcados como ERROR")
+
+
+def run_job(job_id):
+    """
+    Ejecuta un trabajo pendiente. Es idempotente: si el trabajo ya fue tomado
+    por otro worker no hace nada.
+    """
+    vencer_trabajos_colgados()
+    ahora = timezone.now()
+    tomados = BackupJob.objects.filter(pk=job_id, estado=BackupJob.Estado.PENDIENTE).update(
+        estado=BackupJob.Estado.EN_PROCESO,
+        fecha_inicio=ahora,
+        fecha_actualizacion=ahora,
+    )
+    if not tomados:
+        return
+    job = BackupJob.objects.select_related('tenant', 'usuario', 'base').get(pk=job_id)
+
+    try:
+        if job.tipo == BackupJob.Tipo.BACKUP:
+            _ejecutar_backup(job)
+        else:
+            _ejecutar_restore(job)
+    except Exception as e:
+        logger.error(f"Error en trabajo de {job.tipo} {job.id}: {str(e)}", exc_info=True)
+        job.estado = BackupJob.Estado.ERROR
+        job.error = str(e)
+        job.fecha_fin = timezone.now()
+        _guardar_final(job, ['estado', 'error', 'fecha_fin'])
+
+
+def _ejecutar_backup(job):
+    tenant = job.tenant
+    job.secciones_totales = len(EXPORT_SECTIONS)
+    _guardar(job, ['secciones_totales'])
+
+    export_kwargs = {'backup_id': job.backup_id.hex if job.backup_id else None}
+    if job.base is not None:
+        # Incremental: filas modificadas desde que empezó el backup base
+        export_kwargs.update(desde=job.base.fecha_inicio, base_backup_id=job.base.backup_id.hex)
+
+    # El archivo se genera en disco temporal, sin acumular el backup en memoria
+    with tempfile.TemporaryFile() as tmp:
+        progress = _registrar_progreso(job)
+        if job.opciones.get('formato') == COLUMNAR_FORMAT:
+            chunks = iter_tenant_data_columnar(tenant, progress=progress, **export_kwargs)
+            extension = 'tbk'
+        else:
+            chunks = iter_gzip(iter_tenant_data_ndjson(tenant, progress=progress, **export_kwargs))
+            extension = 'ndjson.gz'
+        for chunk in chunks:
+            tmp.write(chunk)
+        tmp.seek(0)
+        timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"backup_{tenant.nombre_taller.replace(' ', '_')}_{timestamp}.{extension}"
+        job.archivo.save(filename, File(tmp), save=False)
+
+    job.resumen = dict(job.progreso)
+    job.estado = BackupJob.Estado.COMPLETADO
+    job.fecha_fin = timezone.now()
+    _guardar_final(job, ['archivo', 'resumen', 'estado', 'fecha_fin'])
+
+    registrar_bitacora(
+        usuario=job.usuario,
+        accion=Bitacora.Accion.CREAR,
+        modulo=Bitacora.Modulo.AUTENTICACION,
+        descripcion=f"Backup {'incremental' if job.es_incremental else 'completo'} en segundo plano generado para el taller '{tenant.nombre_taller}' (trabajo {job.id})",
+    )
+
+
+def _leer_backup(job):
+    if not job.archivo:
+        raise ValidationError(f"El trabajo {job.id} no tiene archivo de backup")
+    with job.archivo.open('rb') as archivo:
+        return load_backup_content(archivo.read())
+
+
+def _restaurar_datos(job, backup_data, replace):
+    backups = backup_data if isinstance(backup_data, list) else [backup_data]
+    if any('metadata' not in backup for backup in backups):
+        raise ValidationError("Archivo de backup inválido: falta metadata")
+    return bulk_import_tenant_data(backup_data, job.tenant, replace=replace, progress=_registrar_progreso(job))
+
+
+def _restaurar_archivo(job, origen, replace):
+    """
+    Restaura el archivo de `origen`. Los backups NDJSON y columnares se leen
+    por partes; el JSON clásico se carga completo.
+    """
+    if not origen.archivo:
+        raise ValidationError(f"El trabajo {origen.id} no tiene archivo de backup")
+    with origen.archivo.open('rb') as archivo:
+        if is_streamable_backup(archivo):
+            return stream_import_tenant_data(
+                archivo, job.tenant, replace=replace, progress=_registrar_progreso(job)
+            )
+        return _restaurar_datos(job, load_backup_content(archivo.read()), replace)
+
+
+def _restaurar_cadena(job, cadena, replace):
+    """
+    Restaura un backup completo y sus incrementales. Los que generan los
+    trabajos (NDJSON o columnar) se combinan leyendo los archivos por partes;
+    si alguno es JSON clásico la cadena se carga en memoria.
+    """
+    with ExitStack() as pila:
+        archivos = []
+        for backup in cadena:
+            if not backup.archivo:
+                raise ValidationError(f"El trabajo {backup.id} no tiene archivo de backup")
+            archivos.append(pila.enter_context(backup.archivo.open('rb')))
+        if all(is_streamable_backup(archivo) for archivo in archivos):
+            return stream_import_backup_chain(
+                archivos, job.tenant, replace=replace, progress=_registrar_progreso(job)
+            )
+    return _restaurar_datos(job, [_leer_backup(backup) for backup in cadena], replace)
+
+
+def _ejecutar_restore(job):
+    job.secciones_totales = len(RESTORE_ORDER)
+    _guardar(job, ['secciones_totales'])
+
+    replace = job.opciones.get('replace', True)
+    origen_id = job.opciones.get('backup_job_id')
+    if origen_id:
+        # Restaurar la cadena de un backup generado por un trabajo anterior
+        origen = BackupJob.objects.get(pk=origen_id, tenant=job.tenant)
+        cadena = origen.cadena()
+        if len(cadena) == 1:
+            summary = _restaurar_archivo(job, origen, replace)
+        else:
+            summary = _restaurar_cadena(job, cadena, replace)
+    else:
+        summary = _restaurar_archivo(job, job, replace)
+
+    job.resumen = summary
+    job.estado = BackupJob.Estado.COMPLETADO
+    job.fecha_fin = timezone.now()
+    # Incluye el progreso por si se omitió durante la transacción (SQLite)
+    _guardar_final(job, ['progreso', 'ultima_seccion', 'secciones_completadas', 'resumen', 'estado', 'fecha_fin'])
+
+    registrar_bitacora(
+        usuario=job.usuario,
+        accion=Bitacora.Accion.EDITAR,
+        modulo=Bitacora.Modulo.AUTENTICACION,
+        descripcion=f"Restauración del sistema completada (trabajo {job.id}). Resumen: {json.dumps(summary)}",
+    )
@@ -0,0 +1,55 @@
+"""
+Comando de Django para verificar la integridad de los backups guardados por
+los trabajos en segundo plano, contra el manifest de cada archivo.
+
+Uso:
+    python manage.py verificar_backups
+    python manage.py verificar_backups --tenant 3
+"""
+from django.core.management.base import BaseCommand
+
+from backup_restore.models import BackupJob
+from backup_restore.utils import verify_backup
+
+
+class Command(BaseCommand):
+    help = 'Verifica los archivos de backup guardados contra su manifest (filas y SHA-256 por sección)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=int,
+            help='Verificar solo los backups de este tenant'
+        )
+
+    def handle(self, *args, **options):
+        jobs = BackupJob.objects.filter(
+            tipo=BackupJob.Tipo.BACKUP,
+            estado=BackupJob.Estado.COMPLETADO,
+        ).exclude(archivo='').exclude(archivo__isnull=True).order_by('id')
+        if options['tenant']:
+            jobs = jobs.filter(tenant_id=options['tenant'])
+
+        validos = 0
+        invalidos = 0
+        for job in jobs.iterator():
+            try:
+                with job.archivo.open('rb') as archivo:
+                    resultado = verify_backup(archivo)
+            except OSError as e:
+                resultado = {'valido': False, 'errores': [f"No se pudo abrir el archivo: {e}"]}
+
+            if resultado['valido']:
+                validos += 1
+                self.stdout.write(f"✅ Trabajo {job.id}: {job.archivo.name}")
+            else:
+                invalidos += 1
+                self.stdout.write(self.style.ERROR(
+                    f"❌ Trabajo {job.id}: {job.archivo.name} - {'; '.join(resultado['errores'])}"
+                ))
+
+        resumen = f"\n{validos} backups válidos, {invalidos} con errores"
+        if invalidos:
+            self.stdout.write(self.style.ERROR(resumen))
+        else:
+            self.stdout.write(self.style.SUCCESS(resumen))
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('personal_admin', '0018_merge_20251125_0503'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackupJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('BACKUP', 'Backup'), ('RESTORE', 'Restauración')], max_length=10)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En proceso'), ('COMPLETADO', 'Completado'), ('ERROR', 'Error')], default='PENDIENTE', max_length=12)),
+                ('opciones', models.JSONField(blank=True, default=dict, help_text='Opciones del trabajo (p. ej. replace)')),
+                ('archivo', models.FileField(blank=True, null=True, upload_to='backups/%Y/%m/')),
+                ('ultima_seccion', models.CharField(blank=True, help_text='Última sección procesada', max_length=50)),
+                ('secciones_totales', models.PositiveIntegerField(default=0)),
+                ('secciones_completadas', models.PositiveIntegerField(default=0)),
+                ('progreso', models.JSONField(blank=True, default=dict, help_text='Filas procesadas por sección')),
+                ('resumen', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='backup_jobs', to='personal_admin.tenant')),
+                ('usuario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='backup_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'backup_job',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['tenant', 'estado'], name='backup_job_tenant__85c5ab_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup_restore', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backupjob',
+            name='backup_id',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='backupjob',
+            name='base',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='incrementales', to='backup_restore.backupjob'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup_restore', '0002_backupjob_cadena'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backupjob',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,3 +1,75 @@
 from django.db import models
+from django.contrib.auth.models import User
+from personal_admin.models_saas import Tenant
 
-# Create your models here.
+
+class BackupJob(models.Model):
+    """
+    Trabajo de backup o restauración ejecutado en segundo plano.
+
+    Guarda el estado, el avance por sección y el archivo asociado: para un
+    backup es el archivo generado (.ndjson.gz) y para una restauración es el
+    archivo subido que se va a importar.
+    """
+    class Tipo(models.TextChoices):
+        BACKUP = "BACKUP", "Backup"
+        RESTORE = "RESTORE", "Restauración"
+
+    class Estado(models.TextChoices):
+        PENDIENTE = "PENDIENTE", "Pendiente"
+        EN_PROCESO = "EN_PROCESO", "En proceso"
+        COMPLETADO = "COMPLETADO", "Completado"
+        ERROR = "ERROR", "Error"
+
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='backup_jobs')
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='backup_jobs')
+    tipo = models.CharField(max_length=10, choices=Tipo.choices)
+    estado = models.CharField(max_length=12, choices=Estado.choices, default=Estado.PENDIENTE)
+    opciones = models.JSONField(default=dict, blank=True, help_text="Opciones del trabajo (p. ej. replace)")
+    archivo = models.FileField(upload_to='backups/%Y/%m/', blank=True, null=True)
+    # Cadena de backups incrementales: cada incremental apunta a su base
+    backup_id = models.UUIDField(null=True, blank=True, editable=False)
+    base = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='incrementales'
+    )
+    ultima_seccion = models.CharField(max_length=50, blank=True, help_text="Última sección procesada")
+    secciones_totales = models.PositiveIntegerField(default=0)
+    secciones_completadas = models.PositiveIntegerField(default=0)
+    progreso = models.JSONField(default=dict, blank=True, help_text="Filas procesadas por sección")
+    resumen = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    # Última escritura del worker: un trabajo sin novedades por
+    # BACKUP_JOB_TIMEOUT se da por colgado
+    fecha_actualizacion = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "backup_job"
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['tenant', 'estado']),
+        ]
+
+    @property
+    def porcentaje(self):
+        if not self.secciones_totales:
+            return 100 if self.estado == self.Estado.COMPLETADO else 0
+        return round(self.secciones_completadas * 100 / self.secciones_totales)
+
+    @property
+    def es_incremental(self):
+        return self.base_id is not None
+
+    def cadena(self):
+        """Backups desde el completo base hasta este, en orden de aplicación."""
+        cadena = []
+        job = self
+        while job is not None:
+            cadena.append(job)
+            job = job.base
+        return list(reversed(cadena))
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.id} - {self.tenant} ({self.estado})"
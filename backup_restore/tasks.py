@@ -0,0 +1,12 @@
+"""
+Tareas Celery del módulo de Backup y Restore.
+Solo se usan con BACKUP_JOBS_BACKEND='celery'.
+"""
+from celery import shared_task
+
+from .jobs import run_job
+
+
+@shared_task
+def ejecutar_backup_job(job_id):
+    run_job(job_id)
@@ -1,3 +1,313 @@
-from django.test import TestCase
+import copy
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import Group, Permission, User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from clientes_servicios.models import Cliente
+from operaciones_inventario.modelsItem import Item
+from operaciones_inventario.modelsOrdenTrabajo import DetalleOrdenTrabajo, OrdenTrabajo
+from operaciones_inventario.modelsVehiculos import Marca, Modelo, Vehiculo
+from personal_admin.models_saas import Tenant, UserProfile
+from servicios_IA.jobsReportes import _registrar_progreso
+from servicios_IA.models import Reporte
+from .jobs import _guardar_final, vencer_trabajos_colgados
+from .models import BackupJob
+from .bulk_restore import bulk_import_tenant_data, stream_import_tenant_data
+from .utils import (
+    COLUMNAR_MAGIC, EXPORT_SECTIONS, SECCIONES_EXPORTADAS, export_tenant_data, import_tenant_data, iter_tenant_data_columnar,
+    iter_tenant_data_ndjson, merge_backup_chain, parse_columnar_backup, verify_backup,
+)
+
+
+def _crear_tenant():
+    propietario = User.objects.create_user(username='propietario', password='x')
+    tenant = Tenant.objects.create(nombre_taller='Taller Test', propietario=propietario)
+    UserProfile.objects.create(usuario=propietario, tenant=tenant)
+    return tenant
+
+
+def _crear_ordenes(tenant, cantidad):
+    """Órdenes con cliente, vehículo y una línea de detalle cada una"""
+    marca = Marca.objects.create(nombre='Toyota', tenant=tenant)
+    modelo = Modelo.objects.create(nombre='Corolla', marca=marca, tenant=tenant)
+    item = Item.objects.create(codigo='I1', nombre='Item', tipo='Servicio', precio=Decimal('10'), tenant=tenant)
+    ordenes = []
+    for i in range(cantidad):
+        cliente = Cliente.objects.create(nombre=f'C{i}', nit=f'N{i}', tenant=tenant)
+        vehiculo = Vehiculo.objects.create(
+            cliente=cliente, marca=marca, modelo=modelo, numero_placa=f'P{i}', tenant=tenant
+        )
+        orden = OrdenTrabajo.objects.create(
+            cliente=cliente, vehiculo=vehiculo, estado='pendiente', tenant=tenant
+        )
+        DetalleOrdenTrabajo.objects.create(
+            orden_trabajo=orden, item=item, cantidad=1, precio_unitario=Decimal('10'), tenant=tenant
+        )
+        ordenes.append(orden)
+    return ordenes
+
+
+class ExportTenantDataQueriesTest(TestCase):
+    """La cantidad de consultas del export depende de las tablas, no de las filas."""
+
+    def setUp(self):
+        propietario = User.objects.create_user(username='propietario', password='x')
+        self.tenant = Tenant.objects.create(nombre_taller='Taller Test', propietario=propietario)
+        UserProfile.objects.create(usuario=propietario, tenant=self.tenant)
+
+    def _agregar_usuarios_y_grupos(self, cantidad):
+        permisos = list(Permission.objects.select_related('content_type')[:10])
+        for i in range(cantidad):
+            grupo = Group.objects.create(name=f'rol_{self.tenant.id}_{Group.objects.count()}')
+            grupo.permissions.set(permisos)
+            usuario = User.objects.create_user(username=f'usuario_{User.objects.count()}', password='x')
+            UserProfile.objects.create(usuario=usuario, tenant=self.tenant)
+            usuario.groups.add(grupo)
+
+    def test_presupuesto_de_consultas_constante(self):
+        # Una consulta por sección más los mapas de permisos y de grupos por usuario
+        presupuesto = len(EXPORT_SECTIONS) + 2
+
+        self._agregar_usuarios_y_grupos(2)
+        with self.assertNumQueries(presupuesto):
+            data = export_tenant_data(self.tenant)
+        self.assertEqual(len(data['users']), 3)
+
+        self._agregar_usuarios_y_grupos(10)
+        with self.assertNumQueries(presupuesto):
+            data = export_tenant_data(self.tenant)
+        self.assertEqual(len(data['users']), 13)
+        grupos = {grupo['name']: grupo for grupo in data['groups']}
+        usuario = next(u for u in data['users'] if u['groups'])
+        self.assertEqual(len(grupos[usuario['groups'][0]]['permissions']), 10)
+
+
+class RestaurarReportesTest(TestCase):
+    """Los reportes del tenant sobreviven a un export y su restauración."""
+
+    def setUp(self):
+        self.propietario = User.objects.create_user(username='propietario', password='x')
+        self.tenant = Tenant.objects.create(nombre_taller='Taller Test', propietario=self.propietario)
+        UserProfile.objects.create(usuario=self.propietario, tenant=self.tenant)
+        Reporte.objects.create(
+            usuario=self.propietario,
+            tenant=self.tenant,
+            tipo='NATURAL',
+            nombre='Órdenes de octubre',
+            descripcion='Órdenes creadas en octubre',
+            consulta_original='listar órdenes de octubre',
+            formato='XLSX',
+            estado='ERROR',
+            parametros={'entidad': 'ordenes'},
+            registros_procesados=3,
+            registros_totales=10,
+            error='sin datos',
+        )
+
+    def _campos_reporte(self):
+        return list(Reporte.objects.filter(tenant=self.tenant).values(
+            'usuario_id', 'tipo', 'nombre', 'descripcion', 'consulta_original',
+            'formato', 'estado', 'parametros', 'registros_procesados',
+            'registros_totales', 'error',
+        ))
+
+    def test_export_incluye_campos_del_reporte(self):
+        data = export_tenant_data(self.tenant)
+        reporte = data['reportes'][0]
+        self.assertEqual(reporte['tipo'], 'NATURAL')
+        self.assertEqual(reporte['usuario_id'], self.propietario.id)
+
+    def test_restauraciones_conservan_el_reporte(self):
+        esperado = self._campos_reporte()
+        data = export_tenant_data(self.tenant)
+
+        bulk_import_tenant_data(copy.deepcopy(data), self.tenant, replace=True)
+        self.assertEqual(self._campos_reporte(), esperado)
+
+        import_tenant_data(copy.deepcopy(data), self.tenant, replace=True)
+        self.assertEqual(self._campos_reporte(), esperado)
+
+        archivo = io.BytesIO(b''.join(
+            linea if isinstance(linea, bytes) else linea.encode()
+            for linea in iter_tenant_data_ndjson(self.tenant)
+        ))
+        summary = stream_import_tenant_data(archivo, self.tenant, replace=True)
+        self.assertEqual(summary['reportes'], 1)
+        self.assertEqual(self._campos_reporte(), esperado)
+
+    def test_incremental_incluye_reportes_actualizados(self):
+        desde = timezone.now()
+        data = export_tenant_data(self.tenant, desde=desde, base_backup_id='base')
+        self.assertEqual(data['reportes'], [])
+
+        # El worker actualiza el avance con update(), sin pasar por save()
+        reporte = Reporte.objects.get(tenant=self.tenant)
+        _registrar_progreso(reporte)(5, 10)
+        data = export_tenant_data(self.tenant, desde=desde, base_backup_id='base')
+        self.assertEqual([r['registros_procesados'] for r in data['reportes']], [5])
+
+
+class BackupIncrementalTest(TestCase):
+    """Un incremental lleva las filas modificadas y rangos de IDs, no tablas completas."""
+
+    def setUp(self):
+        self.tenant = _crear_tenant()
+        self.ordenes = _crear_ordenes(self.tenant, 5)
+
+    def test_incremental_de_ordenes(self):
+        base = export_tenant_data(self.tenant, backup_id='b0')
+        desde = timezone.now()
+
+        # Cambia una línea (y con ella los totales de su orden) y se elimina otra orden
+        detalle = self.ordenes[1].detalles.get()
+        detalle.cantidad = 3
+        detalle.save()
+        self.ordenes[3].delete()
+
+        incremental = export_tenant_data(self.tenant, desde=desde, base_backup_id='b0', backup_id='b1')
+        self.assertEqual([o['id'] for o in incremental['ordenes_trabajo']], [self.ordenes[1].id])
+        self.assertEqual([d['id'] for d in incremental['detalles_ordenes']], [detalle.id])
+        self.assertEqual(incremental['items'], [])
+        self.assertEqual(incremental['vehiculos'], [])
+
+        ids = [orden.id for orden in self.ordenes]
+        self.assertEqual(incremental['ids_actuales']['ordenes_trabajo'], [[ids[0], ids[2]], [ids[4], ids[4]]])
+
+        completo = merge_backup_chain([base, incremental])
+        self.assertEqual(
+            sorted(o['id'] for o in completo['ordenes_trabajo']),
+            list(OrdenTrabajo.objects.filter(tenant=self.tenant).order_by('id').values_list('id', flat=True)),
+        )
+        orden = next(o for o in completo['ordenes_trabajo'] if o['id'] == self.ordenes[1].id)
+        self.ordenes[1].refresh_from_db()
+        self.assertEqual(Decimal(orden['total']), self.ordenes[1].total)
+
+
+class BackupColumnarTest(TestCase):
+    """El formato columnar reconstruye exactamente las mismas filas."""
+
+    def setUp(self):
+        self.tenant = _crear_tenant()
+        _crear_ordenes(self.tenant, 5)
+
+    def test_ida_y_vuelta(self):
+        esperado = export_tenant_data(self.tenant)
+        # Lotes de 2 filas: varias secciones ocupan más de un frame
+        contenido = b''.join(iter_tenant_data_columnar(self.tenant, chunk_size=2))
+        self.assertTrue(contenido.startswith(COLUMNAR_MAGIC))
+
+        data = parse_columnar_backup(contenido)
+        self.assertEqual(data['metadata']['formato'], 'columnar')
+        self.assertEqual(data['tenant'], esperado['tenant'])
+        self.assertEqual(data['manifest'], esperado['manifest'])
+        for nombre in SECCIONES_EXPORTADAS:
+            self.assertEqual(data.get(nombre, []), esperado[nombre], nombre)
+
+        summary = stream_import_tenant_data(io.BytesIO(contenido), self.tenant, replace=True)
+        self.assertEqual(summary['ordenes_trabajo'], 5)
+        self.assertEqual(OrdenTrabajo.objects.filter(tenant=self.tenant).count(), 5)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'La exportación paralela solo se usa en PostgreSQL')
+class ExportacionParalelaTest(TransactionTestCase):
+    """
+    El export paralelo produce los mismos bytes que el secuencial. Es un
+    TransactionTestCase: dentro de un atomic el export cae al modo secuencial.
+    """
+
+    def setUp(self):
+        self.tenant = _crear_tenant()
+        _crear_ordenes(self.tenant, 5)
+
+    def _exportar(self, workers):
+        lineas = list(iter_tenant_data_ndjson(self.tenant, chunk_size=2, backup_id='b0', workers=workers))
+        # La primera línea es la metadata, con la fecha del backup
+        self.assertIn('metadata', json.loads(lineas[0]))
+        return ''.join(lineas[1:]).encode()
+
+    def test_paralelo_igual_a_secuencial(self):
+        self.assertEqual(self._exportar(workers=4), self._exportar(workers=1))
+
+
+class VerificarBackupTest(TestCase):
+    """verify_backup detecta una sección alterada después del export."""
+
+    def setUp(self):
+        self.tenant = _crear_tenant()
+        _crear_ordenes(self.tenant, 5)
+        self.lineas = [json.loads(linea) for linea in iter_tenant_data_ndjson(self.tenant)]
+
+    def _archivo(self, lineas):
+        return io.BytesIO(''.join(json.dumps(linea, ensure_ascii=False) + '\n' for linea in lineas).encode())
+
+    def _seccion(self, lineas, nombre):
+        return next(linea for linea in lineas if linea.get('section') == nombre)
+
+    def test_backups_intactos_son_validos(self):
+        resultado = verify_backup(self._archivo(self.lineas))
+        self.assertTrue(resultado['valido'], resultado['errores'])
+        self.assertEqual(resultado['secciones']['clientes']['filas'], 5)
+
+        columnar = io.BytesIO(b''.join(iter_tenant_data_columnar(self.tenant)))
+        resultado = verify_backup(columnar)
+        self.assertTrue(resultado['valido'], resultado['errores'])
+        self.assertEqual(resultado['formato'], 'columnar')
+
+    def test_fila_modificada(self):
+        lineas = copy.deepcopy(self.lineas)
+        self._seccion(lineas, 'clientes')['rows'][2]['nombre'] = 'Otro cliente'
+
+        resultado = verify_backup(self._archivo(lineas))
+        self.assertFalse(resultado['valido'])
+        self.assertFalse(resultado['secciones']['clientes']['ok'])
+        self.assertTrue(resultado['secciones']['vehiculos']['ok'])
+        self.assertEqual(resultado['errores'], ["Sección 'clientes': SHA-256 no coincide"])
+
+    def test_fila_eliminada(self):
+        lineas = copy.deepcopy(self.lineas)
+        self._seccion(lineas, 'vehiculos')['rows'].pop()
+
+        resultado = verify_backup(self._archivo(lineas))
+        self.assertFalse(resultado['valido'])
+        self.assertEqual(resultado['errores'], ["Sección 'vehiculos': 4 filas, se esperaban 5"])
+
+
+class VencerTrabajosTest(TestCase):
+    """Un trabajo se da por colgado según su última escritura, no su inicio."""
+
+    def setUp(self):
+        propietario = User.objects.create_user(username='propietario', password='x')
+        self.tenant = Tenant.objects.create(nombre_taller='Taller Test', propietario=propietario)
+        hace_tres_horas = timezone.now() - timedelta(hours=3)
+        self.job = BackupJob.objects.create(
+            tenant=self.tenant,
+            tipo=BackupJob.Tipo.RESTORE,
+            estado=BackupJob.Estado.EN_PROCESO,
+            fecha_inicio=hace_tres_horas,
+            fecha_actualizacion=timezone.now(),
+        )
+
+    def test_trabajo_largo_con_progreso_reciente_sigue_en_proceso(self):
+        vencer_trabajos_colgados(self.tenant)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.estado, BackupJob.Estado.EN_PROCESO)
+
+    def test_trabajo_vencido_no_vuelve_a_completado(self):
+        BackupJob.objects.filter(pk=self.job.pk).update(fecha_actualizacion=self.job.fecha_inicio)
+        vencer_trabajos_colgados(self.tenant)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.estado, BackupJob.Estado.ERROR)
+
+        # El worker termina después y no sobrescribe el ERROR
+        self.job.estado = BackupJob.Estado.COMPLETADO
+        self.job.fecha_fin = timezone.now()
+        _guardar_final(self.job, ['estado', 'fecha_fin'])
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.estado, BackupJob.Estado.ERROR)
@@ -2,12 +2,21 @@
 URLs para el módulo de Backup y Restore
 """
 from django.urls import path
-from .views import BackupView, RestoreView
+from .views import (
+    BackupView, RestoreView,
+    BackupJobListCreateView, BackupJobDetailView, BackupJobDownloadView,
+    BackupJobManifestView, BackupVerifyView,
+)
 
 app_name = 'backup_restore'
 
 urlpatterns = [
     path('backup/', BackupView.as_view(), name='backup'),
     path('restore/', RestoreView.as_view(), name='restore'),
+    path('backup/verify/', BackupVerifyView.as_view(), name='backup-verify'),
+    path('backup/jobs/', BackupJobListCreateView.as_view(), name='backup-jobs'),
+    path('backup/jobs/<int:pk>/', BackupJobDetailView.as_view(), name='backup-job-detail'),
+    path('backup/jobs/<int:pk>/descargar/', BackupJobDownloadView.as_view(), name='backup-job-download'),
+    path('backup/jobs/<int:pk>/manifest/', BackupJobManifestView.as_view(), name='backup-job-manifest'),
 ]
 
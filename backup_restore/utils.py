@@ -2,12 +2,25 @@
 Utilidades para Backup y Restore del sistema multi-tenant.
 Permite exportar e importar todos los datos de un tenant específico.
 """
+import bisect
+import gzip
+import hashlib
+import io
 import json
+import queue
+import re
+import struct
+import threading
+import uuid
+import zlib
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
-from django.db import transaction, IntegrityError
+from django.conf import settings
+from django.db import connection, transaction, IntegrityError
 from django.core.exceptions import ValidationError
 from django.db.models import Q
+from django.utils import timezone
 import logging
 
 from personal_admin.models_saas import Tenant, UserProfile
@@ -28,581 +41,1725 @@ from finanzas_facturacion.models import Pago
 from finanzas_facturacion.modelsFactProv import FacturaProveedor
 from finanzas_facturacion.modelsDetallesFactProv import DetalleFacturaProveedor
 from servicios_IA.models import LecturaPlaca, Reporte
+from servicios_IA.utils.reportes_cache import invalidar_tenant
+from personal_admin.metricas_dashboard import invalidar_metricas
+from personal_admin.signals import borrar_sin_senales, senales_suspendidas
 
 logger = logging.getLogger(__name__)
 
 
-def export_tenant_data(tenant):
+# Tamaño de lote usado por los .iterator() de exportación: acota la memoria
+# que ocupa cada sección sin importar cuántas filas tenga el tenant.
+EXPORT_CHUNK_SIZE = 2000
+
+# Valor de metadata['formato'] que identifica un backup exportado en streaming
+NDJSON_FORMAT = 'ndjson'
+
+# Formato columnar binario: cabecera MAGIC + versión y luego frames
+# [tipo (1 byte), largo del nombre (2), largo del payload (4)] + nombre + payload.
+# El payload es JSON compacto comprimido con zlib; en las secciones los valores
+# van agrupados por columna, con las columnas declaradas una sola vez por frame.
+COLUMNAR_FORMAT = 'columnar'
+COLUMNAR_MAGIC = b'TBKC'
+COLUMNAR_VERSION = 1
+_FRAME = struct.Struct('>BHI')
+_FRAME_OBJETO = 0
+_FRAME_SECCION = 1
+
+# Versión del esquema de datos (secciones y campos exportados). metadata['version']
+# ('1.0') sigue siendo la versión del contenedor que validan las restauraciones.
+# 2: incluye el manifest con filas y SHA-256 por sección
+BACKUP_SCHEMA_VERSION = 2
+
+# Valores de metadata['tipo']
+BACKUP_COMPLETO = 'completo'
+BACKUP_INCREMENTAL = 'incremental'
+
+# Secciones que un backup incremental exporta parcialmente: solo las filas
+# con el campo de fecha indicado >= metadata['desde']. Las demás (grupos,
+# usuarios y catálogos chicos: cargos, marcas, modelos, áreas, proveedores)
+# no tienen fecha de modificación y se exportan completas en cada incremental.
+# Los update()/bulk_update() de estos modelos asignan la fecha explícitamente
+# (auto_now solo aplica en save()).
+INCREMENTAL_SECTIONS = {
+    'empleados': (Empleado, 'fecha_actualizado'),
+    'clientes': (Cliente, 'fecha_actualizacion'),
+    'citas': (Cita, 'fecha_actualizacion'),
+    'vehiculos': (Vehiculo, 'fecha_actualizacion'),
+    'items': (Item, 'fecha_actualizacion'),
+    'presupuestos': (presupuesto, 'fecha_actualizacion'),
+    'detalles_presupuestos': (detallePresupuesto, 'fecha_actualizacion'),
+    'ordenes_trabajo': (OrdenTrabajo, 'fecha_actualizacion'),
+    'detalles_ordenes': (DetalleOrdenTrabajo, 'fecha_actualizacion'),
+    'notas_ordenes': (NotaOrdenTrabajo, 'fecha_actualizacion'),
+    'tareas_ordenes': (TareaOrdenTrabajo, 'fecha_actualizacion'),
+    'inventarios_vehiculos': (InventarioVehiculo, 'fecha_actualizacion'),
+    'inspecciones': (Inspeccion, 'fecha_actualizacion'),
+    'detalles_inspeccion': (DetalleInspeccion, 'fecha_actualizacion'),
+    'pruebas_ruta': (PruebaRuta, 'fecha_actualizacion'),
+    'asignaciones_tecnicos': (AsignacionTecnico, 'fecha_actualizacion'),
+    'imagenes_ordenes': (ImagenOrdenTrabajo, 'fecha_actualizacion'),
+    'pagos': (Pago, 'fecha_actualizacion'),
+    'facturas_proveedor': (FacturaProveedor, 'fecha_actualizacion'),
+    'detalles_facturas_proveedor': (DetalleFacturaProveedor, 'fecha_actualizacion'),
+    'asistencias': (Asistencia, 'fecha_actualizacion'),
+    'nominas': (Nomina, 'fecha_actualizacion'),
+    'detalles_nomina': (DetalleNomina, 'fecha_actualizacion'),
+    'reportes': (Reporte, 'fecha_actualizacion'),
+    # Secciones de solo inserción: basta la fecha de creación
+    'lecturas_placa': (LecturaPlaca, 'created_at'),
+    'bitacoras': (Bitacora, 'fecha_accion'),
+}
+
+
+def _iso(valor):
+    """Serializa fechas/horas a ISO 8601 respetando los None."""
+    return valor.isoformat() if valor else None
+
+
+def _build_metadata(tenant, backup_id=None, desde=None, base_backup_id=None, **extra):
+    metadata = {
+        'version': '1.0',
+        'tenant_id': tenant.id,
+        'tenant_nombre': tenant.nombre_taller,
+        'fecha_backup': datetime.now().isoformat(),
+        'django_version': '5.2.6',
+        'backup_id': backup_id or uuid.uuid4().hex,
+        'tipo': BACKUP_INCREMENTAL if desde else BACKUP_COMPLETO,
+        # Instante (con zona horaria) previo a la lectura de datos; es el
+        # `desde` de un incremental que tome este backup como base
+        'marca_tiempo': timezone.now().isoformat(),
+        'schema_version': BACKUP_SCHEMA_VERSION,
+    }
+    if desde:
+        if not base_backup_id:
+            raise ValidationError("Un backup incremental requiere el backup_id de su base")
+        metadata['base_backup_id'] = base_backup_id
+        metadata['desde'] = desde.isoformat()
+    metadata.update(extra)
+    return metadata
+
+
+class _Manifest:
+    """
+    Acumula la cantidad de filas y el SHA-256 de cada sección a medida que se
+    exporta o se lee. El hash se calcula sobre cada fila serializada en forma
+    canónica (claves ordenadas, JSON compacto), así que no depende del formato
+    del archivo (JSON, NDJSON o columnar) ni del tamaño de los lotes.
+    """
+
+    def __init__(self):
+        self._secciones = {}
+
+    def agregar(self, nombre, rows):
+        seccion = self._secciones.setdefault(nombre, {'filas': 0, 'hash': hashlib.sha256()})
+        for row in rows:
+            seccion['hash'].update(
+                json.dumps(row, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            )
+            seccion['hash'].update(b'\n')
+            seccion['filas'] += 1
+
+    def secciones(self):
+        return {
+            nombre: {'filas': seccion['filas'], 'sha256': seccion['hash'].hexdigest()}
+            for nombre, seccion in self._secciones.items()
+        }
+
+    def como_dict(self):
+        return {
+            'schema_version': BACKUP_SCHEMA_VERSION,
+            'algoritmo': 'sha256',
+            'secciones': self.secciones(),
+        }
+
+
+def _filtrar_desde(queryset, nombre, desde):
+    """En un backup incremental deja solo las filas modificadas desde `desde`."""
+    if desde is None:
+        return queryset
+    campo = INCREMENTAL_SECTIONS[nombre][1]
+    return queryset.filter(**{f'{campo}__gte': desde})
+
+
+def _rows_seccion(nombre, exportar, tenant, chunk_size, desde):
+    if desde is not None and nombre in INCREMENTAL_SECTIONS:
+        return exportar(tenant, chunk_size, desde=desde)
+    return exportar(tenant, chunk_size)
+
+
+def _ids_actuales(tenant):
+    """
+    IDs vigentes de las secciones incrementales, en rangos (ver _rangos_ids).
+    Al reconstruir la cadena, las filas del backup base que ya no figuran
+    aquí se dan por eliminadas. Las bitácoras no se restauran, así que no
+    se listan.
+    """
+    return {
+        nombre: _rangos_ids(model.objects.filter(tenant=tenant))
+        for nombre, (model, _) in INCREMENTAL_SECTIONS.items()
+        if nombre != 'bitacoras'
+    }
+
+
+def _rangos_ids(queryset):
+    """
+    IDs del queryset como rangos [inicio, fin] de IDs consecutivos. Con IDs
+    autoincrementales la cantidad de rangos depende de las filas eliminadas
+    (los huecos), no del tamaño de la tabla.
+    """
+    rangos = []
+    ids = queryset.order_by('id').values_list('id', flat=True)
+    for id_ in ids.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        if rangos and id_ == rangos[-1][1] + 1:
+            rangos[-1][1] = id_
+        else:
+            rangos.append([id_, id_])
+    return rangos
+
+
+class IdsVigentes:
+    """
+    Pertenencia a los IDs de una sección de 'ids_actuales': rangos
+    [inicio, fin] o, en backups anteriores, la lista completa de IDs.
+    """
+
+    def __init__(self, valor):
+        if valor and isinstance(valor[0], (list, tuple)):
+            self._ids = None
+            self._inicios = [inicio for inicio, _ in valor]
+            self._fines = [fin for _, fin in valor]
+        else:
+            self._ids = set(valor)
+
+    def __contains__(self, id_):
+        if self._ids is not None:
+            return id_ in self._ids
+        i = bisect.bisect_right(self._inicios, id_) - 1
+        return i >= 0 and id_ <= self._fines[i]
+
+
+def _export_tenant(tenant):
+    return {
+        'id': tenant.id,
+        'nombre_taller': tenant.nombre_taller,
+        'activo': tenant.activo,
+        'fecha_creacion': _iso(tenant.fecha_creacion),
+        'propietario_id': tenant.propietario_id,
+        'ubicacion': tenant.ubicacion,
+        'telefono': tenant.telefono,
+        'horarios': tenant.horarios,
+        'email_contacto': tenant.email_contacto,
+        'logo': tenant.logo,
+        'codigo_invitacion': tenant.codigo_invitacion,
+    }
+
+
+def _export_groups(tenant, chunk_size):
+    from django.contrib.auth.models import Group
+    # Permisos de todos los grupos en una sola consulta (con su app_label),
+    # en lugar de una consulta de content_type por permiso
+    GroupPermission = Group.permissions.through
+    permisos_por_grupo = {}
+    for group_id, app_label, codename in GroupPermission.objects.order_by(
+        'permission__content_type__app_label', 'permission__content_type__model', 'permission__codename'
+    ).values_list('group_id', 'permission__content_type__app_label', 'permission__codename'):
+        permisos_por_grupo.setdefault(group_id, []).append(f"{app_label}.{codename}")
+
+    # Exportar TODOS los grupos del sistema (no solo los asignados a usuarios)
+    # Esto asegura que roles sin usuarios asignados también se exporten
+    for group in Group.objects.all().iterator(chunk_size=chunk_size):
+        yield {
+            'id': group.id,
+            'name': group.name,
+            # Permisos con formato "app_label.codename"
+            'permissions': permisos_por_grupo.get(group.id, []),
+        }
+
+
+def _export_users(tenant, chunk_size):
+    from django.contrib.auth.models import User
+    # Nombres de grupos (roles) de los usuarios del tenant, en una sola consulta
+    UserGroup = User.groups.through
+    grupos_por_usuario = {}
+    for user_id, nombre in UserGroup.objects.filter(
+        user__profile__tenant=tenant
+    ).order_by('id').values_list('user_id', 'group__name'):
+        grupos_por_usuario.setdefault(user_id, []).append(nombre)
+
+    user_profiles = UserProfile.objects.filter(tenant=tenant).select_related('usuario')
+    for profile in user_profiles.iterator(chunk_size=chunk_size):
+        user = profile.usuario
+        yield {
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'is_active': user.is_active,
+            'is_staff': user.is_staff,
+            'is_superuser': user.is_superuser,
+            'date_joined': _iso(user.date_joined),
+            'last_login': _iso(user.last_login),
+            'groups': grupos_por_usuario.get(user.id, []),  # Exportar grupos (roles)
+        }
+
+
+def _export_user_profiles(tenant, chunk_size):
+    for profile in UserProfile.objects.filter(tenant=tenant).iterator(chunk_size=chunk_size):
+        yield {
+            'id': profile.id,
+            'usuario_id': profile.usuario_id,
+            'tenant_id': profile.tenant_id,
+        }
+
+
+def _export_cargos(tenant, chunk_size):
+    for cargo in Cargo.objects.filter(tenant=tenant).iterator(chunk_size=chunk_size):
+        yield {
+            'id': cargo.id,
+            'nombre': cargo.nombre,
+            'descripcion': cargo.descripcion,
+            'sueldo': str(cargo.sueldo),
+            'tenant_id': cargo.tenant_id,
+        }
+
+
+def _export_empleados(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(Empleado.objects.filter(tenant=tenant), 'empleados', desde)
+    for empleado in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': empleado.id,
+            'cargo_id': empleado.cargo_id,
+            'usuario_id': empleado.usuario_id,
+            'area_id': empleado.area_id,
+            'tenant_id': empleado.tenant_id,
+            'nombre': empleado.nombre,
+            'apellido': empleado.apellido,
+            'ci': empleado.ci,
+            'direccion': empleado.direccion,
+            'telefono': empleado.telefono,
+            'sexo': empleado.sexo,
+            'sueldo': str(empleado.sueldo),
+            'estado': empleado.estado,
+            'fecha_registro': _iso(empleado.fecha_registro),
+            'fecha_actualizado': _iso(empleado.fecha_actualizado),
+        }
+
+
+def _export_clientes(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(Cliente.objects.filter(tenant=tenant), 'clientes', desde)
+    for cliente in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': cliente.id,
+            'nombre': cliente.nombre,
+            'apellido': cliente.apellido,
+            'nit': cliente.nit,
+            'telefono': cliente.telefono,
+            'direccion': cliente.direccion,
+            'tipo_cliente': cliente.tipo_cliente,
+            'fecha_registro': _iso(cliente.fecha_registro),
+            'fecha_actualizacion': _iso(cliente.fecha_actualizacion),
+            'activo': cliente.activo,
+            'usuario_id': cliente.usuario_id,
+            'tenant_id': cliente.tenant_id,
+        }
+
+
+def _export_citas(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(Cita.objects.filter(tenant=tenant), 'citas', desde)
+    for cita in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': cita.id,
+            'vehiculo_id': cita.vehiculo_id,
+            'empleado_id': cita.empleado_id,
+            'cliente_id': cita.cliente_id,
+            'fecha_hora_inicio': _iso(cita.fecha_hora_inicio),
+            'fecha_hora_fin': _iso(cita.fecha_hora_fin),
+            'estado': cita.estado,
+            'tipo_cita': cita.tipo_cita,
+            'descripcion': cita.descripcion,
+            'nota': cita.nota,
+            'fecha_creacion': _iso(cita.fecha_creacion),
+            'fecha_actualizacion': _iso(cita.fecha_actualizacion),
+            'tenant_id': cita.tenant_id,
+        }
+
+
+def _export_marcas(tenant, chunk_size):
+    for marca in Marca.objects.filter(tenant=tenant).iterator(chunk_size=chunk_size):
+        yield {
+            'id': marca.id,
+            'nombre': marca.nombre,
+            'tenant_id': marca.tenant_id,
+        }
+
+
+def _export_modelos(tenant, chunk_size):
+    for modelo in Modelo.objects.filter(tenant=tenant).iterator(chunk_size=chunk_size):
+        yield {
+            'id': modelo.id,
+            'marca_id': modelo.marca_id,
+            'nombre': modelo.nombre,
+            'tenant_id': modelo.tenant_id,
+        }
+
+
+def _export_vehiculos(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(Vehiculo.objects.filter(tenant=tenant), 'vehiculos', desde)
+    for vehiculo in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': vehiculo.id,
+            'cliente_id': vehiculo.cliente_id,
+            'marca_id': vehiculo.marca_id,
+            'modelo_id': vehiculo.modelo_id,
+            'numero_placa': vehiculo.numero_placa,
+            'color': vehiculo.color,
+            'año': vehiculo.año,
+            'tipo': vehiculo.tipo,
+            'vin': vehiculo.vin,
+            'numero_motor': vehiculo.numero_motor,
+            'version': vehiculo.version,
+            'cilindrada': vehiculo.cilindrada,
+            'tipo_combustible': vehiculo.tipo_combustible,
+            'fecha_registro': _iso(vehiculo.fecha_registro),
+            'tenant_id': vehiculo.tenant_id,
+        }
+
+
+def _export_areas(tenant, chunk_size):
+    for area in Area.objects.filter(tenant=tenant).iterator(chunk_size=chunk_size):
+        yield {
+            'id': area.id,
+            'nombre': area.nombre,
+            'tenant_id': area.tenant_id,
+        }
+
+
+def _export_items(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(Item.objects.filter(tenant=tenant), 'items', desde)
+    for item in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': item.id,
+            'codigo': item.codigo,
+            'nombre': item.nombre,
+            'descripcion': item.descripcion,
+            'precio': str(item.precio) if item.precio else None,
+            'costo': str(item.costo) if item.costo else None,
+            'stock': item.stock,
+            'tipo': item.tipo,
+            'fabricante': item.fabricante,
+            'imagen': item.imagen,
+            'estado': item.estado,
+            'area_id': item.area_id,
+            'tenant_id': item.tenant_id,
+        }
+
+
+def _export_proveedores(tenant, chunk_size):
+    for proveedor in Proveedor.objects.filter(tenant=tenant).iterator(chunk_size=chunk_size):
+        yield {
+            'id': proveedor.id,
+            'nombre': proveedor.nombre,
+            'contacto': proveedor.contacto,
+            'telefono': proveedor.telefono,
+            'correo': proveedor.correo,
+            'direccion': proveedor.direccion,
+            'nit': proveedor.nit,
+            'tenant_id': proveedor.tenant_id,
+        }
+
+
+def _export_presupuestos(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(presupuesto.objects.filter(tenant=tenant), 'presupuestos', desde)
+    for presup in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': presup.id,
+            'vehiculo_id': presup.vehiculo_id,
+            'cliente_id': presup.cliente_id,
+            'diagnostico': presup.diagnostico,
+            'fecha_inicio': _iso(presup.fecha_inicio),
+            'fecha_fin': _iso(presup.fecha_fin),
+            'estado': presup.estado,
+            'con_impuestos': presup.con_impuestos,
+            'impuestos': str(presup.impuestos) if presup.impuestos else None,
+            'total_descuentos': str(presup.total_descuentos) if presup.total_descuentos else None,
+            'subtotal': str(presup.subtotal) if presup.subtotal else None,
+            'total': str(presup.total) if presup.total else None,
+            'tenant_id': presup.tenant_id,
+        }
+
+
+def _export_detalles_presupuestos(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(detallePresupuesto.objects.filter(tenant=tenant), 'detalles_presupuestos', desde)
+    for detalle in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': detalle.id,
+            'presupuesto_id': detalle.presupuesto_id,
+            'item_id': detalle.item_id,
+            'cantidad': detalle.cantidad,
+            'precio_unitario': str(detalle.precio_unitario) if detalle.precio_unitario else None,
+            'descuento_porcentaje': str(detalle.descuento_porcentaje) if detalle.descuento_porcentaje else None,
+            'tenant_id': detalle.tenant_id,
+        }
+
+
+def _export_ordenes_trabajo(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(OrdenTrabajo.objects.filter(tenant=tenant), 'ordenes_trabajo', desde)
+    for orden in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': orden.id,
+            'cliente_id': orden.cliente_id,
+            'vehiculo_id': orden.vehiculo_id,
+            'fecha_creacion': _iso(orden.fecha_creacion),
+            'fecha_inicio': _iso(orden.fecha_inicio),
+            'fecha_finalizacion': _iso(orden.fecha_finalizacion),
+            'fecha_entrega': _iso(orden.fecha_entrega),
+            'estado': orden.estado,
+            'kilometraje': str(orden.kilometraje) if orden.kilometraje is not None else '0',
+            'nivel_combustible': orden.nivel_combustible,
+            'observaciones': orden.observaciones,
+            'fallo_requerimiento': orden.fallo_requerimiento,
+            'subtotal': str(orden.subtotal) if orden.subtotal is not None else '0.00',
+            'impuesto': str(orden.impuesto) if orden.impuesto is not None else '0.00',
+            'descuento': str(orden.descuento) if orden.descuento is not None else '0.00',
+            'total': str(orden.total) if orden.total is not None else '0.00',
+            'tenant_id': orden.tenant_id,
+        }
+
+
+def _export_detalles_ordenes(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(DetalleOrdenTrabajo.objects.filter(tenant=tenant), 'detalles_ordenes', desde)
+    for detalle in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': detalle.id,
+            'orden_trabajo_id': detalle.orden_trabajo_id,
+            'item_id': detalle.item_id,
+            'cantidad': detalle.cantidad,
+            'precio_unitario': str(detalle.precio_unitario) if detalle.precio_unitario else None,
+            'descuento_porcentaje': str(detalle.descuento_porcentaje) if detalle.descuento_porcentaje else None,
+            'tenant_id': detalle.tenant_id,
+        }
+
+
+def _export_notas_ordenes(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(NotaOrdenTrabajo.objects.filter(tenant=tenant), 'notas_ordenes', desde)
+    for nota in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': nota.id,
+            'orden_trabajo_id': nota.orden_trabajo_id,
+            'contenido': nota.contenido,
+            'fecha_nota': _iso(nota.fecha_nota),
+            'tenant_id': nota.tenant_id,
+        }
+
+
+def _export_tareas_ordenes(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(TareaOrdenTrabajo.objects.filter(tenant=tenant), 'tareas_ordenes', desde)
+    for tarea in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': tarea.id,
+            'orden_trabajo_id': tarea.orden_trabajo_id,
+            'descripcion': tarea.descripcion,
+            'completada': tarea.completada,
+            'tenant_id': tarea.tenant_id,
+        }
+
+
+def _export_inventarios_vehiculos(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(InventarioVehiculo.objects.filter(tenant=tenant), 'inventarios_vehiculos', desde)
+    for inv in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': inv.id,
+            'orden_trabajo_id': inv.orden_trabajo_id,
+            'fecha_creacion': _iso(inv.fecha_creacion),
+            'extintor': inv.extintor,
+            'botiquin': inv.botiquin,
+            'antena': inv.antena,
+            'llanta_repuesto': inv.llanta_repuesto,
+            'documentos': inv.documentos,
+            'encendedor': inv.encendedor,
+            'pisos': inv.pisos,
+            'luces': inv.luces,
+            'llaves': inv.llaves,
+            'gata': inv.gata,
+            'herramientas': inv.herramientas,
+            'tapas_ruedas': inv.tapas_ruedas,
+            'triangulos': inv.triangulos,
+            'tenant_id': inv.tenant_id,
+        }
+
+
+def _export_inspecciones(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(Inspeccion.objects.filter(tenant=tenant), 'inspecciones', desde)
+    for inspeccion in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': inspeccion.id,
+            'orden_trabajo_id': inspeccion.orden_trabajo_id,
+            'tipo_inspeccion': inspeccion.tipo_inspeccion,
+            'fecha': _iso(inspeccion.fecha),
+            'tecnico_id': inspeccion.tecnico_id,
+            'aceite_motor': inspeccion.aceite_motor,
+            'Filtros_VH': inspeccion.Filtros_VH,
+            'nivel_refrigerante': inspeccion.nivel_refrigerante,
+            'pastillas_freno': inspeccion.pastillas_freno,
+            'Estado_neumaticos': inspeccion.Estado_neumaticos,
+            'estado_bateria': inspeccion.estado_bateria,
+            'estado_luces': inspeccion.estado_luces,
+            'observaciones_generales': inspeccion.observaciones_generales,
+            'tenant_id': inspeccion.tenant_id,
+        }
+
+
+def _export_detalles_inspeccion(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(DetalleInspeccion.objects.filter(tenant=tenant), 'detalles_inspeccion', desde)
+    for detalle in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': detalle.id,
+            'inspeccion_id': detalle.inspeccion_id,
+            'aceite_motor': detalle.aceite_motor,
+            'Filtros_VH': detalle.Filtros_VH,
+            'nivel_refrigerante': detalle.nivel_refrigerante,
+            'pastillas_freno': detalle.pastillas_freno,
+            'Estado_neumaticos': detalle.Estado_neumaticos,
+            'estado_bateria': detalle.estado_bateria,
+            'estado_luces': detalle.estado_luces,
+            'tenant_id': detalle.tenant_id,
+        }
+
+
+def _export_pruebas_ruta(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(PruebaRuta.objects.filter(tenant=tenant), 'pruebas_ruta', desde)
+    for prueba in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': prueba.id,
+            'orden_trabajo_id': prueba.orden_trabajo_id,
+            'tipo_prueba': prueba.tipo_prueba,
+            'kilometraje_inicio': prueba.kilometraje_inicio,
+            'kilometraje_final': prueba.kilometraje_final,
+            'ruta': prueba.ruta,
+            'frenos': prueba.frenos,
+            'motor': prueba.motor,
+            'suspension': prueba.suspension,
+            'direccion': prueba.direccion,
+            'observaciones': prueba.observaciones,
+            'tecnico_id': prueba.tecnico_id,
+            'fecha_prueba': _iso(prueba.fecha_prueba),
+            'tenant_id': prueba.tenant_id,
+        }
+
+
+def _export_asignaciones_tecnicos(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(AsignacionTecnico.objects.filter(tenant=tenant), 'asignaciones_tecnicos', desde)
+    for asignacion in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': asignacion.id,
+            'orden_trabajo_id': asignacion.orden_trabajo_id,
+            'tecnico_id': asignacion.tecnico_id,
+            'fecha_asignacion': _iso(asignacion.fecha_asignacion),
+            'tenant_id': asignacion.tenant_id,
+        }
+
+
+def _export_imagenes_ordenes(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(ImagenOrdenTrabajo.objects.filter(tenant=tenant), 'imagenes_ordenes', desde)
+    for imagen in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': imagen.id,
+            'orden_trabajo_id': imagen.orden_trabajo_id,
+            'imagen_url': imagen.imagen_url,
+            'descripcion': imagen.descripcion,
+            'tenant_id': imagen.tenant_id,
+        }
+
+
+def _export_pagos(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(Pago.objects.filter(tenant=tenant), 'pagos', desde)
+    for pago in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': pago.id,
+            'orden_trabajo_id': pago.orden_trabajo_id,
+            'monto': str(pago.monto),
+            'metodo_pago': pago.metodo_pago,
+            'estado': pago.estado,
+            'fecha_pago': _iso(pago.fecha_pago),
+            'descripcion': pago.descripcion,
+            'stripe_payment_intent_id': pago.stripe_payment_intent_id,
+            'numero_referencia': pago.numero_referencia,
+            'currency': pago.currency,
+            'usuario_id': pago.usuario_id,
+            'tenant_id': pago.tenant_id,
+        }
+
+
+def _export_facturas_proveedor(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(FacturaProveedor.objects.filter(tenant=tenant), 'facturas_proveedor', desde)
+    for factura in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': factura.id,
+            'proveedor_id': factura.proveedor_id,
+            'numero': factura.numero,
+            'fecha_registro': _iso(factura.fecha_registro),
+            'observacion': factura.observacion,
+            'descuento_porcentaje': str(factura.descuento_porcentaje) if factura.descuento_porcentaje else None,
+            'impuesto_porcentaje': str(factura.impuesto_porcentaje) if factura.impuesto_porcentaje else None,
+            'subtotal': str(factura.subtotal) if factura.subtotal else None,
+            'total': str(factura.total) if factura.total else None,
+            'tenant_id': factura.tenant_id,
+        }
+
+
+def _export_detalles_facturas_proveedor(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(DetalleFacturaProveedor.objects.filter(tenant=tenant), 'detalles_facturas_proveedor', desde)
+    for detalle in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': detalle.id,
+            'factura_id': detalle.factura_id,
+            'item_id': detalle.item_id,
+            'cantidad': detalle.cantidad,
+            'precio_unitario': str(detalle.precio) if detalle.precio else None,
+            'descuento_porcentaje': str(detalle.descuento) if detalle.descuento else None,
+            'tenant_id': detalle.tenant_id,
+        }
+
+
+def _export_lecturas_placa(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(LecturaPlaca.objects.filter(tenant=tenant), 'lecturas_placa', desde)
+    for lectura in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': lectura.id,
+            'placa': lectura.placa,
+            'score': str(lectura.score) if lectura.score else None,
+            'camera_id': lectura.camera_id,
+            'vehiculo_id': lectura.vehiculo_id,
+            'match': lectura.match,
+            'created_at': _iso(lectura.created_at),
+            'tenant_id': lectura.tenant_id,
+        }
+
+
+def _export_reportes(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(Reporte.objects.filter(tenant=tenant), 'reportes', desde)
+    for reporte in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': reporte.id,
+            'usuario_id': reporte.usuario_id,
+            'tipo': reporte.tipo,
+            'nombre': reporte.nombre,
+            'descripcion': reporte.descripcion,
+            'consulta_original': reporte.consulta_original,
+            'formato': reporte.formato,
+            'estado': reporte.estado,
+            'parametros': reporte.parametros,
+            'registros_procesados': reporte.registros_procesados,
+            'registros_totales': reporte.registros_totales,
+            'tiempo_generacion': reporte.tiempo_generacion,
+            'error': reporte.error,
+            'fecha_generacion': _iso(reporte.fecha_generacion),
+            'fecha_inicio': _iso(reporte.fecha_inicio),
+            'archivo': reporte.archivo.url if reporte.archivo else None,
+            'tenant_id': reporte.tenant_id,
+        }
+
+
+def _export_bitacoras(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(Bitacora.objects.filter(tenant=tenant), 'bitacoras', desde)
+    for bitacora in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': bitacora.id,
+            'usuario_id': bitacora.usuario_id,
+            'accion': bitacora.accion,
+            'modulo': bitacora.modulo,
+            'descripcion': bitacora.descripcion,
+            'ip_address': str(bitacora.ip_address) if bitacora.ip_address else None,
+            'fecha_accion': _iso(bitacora.fecha_accion),
+            'tenant_id': bitacora.tenant_id,
+        }
+
+
+def _export_asistencias(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(Asistencia.objects.filter(tenant=tenant), 'asistencias', desde)
+    for asistencia in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': asistencia.id,
+            'empleado_id': asistencia.empleado_id,
+            'fecha': _iso(asistencia.fecha),
+            'hora_entrada': _iso(asistencia.hora_entrada),
+            'hora_salida': _iso(asistencia.hora_salida),
+            'horas_extras': str(asistencia.horas_extras) if asistencia.horas_extras else '0.00',
+            'horas_faltantes': str(asistencia.horas_faltantes) if asistencia.horas_faltantes else '0.00',
+            'estado': asistencia.estado,
+            'fecha_creacion': _iso(asistencia.fecha_creacion),
+            'fecha_actualizacion': _iso(asistencia.fecha_actualizacion),
+            'tenant_id': asistencia.tenant_id,
+        }
+
+
+def _export_nominas(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(Nomina.objects.filter(tenant=tenant), 'nominas', desde)
+    for nomina in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': nomina.id,
+            'mes': nomina.mes,
+            'fecha_inicio': _iso(nomina.fecha_inicio),
+            'fecha_corte': _iso(nomina.fecha_corte),
+            'fecha_registro': _iso(nomina.fecha_registro),
+            'estado': nomina.estado,
+            'total_nomina': str(nomina.total_nomina) if nomina.total_nomina else '0.00',
+            'tenant_id': nomina.tenant_id,
+        }
+
+
+def _export_detalles_nomina(tenant, chunk_size, desde=None):
+    queryset = _filtrar_desde(DetalleNomina.objects.filter(tenant=tenant), 'detalles_nomina', desde)
+    for detalle in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': detalle.id,
+            'nomina_id': detalle.nomina_id,
+            'empleado_id': detalle.empleado_id,
+            'sueldo': str(detalle.sueldo) if detalle.sueldo else '0.00',
+            'horas_extras': str(detalle.horas_extras) if detalle.horas_extras else '0.00',
+            'total_bruto': str(detalle.total_bruto) if detalle.total_bruto else '0.00',
+            'total_descuento': str(detalle.total_descuento) if detalle.total_descuento else '0.00',
+            'sueldo_neto': str(detalle.sueldo_neto) if detalle.sueldo_neto else '0.00',
+            'tenant_id': detalle.tenant_id,
+        }
+
+
+# Secciones del backup en el orden en que se escriben en el archivo.
+# Cada exportador es un generador que recorre su tabla con .iterator(),
+# de modo que el modo streaming nunca materializa una tabla completa.
+EXPORT_SECTIONS = [
+    ('groups', _export_groups),  # Grupos (roles) con sus permisos
+    ('users', _export_users),
+    ('user_profiles', _export_user_profiles),
+    ('cargos', _export_cargos),
+    ('empleados', _export_empleados),
+    ('clientes', _export_clientes),
+    ('citas', _export_citas),
+    ('marcas', _export_marcas),
+    ('modelos', _export_modelos),
+    ('vehiculos', _export_vehiculos),
+    ('areas', _export_areas),
+    ('items', _export_items),
+    ('proveedores', _export_proveedores),
+    ('presupuestos', _export_presupuestos),
+    ('detalles_presupuestos', _export_detalles_presupuestos),
+    ('ordenes_trabajo', _export_ordenes_trabajo),
+    ('detalles_ordenes', _export_detalles_ordenes),
+    ('notas_ordenes', _export_notas_ordenes),
+    ('tareas_ordenes', _export_tareas_ordenes),
+    ('inventarios_vehiculos', _export_inventarios_vehiculos),
+    ('inspecciones', _export_inspecciones),
+    ('detalles_inspeccion', _export_detalles_inspeccion),
+    ('pruebas_ruta', _export_pruebas_ruta),
+    ('asignaciones_tecnicos', _export_asignaciones_tecnicos),
+    ('imagenes_ordenes', _export_imagenes_ordenes),
+    ('pagos', _export_pagos),
+    ('facturas_proveedor', _export_facturas_proveedor),
+    ('detalles_facturas_proveedor', _export_detalles_facturas_proveedor),
+    ('lecturas_placa', _export_lecturas_placa),
+    ('reportes', _export_reportes),
+    ('bitacoras', _export_bitacoras),
+    ('asistencias', _export_asistencias),
+    ('nominas', _export_nominas),
+    ('detalles_nomina', _export_detalles_nomina),
+]
+
+SECCIONES_EXPORTADAS = {nombre for nombre, _ in EXPORT_SECTIONS}
+
+
+_SNAPSHOT_ID = re.compile(r'^[0-9A-Fa-f-]+$')
+
+
+def _export_workers(workers):
+    if workers is None:
+        workers = getattr(settings, 'BACKUP_EXPORT_WORKERS', 1)
+    return max(int(workers), 1)
+
+
+def _exportacion_paralela_disponible(workers):
+    """
+    La exportación paralela solo es consistente en PostgreSQL, donde todos los
+    workers leen el mismo snapshot. Fuera de una transacción abierta, porque
+    el nivel de aislamiento debe fijarse antes de la primera consulta.
+    """
+    return workers > 1 and connection.vendor == 'postgresql' and not connection.in_atomic_block
+
+
+def _exportar_snapshot():
+    """
+    Abre la transacción REPEATABLE READ de la conexión principal y devuelve el
+    ID de su snapshot (pg_export_snapshot) para que los workers lo importen.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        cursor.execute("SELECT pg_export_snapshot()")
+        return cursor.fetchone()[0]
+
+
+# Lotes que cada worker de la exportación paralela puede leer por adelantado
+LOTES_POR_ADELANTADO = 2
+_FIN_SECCION = object()
+
+
+class _ExportacionCancelada(Exception):
+    pass
+
+
+def _encolar(cola, item, cancelada):
+    """put() bloqueante que se interrumpe si el consumidor abandonó la exportación."""
+    while True:
+        if cancelada.is_set():
+            raise _ExportacionCancelada()
+        try:
+            cola.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+
+
+def _exportar_seccion_en_snapshot(nombre, exportar, tenant, chunk_size, desde, snapshot, cola, cancelada):
+    """
+    Ejecuta una sección en un hilo del pool, con su propia conexión, dentro
+    del snapshot exportado por la conexión principal. Las filas se entregan
+    en lotes de chunk_size por una cola acotada: el worker se detiene
+    mientras el consumidor no avance.
+    """
+    try:
+        with transaction.atomic():
+            if snapshot is not None:
+                if not _SNAPSHOT_ID.match(snapshot):
+                    raise ValueError(f"ID de snapshot inválido: {snapshot}")
+                with connection.cursor() as cursor:
+                    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+                    # SET no admite parámetros: el ID se valida arriba
+                    cursor.execute(f"SET TRANSACTION SNAPSHOT '{snapshot}'")
+            lote = []
+            for row in _rows_seccion(nombre, exportar, tenant, chunk_size, desde):
+                lote.append(row)
+                if len(lote) >= chunk_size:
+                    _encolar(cola, lote, cancelada)
+                    lote = []
+            if lote:
+                _encolar(cola, lote, cancelada)
+        _encolar(cola, _FIN_SECCION, cancelada)
+    except _ExportacionCancelada:
+        pass
+    except Exception as e:
+        # El error se relanza en el hilo que consume la sección
+        _encolar(cola, e, cancelada)
+    finally:
+        connection.close()
+
+
+def _filas_de_cola(cola):
+    while True:
+        item = cola.get()
+        if item is _FIN_SECCION:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield from item
+
+
+def _iter_secciones(tenant, chunk_size, desde, workers=None, ids_actuales=None):
+    """
+    Produce (seccion, filas) en el orden de EXPORT_SECTIONS.
+    
+    En modo serie las filas se leen con .iterator() a medida que se consumen.
+    Con workers > 1 en PostgreSQL las secciones se consultan en paralelo, cada
+    una en su propia conexión y todas sobre el mismo snapshot REPEATABLE READ,
+    así que el resultado es idéntico al de la exportación en serie. Cada
+    worker lee como máximo LOTES_POR_ADELANTADO lotes por delante del
+    consumidor, así que la memoria no depende del tamaño de las secciones.
+    
+    Si se pasa el dict ids_actuales, al terminar se completa con
+    _ids_actuales(), leído en el mismo snapshot que las secciones.
+    """
+    workers = _export_workers(workers)
+    if not _exportacion_paralela_disponible(workers):
+        for nombre, exportar in EXPORT_SECTIONS:
+            yield nombre, _rows_seccion(nombre, exportar, tenant, chunk_size, desde)
+        if ids_actuales is not None:
+            ids_actuales.update(_ids_actuales(tenant))
+        return
+    
+    with transaction.atomic():
+        snapshot = _exportar_snapshot()
+        cancelada = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backup-export')
+        try:
+            # El pool toma las secciones en orden: la que se consume siempre
+            # tiene un worker asignado y las siguientes esperan su turno
+            colas = []
+            for nombre, exportar in EXPORT_SECTIONS:
+                cola = queue.Queue(maxsize=LOTES_POR_ADELANTADO)
+                executor.submit(
+                    _exportar_seccion_en_snapshot,
+                    nombre, exportar, tenant, chunk_size, desde, snapshot, cola, cancelada
+                )
+                colas.append((nombre, cola))
+            for nombre, cola in colas:
+                filas = _filas_de_cola(cola)
+                yield nombre, filas
+                # Vaciar lo que el consumidor no leyó para liberar al worker
+                for _ in filas:
+                    pass
+            if ids_actuales is not None:
+                ids_actuales.update(_ids_actuales(tenant))
+        finally:
+            cancelada.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def export_tenant_data(tenant, chunk_size=EXPORT_CHUNK_SIZE, desde=None, base_backup_id=None, backup_id=None,
+                       workers=None):
     """
     Exporta todos los datos de un tenant a un diccionario JSON serializable.
     
     Args:
         tenant: Instancia del modelo Tenant
+        chunk_size: Filas leídas por consulta en cada sección
+        desde: Si se indica, genera un backup incremental con las filas de
+            INCREMENTAL_SECTIONS modificadas desde ese instante
+        base_backup_id: backup_id del backup base (requerido con `desde`)
+        backup_id: Identificador a registrar en la metadata (por defecto uno nuevo)
+        workers: Secciones a exportar en paralelo (por defecto
+            settings.BACKUP_EXPORT_WORKERS; 1 = en serie)
         
     Returns:
         dict: Diccionario con todos los datos del tenant
     """
     try:
         backup_data = {
-            'metadata': {
-                'version': '1.0',
-                'tenant_id': tenant.id,
-                'tenant_nombre': tenant.nombre_taller,
-                'fecha_backup': datetime.now().isoformat(),
-                'django_version': '5.2.6',
-            },
-            'tenant': {},
-            'groups': [],  # Grupos (roles) con sus permisos
-            'users': [],
-            'user_profiles': [],
-            'cargos': [],
-            'empleados': [],
-            'clientes': [],
-            'citas': [],
-            'marcas': [],
-            'modelos': [],
-            'vehiculos': [],
-            'areas': [],
-            'items': [],
-            'proveedores': [],
-            'presupuestos': [],
-            'detalles_presupuestos': [],
-            'ordenes_trabajo': [],
-            'detalles_ordenes': [],
-            'notas_ordenes': [],
-            'tareas_ordenes': [],
-            'inventarios_vehiculos': [],
-            'inspecciones': [],
-            'detalles_inspeccion': [],
-            'pruebas_ruta': [],
-            'asignaciones_tecnicos': [],
-            'imagenes_ordenes': [],
-            'pagos': [],
-            'facturas_proveedor': [],
-            'detalles_facturas_proveedor': [],
-            'lecturas_placa': [],
-            'reportes': [],
-            'bitacoras': [],
-            'asistencias': [],
-            'nominas': [],
-            'detalles_nomina': [],
-        }
-        
-        # 1. Exportar Tenant
-        backup_data['tenant'] = {
-            'id': tenant.id,
-            'nombre_taller': tenant.nombre_taller,
-            'activo': tenant.activo,
-            'fecha_creacion': tenant.fecha_creacion.isoformat() if tenant.fecha_creacion else None,
-            'propietario_id': tenant.propietario_id,
-            'ubicacion': tenant.ubicacion,
-            'telefono': tenant.telefono,
-            'horarios': tenant.horarios,
-            'email_contacto': tenant.email_contacto,
-            'logo': tenant.logo,
-            'codigo_invitacion': tenant.codigo_invitacion,
+            'metadata': _build_metadata(tenant, backup_id=backup_id, desde=desde, base_backup_id=base_backup_id),
+            'tenant': _export_tenant(tenant),
         }
+        manifest = _Manifest()
+        ids_actuales = {} if desde is not None else None
+        for nombre, rows in _iter_secciones(tenant, chunk_size, desde, workers, ids_actuales):
+            backup_data[nombre] = list(rows)
+            manifest.agregar(nombre, backup_data[nombre])
+        if ids_actuales is not None:
+            backup_data['ids_actuales'] = ids_actuales
+        backup_data['manifest'] = manifest.como_dict()
         
-        # 2. Exportar Grupos (Roles) con sus permisos
-        from django.contrib.auth.models import Group, Permission
-        # Obtener todos los grupos que están siendo usados por usuarios del tenant
-        user_profiles_temp = UserProfile.objects.filter(tenant=tenant).select_related('usuario').prefetch_related('usuario__groups')
-        group_ids_used = set()
-        for profile in user_profiles_temp:
-            group_ids_used.update(profile.usuario.groups.values_list('id', flat=True))
-        
-        # Exportar TODOS los grupos del sistema (no solo los asignados a usuarios)
-        # Esto asegura que roles sin usuarios asignados también se exporten
-        for group in Group.objects.all().prefetch_related('permissions'):
-            # Exportar permisos con formato "app_label.codename"
-            permissions = []
-            for perm in group.permissions.all():
-                permissions.append(f"{perm.content_type.app_label}.{perm.codename}")
-            backup_data['groups'].append({
-                'id': group.id,
-                'name': group.name,
-                'permissions': permissions,
-            })
-        
-        # 3. Exportar UserProfiles y Users relacionados
-        user_profiles = UserProfile.objects.filter(tenant=tenant).select_related('usuario').prefetch_related('usuario__groups')
-        
-        for profile in user_profiles:
-            user = profile.usuario
-            
-            # Obtener nombres de grupos (roles) del usuario
-            group_names = list(user.groups.values_list('name', flat=True))
-            
-            # Datos del usuario
-            backup_data['users'].append({
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'is_active': user.is_active,
-                'is_staff': user.is_staff,
-                'is_superuser': user.is_superuser,
-                'date_joined': user.date_joined.isoformat() if user.date_joined else None,
-                'last_login': user.last_login.isoformat() if user.last_login else None,
-                'groups': group_names,  # Exportar grupos (roles)
-            })
-            
-            # Datos del profile
-            backup_data['user_profiles'].append({
-                'id': profile.id,
-                'usuario_id': profile.usuario_id,
-                'tenant_id': profile.tenant_id,
-            })
-        
-        # 4. Exportar Cargos
-        for cargo in Cargo.objects.filter(tenant=tenant):
-            backup_data['cargos'].append({
-                'id': cargo.id,
-                'nombre': cargo.nombre,
-                'descripcion': cargo.descripcion,
-                'sueldo': str(cargo.sueldo),
-                'tenant_id': cargo.tenant_id,
-            })
-        
-        # 4. Exportar Empleados
-        for empleado in Empleado.objects.filter(tenant=tenant).select_related('cargo', 'usuario', 'area'):
-            backup_data['empleados'].append({
-                'id': empleado.id,
-                'cargo_id': empleado.cargo_id,
-                'usuario_id': empleado.usuario_id,
-                'area_id': empleado.area_id,
-                'tenant_id': empleado.tenant_id,
-                'nombre': empleado.nombre,
-                'apellido': empleado.apellido,
-                'ci': empleado.ci,
-                'direccion': empleado.direccion,
-                'telefono': empleado.telefono,
-                'sexo': empleado.sexo,
-                'sueldo': str(empleado.sueldo),
-                'estado': empleado.estado,
-                'fecha_registro': empleado.fecha_registro.isoformat() if empleado.fecha_registro else None,
-                'fecha_actualizado': empleado.fecha_actualizado.isoformat() if empleado.fecha_actualizado else None,
-            })
-        
-        # 5. Exportar Clientes
-        for cliente in Cliente.objects.filter(tenant=tenant).select_related('usuario'):
-            backup_data['clientes'].append({
-                'id': cliente.id,
-                'nombre': cliente.nombre,
-                'apellido': cliente.apellido,
-                'nit': cliente.nit,
-                'telefono': cliente.telefono,
-                'direccion': cliente.direccion,
-                'tipo_cliente': cliente.tipo_cliente,
-                'fecha_registro': cliente.fecha_registro.isoformat() if cliente.fecha_registro else None,
-                'fecha_actualizacion': cliente.fecha_actualizacion.isoformat() if cliente.fecha_actualizacion else None,
-                'activo': cliente.activo,
-                'usuario_id': cliente.usuario_id,
-                'tenant_id': cliente.tenant_id,
-            })
-        
-        # 6. Exportar Citas
-        for cita in Cita.objects.filter(tenant=tenant).select_related('vehiculo', 'empleado', 'cliente'):
-            backup_data['citas'].append({
-                'id': cita.id,
-                'vehiculo_id': cita.vehiculo_id,
-                'empleado_id': cita.empleado_id,
-                'cliente_id': cita.cliente_id,
-                'fecha_hora_inicio': cita.fecha_hora_inicio.isoformat() if cita.fecha_hora_inicio else None,
-                'fecha_hora_fin': cita.fecha_hora_fin.isoformat() if cita.fecha_hora_fin else None,
-                'estado': cita.estado,
-                'tipo_cita': cita.tipo_cita,
-                'descripcion': cita.descripcion,
-                'nota': cita.nota,
-                'fecha_creacion': cita.fecha_creacion.isoformat() if cita.fecha_creacion else None,
-                'fecha_actualizacion': cita.fecha_actualizacion.isoformat() if cita.fecha_actualizacion else None,
-                'tenant_id': cita.tenant_id,
-            })
-        
-        # 7. Exportar Marcas
-        for marca in Marca.objects.filter(tenant=tenant):
-            backup_data['marcas'].append({
-                'id': marca.id,
-                'nombre': marca.nombre,
-                'tenant_id': marca.tenant_id,
-            })
-        
-        # 8. Exportar Modelos
-        for modelo in Modelo.objects.filter(tenant=tenant).select_related('marca'):
-            backup_data['modelos'].append({
-                'id': modelo.id,
-                'marca_id': modelo.marca_id,
-                'nombre': modelo.nombre,
-                'tenant_id': modelo.tenant_id,
-            })
-        
-        # 9. Exportar Vehículos
-        for vehiculo in Vehiculo.objects.filter(tenant=tenant).select_related('cliente', 'marca', 'modelo'):
-            backup_data['vehiculos'].append({
-                'id': vehiculo.id,
-                'cliente_id': vehiculo.cliente_id,
-                'marca_id': vehiculo.marca_id,
-                'modelo_id': vehiculo.modelo_id,
-                'numero_placa': vehiculo.numero_placa,
-                'color': vehiculo.color,
-                'año': vehiculo.año,
-                'tipo': vehiculo.tipo,
-                'vin': vehiculo.vin,
-                'numero_motor': vehiculo.numero_motor,
-                'version': vehiculo.version,
-                'cilindrada': vehiculo.cilindrada,
-                'tipo_combustible': vehiculo.tipo_combustible,
-                'fecha_registro': vehiculo.fecha_registro.isoformat() if vehiculo.fecha_registro else None,
-                'tenant_id': vehiculo.tenant_id,
-            })
-        
-        # 10. Exportar Áreas
-        for area in Area.objects.filter(tenant=tenant):
-            backup_data['areas'].append({
-                'id': area.id,
-                'nombre': area.nombre,
-                'tenant_id': area.tenant_id,
-            })
-        
-        # 11. Exportar Items
-        for item in Item.objects.filter(tenant=tenant):
-            backup_data['items'].append({
-                'id': item.id,
-                'codigo': item.codigo,
-                'nombre': item.nombre,
-                'descripcion': item.descripcion,
-                'precio': str(item.precio) if item.precio else None,
-                'costo': str(item.costo) if item.costo else None,
-                'stock': item.stock,
-                'tipo': item.tipo,
-                'fabricante': item.fabricante,
-                'imagen': item.imagen,
-                'estado': item.estado,
-                'area_id': item.area_id,
-                'tenant_id': item.tenant_id,
-            })
-        
-        # 12. Exportar Proveedores
-        for proveedor in Proveedor.objects.filter(tenant=tenant):
-            backup_data['proveedores'].append({
-                'id': proveedor.id,
-                'nombre': proveedor.nombre,
-                'contacto': proveedor.contacto,
-                'telefono': proveedor.telefono,
-                'correo': proveedor.correo,
-                'direccion': proveedor.direccion,
-                'nit': proveedor.nit,
-                'tenant_id': proveedor.tenant_id,
-            })
-        
-        # 13. Exportar Presupuestos
-        for presup in presupuesto.objects.filter(tenant=tenant).select_related('vehiculo', 'cliente'):
-            backup_data['presupuestos'].append({
-                'id': presup.id,
-                'vehiculo_id': presup.vehiculo_id,
-                'cliente_id': presup.cliente_id,
-                'diagnostico': presup.diagnostico,
-                'fecha_inicio': presup.fecha_inicio.isoformat() if presup.fecha_inicio else None,
-                'fecha_fin': presup.fecha_fin.isoformat() if presup.fecha_fin else None,
-                'estado': presup.estado,
-                'con_impuestos': presup.con_impuestos,
-                'impuestos': str(presup.impuestos) if presup.impuestos else None,
-                'total_descuentos': str(presup.total_descuentos) if presup.total_descuentos else None,
-                'subtotal': str(presup.subtotal) if presup.subtotal else None,
-                'total': str(presup.total) if presup.total else None,
-                'tenant_id': presup.tenant_id,
-            })
-        
-        # 14. Exportar Detalles de Presupuestos
-        for detalle in detallePresupuesto.objects.filter(tenant=tenant).select_related('presupuesto', 'item'):
-            backup_data['detalles_presupuestos'].append({
-                'id': detalle.id,
-                'presupuesto_id': detalle.presupuesto_id,
-                'item_id': detalle.item_id,
-                'cantidad': detalle.cantidad,
-                'precio_unitario': str(detalle.precio_unitario) if detalle.precio_unitario else None,
-                'descuento_porcentaje': str(detalle.descuento_porcentaje) if detalle.descuento_porcentaje else None,
-                'tenant_id': detalle.tenant_id,
-            })
-        
-            # 15. Exportar Órdenes de Trabajo
-        for orden in OrdenTrabajo.objects.filter(tenant=tenant).select_related('cliente', 'vehiculo'):
-            backup_data['ordenes_trabajo'].append({
-                'id': orden.id,
-                'cliente_id': orden.cliente_id,
-                'vehiculo_id': orden.vehiculo_id,
-                'fecha_creacion': orden.fecha_creacion.isoformat() if orden.fecha_creacion else None,
-                'fecha_inicio': orden.fecha_inicio.isoformat() if orden.fecha_inicio else None,
-                'fecha_finalizacion': orden.fecha_finalizacion.isoformat() if orden.fecha_finalizacion else None,
-                'fecha_entrega': orden.fecha_entrega.isoformat() if orden.fecha_entrega else None,
-                'estado': orden.estado,
-                'kilometraje': str(orden.kilometraje) if orden.kilometraje is not None else '0',
-                'nivel_combustible': orden.nivel_combustible,
-                'observaciones': orden.observaciones,
-                'fallo_requerimiento': orden.fallo_requerimiento,
-                'subtotal': str(orden.subtotal) if orden.subtotal is not None else '0.00',
-                'impuesto': str(orden.impuesto) if orden.impuesto is not None else '0.00',
-                'descuento': str(orden.descuento) if orden.descuento is not None else '0.00',
-                'total': str(orden.total) if orden.total is not None else '0.00',
-                'tenant_id': orden.tenant_id,
-            })        # 16. Exportar Detalles de Órdenes
-        for detalle in DetalleOrdenTrabajo.objects.filter(tenant=tenant).select_related('orden_trabajo', 'item'):
-            backup_data['detalles_ordenes'].append({
-                'id': detalle.id,
-                'orden_trabajo_id': detalle.orden_trabajo_id,
-                'item_id': detalle.item_id,
-                'cantidad': detalle.cantidad,
-                'precio_unitario': str(detalle.precio_unitario) if detalle.precio_unitario else None,
-                'descuento_porcentaje': str(detalle.descuento_porcentaje) if detalle.descuento_porcentaje else None,
-                'tenant_id': detalle.tenant_id,
-            })
-        
-        # 17. Exportar Notas de Órdenes
-        for nota in NotaOrdenTrabajo.objects.filter(tenant=tenant).select_related('orden_trabajo'):
-            backup_data['notas_ordenes'].append({
-                'id': nota.id,
-                'orden_trabajo_id': nota.orden_trabajo_id,
-                'contenido': nota.contenido,
-                'fecha_nota': nota.fecha_nota.isoformat() if nota.fecha_nota else None,
-                'tenant_id': nota.tenant_id,
-            })
-        
-        # 18. Exportar Tareas de Órdenes
-        for tarea in TareaOrdenTrabajo.objects.filter(tenant=tenant).select_related('orden_trabajo'):
-            backup_data['tareas_ordenes'].append({
-                'id': tarea.id,
-                'orden_trabajo_id': tarea.orden_trabajo_id,
-                'descripcion': tarea.descripcion,
-                'completada': tarea.completada,
-                'tenant_id': tarea.tenant_id,
-            })
-        
-        # 19. Exportar Inventarios de Vehículos
-        for inv in InventarioVehiculo.objects.filter(tenant=tenant).select_related('orden_trabajo'):
-            backup_data['inventarios_vehiculos'].append({
-                'id': inv.id,
-                'orden_trabajo_id': inv.orden_trabajo_id,
-                'fecha_creacion': inv.fecha_creacion.isoformat() if inv.fecha_creacion else None,
-                'extintor': inv.extintor,
-                'botiquin': inv.botiquin,
-                'antena': inv.antena,
-                'llanta_repuesto': inv.llanta_repuesto,
-                'documentos': inv.documentos,
-                'encendedor': inv.encendedor,
-                'pisos': inv.pisos,
-                'luces': inv.luces,
-                'llaves': inv.llaves,
-                'gata': inv.gata,
-                'herramientas': inv.herramientas,
-                'tapas_ruedas': inv.tapas_ruedas,
-                'triangulos': inv.triangulos,
-                'tenant_id': inv.tenant_id,
-            })
-        
-        # 20. Exportar Inspecciones
-        for inspeccion in Inspeccion.objects.filter(tenant=tenant).select_related('orden_trabajo'):
-            backup_data['inspecciones'].append({
-                'id': inspeccion.id,
-                'orden_trabajo_id': inspeccion.orden_trabajo_id,
-                'tipo_inspeccion': inspeccion.tipo_inspeccion,
-                'fecha': inspeccion.fecha.isoformat() if inspeccion.fecha else None,
-                'tecnico_id': inspeccion.tecnico_id,
-                'aceite_motor': inspeccion.aceite_motor,
-                'Filtros_VH': inspeccion.Filtros_VH,
-                'nivel_refrigerante': inspeccion.nivel_refrigerante,
-                'pastillas_freno': inspeccion.pastillas_freno,
-                'Estado_neumaticos': inspeccion.Estado_neumaticos,
-                'estado_bateria': inspeccion.estado_bateria,
-                'estado_luces': inspeccion.estado_luces,
-                'observaciones_generales': inspeccion.observaciones_generales,
-                'tenant_id': inspeccion.tenant_id,
-            })
-        
-        # 20.1. Exportar Detalles de Inspecciones
-        for detalle in DetalleInspeccion.objects.filter(tenant=tenant).select_related('inspeccion'):
-            backup_data['detalles_inspeccion'].append({
-                'id': detalle.id,
-                'inspeccion_id': detalle.inspeccion_id,
-                'aceite_motor': detalle.aceite_motor,
-                'Filtros_VH': detalle.Filtros_VH,
-                'nivel_refrigerante': detalle.nivel_refrigerante,
-                'pastillas_freno': detalle.pastillas_freno,
-                'Estado_neumaticos': detalle.Estado_neumaticos,
-                'estado_bateria': detalle.estado_bateria,
-                'estado_luces': detalle.estado_luces,
-                'tenant_id': detalle.tenant_id,
-            })
+        logger.info(f"Backup exportado exitosamente para tenant: {tenant.nombre_taller}")
+        return backup_data
         
-        # 21. Exportar Pruebas de Ruta
-        for prueba in PruebaRuta.objects.filter(tenant=tenant).select_related('orden_trabajo'):
-            backup_data['pruebas_ruta'].append({
-                'id': prueba.id,
-                'orden_trabajo_id': prueba.orden_trabajo_id,
-                'tipo_prueba': prueba.tipo_prueba,
-                'kilometraje_inicio': prueba.kilometraje_inicio,
-                'kilometraje_final': prueba.kilometraje_final,
-                'ruta': prueba.ruta,
-                'frenos': prueba.frenos,
-                'motor': prueba.motor,
-                'suspension': prueba.suspension,
-                'direccion': prueba.direccion,
-                'observaciones': prueba.observaciones,
-                'tecnico_id': prueba.tecnico_id,
-                'fecha_prueba': prueba.fecha_prueba.isoformat() if prueba.fecha_prueba else None,
-                'tenant_id': prueba.tenant_id,
-            })
+    except Exception as e:
+        logger.error(f"Error al exportar datos del tenant {tenant.id}: {str(e)}", exc_info=True)
+        raise
+
+
+def _iter_lotes(tenant, chunk_size, progress, desde, workers=None, ids_actuales=None):
+    """
+    Recorre EXPORT_SECTIONS produciendo (seccion, filas) en lotes de como
+    máximo `chunk_size` filas; siempre hay al menos un lote por sección,
+    aunque esté vacío.
+    """
+    for nombre, seccion in _iter_secciones(tenant, chunk_size, desde, workers, ids_actuales):
+        rows = []
+        filas = 0
+        for row in seccion:
+            rows.append(row)
+            filas += 1
+            if len(rows) >= chunk_size:
+                yield nombre, rows
+                rows = []
+        yield nombre, rows
+        if progress is not None:
+            progress(nombre, filas)
+
+
+def iter_tenant_data_ndjson(tenant, chunk_size=EXPORT_CHUNK_SIZE, progress=None,
+                            desde=None, base_backup_id=None, backup_id=None, workers=None):
+    """
+    Exporta los datos de un tenant como NDJSON, una línea a la vez.
+    
+    La primera línea contiene la metadata y la segunda el tenant; después
+    cada sección se emite en líneas {"section": ..., "rows": [...]} de como
+    máximo `chunk_size` filas. Solo un lote vive en memoria a la vez. La
+    última línea es el manifest con las filas y el SHA-256 de cada sección.
+    
+    Args:
+        tenant: Instancia del modelo Tenant
+        chunk_size: Filas por consulta y por línea de sección
+        progress: Callable opcional progress(seccion, filas) invocado al
+            terminar cada sección
+        desde, base_backup_id, backup_id, workers: Igual que en export_tenant_data
         
-        # 22. Exportar Asignaciones de Técnicos
-        for asignacion in AsignacionTecnico.objects.filter(tenant=tenant).select_related('orden_trabajo', 'tecnico'):
-            backup_data['asignaciones_tecnicos'].append({
-                'id': asignacion.id,
-                'orden_trabajo_id': asignacion.orden_trabajo_id,
-                'tecnico_id': asignacion.tecnico_id,
-                'fecha_asignacion': asignacion.fecha_asignacion.isoformat() if asignacion.fecha_asignacion else None,
-                'tenant_id': asignacion.tenant_id,
-            })
+    Yields:
+        str: Líneas JSON terminadas en salto de línea
+    """
+    try:
+        metadata = _build_metadata(
+            tenant, backup_id=backup_id, desde=desde, base_backup_id=base_backup_id, formato=NDJSON_FORMAT
+        )
+        yield json.dumps({'metadata': metadata}, ensure_ascii=False) + '\n'
+        yield json.dumps({'tenant': _export_tenant(tenant)}, ensure_ascii=False) + '\n'
         
-        # 23. Exportar Imágenes de Órdenes
-        for imagen in ImagenOrdenTrabajo.objects.filter(tenant=tenant).select_related('orden_trabajo'):
-            backup_data['imagenes_ordenes'].append({
-                'id': imagen.id,
-                'orden_trabajo_id': imagen.orden_trabajo_id,
-                'imagen_url': imagen.imagen_url,
-                'descripcion': imagen.descripcion,
-                'tenant_id': imagen.tenant_id,
-            })
+        manifest = _Manifest()
+        ids_actuales = {} if desde is not None else None
+        for nombre, rows in _iter_lotes(tenant, chunk_size, progress, desde, workers, ids_actuales):
+            manifest.agregar(nombre, rows)
+            yield json.dumps({'section': nombre, 'rows': rows}, ensure_ascii=False) + '\n'
         
-        # 24. Exportar Pagos
-        for pago in Pago.objects.filter(tenant=tenant).select_related('orden_trabajo', 'usuario'):
-            backup_data['pagos'].append({
-                'id': pago.id,
-                'orden_trabajo_id': pago.orden_trabajo_id,
-                'monto': str(pago.monto),
-                'metodo_pago': pago.metodo_pago,
-                'estado': pago.estado,
-                'fecha_pago': pago.fecha_pago.isoformat() if pago.fecha_pago else None,
-                'descripcion': pago.descripcion,
-                'stripe_payment_intent_id': pago.stripe_payment_intent_id,
-                'numero_referencia': pago.numero_referencia,
-                'currency': pago.currency,
-                'usuario_id': pago.usuario_id,
-                'tenant_id': pago.tenant_id,
-            })
+        if ids_actuales is not None:
+            yield json.dumps({'ids_actuales': ids_actuales}) + '\n'
+        # El manifest va al final: solo se conoce después de leer todas las secciones
+        yield json.dumps({'manifest': manifest.como_dict()}) + '\n'
         
-        # 25. Exportar Facturas de Proveedor
-        for factura in FacturaProveedor.objects.filter(tenant=tenant).select_related('proveedor'):
-            backup_data['facturas_proveedor'].append({
-                'id': factura.id,
-                'proveedor_id': factura.proveedor_id,
-                'numero': factura.numero,
-                'fecha_registro': factura.fecha_registro.isoformat() if factura.fecha_registro else None,
-                'observacion': factura.observacion,
-                'descuento_porcentaje': str(factura.descuento_porcentaje) if factura.descuento_porcentaje else None,
-                'impuesto_porcentaje': str(factura.impuesto_porcentaje) if factura.impuesto_porcentaje else None,
-                'subtotal': str(factura.subtotal) if factura.subtotal else None,
-                'total': str(factura.total) if factura.total else None,
-                'tenant_id': factura.tenant_id,
-            })
+        logger.info(f"Backup NDJSON exportado exitosamente para tenant: {tenant.nombre_taller}")
+    except Exception as e:
+        logger.error(f"Error al exportar datos del tenant {tenant.id}: {str(e)}", exc_info=True)
+        raise
+
+
+def _json_compacto(valor):
+    return json.dumps(valor, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _frame(tipo, nombre, payload, level):
+    nombre = nombre.encode('utf-8')
+    payload = zlib.compress(payload, level)
+    return _FRAME.pack(tipo, len(nombre), len(payload)) + nombre + payload
+
+
+def _a_columnas(rows):
+    """
+    Convierte una lista de dicts en (columnas, valores por columna). Los
+    valores de una misma columna quedan contiguos, lo que comprime mucho
+    mejor que fila por fila.
+    """
+    columnas = []
+    vistas = set()
+    for row in rows:
+        for clave in row:
+            if clave not in vistas:
+                vistas.add(clave)
+                columnas.append(clave)
+    return columnas, [[row.get(columna) for row in rows] for columna in columnas]
+
+
+def iter_tenant_data_columnar(tenant, chunk_size=EXPORT_CHUNK_SIZE, progress=None,
+                              desde=None, base_backup_id=None, backup_id=None, level=6, workers=None):
+    """
+    Exporta los datos de un tenant en el formato columnar binario.
+    
+    Cada lote de una sección es un frame independiente comprimido con zlib,
+    con las columnas una sola vez y los valores agrupados por columna, así que
+    el archivo no repite nombres de campo ni espacios y se puede generar en
+    streaming.
+    
+    Args:
+        tenant: Instancia del modelo Tenant
+        chunk_size: Filas por consulta y por frame de sección
+        progress, desde, base_backup_id, backup_id, workers: Igual que en iter_tenant_data_ndjson
+        level: Nivel de compresión zlib de cada frame
         
-        # 26. Exportar Detalles de Facturas de Proveedor
-        for detalle in DetalleFacturaProveedor.objects.filter(tenant=tenant).select_related('factura', 'item'):
-            backup_data['detalles_facturas_proveedor'].append({
-                'id': detalle.id,
-                'factura_id': detalle.factura_id,
-                'item_id': detalle.item_id,
-                'cantidad': detalle.cantidad,
-                'precio_unitario': str(detalle.precio) if detalle.precio else None,
-                'descuento_porcentaje': str(detalle.descuento) if detalle.descuento else None,
-                'tenant_id': detalle.tenant_id,
-            })
+    Yields:
+        bytes: Cabecera y frames del archivo
+    """
+    try:
+        metadata = _build_metadata(
+            tenant, backup_id=backup_id, desde=desde, base_backup_id=base_backup_id, formato=COLUMNAR_FORMAT
+        )
+        yield COLUMNAR_MAGIC + bytes([COLUMNAR_VERSION])
+        yield _frame(_FRAME_OBJETO, 'metadata', _json_compacto(metadata), level)
+        yield _frame(_FRAME_OBJETO, 'tenant', _json_compacto(_export_tenant(tenant)), level)
         
-        # 27. Exportar Lecturas de Placa
-        for lectura in LecturaPlaca.objects.filter(tenant=tenant).select_related('vehiculo'):
-            backup_data['lecturas_placa'].append({
-                'id': lectura.id,
-                'placa': lectura.placa,
-                'score': str(lectura.score) if lectura.score else None,
-                'camera_id': lectura.camera_id,
-                'vehiculo_id': lectura.vehiculo_id,
-                'match': lectura.match,
-                'created_at': lectura.created_at.isoformat() if lectura.created_at else None,
-                'tenant_id': lectura.tenant_id,
-            })
+        manifest = _Manifest()
+        ids_actuales = {} if desde is not None else None
+        for nombre, rows in _iter_lotes(tenant, chunk_size, progress, desde, workers, ids_actuales):
+            manifest.agregar(nombre, rows)
+            columnas, valores = _a_columnas(rows)
+            yield _frame(_FRAME_SECCION, nombre, _json_compacto({'columnas': columnas, 'valores': valores}), level)
         
-        # 28. Exportar Reportes
-        for reporte in Reporte.objects.filter(tenant=tenant):
-            backup_data['reportes'].append({
-                'id': reporte.id,
-                'tipo_reporte': reporte.tipo_reporte,
-                'formato': reporte.formato,
-                'fecha_generacion': reporte.fecha_generacion.isoformat() if reporte.fecha_generacion else None,
-                'archivo': reporte.archivo.url if reporte.archivo else None,
-                'tenant_id': reporte.tenant_id,
-            })
+        if ids_actuales is not None:
+            yield _frame(_FRAME_OBJETO, 'ids_actuales', _json_compacto(ids_actuales), level)
+        yield _frame(_FRAME_OBJETO, 'manifest', _json_compacto(manifest.como_dict()), level)
         
-        # 29. Exportar Bitácoras
-        for bitacora in Bitacora.objects.filter(tenant=tenant).select_related('usuario'):
-            backup_data['bitacoras'].append({
-                'id': bitacora.id,
-                'usuario_id': bitacora.usuario_id,
-                'accion': bitacora.accion,
-                'modulo': bitacora.modulo,
-                'descripcion': bitacora.descripcion,
-                'ip_address': str(bitacora.ip_address) if bitacora.ip_address else None,
-                'fecha_accion': bitacora.fecha_accion.isoformat() if bitacora.fecha_accion else None,
-                'tenant_id': bitacora.tenant_id,
-            })
+        logger.info(f"Backup columnar exportado exitosamente para tenant: {tenant.nombre_taller}")
+    except Exception as e:
+        logger.error(f"Error al exportar datos del tenant {tenant.id}: {str(e)}", exc_info=True)
+        raise
+
+
+def is_columnar_backup(content):
+    """Indica si el contenido (bytes) es un backup en formato columnar."""
+    return isinstance(content, (bytes, bytearray)) and content[:len(COLUMNAR_MAGIC)] == COLUMNAR_MAGIC
+
+
+def _leer_exacto(archivo, n):
+    datos = archivo.read(n)
+    if len(datos) != n:
+        raise ValidationError("Archivo de backup columnar truncado")
+    return datos
+
+
+def _iter_frames_columnar(archivo):
+    """
+    Lee los frames de un backup columnar desde un objeto tipo archivo,
+    uno a la vez, y produce (seccion, valor). Las secciones se devuelven
+    como listas de dicts, un lote por frame.
+    """
+    cabecera = archivo.read(len(COLUMNAR_MAGIC) + 1)
+    if cabecera[:len(COLUMNAR_MAGIC)] != COLUMNAR_MAGIC or cabecera[len(COLUMNAR_MAGIC):] != bytes([COLUMNAR_VERSION]):
+        raise ValidationError("Formato de backup columnar no compatible")
+    
+    while True:
+        encabezado = archivo.read(_FRAME.size)
+        if not encabezado:
+            return
+        if len(encabezado) != _FRAME.size:
+            raise ValidationError("Archivo de backup columnar truncado")
+        tipo, largo_nombre, largo = _FRAME.unpack(encabezado)
+        nombre = _leer_exacto(archivo, largo_nombre).decode('utf-8')
+        payload = json.loads(zlib.decompress(_leer_exacto(archivo, largo)))
         
-        # 30. Exportar Asistencias
-        for asistencia in Asistencia.objects.filter(tenant=tenant).select_related('empleado'):
-            backup_data['asistencias'].append({
-                'id': asistencia.id,
-                'empleado_id': asistencia.empleado_id,
-                'fecha': asistencia.fecha.isoformat() if asistencia.fecha else None,
-                'hora_entrada': asistencia.hora_entrada.isoformat() if asistencia.hora_entrada else None,
-                'hora_salida': asistencia.hora_salida.isoformat() if asistencia.hora_salida else None,
-                'horas_extras': str(asistencia.horas_extras) if asistencia.horas_extras else '0.00',
-                'horas_faltantes': str(asistencia.horas_faltantes) if asistencia.horas_faltantes else '0.00',
-                'estado': asistencia.estado,
-                'fecha_creacion': asistencia.fecha_creacion.isoformat() if asistencia.fecha_creacion else None,
-                'fecha_actualizacion': asistencia.fecha_actualizacion.isoformat() if asistencia.fecha_actualizacion else None,
-                'tenant_id': asistencia.tenant_id,
-            })
+        if tipo == _FRAME_SECCION:
+            columnas = payload['columnas']
+            yield nombre, [dict(zip(columnas, fila)) for fila in zip(*payload['valores'])]
+        else:
+            yield nombre, payload
+
+
+def parse_columnar_backup(content):
+    """
+    Reconstruye el diccionario de backup a partir de un archivo columnar
+    generado por iter_tenant_data_columnar.
+    
+    Returns:
+        dict: Mismo formato que devuelve export_tenant_data
+    """
+    backup_data = {}
+    for nombre, valor in _iter_frames_columnar(io.BytesIO(content)):
+        if nombre in SECCIONES_EXPORTADAS:
+            backup_data.setdefault(nombre, []).extend(valor)
+        else:
+            backup_data[nombre] = valor
+    return backup_data
+
+
+def iter_gzip(chunks, level=6):
+    """
+    Comprime incrementalmente un iterable de str/bytes en formato gzip.
+    
+    Usa un compresor zlib con cabecera gzip (wbits=31), así que el
+    resultado es compatible con gzip.decompress y con la detección por
+    bytes mágicos de RestoreView.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def parse_ndjson_backup(lines):
+    """
+    Reconstruye el diccionario de backup a partir de líneas NDJSON
+    generadas por iter_tenant_data_ndjson.
+    
+    Args:
+        lines: Iterable de líneas (str o bytes)
         
-        # 31. Exportar Nóminas
-        for nomina in Nomina.objects.filter(tenant=tenant):
-            backup_data['nominas'].append({
-                'id': nomina.id,
-                'mes': nomina.mes,
-                'fecha_inicio': nomina.fecha_inicio.isoformat() if nomina.fecha_inicio else None,
-                'fecha_corte': nomina.fecha_corte.isoformat() if nomina.fecha_corte else None,
-                'fecha_registro': nomina.fecha_registro.isoformat() if nomina.fecha_registro else None,
-                'estado': nomina.estado,
-                'total_nomina': str(nomina.total_nomina) if nomina.total_nomina else '0.00',
-                'tenant_id': nomina.tenant_id,
-            })
+    Returns:
+        dict: Mismo formato que devuelve export_tenant_data
+    """
+    backup_data = {}
+    for line in lines:
+        if isinstance(line, (bytes, bytearray)):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line:
+            continue
+        registro = json.loads(line)
+        if 'section' in registro:
+            backup_data.setdefault(registro['section'], []).extend(registro.get('rows', []))
+        else:
+            backup_data.update(registro)
+    return backup_data
+
+
+def is_streamable_backup(archivo):
+    """
+    Indica si un archivo subido (objeto tipo archivo) se puede restaurar en
+    streaming, es decir, si es NDJSON (con o sin gzip) o columnar. Solo lee
+    el comienzo del archivo y lo deja de nuevo en la posición inicial.
+    """
+    try:
+        inicio = archivo.read(len(COLUMNAR_MAGIC))
+        archivo.seek(0)
+        if inicio == COLUMNAR_MAGIC:
+            return True
+        lector = gzip.GzipFile(fileobj=archivo, mode='rb') if inicio[:2] == b'\x1f\x8b' else archivo
+        # La línea de metadata es corta; un JSON clásico en una sola línea no se lee entero
+        return is_ndjson_backup(lector.readline(64 * 1024))
+    except (OSError, EOFError):
+        return False
+    finally:
+        archivo.seek(0)
+
+
+def iter_backup_registros(archivo):
+    """
+    Lee un backup NDJSON (con o sin gzip) o columnar desde un objeto tipo
+    archivo sin cargarlo entero en memoria: el gzip se descomprime de forma
+    incremental y se produce un registro a la vez.
+    
+    Yields:
+        tuple: (clave, valor). Para 'metadata', 'tenant' e 'ids_actuales' el
+        valor es el objeto correspondiente; para las secciones es un lote de
+        filas (una sección puede venir en varios lotes consecutivos).
         
-        # 32. Exportar Detalles de Nómina
-        for detalle in DetalleNomina.objects.filter(tenant=tenant).select_related('nomina', 'empleado'):
-            backup_data['detalles_nomina'].append({
-                'id': detalle.id,
-                'nomina_id': detalle.nomina_id,
-                'empleado_id': detalle.empleado_id,
-                'sueldo': str(detalle.sueldo) if detalle.sueldo else '0.00',
-                'horas_extras': str(detalle.horas_extras) if detalle.horas_extras else '0.00',
-                'total_bruto': str(detalle.total_bruto) if detalle.total_bruto else '0.00',
-                'total_descuento': str(detalle.total_descuento) if detalle.total_descuento else '0.00',
-                'sueldo_neto': str(detalle.sueldo_neto) if detalle.sueldo_neto else '0.00',
-                'tenant_id': detalle.tenant_id,
-            })
+    Raises:
+        ValidationError: Si el archivo es un JSON clásico (no se puede leer
+            por partes) o no es un backup reconocible
+    """
+    inicio = archivo.read(len(COLUMNAR_MAGIC))
+    archivo.seek(0)
+    if inicio == COLUMNAR_MAGIC:
+        yield from _iter_frames_columnar(archivo)
+        return
+    if inicio[:2] == b'\x1f\x8b':
+        archivo = gzip.GzipFile(fileobj=archivo, mode='rb')
+    
+    primera = True
+    for line in archivo:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            registro = json.loads(line)
+        except ValueError:
+            registro = None
+        if primera and not (isinstance(registro, dict) and registro.get('metadata', {}).get('formato') == NDJSON_FORMAT):
+            raise ValidationError(
+                "La restauración en streaming requiere un backup NDJSON o columnar"
+            )
+        if registro is None:
+            raise ValidationError("Línea inválida en el backup NDJSON")
+        primera = False
+        if 'section' in registro:
+            yield registro['section'], registro.get('rows', [])
+        else:
+            yield from registro.items()
+
+
+def verify_backup(archivo):
+    """
+    Verifica la integridad de un archivo de backup contra su manifest sin
+    tocar la base de datos. Los backups NDJSON y columnares se leen por
+    partes; el JSON clásico se carga completo.
+    
+    Args:
+        archivo: Objeto tipo archivo en modo binario
         
-        logger.info(f"Backup exportado exitosamente para tenant: {tenant.nombre_taller}")
-        return backup_data
+    Returns:
+        dict: 'valido', datos de la metadata, el resultado por sección
+        ('filas', 'sha256', 'ok') y la lista de 'errores'
+    """
+    metadata = None
+    manifest = None
+    calculado = _Manifest()
+    errores = []
+    try:
+        if is_streamable_backup(archivo):
+            registros = iter_backup_registros(archivo)
+        else:
+            registros = load_backup_content(archivo.read()).items()
+        for clave, valor in registros:
+            if clave == 'metadata':
+                metadata = valor
+            elif clave == 'manifest':
+                manifest = valor
+            elif clave in SECCIONES_EXPORTADAS:
+                calculado.agregar(clave, valor)
+    except (ValidationError, ValueError, AttributeError, OSError, EOFError, zlib.error) as e:
+        errores.append(f"Archivo ilegible: {e}")
+    
+    secciones = {}
+    if metadata is None and not errores:
+        errores.append("Falta la metadata del backup")
+    if manifest is None:
+        if not errores:
+            errores.append("El backup no tiene manifest (generado antes de schema_version 2)")
+    else:
+        esperadas = manifest.get('secciones', {})
+        leidas = calculado.secciones()
+        for nombre in list(esperadas) + [n for n in leidas if n not in esperadas]:
+            esperada = esperadas.get(nombre)
+            leida = leidas.get(nombre, {'filas': 0, 'sha256': None})
+            ok = esperada is not None and esperada == leida
+            secciones[nombre] = {**leida, 'ok': ok}
+            if esperada is None:
+                errores.append(f"Sección '{nombre}' no figura en el manifest")
+            elif esperada['filas'] != leida['filas']:
+                errores.append(f"Sección '{nombre}': {leida['filas']} filas, se esperaban {esperada['filas']}")
+            elif not ok:
+                errores.append(f"Sección '{nombre}': SHA-256 no coincide")
+    
+    metadata = metadata or {}
+    return {
+        'valido': not errores,
+        'backup_id': metadata.get('backup_id'),
+        'tipo': metadata.get('tipo'),
+        'tenant_id': metadata.get('tenant_id'),
+        'schema_version': metadata.get('schema_version'),
+        'formato': metadata.get('formato', 'json'),
+        'secciones': secciones,
+        'errores': errores,
+    }
+
+
+def is_ndjson_backup(content):
+    """Indica si el contenido (bytes ya descomprimidos) es un backup NDJSON."""
+    primera_linea = content.split(b'\n', 1)[0] if isinstance(content, (bytes, bytearray)) else content.split('\n', 1)[0]
+    try:
+        registro = json.loads(primera_linea)
+    except ValueError:
+        return False
+    return isinstance(registro, dict) and registro.get('metadata', {}).get('formato') == NDJSON_FORMAT
+
+
+def load_backup_content(content):
+    """
+    Decodifica el contenido de un archivo de backup: columnar binario, o
+    JSON/NDJSON comprimido o no con gzip (se detecta por los bytes mágicos).
+    
+    Returns:
+        dict: Mismo formato que devuelve export_tenant_data
+    """
+    if is_columnar_backup(content):
+        return parse_columnar_backup(content)
+    if content[:2] == b'\x1f\x8b':
+        content = gzip.decompress(content)
+    if is_ndjson_backup(content):
+        return parse_ndjson_backup(content.splitlines())
+    return json.loads(content)
+
+
+def validar_cadena(metadatas):
+    """
+    Verifica que la metadata de una cadena de backups empiece con un backup
+    completo y que cada siguiente sea un incremental del anterior, del mismo
+    taller.
+    """
+    if not metadatas:
+        raise ValidationError("La cadena de backups está vacía")
+    base_metadata = metadatas[0]
+    if base_metadata.get('tipo', BACKUP_COMPLETO) != BACKUP_COMPLETO:
+        raise ValidationError("La cadena de backups debe comenzar con un backup completo")
+    anterior = base_metadata.get('backup_id')
+    for metadata in metadatas[1:]:
+        if metadata.get('tipo') != BACKUP_INCREMENTAL or metadata.get('base_backup_id') != anterior:
+            raise ValidationError(
+                f"Cadena de backups rota: {metadata.get('backup_id')} no es un incremental de {anterior}"
+            )
+        if metadata.get('tenant_id') != base_metadata.get('tenant_id'):
+            raise ValidationError("La cadena de backups mezcla datos de distintos talleres")
+        anterior = metadata.get('backup_id')
+
+
+def merge_backup_chain(backups):
+    """
+    Reconstruye un backup completo a partir de una cadena de backups:
+    el primero completo y cada siguiente incremental sobre el anterior
+    (metadata['base_backup_id'] == backup_id del anterior).
+    
+    Las filas se combinan por su ID original: en las secciones incrementales
+    se agregan/reemplazan las filas modificadas y se quitan las que ya no
+    figuran en 'ids_actuales'; las demás secciones se toman completas del
+    backup más reciente.
+    
+    Args:
+        backups: Lista de diccionarios de backup en orden de aplicación
         
-    except Exception as e:
-        logger.error(f"Error al exportar datos del tenant {tenant.id}: {str(e)}", exc_info=True)
-        raise
+    Returns:
+        dict: Backup completo equivalente al último de la cadena
+    """
+    if not backups:
+        raise ValidationError("La cadena de backups está vacía")
+    validar_cadena([backup.get('metadata', {}) for backup in backups])
+    base = backups[0]
+    base_metadata = base.get('metadata', {})
+    
+    filas = {
+        nombre: {row['id']: row for row in base.get(nombre, [])}
+        for nombre, _ in EXPORT_SECTIONS
+    }
+    for incremental in backups[1:]:
+        ids_actuales = incremental.get('ids_actuales', {})
+        for nombre, _ in EXPORT_SECTIONS:
+            rows = incremental.get(nombre, [])
+            if nombre not in INCREMENTAL_SECTIONS:
+                filas[nombre] = {row['id']: row for row in rows}
+                continue
+            seccion = filas[nombre]
+            for row in rows:
+                seccion[row['id']] = row
+            if nombre in ids_actuales:
+                vigentes = IdsVigentes(ids_actuales[nombre])
+                filas[nombre] = {id_: row for id_, row in seccion.items() if id_ in vigentes}
+    
+    ultimo = backups[-1]
+    backup_data = {
+        'metadata': dict(base_metadata, cadena=[b.get('metadata', {}).get('backup_id') for b in backups]),
+        'tenant': ultimo.get('tenant', base.get('tenant')),
+    }
+    for nombre, _ in EXPORT_SECTIONS:
+        backup_data[nombre] = list(filas[nombre].values())
+    return backup_data
+
+
+def resolve_backup_chain(backup_data):
+    """
+    Acepta un backup completo o una cadena (lista) de backups y devuelve
+    el backup completo a importar.
+    """
+    if isinstance(backup_data, (list, tuple)):
+        return merge_backup_chain(backup_data)
+    if backup_data.get('metadata', {}).get('tipo') == BACKUP_INCREMENTAL:
+        raise ValidationError(
+            "Un backup incremental debe restaurarse junto con su cadena (backup completo base e incrementales)"
+        )
+    return backup_data
+
+
+def _clear_tenant_data(target_tenant):
+    """
+    Elimina los datos existentes del tenant antes de una restauración con
+    replace=True. Debe ejecutarse dentro de la transacción de importación.
+    """
+    # Sin los receivers de métricas y cachés (una consulta o más por fila
+    # borrada, y sin el DELETE por tabla de Django): la restauración los
+    # invalida completos al terminar
+    with senales_suspendidas():
+        logger.warning(f"Eliminando datos existentes del tenant {target_tenant.id}")
+        # Primero set null foreign keys a empleados del tenant
+        empleado_ids = Empleado.objects.filter(tenant=target_tenant).values_list('id', flat=True)
+        Inspeccion.objects.filter(Q(tenant=target_tenant) | Q(tecnico__in=empleado_ids)).update(tecnico=None)
+        AsignacionTecnico.objects.filter(Q(tenant=target_tenant) | Q(tecnico__in=empleado_ids)).update(tecnico=None)
+        PruebaRuta.objects.filter(Q(tenant=target_tenant) | Q(tecnico__in=empleado_ids)).update(tecnico=None)
+        Cita.objects.filter(empleado__in=empleado_ids).update(empleado=None)
+        # Ahora borrar en orden (añadiendo nóminas y asistencias)
+        borrar_sin_senales(Bitacora.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(Reporte.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(LecturaPlaca.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(Cita.objects.filter(empleado__in=empleado_ids))
+        borrar_sin_senales(DetalleNomina.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(Nomina.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(Asistencia.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(DetalleFacturaProveedor.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(FacturaProveedor.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(Pago.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(ImagenOrdenTrabajo.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(AsignacionTecnico.objects.filter(tecnico__in=empleado_ids))
+        borrar_sin_senales(PruebaRuta.objects.filter(tecnico__in=empleado_ids))
+        borrar_sin_senales(DetalleInspeccion.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(Inspeccion.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(InventarioVehiculo.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(TareaOrdenTrabajo.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(NotaOrdenTrabajo.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(DetalleOrdenTrabajo.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(OrdenTrabajo.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(detallePresupuesto.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(presupuesto.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(Vehiculo.objects.filter(tenant=target_tenant))
+        # Intentar eliminar empleados; si falla por FK, limpiar referencias y reintentar
+        try:
+            borrar_sin_senales(Empleado.objects.filter(tenant=target_tenant))
+        except IntegrityError:
+            logger.warning("Fallo al eliminar empleados: limpiando referencias y reintentando")
+            # Asegurar que todos los campos que referencian empleados queden en NULL
+            Inspeccion.objects.filter(tecnico__in=empleado_ids).update(tecnico=None)
+            AsignacionTecnico.objects.filter(tecnico__in=empleado_ids).update(tecnico=None)
+            PruebaRuta.objects.filter(tecnico__in=empleado_ids).update(tecnico=None)
+            Cita.objects.filter(empleado__in=empleado_ids).update(empleado=None)
+            # Reintentar la eliminación
+            borrar_sin_senales(Empleado.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(Cliente.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(Modelo.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(Marca.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(Item.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(Proveedor.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(Cargo.objects.filter(tenant=target_tenant))
+        borrar_sin_senales(Area.objects.filter(tenant=target_tenant))
+        # No borrar UserProfile, ya que se recrearán
+        # Las eliminaciones se confirmarán automáticamente con la transacción atómica
+
+
+def _import_groups(rows, id_mapping, summary):
+    """Importa grupos (roles) y sus permisos; se llama antes que los usuarios."""
+    from django.contrib.auth.models import Group, Permission
+    for group_data in rows:
+        old_id = group_data['id']
+        group_name = group_data['name']
+        permissions_codenames = group_data.get('permissions', [])
+
+        # Crear o obtener el grupo
+        group, created = Group.objects.get_or_create(name=group_name)
+
+        # Restaurar permisos del grupo
+        if permissions_codenames:
+            permissions_to_add = []
+            for codename in permissions_codenames:
+                try:
+                    # Buscar permiso por codename (puede tener formato "app.codename" o solo "codename")
+                    if '.' in codename:
+                        app_label, perm_codename = codename.split('.', 1)
+                        permission = Permission.objects.get(codename=perm_codename, content_type__app_label=app_label)
+                    else:
+                        # Si no tiene app_label, buscar en todos los permisos
+                        permission = Permission.objects.filter(codename=codename).first()
+
+                    if permission:
+                        permissions_to_add.append(permission)
+                except Permission.DoesNotExist:
+                    logger.warning(f"Permiso '{codename}' no encontrado, omitiendo...")
+
+            # Asignar permisos al grupo
+            if permissions_to_add:
+                group.permissions.set(permissions_to_add)
+                logger.info(f"Permisos restaurados para grupo '{group_name}': {len(permissions_to_add)} permisos")
+
+        id_mapping['groups'][old_id] = group.id
+        summary['groups'] += 1
+
+
+def _import_users(rows, id_mapping, summary):
+    """Importa usuarios y les reasigna sus grupos (roles)."""
+    from django.contrib.auth.models import User, Group
+    for user_data in rows:
+        old_id = user_data['id']
+        user_data.pop('id')
+        # Extraer grupos antes de crear el usuario
+        group_names = user_data.pop('groups', [])
+        # No importar password si no queremos sobreescribir
+        password = user_data.pop('password', None)
+        user, created = User.objects.get_or_create(
+            username=user_data['username'],
+            defaults=user_data
+        )
+        if not created and password:
+            # Si ya existe, actualizar campos pero no password por seguridad
+            for key, value in user_data.items():
+                if key not in ['password', 'groups']:
+                    setattr(user, key, value)
+            user.save()
+
+        # Restaurar grupos (roles) del usuario
+        if group_names:
+            groups_to_assign = []
+            for group_name in group_names:
+                try:
+                    group = Group.objects.get(name=group_name)
+                    groups_to_assign.append(group)
+                except Group.DoesNotExist:
+                    # Si el grupo no existe, crear uno básico (aunque debería existir si se importó correctamente)
+                    logger.warning(f"Grupo '{group_name}' no existe, creando grupo básico...")
+                    try:
+                        group = Group.objects.create(name=group_name)
+                        groups_to_assign.append(group)
+                    except Exception as e:
+                        logger.error(f"Error al crear grupo '{group_name}': {e}")
+
+            # Asignar grupos al usuario
+            if groups_to_assign:
+                user.groups.set(groups_to_assign)
+                logger.info(f"Grupos restaurados para usuario {user.username}: {[g.name for g in groups_to_assign]}")
+
+        id_mapping['users'][old_id] = user.id
+        summary['users'] += 1
+
+
+def _import_user_profiles(rows, id_mapping, summary, target_tenant):
+    """Importa los UserProfile enlazándolos al tenant destino."""
+    for profile_data in rows:
+        old_user_id = profile_data.pop('usuario_id')
+        profile_data.pop('id')
+        profile_data.pop('tenant_id')
+
+        if old_user_id in id_mapping['users']:
+            profile_data['usuario_id'] = id_mapping['users'][old_user_id]
+            profile_data['tenant_id'] = target_tenant.id
+            UserProfile.objects.get_or_create(
+                usuario_id=profile_data['usuario_id'],
+                tenant_id=profile_data['tenant_id'],
+                defaults=profile_data
+            )
+            summary['user_profiles'] += 1
+
+
+def _new_summary():
+    """Contadores por sección que devuelve la importación."""
+    return {
+        'tenant': 0,
+        'groups': 0,
+        'users': 0,
+        'user_profiles': 0,
+        'cargos': 0,
+        'empleados': 0,
+        'clientes': 0,
+        'citas': 0,
+        'marcas': 0,
+        'modelos': 0,
+        'vehiculos': 0,
+        'areas': 0,
+        'items': 0,
+        'proveedores': 0,
+        'presupuestos': 0,
+        'detalles_presupuestos': 0,
+        'ordenes_trabajo': 0,
+        'detalles_ordenes': 0,
+        'notas_ordenes': 0,
+        'tareas_ordenes': 0,
+        'inventarios_vehiculos': 0,
+        'inspecciones': 0,
+        'detalles_inspeccion': 0,
+        'pruebas_ruta': 0,
+        'asignaciones_tecnicos': 0,
+        'imagenes_ordenes': 0,
+        'pagos': 0,
+        'facturas_proveedor': 0,
+        'detalles_facturas_proveedor': 0,
+        'lecturas_placa': 0,
+        'reportes': 0,
+        'bitacoras': 0,
+        'asistencias': 0,
+        'nominas': 0,
+        'detalles_nomina': 0,
+        'errors': [],
+    }
+
+
+def _new_id_mapping():
+    """Mapeo de IDs antiguos (del backup) a IDs nuevos, por entidad."""
+    return {
+        'users': {},
+        'groups': {},
+        'cargos': {},
+        'areas': {},
+        'items': {},
+        'marcas': {},
+        'modelos': {},
+        'clientes': {},
+        'vehiculos': {},
+        'proveedores': {},
+        'empleados': {},
+        'presupuestos': {},
+        'ordenes_trabajo': {},
+        'inspecciones': {},
+        'nominas': {},
+    }
 
 
 def import_tenant_data(backup_data, target_tenant, replace=False):
@@ -610,226 +1767,41 @@ def import_tenant_data(backup_data, target_tenant, replace=False):
     Importa datos de un backup a un tenant.
     
     Args:
-        backup_data: Diccionario con los datos del backup
+        backup_data: Diccionario con los datos del backup, o lista con un
+            backup completo seguido de sus incrementales
         target_tenant: Instancia del Tenant destino
         replace: Si True, elimina datos existentes antes de importar
         
     Returns:
         dict: Resumen de la importación
     """
-    with transaction.atomic():
+    # Cada fila se crea con create(): sin receivers de métricas y cachés,
+    # que se invalidan completas al final
+    with transaction.atomic(), senales_suspendidas():
         try:
+            backup_data = resolve_backup_chain(backup_data)
+            
             # Validar versión del backup
             if backup_data.get('metadata', {}).get('version') != '1.0':
                 raise ValidationError("Versión de backup no compatible")
             
-            summary = {
-                'tenant': 0,
-                'groups': 0,
-                'users': 0,
-                'user_profiles': 0,
-                'cargos': 0,
-                'empleados': 0,
-                'clientes': 0,
-                'citas': 0,
-                'marcas': 0,
-                'modelos': 0,
-                'vehiculos': 0,
-                'areas': 0,
-                'items': 0,
-                'proveedores': 0,
-                'presupuestos': 0,
-                'detalles_presupuestos': 0,
-                'ordenes_trabajo': 0,
-                'detalles_ordenes': 0,
-                'notas_ordenes': 0,
-                'tareas_ordenes': 0,
-                'inventarios_vehiculos': 0,
-                'inspecciones': 0,
-                'detalles_inspeccion': 0,
-                'pruebas_ruta': 0,
-                'asignaciones_tecnicos': 0,
-                'imagenes_ordenes': 0,
-                'pagos': 0,
-                'facturas_proveedor': 0,
-                'detalles_facturas_proveedor': 0,
-                'lecturas_placa': 0,
-                'reportes': 0,
-                'bitacoras': 0,
-                'asistencias': 0,
-                'nominas': 0,
-                'detalles_nomina': 0,
-                'errors': [],
-            }
+            summary = _new_summary()
             
             # Mapeo de IDs antiguos a nuevos
-            id_mapping = {
-                'users': {},
-                'groups': {},
-                'cargos': {},
-                'areas': {},
-                'items': {},
-                'marcas': {},
-                'modelos': {},
-                'clientes': {},
-                'vehiculos': {},
-                'proveedores': {},
-                'empleados': {},
-                'presupuestos': {},
-                'ordenes_trabajo': {},
-                'inspecciones': {},
-                'nominas': {},
-            }
+            id_mapping = _new_id_mapping()
             
             if replace:
-                logger.warning(f"Eliminando datos existentes del tenant {target_tenant.id}")
-                # Primero set null foreign keys a empleados del tenant
-                empleado_ids = Empleado.objects.filter(tenant=target_tenant).values_list('id', flat=True)
-                Inspeccion.objects.filter(Q(tenant=target_tenant) | Q(tecnico__in=empleado_ids)).update(tecnico=None)
-                AsignacionTecnico.objects.filter(Q(tenant=target_tenant) | Q(tecnico__in=empleado_ids)).update(tecnico=None)
-                PruebaRuta.objects.filter(Q(tenant=target_tenant) | Q(tecnico__in=empleado_ids)).update(tecnico=None)
-                Cita.objects.filter(empleado__in=empleado_ids).update(empleado=None)
-                # Ahora borrar en orden (añadiendo nóminas y asistencias)
-                Bitacora.objects.filter(tenant=target_tenant).delete()
-                Reporte.objects.filter(tenant=target_tenant).delete()
-                LecturaPlaca.objects.filter(tenant=target_tenant).delete()
-                Cita.objects.filter(empleado__in=empleado_ids).delete()
-                DetalleNomina.objects.filter(tenant=target_tenant).delete()
-                Nomina.objects.filter(tenant=target_tenant).delete()
-                Asistencia.objects.filter(tenant=target_tenant).delete()
-                DetalleFacturaProveedor.objects.filter(tenant=target_tenant).delete()
-                FacturaProveedor.objects.filter(tenant=target_tenant).delete()
-                Pago.objects.filter(tenant=target_tenant).delete()
-                ImagenOrdenTrabajo.objects.filter(tenant=target_tenant).delete()
-                AsignacionTecnico.objects.filter(tecnico__in=empleado_ids).delete()
-                PruebaRuta.objects.filter(tecnico__in=empleado_ids).delete()
-                DetalleInspeccion.objects.filter(tenant=target_tenant).delete()
-                Inspeccion.objects.filter(tenant=target_tenant).delete()
-                InventarioVehiculo.objects.filter(tenant=target_tenant).delete()
-                TareaOrdenTrabajo.objects.filter(tenant=target_tenant).delete()
-                NotaOrdenTrabajo.objects.filter(tenant=target_tenant).delete()
-                DetalleOrdenTrabajo.objects.filter(tenant=target_tenant).delete()
-                OrdenTrabajo.objects.filter(tenant=target_tenant).delete()
-                detallePresupuesto.objects.filter(tenant=target_tenant).delete()
-                presupuesto.objects.filter(tenant=target_tenant).delete()
-                Vehiculo.objects.filter(tenant=target_tenant).delete()
-                # Intentar eliminar empleados; si falla por FK, limpiar referencias y reintentar
-                try:
-                    Empleado.objects.filter(tenant=target_tenant).delete()
-                except IntegrityError:
-                    logger.warning("Fallo al eliminar empleados: limpiando referencias y reintentando")
-                    # Asegurar que todos los campos que referencian empleados queden en NULL
-                    Inspeccion.objects.filter(tecnico__in=empleado_ids).update(tecnico=None)
-                    AsignacionTecnico.objects.filter(tecnico__in=empleado_ids).update(tecnico=None)
-                    PruebaRuta.objects.filter(tecnico__in=empleado_ids).update(tecnico=None)
-                    Cita.objects.filter(empleado__in=empleado_ids).update(empleado=None)
-                    # Reintentar la eliminación
-                    Empleado.objects.filter(tenant=target_tenant).delete()
-                Cliente.objects.filter(tenant=target_tenant).delete()
-                Modelo.objects.filter(tenant=target_tenant).delete()
-                Marca.objects.filter(tenant=target_tenant).delete()
-                Item.objects.filter(tenant=target_tenant).delete()
-                Proveedor.objects.filter(tenant=target_tenant).delete()
-                Cargo.objects.filter(tenant=target_tenant).delete()
-                Area.objects.filter(tenant=target_tenant).delete()
-                # No borrar UserProfile, ya que se recrearán
-                # Las eliminaciones se confirmarán automáticamente con la transacción atómica
+                _clear_tenant_data(target_tenant)
             
             # Importar (cada operación se ejecutará con autocommit del DB)
             # 0. Importar Grupos (Roles) primero, antes de usuarios
-            from django.contrib.auth.models import User, Group, Permission
-            for group_data in backup_data.get('groups', []):
-                old_id = group_data['id']
-                group_name = group_data['name']
-                permissions_codenames = group_data.get('permissions', [])
-                
-                # Crear o obtener el grupo
-                group, created = Group.objects.get_or_create(name=group_name)
-                
-                # Restaurar permisos del grupo
-                if permissions_codenames:
-                    permissions_to_add = []
-                    for codename in permissions_codenames:
-                        try:
-                            # Buscar permiso por codename (puede tener formato "app.codename" o solo "codename")
-                            if '.' in codename:
-                                app_label, perm_codename = codename.split('.', 1)
-                                permission = Permission.objects.get(codename=perm_codename, content_type__app_label=app_label)
-                            else:
-                                # Si no tiene app_label, buscar en todos los permisos
-                                permission = Permission.objects.filter(codename=codename).first()
-                            
-                            if permission:
-                                permissions_to_add.append(permission)
-                        except Permission.DoesNotExist:
-                            logger.warning(f"Permiso '{codename}' no encontrado, omitiendo...")
-                    
-                    # Asignar permisos al grupo
-                    if permissions_to_add:
-                        group.permissions.set(permissions_to_add)
-                        logger.info(f"Permisos restaurados para grupo '{group_name}': {len(permissions_to_add)} permisos")
-                
-                id_mapping['groups'][old_id] = group.id
-                summary['groups'] += 1
+            _import_groups(backup_data.get('groups', []), id_mapping, summary)
             
             # 1. Importar Usuarios (después de grupos)
-            for user_data in backup_data.get('users', []):
-                old_id = user_data['id']
-                user_data.pop('id')
-                # Extraer grupos antes de crear el usuario
-                group_names = user_data.pop('groups', [])
-                # No importar password si no queremos sobreescribir
-                password = user_data.pop('password', None)
-                user, created = User.objects.get_or_create(
-                    username=user_data['username'],
-                    defaults=user_data
-                )
-                if not created and password:
-                    # Si ya existe, actualizar campos pero no password por seguridad
-                    for key, value in user_data.items():
-                        if key not in ['password', 'groups']:
-                            setattr(user, key, value)
-                    user.save()
-                
-                # Restaurar grupos (roles) del usuario
-                if group_names:
-                    groups_to_assign = []
-                    for group_name in group_names:
-                        try:
-                            group = Group.objects.get(name=group_name)
-                            groups_to_assign.append(group)
-                        except Group.DoesNotExist:
-                            # Si el grupo no existe, crear uno básico (aunque debería existir si se importó correctamente)
-                            logger.warning(f"Grupo '{group_name}' no existe, creando grupo básico...")
-                            try:
-                                group = Group.objects.create(name=group_name)
-                                groups_to_assign.append(group)
-                            except Exception as e:
-                                logger.error(f"Error al crear grupo '{group_name}': {e}")
-                    
-                    # Asignar grupos al usuario
-                    if groups_to_assign:
-                        user.groups.set(groups_to_assign)
-                        logger.info(f"Grupos restaurados para usuario {user.username}: {[g.name for g in groups_to_assign]}")
-                
-                id_mapping['users'][old_id] = user.id
-                summary['users'] += 1
+            _import_users(backup_data.get('users', []), id_mapping, summary)
             
             # 1.1. Importar UserProfiles
-            for profile_data in backup_data.get('user_profiles', []):
-                old_user_id = profile_data.pop('usuario_id')
-                profile_data.pop('id')
-                profile_data.pop('tenant_id')
-                
-                if old_user_id in id_mapping['users']:
-                    profile_data['usuario_id'] = id_mapping['users'][old_user_id]
-                    profile_data['tenant_id'] = target_tenant.id
-                    UserProfile.objects.get_or_create(
-                        usuario_id=profile_data['usuario_id'],
-                        tenant_id=profile_data['tenant_id'],
-                        defaults=profile_data
-                    )
-                    summary['user_profiles'] += 1
+            _import_user_profiles(backup_data.get('user_profiles', []), id_mapping, summary, target_tenant)
             
             # 1. Importar Marcas primero (sin dependencias)
             for marca_data in backup_data.get('marcas', []):
@@ -1154,43 +2126,45 @@ def import_tenant_data(backup_data, target_tenant, replace=False):
                     summary['errors'].append(f"Orden de trabajo {old_id}: {str(e)}")
             
             # 13. Importar Detalles de Órdenes
-            for detalle_data in backup_data.get('detalles_ordenes', []):
-                old_orden_id = detalle_data.pop('orden_trabajo_id')
-                old_item_id = detalle_data.pop('item_id', None)
-                detalle_data.pop('id')
-                detalle_data.pop('tenant_id')
+            # Cada detalle recalcularía su orden al guardarse; se recalculan una vez al final
+            with OrdenTrabajo.recalculo_diferido():
+                for detalle_data in backup_data.get('detalles_ordenes', []):
+                    old_orden_id = detalle_data.pop('orden_trabajo_id')
+                    old_item_id = detalle_data.pop('item_id', None)
+                    detalle_data.pop('id')
+                    detalle_data.pop('tenant_id')
                 
-                if old_orden_id in id_mapping['ordenes_trabajo']:
-                    detalle_data['orden_trabajo_id'] = id_mapping['ordenes_trabajo'][old_orden_id]
+                    if old_orden_id in id_mapping['ordenes_trabajo']:
+                        detalle_data['orden_trabajo_id'] = id_mapping['ordenes_trabajo'][old_orden_id]
                     
-                    # Mapear item_id si existe
-                    if old_item_id and old_item_id in id_mapping['items']:
-                        detalle_data['item_id'] = id_mapping['items'][old_item_id]
-                    else:
-                        detalle_data['item_id'] = None
+                        # Mapear item_id si existe
+                        if old_item_id and old_item_id in id_mapping['items']:
+                            detalle_data['item_id'] = id_mapping['items'][old_item_id]
+                        else:
+                            detalle_data['item_id'] = None
                     
-                    # Ensure all decimal fields have default values (never None)
-                    if detalle_data.get('descuento_porcentaje') is None or detalle_data.get('descuento_porcentaje') == 'None':
-                        detalle_data['descuento_porcentaje'] = '0.00'
-                    if detalle_data.get('descuento') is None or detalle_data.get('descuento') == 'None':
-                        detalle_data['descuento'] = '0.00'
-                    if detalle_data.get('subtotal') is None or detalle_data.get('subtotal') == 'None':
-                        detalle_data['subtotal'] = '0.00'
-                    if detalle_data.get('total') is None or detalle_data.get('total') == 'None':
-                        detalle_data['total'] = '0.00'
-                    if detalle_data.get('precio_unitario') is None or detalle_data.get('precio_unitario') == 'None':
-                        detalle_data['precio_unitario'] = '0.00'
-                    if detalle_data.get('cantidad') is None or detalle_data.get('cantidad') == 'None':
-                        detalle_data['cantidad'] = 0
+                        # Ensure all decimal fields have default values (never None)
+                        if detalle_data.get('descuento_porcentaje') is None or detalle_data.get('descuento_porcentaje') == 'None':
+                            detalle_data['descuento_porcentaje'] = '0.00'
+                        if detalle_data.get('descuento') is None or detalle_data.get('descuento') == 'None':
+                            detalle_data['descuento'] = '0.00'
+                        if detalle_data.get('subtotal') is None or detalle_data.get('subtotal') == 'None':
+                            detalle_data['subtotal'] = '0.00'
+                        if detalle_data.get('total') is None or detalle_data.get('total') == 'None':
+                            detalle_data['total'] = '0.00'
+                        if detalle_data.get('precio_unitario') is None or detalle_data.get('precio_unitario') == 'None':
+                            detalle_data['precio_unitario'] = '0.00'
+                        if detalle_data.get('cantidad') is None or detalle_data.get('cantidad') == 'None':
+                            detalle_data['cantidad'] = 0
                     
-                    # Convertir campos string a Decimal
-                    for field in ['descuento_porcentaje', 'descuento', 'subtotal', 'total', 'precio_unitario']:
-                        if field in detalle_data and detalle_data[field] is not None:
-                            if isinstance(detalle_data[field], str):
-                                detalle_data[field] = Decimal(detalle_data[field])
+                        # Convertir campos string a Decimal
+                        for field in ['descuento_porcentaje', 'descuento', 'subtotal', 'total', 'precio_unitario']:
+                            if field in detalle_data and detalle_data[field] is not None:
+                                if isinstance(detalle_data[field], str):
+                                    detalle_data[field] = Decimal(detalle_data[field])
                     
-                    DetalleOrdenTrabajo.objects.create(tenant=target_tenant, **detalle_data)
-                    summary['detalles_ordenes'] += 1
+                        DetalleOrdenTrabajo.objects.create(tenant=target_tenant, **detalle_data)
+                        summary['detalles_ordenes'] += 1
             
             # 14. Importar Notas de Órdenes
             for nota_data in backup_data.get('notas_ordenes', []):
@@ -1427,9 +2401,14 @@ def import_tenant_data(backup_data, target_tenant, replace=False):
             
             # 26. Importar Reportes (solo metadatos, no archivos)
             for reporte_data in backup_data.get('reportes', []):
+                old_usuario_id = reporte_data.pop('usuario_id', None)
                 reporte_data.pop('id')
                 reporte_data.pop('tenant_id')
                 reporte_data.pop('archivo', None)
+                # El usuario es obligatorio: sin él no se puede restaurar el reporte
+                if not old_usuario_id or old_usuario_id not in id_mapping['users']:
+                    continue
+                reporte_data['usuario_id'] = id_mapping['users'][old_usuario_id]
                 Reporte.objects.create(tenant=target_tenant, **reporte_data)
                 summary['reportes'] += 1
             
@@ -1522,6 +2501,10 @@ def import_tenant_data(backup_data, target_tenant, replace=False):
                     DetalleNomina.objects.create(tenant=target_tenant, **detalle_data)
                     summary['detalles_nomina'] += 1
             
+            # Invalidar reportes cacheados y métricas del dashboard del tenant restaurado
+            invalidar_tenant(target_tenant.id)
+            invalidar_metricas(target_tenant.id)
+            
             logger.info(f"Backup importado exitosamente al tenant: {target_tenant.nombre_taller}")
             return summary
         except Exception as e:
@@ -4,16 +4,27 @@ Vistas para Backup y Restore del sistema multi-tenant.
 import json
 import gzip
 import logging
-from django.http import HttpResponse
+import uuid
+from django.http import HttpResponse, StreamingHttpResponse, FileResponse
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.urls import reverse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 
-from .utils import export_tenant_data, import_tenant_data
+from .utils import (
+    export_tenant_data, import_tenant_data, iter_tenant_data_ndjson,
+    iter_gzip, parse_ndjson_backup, is_ndjson_backup, load_backup_content,
+    iter_tenant_data_columnar, parse_columnar_backup, is_columnar_backup, COLUMNAR_FORMAT,
+    is_streamable_backup, verify_backup,
+)
+from .bulk_restore import bulk_import_tenant_data, stream_import_tenant_data
+from .models import BackupJob
+from .jobs import enqueue_job, vencer_trabajos_colgados
 from personal_admin.views import registrar_bitacora
 from personal_admin.models import Bitacora
 
@@ -26,6 +37,10 @@ class BackupView(APIView):
     Devuelve un archivo JSON descargable.
     
     GET /api/backup/
+    GET /api/backup/?stream=true  -> NDJSON comprimido generado en streaming,
+                                    con memoria constante sin importar el tamaño del tenant
+    GET /api/backup/?formato=columnar -> formato columnar binario (.tbk), también en
+                                    streaming; más compacto y rápido de generar y leer
     """
     permission_classes = [IsAuthenticated]
     
@@ -40,6 +55,13 @@ class BackupView(APIView):
             
             tenant = user.profile.tenant
             
+            stream = request.query_params.get('stream', 'false')
+            if isinstance(stream, str):
+                stream = stream.lower() == 'true'
+            formato = request.query_params.get('formato', '').lower()
+            if stream or formato == COLUMNAR_FORMAT:
+                return self._streaming_response(request, user, tenant, formato)
+            
             # Exportar datos del tenant
             backup_data = export_tenant_data(tenant)
             
@@ -75,6 +97,37 @@ class BackupView(APIView):
                 {"error": f"Error al crear backup: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    
+    def _streaming_response(self, request, user, tenant, formato=''):
+        """
+        Envía el backup a medida que se genera: NDJSON comprimido en gzip o,
+        con formato=columnar, el formato columnar binario.
+        Cada sección se lee con .iterator() y se comprime de forma incremental,
+        por lo que nunca se arma el backup completo en memoria.
+        """
+        timestamp = timezone.now().strftime("%Y%m%d_%H%M%S")
+        nombre = f"backup_{tenant.nombre_taller.replace(' ', '_')}_{timestamp}"
+        if formato == COLUMNAR_FORMAT:
+            filename = f"{nombre}.tbk"
+            contenido = iter_tenant_data_columnar(tenant)
+            content_type = 'application/octet-stream'
+        else:
+            filename = f"{nombre}.ndjson.gz"
+            contenido = iter_gzip(iter_tenant_data_ndjson(tenant))
+            content_type = 'application/gzip'
+        
+        # Registrar en bitácora antes de empezar a enviar datos
+        registrar_bitacora(
+            usuario=user,
+            accion=Bitacora.Accion.CREAR,
+            modulo=Bitacora.Modulo.AUTENTICACION,
+            descripcion=f"Backup del sistema creado (streaming): {filename}",
+            request=request
+        )
+        
+        response = StreamingHttpResponse(contenido, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
 
 class RestoreView(APIView):
@@ -84,6 +137,11 @@ class RestoreView(APIView):
     
     POST /api/restore/
     Body: FormData con 'backup_file' (archivo JSON) y opcionalmente 'replace' (true/false)
+          y 'bulk' (true/false) para usar la restauración masiva con bulk_create.
+          Para restaurar una cadena incremental se envían varios 'backup_file'
+          en orden: el backup completo base y luego sus incrementales.
+          Con 'stream' (true/false) un backup NDJSON o columnar se importa
+          leyéndolo por partes, sin cargar el archivo completo en memoria.
     """
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser, JSONParser]
@@ -107,18 +165,40 @@ class RestoreView(APIView):
                 )
             
             # Obtener el archivo del request
+            backup_files = request.FILES.getlist('backup_file')
             backup_file = request.FILES.get('backup_file')
-            if not backup_file:
+            stream = request.data.get('stream', False)
+            if isinstance(stream, str):
+                stream = stream.lower() == 'true'
+            if len(backup_files) > 1:
+                # Cadena de backups: completo base + incrementales, en orden
+                try:
+                    backup_data = [load_backup_content(f.read()) for f in backup_files]
+                except Exception as e:
+                    logger.error(f"Error leyendo cadena de backups: {e}", exc_info=True)
+                    return Response({"error": f"Archivo inválido: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
+            elif not backup_file:
                 # Intentar obtener desde data si viene como JSON
                 if 'backup_data' in request.data:
                     backup_data = request.data['backup_data']
                     if isinstance(backup_data, str):
-                        backup_data = json.loads(backup_data)
+                        if is_ndjson_backup(backup_data):
+                            backup_data = parse_ndjson_backup(backup_data.splitlines())
+                        else:
+                            backup_data = json.loads(backup_data)
                 else:
                     return Response(
                         {"error": "No se proporcionó archivo de backup"},
                         status=status.HTTP_400_BAD_REQUEST
                     )
+            elif stream:
+                # El archivo se lee por partes durante la importación
+                if not is_streamable_backup(backup_file):
+                    return Response(
+                        {"error": "La restauración en streaming requiere un backup NDJSON o columnar"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                backup_data = None
             else:
                 # Leer y parsear el archivo JSON (posiblemente comprimido)
                 try:
@@ -132,9 +212,15 @@ class RestoreView(APIView):
                             logger.error(f"Error al descomprimir gzip: {e}", exc_info=True)
                             return Response({"error": f"Error al descomprimir archivo gzip: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
 
-                    # Intentar decodificar y parsear JSON
+                    # Intentar decodificar y parsear JSON (o NDJSON de un backup en streaming,
+                    # o el formato columnar binario, que trae su propia compresión)
                     try:
-                        backup_data = json.loads(file_content.decode('utf-8'))
+                        if is_columnar_backup(file_content):
+                            backup_data = parse_columnar_backup(file_content)
+                        elif is_ndjson_backup(file_content):
+                            backup_data = parse_ndjson_backup(file_content.splitlines())
+                        else:
+                            backup_data = json.loads(file_content.decode('utf-8'))
                     except UnicodeDecodeError:
                         # Si no se puede decodificar, intentamos sin decodificar (ya dict)
                         try:
@@ -147,8 +233,9 @@ class RestoreView(APIView):
                     logger.error(f"Error leyendo archivo de backup: {e}", exc_info=True)
                     return Response({"error": f"Archivo inválido: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Validar que el backup es válido
-            if 'metadata' not in backup_data:
+            # Validar que el backup es válido (en streaming se valida al leerlo)
+            backups = backup_data if isinstance(backup_data, list) else [backup_data]
+            if backup_data is not None and any('metadata' not in backup for backup in backups):
                 return Response(
                     {"error": "Archivo de backup inválido: falta metadata"},
                     status=status.HTTP_400_BAD_REQUEST
@@ -159,8 +246,18 @@ class RestoreView(APIView):
             if isinstance(replace, str):
                 replace = replace.lower() == 'true'
             
+            # Verificar opción de restauración masiva
+            bulk = request.data.get('bulk', False)
+            if isinstance(bulk, str):
+                bulk = bulk.lower() == 'true'
+            
             # Importar datos
-            summary = import_tenant_data(backup_data, tenant, replace=replace)
+            if backup_data is None:
+                summary = stream_import_tenant_data(backup_file, tenant, replace=replace)
+            elif bulk:
+                summary = bulk_import_tenant_data(backup_data, tenant, replace=replace)
+            else:
+                summary = import_tenant_data(backup_data, tenant, replace=replace)
             
             # Registrar en bitácora
             registrar_bitacora(
@@ -191,3 +288,253 @@ class RestoreView(APIView):
                 {"error": f"Error al restaurar backup: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+def _tenant_del_usuario(user):
+    if not hasattr(user, 'profile') or not user.profile.tenant:
+        return None
+    return user.profile.tenant
+
+
+def _puede_restaurar(user, tenant):
+    return user.is_staff or user.is_superuser or tenant.propietario == user
+
+
+def _job_data(job):
+    return {
+        "id": job.id,
+        "tipo": job.tipo,
+        "estado": job.estado,
+        "opciones": job.opciones,
+        "porcentaje": job.porcentaje,
+        "secciones_totales": job.secciones_totales,
+        "secciones_completadas": job.secciones_completadas,
+        "ultima_seccion": job.ultima_seccion,
+        "progreso": job.progreso,
+        "resumen": job.resumen,
+        "error": job.error,
+        "fecha_creacion": job.fecha_creacion,
+        "fecha_inicio": job.fecha_inicio,
+        "fecha_fin": job.fecha_fin,
+        "backup_id": job.backup_id.hex if job.backup_id else None,
+        "base_id": job.base_id,
+        "descarga_disponible": job.tipo == BackupJob.Tipo.BACKUP and job.estado == BackupJob.Estado.COMPLETADO and bool(job.archivo),
+    }
+
+
+class BackupJobListCreateView(APIView):
+    """
+    Trabajos de backup/restore en segundo plano para el tenant actual.
+    
+    GET  /api/backup/jobs/  -> lista de trabajos del tenant
+    POST /api/backup/jobs/  -> encola un trabajo
+         Body: 'tipo' (BACKUP o RESTORE).
+               BACKUP: opcionalmente 'incremental' (true/false), que toma como
+               base el último backup completado del tenant, y 'formato'
+               ('ndjson' o 'columnar').
+               RESTORE: 'backup_file', o 'backup_job_id' para restaurar la
+               cadena de un backup anterior; opcionalmente 'replace' (true/false)
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+    
+    def get(self, request):
+        tenant = _tenant_del_usuario(request.user)
+        if tenant is None:
+            return Response(
+                {"error": "Usuario no tiene un tenant asociado"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        vencer_trabajos_colgados(tenant)
+        jobs = BackupJob.objects.filter(tenant=tenant)[:50]
+        return Response([_job_data(job) for job in jobs])
+    
+    def post(self, request):
+        user = request.user
+        tenant = _tenant_del_usuario(user)
+        if tenant is None:
+            return Response(
+                {"error": "Usuario no tiene un tenant asociado"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        tipo = str(request.data.get('tipo', BackupJob.Tipo.BACKUP)).upper()
+        if tipo not in BackupJob.Tipo.values:
+            return Response(
+                {"error": f"Tipo de trabajo inválido: {tipo}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        job = BackupJob(tenant=tenant, usuario=user, tipo=tipo)
+        if tipo == BackupJob.Tipo.BACKUP:
+            job.backup_id = uuid.uuid4()
+            incremental = request.data.get('incremental', False)
+            if isinstance(incremental, str):
+                incremental = incremental.lower() == 'true'
+            if incremental:
+                job.base = BackupJob.objects.filter(
+                    tenant=tenant,
+                    tipo=BackupJob.Tipo.BACKUP,
+                    estado=BackupJob.Estado.COMPLETADO,
+                    backup_id__isnull=False,
+                ).first()
+                if job.base is None:
+                    return Response(
+                        {"error": "No existe un backup completado para usar como base del incremental"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                job.opciones = {'incremental': True}
+            if str(request.data.get('formato', '')).lower() == COLUMNAR_FORMAT:
+                job.opciones['formato'] = COLUMNAR_FORMAT
+        if tipo == BackupJob.Tipo.RESTORE:
+            if not _puede_restaurar(user, tenant):
+                return Response(
+                    {"error": "No tienes permisos para restaurar backups"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            replace = request.data.get('replace', True)
+            if isinstance(replace, str):
+                replace = replace.lower() == 'true'
+            job.opciones = {'replace': replace}
+            backup_file = request.FILES.get('backup_file')
+            backup_job_id = request.data.get('backup_job_id')
+            if backup_file:
+                job.archivo = backup_file
+            elif backup_job_id:
+                origen = BackupJob.objects.filter(
+                    pk=backup_job_id, tenant=tenant,
+                    tipo=BackupJob.Tipo.BACKUP, estado=BackupJob.Estado.COMPLETADO,
+                ).first()
+                if origen is None:
+                    return Response(
+                        {"error": "Backup de origen no encontrado o no completado"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                job.opciones['backup_job_id'] = origen.id
+            else:
+                return Response(
+                    {"error": "No se proporcionó archivo de backup"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        with transaction.atomic():
+            job.save()
+            enqueue_job(job)
+        
+        return Response(_job_data(job), status=status.HTTP_202_ACCEPTED)
+
+
+class BackupJobDetailView(APIView):
+    """
+    Estado y progreso por sección de un trabajo.
+    
+    GET /api/backup/jobs/<id>/
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, pk):
+        tenant = _tenant_del_usuario(request.user)
+        if tenant is not None:
+            vencer_trabajos_colgados(tenant)
+        job = BackupJob.objects.filter(pk=pk, tenant=tenant).first()
+        if tenant is None or job is None:
+            return Response({"error": "Trabajo no encontrado"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(_job_data(job))
+
+
+class BackupJobDownloadView(APIView):
+    """
+    Descarga el archivo generado por un trabajo de backup completado.
+    
+    GET /api/backup/jobs/<id>/descargar/
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, pk):
+        tenant = _tenant_del_usuario(request.user)
+        job = BackupJob.objects.filter(pk=pk, tenant=tenant, tipo=BackupJob.Tipo.BACKUP).first()
+        if tenant is None or job is None:
+            return Response({"error": "Trabajo no encontrado"}, status=status.HTTP_404_NOT_FOUND)
+        if job.estado != BackupJob.Estado.COMPLETADO or not job.archivo:
+            return Response(
+                {"error": "El backup todavía no está disponible", "estado": job.estado},
+                status=status.HTTP_409_CONFLICT
+            )
+        columnar = job.opciones.get('formato') == COLUMNAR_FORMAT
+        return FileResponse(
+            job.archivo.open('rb'),
+            as_attachment=True,
+            filename=job.archivo.name.rsplit('/', 1)[-1],
+            content_type='application/octet-stream' if columnar else 'application/gzip',
+        )
+
+
+class BackupJobManifestView(APIView):
+    """
+    Manifiesto de la cadena de un backup: el backup completo base y los
+    incrementales hasta el indicado, en el orden en que deben restaurarse.
+    
+    GET /api/backup/jobs/<id>/manifest/
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, pk):
+        tenant = _tenant_del_usuario(request.user)
+        job = BackupJob.objects.filter(pk=pk, tenant=tenant, tipo=BackupJob.Tipo.BACKUP).first()
+        if tenant is None or job is None:
+            return Response({"error": "Trabajo no encontrado"}, status=status.HTTP_404_NOT_FOUND)
+        
+        backups = []
+        for backup in job.cadena():
+            backups.append({
+                "job_id": backup.id,
+                "backup_id": backup.backup_id.hex if backup.backup_id else None,
+                "tipo": "incremental" if backup.es_incremental else "completo",
+                "base_backup_id": backup.base.backup_id.hex if backup.base_id and backup.base.backup_id else None,
+                "desde": backup.base.fecha_inicio if backup.base_id else None,
+                "estado": backup.estado,
+                "fecha_inicio": backup.fecha_inicio,
+                "descarga": reverse('backup_restore:backup-job-download', args=[backup.id]),
+            })
+        return Response({
+            "tenant_id": tenant.id,
+            "backup_id": job.backup_id.hex if job.backup_id else None,
+            "completa": bool(backups) and backups[0]["tipo"] == "completo",
+            "backups": backups,
+        })
+
+
+class BackupVerifyView(APIView):
+    """
+    Verifica un archivo de backup contra su manifest (filas y SHA-256 por
+    sección) sin restaurarlo ni escribir en la base de datos.
+    
+    POST /api/backup/verify/
+    Body: FormData con 'backup_file', o 'backup_job_id' para verificar el
+          archivo guardado de un trabajo de backup del tenant
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+    
+    def post(self, request):
+        backup_file = request.FILES.get('backup_file')
+        backup_job_id = request.data.get('backup_job_id')
+        if backup_file:
+            return Response(verify_backup(backup_file))
+        if not backup_job_id:
+            return Response(
+                {"error": "No se proporcionó archivo de backup"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        tenant = _tenant_del_usuario(request.user)
+        job = BackupJob.objects.filter(pk=backup_job_id, tenant=tenant, tipo=BackupJob.Tipo.BACKUP).first()
+        if tenant is None or job is None:
+            return Response({"error": "Trabajo no encontrado"}, status=status.HTTP_404_NOT_FOUND)
+        if not job.archivo:
+            return Response(
+                {"error": "El backup todavía no está disponible", "estado": job.estado},
+                status=status.HTTP_409_CONFLICT
+            )
+        with job.archivo.open('rb') as archivo:
+            return Response(verify_backup(archivo))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas_facturacion', '0005_detallefacturaproveedor_tenant_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['tenant', 'estado', 'fecha_pago'], name='pagos_tenant__df6ab1_idx'),
+        ),
+    ]
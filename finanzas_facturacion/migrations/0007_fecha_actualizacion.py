@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas_facturacion', '0006_pago_pagos_tenant__df6ab1_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detallefacturaproveedor',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='facturaproveedor',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
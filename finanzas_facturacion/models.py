@@ -110,6 +110,8 @@ class Pago(models.Model):
         indexes = [
             models.Index(fields=['orden_trabajo', 'estado']),
             models.Index(fields=['fecha_pago']),
+            # Series de ingresos por rango de fechas (viewsIngresos)
+            models.Index(fields=['tenant', 'estado', 'fecha_pago']),
             models.Index(fields=['stripe_payment_intent_id']),
         ]
     
@@ -12,6 +12,7 @@ class DetalleFacturaProveedor(models.Model):
     subtotal = models.DecimalField(max_digits=10, decimal_places=2)
     total = models.DecimalField(max_digits=10, decimal_places=2)
     tenant = models.ForeignKey('personal_admin.Tenant', on_delete=models.CASCADE, related_name='detalles_factura_proveedor')
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'detalle_factura_proveedor'
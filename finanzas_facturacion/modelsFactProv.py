@@ -1,5 +1,6 @@
 from django.db import models
 from django.db.models import Sum
+from django.utils import timezone
 from operaciones_inventario.modelsProveedor import Proveedor
 from personal_admin.models_saas import Tenant
 
@@ -16,6 +17,7 @@ class FacturaProveedor(models.Model):
     total = models.DecimalField(max_digits=10, decimal_places=2)
     proveedor = models.ForeignKey(Proveedor, on_delete=models.CASCADE, related_name='facturas_proveedor')
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='facturas_proveedor')
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'factura_proveedor'
@@ -45,6 +47,35 @@ class FacturaProveedor(models.Model):
         # Recalcular descuento, impuesto y total usando los porcentajes existentes
         self.calcular_montos()
 
+    @classmethod
+    def recalcular_en_lote(cls, factura_ids):
+        """
+        Equivalente a recalcular_desde_detalles() + save() para varias facturas,
+        usando una sola consulta agregada (GROUP BY factura) y un bulk_update.
+        """
+        from .modelsDetallesFactProv import DetalleFacturaProveedor
+        factura_ids = set(factura_ids)
+        if not factura_ids:
+            return 0
+        sumas = dict(
+            DetalleFacturaProveedor.objects.filter(factura__in=factura_ids)
+            .order_by()
+            .values('factura')
+            .annotate(total_detalles=Sum('total'))
+            .values_list('factura', 'total_detalles')
+        )
+        facturas = list(cls.objects.filter(id__in=factura_ids))
+        # bulk_update no aplica auto_now: se asigna para los backups incrementales
+        ahora = timezone.now()
+        for factura in facturas:
+            factura.subtotal = sumas.get(factura.id) or 0
+            factura.calcular_montos()
+            factura.fecha_actualizacion = ahora
+        cls.objects.bulk_update(
+            facturas, ['subtotal', 'descuento', 'impuesto', 'total', 'fecha_actualizacion'], batch_size=500
+        )
+        return len(facturas)
+
     def calcular_montos(self):
         """Calcula descuento, impuesto y total basado en porcentajes"""
         # Calcular descuento en monto
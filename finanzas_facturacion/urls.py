@@ -10,6 +10,7 @@ from .views import (
 from .viewsFactProv import FacturaProveedorViewSet
 from .viewsDetallesFactProv import DetalleFacturaProveedorViewSet
 from .views_export import exportar_pago_pdf, exportar_pago_excel
+from .viewsIngresos import SerieIngresosView
 
 router = DefaultRouter()
 router.register(r'pagos', PagoViewSet, basename='pago')
@@ -28,6 +29,9 @@ urlpatterns = [
     path('pagos/<int:pk>/export/pdf/', exportar_pago_pdf, name='exportar-pago-pdf'),
     path('pagos/<int:pk>/export/excel/', exportar_pago_excel, name='exportar-pago-excel'),
     
+    # Serie temporal de ingresos
+    path('ingresos/serie/', SerieIngresosView.as_view(), name='serie-ingresos'),
+    
     # Router de pagos (CRUD básico)
     path('', include(router.urls)),
 ]
@@ -284,12 +284,12 @@ class ConfirmPaymentWithCardOrden(APIView):
             # Si el pago fue exitoso, actualizar el registro
             if status_pi == "succeeded":
                 pago.estado = 'completado'
-                pago.save(update_fields=['estado'])
+                pago.save(update_fields=['estado', 'fecha_actualizacion'])
                 if pago.orden_trabajo:
                     # Doble chequeo por si acaso (aunque 'pago' ya es seguro)
                     if pago.orden_trabajo.tenant == user_tenant:
                         pago.orden_trabajo.pago = True
-                        pago.orden_trabajo.save(update_fields=['pago'])
+                        pago.orden_trabajo.save(update_fields=['pago', 'fecha_actualizacion'])
                         logger.info(f"✅ Orden #{pago.orden_trabajo.id} marcada como pagada")
                     else:
                         # Esto no debería pasar si tu lógica de creación de Pago es correcta
@@ -365,12 +365,12 @@ class VerifyPaymentIntentOrden(APIView):
             # Si el pago fue exitoso en Stripe, actualizar el registro
             if status_pi == "succeeded":
                 pago.estado = 'completado'
-                pago.save(update_fields=['estado'])
+                pago.save(update_fields=['estado', 'fecha_actualizacion'])
                 
                 # Actualizar estado de pago de la orden
                 if pago.orden_trabajo:
                     pago.orden_trabajo.pago = True
-                    pago.orden_trabajo.save(update_fields=['pago'])
+                    pago.orden_trabajo.save(update_fields=['pago', 'fecha_actualizacion'])
                     logger.info(f"✅ Orden #{pago.orden_trabajo.id} marcada como pagada")
                 
                 logger.info(f"✅ Pago #{pago.id} confirmado exitosamente")
@@ -495,7 +495,7 @@ class PagoViewSet(viewsets.ModelViewSet):
         # Actualizar estado de pago de la orden
         if pago.orden_trabajo:
             pago.orden_trabajo.pago = True
-            pago.orden_trabajo.save(update_fields=['pago'])
+            pago.orden_trabajo.save(update_fields=['pago', 'fecha_actualizacion'])
             logger.info(f"✅ Orden #{pago.orden_trabajo.id} marcada como pagada")
         
         # Registrar en bitácora
@@ -0,0 +1,191 @@
+# finanzas_facturacion/viewsIngresos.py
+from datetime import date, datetime, timedelta
+
+from django.db.models import Count, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import Pago
+from operaciones_inventario.modelsOrdenTrabajo import OrdenTrabajo
+
+# intervalo del query param -> (kind de Trunc, máximo de periodos por consulta)
+INTERVALOS = {
+    'dia': ('day', 366),
+    'semana': ('week', 156),
+    'mes': ('month', 60),
+}
+# Meses que se muestran si no se indica rango (igual que el dashboard)
+MESES_DEFAULT = 6
+
+
+def _inicio_periodo(fecha, intervalo):
+    if intervalo == 'semana':
+        # TruncWeek agrupa por semana ISO (desde el lunes)
+        return fecha - timedelta(days=fecha.weekday())
+    if intervalo == 'mes':
+        return fecha.replace(day=1)
+    return fecha
+
+
+def _siguiente_periodo(fecha, intervalo):
+    if intervalo == 'semana':
+        return fecha + timedelta(days=7)
+    if intervalo == 'mes':
+        return date(fecha.year + fecha.month // 12, fecha.month % 12 + 1, 1)
+    return fecha + timedelta(days=1)
+
+
+def _periodos(inicio, fin, intervalo):
+    """
+    Inicio de cada periodo entre inicio (incluido) y fin (excluido)
+    """
+    periodos = []
+    fecha = inicio
+    while fecha < fin:
+        periodos.append(fecha)
+        fecha = _siguiente_periodo(fecha, intervalo)
+    return periodos
+
+
+def _cantidad_periodos(inicio, fin, intervalo):
+    if intervalo == 'mes':
+        return (fin.year - inicio.year) * 12 + fin.month - inicio.month
+    return (fin - inicio).days // (7 if intervalo == 'semana' else 1)
+
+
+def _agrupar(queryset, campo, kind, inicio, fin, zona, **agregados):
+    """
+    Agrega el queryset por periodo en la base de datos, filtrando primero
+    la ventana [inicio, fin) sobre `campo` para que use el índice
+
+    Returns:
+        Dict {fecha de inicio del periodo: {agregado: valor}}
+    """
+    filas = (
+        queryset.filter(**{f'{campo}__gte': inicio, f'{campo}__lt': fin})
+        .annotate(periodo=Trunc(campo, kind, tzinfo=zona))
+        .order_by()
+        .values('periodo')
+        .annotate(**agregados)
+    )
+    return {timezone.localtime(fila.pop('periodo'), zona).date(): fila for fila in filas}
+
+
+def serie_ingresos(tenant, desde, hasta, intervalo):
+    """
+    Ingresos (pagos completados) y órdenes creadas del tenant por periodo
+
+    Las fechas se interpretan en la zona horaria del proyecto
+    (America/La_Paz) y el rango se amplía a periodos completos. Los
+    periodos sin movimientos se devuelven en cero.
+
+    Returns:
+        Dict con intervalo, desde, hasta (rango efectivo), serie y totales
+    """
+    kind, _ = INTERVALOS[intervalo]
+    zona = timezone.get_default_timezone()
+    inicio = _inicio_periodo(desde, intervalo)
+    fin = _siguiente_periodo(_inicio_periodo(hasta, intervalo), intervalo)
+    inicio_dt = timezone.make_aware(datetime.combine(inicio, datetime.min.time()), zona)
+    fin_dt = timezone.make_aware(datetime.combine(fin, datetime.min.time()), zona)
+
+    ingresos = _agrupar(
+        Pago.objects.filter(tenant=tenant, estado='completado'),
+        'fecha_pago', kind, inicio_dt, fin_dt, zona,
+        total=Sum('monto'), pagos=Count('id'),
+    )
+    ordenes = _agrupar(
+        OrdenTrabajo.objects.filter(tenant=tenant),
+        'fecha_creacion', kind, inicio_dt, fin_dt, zona,
+        cantidad=Count('id'),
+    )
+
+    serie = []
+    for periodo in _periodos(inicio, fin, intervalo):
+        fila_ingresos = ingresos.get(periodo, {})
+        serie.append({
+            'periodo': periodo.isoformat(),
+            'ingresos': float(fila_ingresos.get('total') or 0),
+            'pagos': fila_ingresos.get('pagos', 0),
+            'ordenes': ordenes.get(periodo, {}).get('cantidad', 0),
+        })
+
+    return {
+        'intervalo': intervalo,
+        'zona_horaria': str(zona),
+        'desde': inicio.isoformat(),
+        'hasta': (fin - timedelta(days=1)).isoformat(),
+        'serie': serie,
+        'totales': {
+            'ingresos': round(sum(fila['ingresos'] for fila in serie), 2),
+            'pagos': sum(fila['pagos'] for fila in serie),
+            'ordenes': sum(fila['ordenes'] for fila in serie),
+        },
+    }
+
+
+class SerieIngresosView(APIView):
+    """
+    Serie temporal de ingresos y órdenes del taller
+    GET /api/ingresos/serie/?desde=2025-01-01&hasta=2025-06-30&intervalo=mes
+
+    - intervalo: dia, semana o mes (por defecto mes)
+    - desde / hasta: fechas YYYY-MM-DD (por defecto los últimos 6 meses)
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        user_tenant = user.profile.tenant
+
+        # Verificar que sea administrador
+        is_admin = user.groups.filter(name='administrador').exists()
+        if not is_admin:
+            return Response(
+                {"error": "No tiene permisos para acceder a esta vista"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        intervalo = request.query_params.get('intervalo', 'mes')
+        if intervalo not in INTERVALOS:
+            return Response(
+                {"error": f"Intervalo inválido. Opciones: {', '.join(INTERVALOS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            hasta = request.query_params.get('hasta')
+            hasta = date.fromisoformat(hasta) if hasta else timezone.localdate()
+            desde = request.query_params.get('desde')
+            if desde:
+                desde = date.fromisoformat(desde)
+            else:
+                desde = hasta.replace(day=1)
+                for _ in range(MESES_DEFAULT - 1):
+                    desde = (desde - timedelta(days=1)).replace(day=1)
+        except ValueError:
+            return Response(
+                {"error": "Formato de fecha inválido. Use YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if desde > hasta:
+            return Response(
+                {"error": "La fecha 'desde' no puede ser posterior a 'hasta'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        _, maximo = INTERVALOS[intervalo]
+        inicio = _inicio_periodo(desde, intervalo)
+        fin = _siguiente_periodo(_inicio_periodo(hasta, intervalo), intervalo)
+        if _cantidad_periodos(inicio, fin, intervalo) > maximo:
+            return Response(
+                {"error": f"El rango es demasiado grande: máximo {maximo} periodos con intervalo '{intervalo}'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(serie_ingresos(user_tenant, desde, hasta, intervalo), status=status.HTTP_200_OK)
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operaciones_inventario', '0024_alter_item_codigo_alter_proveedor_nit_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ordentrabajo',
+            index=models.Index(fields=['tenant', 'fecha_creacion'], name='orden_traba_tenant__3e06b7_idx'),
+        ),
+    ]
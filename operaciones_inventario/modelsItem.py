@@ -25,6 +25,7 @@ class Item(models.Model):
 	estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default='Disponible')
 	area = models.ForeignKey('operaciones_inventario.Area', on_delete=models.SET_NULL, related_name='items',null=True,blank=True)
 	tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='items')
+	fecha_actualizacion = models.DateTimeField(auto_now=True)
 
 	class Meta:
 		unique_together = ('codigo', 'tenant')
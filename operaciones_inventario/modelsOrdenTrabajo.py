@@ -1,4 +1,7 @@
-from django.db import models
+import threading
+from contextlib import contextmanager
+from django.db import models, transaction
+from django.utils import timezone
 from clientes_servicios.models import Cliente
 from .modelsVehiculos import Vehiculo
 from personal_admin.models import Empleado
@@ -7,6 +10,9 @@ from .modelsItem import Item
 from django.core.validators import MinValueValidator, MaxValueValidator
 from personal_admin.models_saas import Tenant
 
+# Órdenes pendientes de recalcular mientras hay un recalculo_diferido() activo en el hilo
+_recalculo_diferido = threading.local()
+
 class OrdenTrabajo(models.Model):
     CHOICE_ESTADO = [
     ('pendiente', 'Pendiente'),
@@ -42,19 +48,104 @@ class OrdenTrabajo(models.Model):
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='ordenes')
     pago = models.BooleanField(default=False)
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='ordenes_trabajo')
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
-    def recalcular_totales(self):
-        detalles = self.detalles.all()
-        total_detalles = sum([d.total for d in detalles], Decimal('0.00'))
-        total_descuentos = sum([d.descuento for d in detalles], Decimal('0.00'))
-        subtotal_orden = sum([d.subtotal for d in detalles], Decimal('0.00'))
+    def _asignar_totales(self, total_detalles, total_descuentos, subtotal_orden):
         impuesto = (total_detalles) * Decimal('0.13')
         total_final = total_detalles + impuesto
         self.subtotal = subtotal_orden
         self.impuesto = impuesto
         self.descuento = total_descuentos
         self.total = total_final
-        self.save(update_fields=['subtotal', 'impuesto', 'total', 'descuento'])
+
+    def recalcular_totales(self):
+        sumas = self.detalles.aggregate(
+            suma_total=models.Sum('total'),
+            suma_descuento=models.Sum('descuento'),
+            suma_subtotal=models.Sum('subtotal'),
+        )
+        self._asignar_totales(
+            sumas['suma_total'] or Decimal('0.00'),
+            sumas['suma_descuento'] or Decimal('0.00'),
+            sumas['suma_subtotal'] or Decimal('0.00'),
+        )
+        self.save(update_fields=['subtotal', 'impuesto', 'total', 'descuento', 'fecha_actualizacion'])
+
+    @classmethod
+    @contextmanager
+    def recalculo_diferido(cls):
+        """
+        Agrupa cambios de detalles en una transacción y recalcula los totales
+        una sola vez por orden al final, en lugar de en cada save()/delete()
+        de un detalle. Las órdenes afectadas se recalculan con
+        recalcular_totales_en_lote antes de confirmar la transacción.
+        Los bloques anidados se suman al exterior.
+
+            with OrdenTrabajo.recalculo_diferido():
+                for detalle in detalles:
+                    detalle.save()
+        """
+        if getattr(_recalculo_diferido, 'ordenes', None) is not None:
+            yield _recalculo_diferido.ordenes
+            return
+        with transaction.atomic():
+            _recalculo_diferido.ordenes = ordenes = set()
+            try:
+                yield ordenes
+            finally:
+                _recalculo_diferido.ordenes = None
+            cls.recalcular_totales_en_lote(ordenes)
+
+    @staticmethod
+    def _diferir_recalculo(orden_id):
+        """Registra la orden si hay un recalculo_diferido() activo; indica si se difirió."""
+        ordenes = getattr(_recalculo_diferido, 'ordenes', None)
+        if ordenes is None:
+            return False
+        ordenes.add(orden_id)
+        return True
+
+    @classmethod
+    def recalcular_totales_en_lote(cls, orden_ids):
+        """
+        Recalcula los totales de varias órdenes con una sola consulta agregada
+        (GROUP BY orden) y un bulk_update, en lugar de una lectura de detalles
+        y un UPDATE por orden.
+        """
+        orden_ids = set(orden_ids)
+        if not orden_ids:
+            return 0
+        sumas = {
+            fila['orden_trabajo']: fila
+            for fila in DetalleOrdenTrabajo.objects.filter(orden_trabajo__in=orden_ids)
+            .order_by()
+            .values('orden_trabajo')
+            .annotate(
+                suma_total=models.Sum('total'),
+                suma_descuento=models.Sum('descuento'),
+                suma_subtotal=models.Sum('subtotal'),
+            )
+        }
+        ordenes = list(cls.objects.filter(id__in=orden_ids).only('id', 'tenant'))
+        # bulk_update no aplica auto_now: se asigna para los backups incrementales
+        ahora = timezone.now()
+        for orden in ordenes:
+            fila = sumas.get(orden.id, {})
+            orden._asignar_totales(
+                fila.get('suma_total') or Decimal('0.00'),
+                fila.get('suma_descuento') or Decimal('0.00'),
+                fila.get('suma_subtotal') or Decimal('0.00'),
+            )
+            orden.fecha_actualizacion = ahora
+        cls.objects.bulk_update(
+            ordenes, ['subtotal', 'impuesto', 'total', 'descuento', 'fecha_actualizacion'], batch_size=500
+        )
+
+        # bulk_update no dispara post_save: invalidar los reportes cacheados
+        from servicios_IA.utils.reportes_cache import registrar_cambio
+        for tenant_id in {orden.tenant_id for orden in ordenes}:
+            registrar_cambio(tenant_id, cls._meta.label)
+        return len(ordenes)
 
     def __str__(self):
         return f"Orden {self.id} - {self.estado}"
@@ -64,6 +155,10 @@ class OrdenTrabajo(models.Model):
         verbose_name = 'Orden de Trabajo'
         verbose_name_plural = 'Ordenes de Trabajo'
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Series de órdenes por rango de fechas (finanzas_facturacion.viewsIngresos)
+            models.Index(fields=['tenant', 'fecha_creacion']),
+        ]
 
 class DetalleOrdenTrabajo(models.Model):
     id = models.AutoField(primary_key=True)
@@ -77,8 +172,10 @@ class DetalleOrdenTrabajo(models.Model):
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='detalles_orden', null=True, blank=True)
     item_personalizado = models.CharField(max_length=200, null=True, blank=True)
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='detalles_orden_trabajo')
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
-    def save(self, *args, **kwargs):
+    def calcular_importes(self):
+        """Calcula subtotal, descuento y total de la línea sin tocar la base de datos"""
         from decimal import Decimal, ROUND_HALF_UP
         
         self.subtotal = (Decimal(self.precio_unitario) * Decimal(self.cantidad)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
@@ -97,13 +194,17 @@ class DetalleOrdenTrabajo(models.Model):
         self.descuento = descuento_calculado
         self.total = (self.subtotal - descuento_calculado).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
+    def save(self, *args, **kwargs):
+        self.calcular_importes()
         super().save(*args, **kwargs)
-        self.orden_trabajo.recalcular_totales()
+        if not OrdenTrabajo._diferir_recalculo(self.orden_trabajo_id):
+            self.orden_trabajo.recalcular_totales()
     
     def delete(self, *args, **kwargs):
         orden = self.orden_trabajo
         super().delete(*args, **kwargs)
-        orden.recalcular_totales()
+        if not OrdenTrabajo._diferir_recalculo(orden.id):
+            orden.recalcular_totales()
     
     def __str__(self):
         return f"Detalle {self.id} de Orden {self.orden_trabajo.id}"
@@ -150,6 +251,7 @@ class InventarioVehiculo (models.Model):
     tapas_ruedas = models.BooleanField(default=False)
     triangulos = models.BooleanField(default=False)
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='inventarios_vehiculo')
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Inventario {self.id} de Orden {self.orden_trabajo.id}"
@@ -166,6 +268,7 @@ class TareaOrdenTrabajo(models.Model):
     descripcion = models.CharField(max_length=200)
     completada = models.BooleanField(default=False)
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='tareas_orden_trabajo')
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Tarea {self.id} de Orden {self.orden_trabajo.id}"
@@ -182,6 +285,7 @@ class ImagenOrdenTrabajo(models.Model):
     imagen_url = models.URLField(blank=True, null=True)
     descripcion = models.CharField(max_length=200, blank=True)
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='imagenes_orden_trabajo')
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Imagen {self.id} de Orden {self.orden_trabajo.id}"
@@ -219,6 +323,7 @@ class PruebaRuta(models.Model):
     observaciones = models.TextField()
     tecnico = models.ForeignKey(Empleado, on_delete=models.SET_NULL, null=True, related_name='pruebas_ruta')
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='pruebas_ruta')
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Prueba de Ruta {self.id} de Orden {self.orden_trabajo.id}"
@@ -235,6 +340,7 @@ class NotaOrdenTrabajo(models.Model):
     fecha_nota = models.DateTimeField(auto_now_add=True)
     contenido = models.TextField()
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='notas_orden_trabajo')
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Nota {self.id} de Orden {self.orden_trabajo.id}"
@@ -275,6 +381,7 @@ class Inspeccion(models.Model):
     estado_luces = models.CharField(max_length=20, choices=OPCIONES_ESTADO, blank=True, null=True)
     observaciones_generales = models.TextField(blank=True, null=True)
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='inspecciones')
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Inspección {self.tipo_inspeccion} - Orden {self.orden_trabajo.id}"
@@ -306,6 +413,7 @@ class DetalleInspeccion(models.Model):
     estado_bateria = models.CharField(max_length=20, choices=OPCIONES_NIVEL, blank=True, null=True)
     estado_luces = models.CharField(max_length=20, choices=OPCIONES_ESTADO, blank=True, null=True)
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='detalles_inspeccion')
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Detalle de Inspección {self.id} - Inspección {self.inspeccion.id}"
@@ -321,6 +429,7 @@ class AsignacionTecnico(models.Model):
     tecnico = models.ForeignKey(Empleado, on_delete=models.SET_NULL, null=True, related_name='asignaciones_tecnicos')
     fecha_asignacion = models.DateTimeField(auto_now_add=True)
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='asignaciones_tecnicos')
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Técnico {self.tecnico} asignado a Orden {self.orden_trabajo.id}"
@@ -1,4 +1,5 @@
 from  django.db import models
+from django.utils import timezone
 from decimal import Decimal
 from .modelsItem import Item as item
 from .modelsVehiculos import Vehiculo
@@ -28,6 +29,7 @@ class presupuesto(models.Model):
     total = models.DecimalField(null=True, blank=True, max_digits=10, decimal_places=2)
     vehiculo = models.ForeignKey(Vehiculo, on_delete=models.SET_NULL, null=True, blank=True, related_name='presupuestos')
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='presupuestos')
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['id']
@@ -42,7 +44,52 @@ class presupuesto(models.Model):
         total_detalles = sum((d.total or Decimal('0.00')) for d in detalles)
         total_descuentos = sum((getattr(d, 'descuento', Decimal('0.00')) or Decimal('0.00')) for d in detalles)
         subtotal_orden = sum((getattr(d, 'subtotal', None) or Decimal('0.00')) for d in detalles)
+        self._asignar_totales(total_detalles, total_descuentos, subtotal_orden)
         
+        # Guardar todos los campos calculados
+        self.save(update_fields=['subtotal', 'total', 'total_descuentos', 'fecha_actualizacion'])
+
+    @classmethod
+    def recalcular_totales_en_lote(cls, presupuesto_ids):
+        """
+        Recalcula los totales de varios presupuestos con una sola consulta
+        agregada (GROUP BY presupuesto) y un bulk_update.
+        """
+        presupuesto_ids = set(presupuesto_ids)
+        if not presupuesto_ids:
+            return 0
+        sumas = {
+            fila['presupuesto']: fila
+            for fila in detallePresupuesto.objects.filter(presupuesto__in=presupuesto_ids)
+            .order_by()
+            .values('presupuesto')
+            .annotate(
+                suma_total=models.Sum('total'),
+                # subtotal - total es el descuento de la línea (ver detallePresupuesto.descuento)
+                suma_descuento=models.Sum(
+                    models.F('subtotal') - models.F('total'),
+                    output_field=models.DecimalField(max_digits=10, decimal_places=2),
+                ),
+                suma_subtotal=models.Sum('subtotal'),
+            )
+        }
+        presupuestos = list(cls.objects.filter(id__in=presupuesto_ids).only('id', 'con_impuestos', 'impuestos'))
+        # bulk_update no aplica auto_now: se asigna para los backups incrementales
+        ahora = timezone.now()
+        for presup in presupuestos:
+            fila = sumas.get(presup.id, {})
+            presup._asignar_totales(
+                fila.get('suma_total') or Decimal('0.00'),
+                fila.get('suma_descuento') or Decimal('0.00'),
+                fila.get('suma_subtotal') or Decimal('0.00'),
+            )
+            presup.fecha_actualizacion = ahora
+        cls.objects.bulk_update(
+            presupuestos, ['subtotal', 'total', 'total_descuentos', 'fecha_actualizacion'], batch_size=500
+        )
+        return len(presupuestos)
+
+    def _asignar_totales(self, total_detalles, total_descuentos, subtotal_orden):
         # Calcular impuesto solo si con_impuestos está activado
         if self.con_impuestos and self.impuestos and self.impuestos > Decimal('0.00'):
             # Si el valor es menor a 1, tratarlo como decimal (0.13 = 13%)
@@ -62,9 +109,6 @@ class presupuesto(models.Model):
         self.subtotal = subtotal_orden if subtotal_orden is not None else total_detalles
         self.total_descuentos = total_descuentos
         self.total = total_final
-        
-        # Guardar todos los campos calculados
-        self.save(update_fields=['subtotal', 'total', 'total_descuentos'])
     
 class detallePresupuesto(models.Model):
     id = models.AutoField(primary_key=True)
@@ -76,6 +120,7 @@ class detallePresupuesto(models.Model):
     subtotal = models.DecimalField(null=True, blank=True, max_digits=10, decimal_places=2)
     total = models.DecimalField(null=True, blank=True, max_digits=10, decimal_places=2)
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='detalles_presupuesto')
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['id']
@@ -85,7 +130,8 @@ class detallePresupuesto(models.Model):
     def __str__(self):
         return f'Detalle {self.id} del Presupuesto {self.presupuesto.id}'
 
-    def save(self, *args, **kwargs):
+    def calcular_importes(self):
+        """Calcula subtotal y total de la línea sin tocar la base de datos"""
         from decimal import Decimal, ROUND_HALF_UP
         
         # Calcular subtotal
@@ -107,7 +153,9 @@ class detallePresupuesto(models.Model):
         self.total = (self.subtotal - descuento_calculado).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
         if self.total < Decimal('0.00'):
             self.total = Decimal('0.00')
-            
+
+    def save(self, *args, **kwargs):
+        self.calcular_importes()
         super().save(*args, **kwargs)
         # Recalcular totales del presupuesto padre
         if self.presupuesto:
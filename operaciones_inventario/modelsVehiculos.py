@@ -116,6 +116,7 @@ class Vehiculo(models.Model):
     
     # Campos de auditoría
     fecha_registro = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Registro')
+    fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name='Fecha de Actualización')
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='vehiculos')
     
     class Meta:
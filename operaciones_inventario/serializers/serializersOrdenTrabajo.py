@@ -126,22 +126,26 @@ class OrdenTrabajoSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
         instance.save()
         if detalles_data:
-            ids_en_request = [d.get('id') for d in detalles_data if d.get('id')]
-            instance.detalles.exclude(id__in=ids_en_request).delete()
-            for detalle_data in detalles_data:
-                detalle_id = detalle_data.get('id')
-                if detalle_id:
-                    try:
-                        detalle = instance.detalles.get(id=detalle_id)
-                        for attr, value in detalle_data.items():
-                            if attr != 'id':
-                                setattr(detalle, attr, value)
-                        detalle.save()
-                    except DetalleOrdenTrabajo.DoesNotExist:
-                        detalle_data.pop('id', None)
-                        DetalleOrdenTrabajo.objects.create(orden_trabajo=instance, **detalle_data)
-                else:
-                    DetalleOrdenTrabajo.objects.create(orden_trabajo=instance, **detalle_data)
+            # Los totales de la orden se recalculan una sola vez, al terminar con todos los detalles
+            with OrdenTrabajo.recalculo_diferido() as ordenes:
+                ordenes.add(instance.id)
+                ids_en_request = [d.get('id') for d in detalles_data if d.get('id')]
+                instance.detalles.exclude(id__in=ids_en_request).delete()
+                for detalle_data in detalles_data:
+                    detalle_id = detalle_data.get('id')
+                    if detalle_id:
+                        try:
+                            detalle = instance.detalles.get(id=detalle_id)
+                            for attr, value in detalle_data.items():
+                                if attr != 'id':
+                                    setattr(detalle, attr, value)
+                            detalle.save()
+                        except DetalleOrdenTrabajo.DoesNotExist:
+                            detalle_data.pop('id', None)
+                            DetalleOrdenTrabajo.objects.create(orden_trabajo=instance, tenant=instance.tenant, **detalle_data)
+                    else:
+                        DetalleOrdenTrabajo.objects.create(orden_trabajo=instance, tenant=instance.tenant, **detalle_data)
+            instance.refresh_from_db(fields=['subtotal', 'impuesto', 'total', 'descuento'])
         return instance
 
 class OrdenTrabajoCreateSerializer(serializers.ModelSerializer):
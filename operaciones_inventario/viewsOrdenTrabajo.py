@@ -159,11 +159,12 @@ class DetalleOrdenTrabajoViewSet(viewsets.ModelViewSet):
         """Asignar la orden automáticamente y registrar en bitácora"""
         user_tenant = self.request.user.profile.tenant
         orden = None
-        if 'orden_pk' in self.kwargs:
-            orden = get_object_or_404(OrdenTrabajo, pk=self.kwargs['orden_pk'], tenant=user_tenant)
-            detalle = serializer.save(orden_trabajo=orden, tenant=user_tenant)
-        else:
-            detalle = serializer.save(tenant=user_tenant)
+        with OrdenTrabajo.recalculo_diferido():
+            if 'orden_pk' in self.kwargs:
+                orden = get_object_or_404(OrdenTrabajo, pk=self.kwargs['orden_pk'], tenant=user_tenant)
+                detalle = serializer.save(orden_trabajo=orden, tenant=user_tenant)
+            else:
+                detalle = serializer.save(tenant=user_tenant)
         # Registrar en la bitácora
         registrar_bitacora(
             usuario=self.request.user,
@@ -173,13 +174,19 @@ class DetalleOrdenTrabajoViewSet(viewsets.ModelViewSet):
             request=self.request
         )
 
+    def perform_update(self, serializer):
+        """Actualizar el detalle recalculando la orden una sola vez"""
+        with OrdenTrabajo.recalculo_diferido():
+            serializer.save()
+
     def perform_destroy(self, instance):
         """Eliminar el detalle y registrar en bitácora"""
         # Obtenemos la información ANTES de borrar el objeto
         descripcion = f"Se eliminó el detalle '{instance.nombre_item}' de la orden de trabajo #{instance.orden_trabajo.id}."
         
         # Eliminamos el objeto
-        instance.delete()
+        with OrdenTrabajo.recalculo_diferido():
+            instance.delete()
         
         # Registramos la acción
         registrar_bitacora(
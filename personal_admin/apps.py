@@ -6,5 +6,5 @@ class PersonalAdminConfig(AppConfig):
     name = 'personal_admin'
     
     def ready(self):
-        pass
-        # import personal_admin.signals  # Comentado: el módulo signals no existe
+        # Mantenimiento incremental de las métricas del dashboard
+        import personal_admin.signals  # noqa: F401
@@ -0,0 +1,150 @@
+"""
+Caché de las respuestas de los dashboards.
+
+Los dashboards se consultan periódicamente desde cada pantalla abierta; la
+respuesta se guarda en la caché de Django (Redis si REDIS_URL está
+configurado, memoria local del proceso si no) por DASHBOARD_CACHE_TTL
+segundos, con clave por taller (admin) o por empleado.
+
+- Invalidación: cada taller tiene una "versión" en la caché que forma parte
+  de las claves. Las señales la cambian al confirmar una escritura en los
+  modelos que muestran los dashboards, así las entradas anteriores dejan de
+  usarse sin tener que buscarlas.
+- Estampida: cuando una entrada falta o vence, solo la petición que obtiene
+  el candado (cache.add) recalcula; las demás devuelven la entrada vencida
+  si existe o esperan a que la primera la guarde.
+"""
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Segundos que una entrada vencida se puede seguir sirviendo mientras otra
+# petición la recalcula
+GRACIA = 60
+# Tiempo máximo de un recálculo antes de liberar el candado
+TIEMPO_CANDADO = 30
+# Espera de las peticiones sin entrada mientras otra recalcula
+ESPERA_MAXIMA = 5
+INTERVALO_ESPERA = 0.05
+
+
+def _ttl():
+    return getattr(settings, 'DASHBOARD_CACHE_TTL', 30)
+
+
+def _clave_version(tenant_id):
+    return f'dashboard:version:{tenant_id}'
+
+
+def clave_admin(tenant_id):
+    return f'dashboard:admin:{tenant_id}:{_version(tenant_id)}'
+
+
+def clave_empleado(tenant_id, empleado_id):
+    return f'dashboard:empleado:{tenant_id}:{empleado_id}:{_version(tenant_id)}'
+
+
+def _version(tenant_id):
+    try:
+        return cache.get(_clave_version(tenant_id)) or '0'
+    except Exception:
+        # obtener_o_calcular() tampoco podrá usar la caché y calculará
+        return '0'
+
+
+def _cambiar_version(tenant_ids):
+    for tenant_id in tenant_ids:
+        try:
+            cache.set(_clave_version(tenant_id), uuid.uuid4().hex, None)
+        except Exception:
+            logger.warning(f"No se pudo invalidar la caché del dashboard del tenant {tenant_id}", exc_info=True)
+
+
+def invalidar_dashboard(tenant_id):
+    """
+    Invalida los dashboards del tenant al confirmar la transacción actual
+    (una sola vez por transacción aunque se guarden muchos registros)
+    """
+    if tenant_id is None or _ttl() <= 0:
+        return
+    conexion = transaction.get_connection()
+    if not conexion.in_atomic_block:
+        _cambiar_version([tenant_id])
+        return
+
+    # Se acumulan en la conexión y no en el bloque atomic: un mismo Atomic
+    # (p. ej. @transaction.atomic) se reutiliza en cada llamada
+    pendientes = _pendientes_en_curso(conexion)
+    if pendientes is None:
+        pendientes = set()
+
+        def aplicar():
+            if getattr(conexion, '_dashboards_pendientes', (None,))[0] is pendientes:
+                conexion._dashboards_pendientes = None
+            _cambiar_version(pendientes)
+
+        conexion._dashboards_pendientes = (pendientes, aplicar)
+        transaction.on_commit(aplicar)
+    pendientes.add(tenant_id)
+
+
+def _pendientes_en_curso(conexion):
+    """
+    Tenants a invalidar en la transacción en curso, o None si su on_commit
+    ya se ejecutó o se descartó con un rollback
+    """
+    actual = getattr(conexion, '_dashboards_pendientes', None)
+    if actual is None:
+        return None
+    pendientes, aplicar = actual
+    if any(funcion is aplicar for _, funcion, _ in conexion.run_on_commit):
+        return pendientes
+    return None
+
+
+def obtener_o_calcular(clave, calcular):
+    """
+    Retorna la respuesta cacheada bajo `clave` o la calcula con `calcular()`
+
+    Si la caché no responde (ej. Redis caído) se calcula sin caché.
+    """
+    ttl = _ttl()
+    if ttl <= 0:
+        return calcular()
+    try:
+        return _obtener_o_calcular(clave, calcular, ttl)
+    except Exception:
+        logger.warning("Caché del dashboard no disponible, se calcula sin caché", exc_info=True)
+        return calcular()
+
+
+def _obtener_o_calcular(clave, calcular, ttl):
+    entrada = cache.get(clave)
+    if entrada is not None and entrada['vence'] > time.time():
+        return entrada['datos']
+
+    candado = f'{clave}:candado'
+    if cache.add(candado, 1, TIEMPO_CANDADO):
+        try:
+            datos = calcular()
+            cache.set(clave, {'datos': datos, 'vence': time.time() + ttl}, ttl + GRACIA)
+            return datos
+        finally:
+            cache.delete(candado)
+
+    # Otra petición está recalculando
+    if entrada is not None:
+        return entrada['datos']
+    limite = time.time() + ESPERA_MAXIMA
+    while time.time() < limite:
+        time.sleep(INTERVALO_ESPERA)
+        entrada = cache.get(clave)
+        if entrada is not None:
+            return entrada['datos']
+    return calcular()
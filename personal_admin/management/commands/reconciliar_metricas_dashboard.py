@@ -0,0 +1,48 @@
+"""
+Comando de Django para reconciliar las métricas precalculadas del dashboard
+(MetricaDashboard) con las tablas de origen. Corrige lo que las señales no
+ven: update() masivos, bulk_create, cambios hechos directamente en la base.
+
+Pensado para ejecutarse cada noche (cron o Celery beat con
+personal_admin.tasks.reconciliar_metricas_dashboard_programado).
+
+Uso:
+    python manage.py reconciliar_metricas_dashboard
+    python manage.py reconciliar_metricas_dashboard --tenant 3
+"""
+from django.core.management.base import BaseCommand
+
+from personal_admin.metricas_dashboard import recalcular_metricas
+from personal_admin.models_saas import Tenant
+
+
+class Command(BaseCommand):
+    help = 'Recalcula las métricas del dashboard desde Pago, OrdenTrabajo y Cita y corrige diferencias'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=int,
+            help='Reconciliar solo las métricas de este tenant'
+        )
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.order_by('id')
+        if options['tenant']:
+            tenants = tenants.filter(id=options['tenant'])
+
+        correctos = 0
+        corregidos = 0
+        for tenant in tenants.iterator():
+            diferencias = recalcular_metricas(tenant.id)
+            if diferencias:
+                corregidos += 1
+                self.stdout.write(self.style.WARNING(
+                    f"⚠️  {tenant.nombre_taller}: {diferencias} métricas corregidas"
+                ))
+            else:
+                correctos += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n{correctos} talleres sin diferencias, {corregidos} corregidos"
+        ))
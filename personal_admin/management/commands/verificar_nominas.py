@@ -0,0 +1,66 @@
+"""
+Comando de Django para verificar las nóminas pendientes, que se actualizan
+de forma incremental con cada asistencia (personal_admin.nomina_asistencia),
+contra un cálculo completo desde la asistencia. Detecta lo que ese camino no
+ve: update() masivos, bulk_create, cambios de sueldo del empleado.
+
+Con --reparar reconstruye las nóminas con diferencias. Pensado para
+ejecutarse cada noche (cron o Celery beat con
+personal_admin.tasks.verificar_nominas_programado).
+
+Uso:
+    python manage.py verificar_nominas
+    python manage.py verificar_nominas --tenant 3 --reparar
+    python manage.py verificar_nominas --nomina 12 --reparar
+"""
+from django.core.management.base import BaseCommand
+
+from personal_admin.model_nomina import Nomina
+from personal_admin.nomina_asistencia import verificar_nomina
+
+
+class Command(BaseCommand):
+    help = 'Compara las nóminas pendientes con un cálculo completo desde la asistencia'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=int,
+            help='Verificar solo las nóminas de este tenant'
+        )
+        parser.add_argument(
+            '--nomina',
+            type=int,
+            help='Verificar solo esta nómina (aunque no esté pendiente)'
+        )
+        parser.add_argument(
+            '--reparar',
+            action='store_true',
+            help='Reconstruir las nóminas que tengan diferencias'
+        )
+
+    def handle(self, *args, **options):
+        if options['nomina']:
+            nominas = Nomina.objects.filter(id=options['nomina'])
+        else:
+            nominas = Nomina.objects.filter(estado=Nomina.Estado.PENDIENTE)
+        if options['tenant']:
+            nominas = nominas.filter(tenant_id=options['tenant'])
+
+        correctas = 0
+        con_diferencias = 0
+        for nomina in nominas.select_related('tenant').order_by('id').iterator():
+            diferencias = verificar_nomina(nomina, reparar=options['reparar'])
+            if diferencias:
+                con_diferencias += 1
+                accion = 'reconstruida' if options['reparar'] else 'use --reparar para reconstruirla'
+                self.stdout.write(self.style.WARNING(
+                    f"⚠️  {nomina.tenant.nombre_taller} - Nómina {nomina.get_periodo()} (#{nomina.id}): "
+                    f"{diferencias} valores con diferencias ({accion})"
+                ))
+            else:
+                correctas += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n{correctas} nóminas sin diferencias, {con_diferencias} con diferencias"
+        ))
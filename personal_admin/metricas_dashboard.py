@@ -0,0 +1,292 @@
+"""
+Métricas precalculadas del dashboard de administrador.
+
+Cada registro de Pago, OrdenTrabajo, DetalleOrdenTrabajo y Cita "aporta" a
+ciertas métricas (ej. un pago completado suma su monto a los ingresos de su
+día, de su mes y al total). Al guardar o eliminar un registro las señales
+calculan su aporte anterior y el nuevo y suman solo la diferencia con un
+UPDATE ... SET valor = valor + delta, dentro de la misma transacción que el
+cambio. Las escrituras que no disparan señales (update(), bulk_create) se
+corrigen con recalcular_metricas(), que el comando
+reconciliar_metricas_dashboard ejecuta cada noche.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models_dashboard import FECHA_TOTAL, MetricaDashboard
+from .models_saas import Tenant
+from .cache_dashboard import invalidar_dashboard
+
+DIA = MetricaDashboard.Periodo.DIA
+MES = MetricaDashboard.Periodo.MES
+TOTAL = MetricaDashboard.Periodo.TOTAL
+
+# Marca que indica que las métricas del tenant ya se calcularon completas
+CLAVE_CALCULADO = '_calculado'
+
+CENTAVOS = Decimal('0.01')
+
+ESTADOS_CITA_PENDIENTE = ('pendiente', 'confirmada')
+# Órdenes cuyos items cuentan como "servicios más usados"
+ESTADOS_ORDEN_SERVICIO = ('finalizada', 'entregada')
+
+
+# ===== Aportes de cada registro =====
+
+def aporte_pago(pago):
+    if pago.estado != 'completado' or not pago.fecha_pago:
+        return {}
+    dia = timezone.localtime(pago.fecha_pago).date()
+    monto = Decimal(pago.monto).quantize(CENTAVOS)
+    return {
+        ('ingresos', DIA, dia): monto,
+        ('ingresos', MES, dia.replace(day=1)): monto,
+        ('ingresos', TOTAL, FECHA_TOTAL): monto,
+    }
+
+
+def aporte_cita(cita):
+    if cita.estado not in ESTADOS_CITA_PENDIENTE:
+        return {}
+    return {('citas_pendientes', TOTAL, FECHA_TOTAL): 1}
+
+
+def aporte_orden(estado):
+    return {
+        ('ordenes', TOTAL, FECHA_TOTAL): 1,
+        (f'ordenes_estado:{estado}', TOTAL, FECHA_TOTAL): 1,
+    }
+
+
+def aporte_detalle(item_id, estado_orden):
+    if not item_id or estado_orden not in ESTADOS_ORDEN_SERVICIO:
+        return {}
+    return {(f'servicio:{item_id}', TOTAL, FECHA_TOTAL): 1}
+
+
+def servicios_de_orden(orden_id):
+    """
+    Aporte a "servicios más usados" de los detalles de una orden terminada
+    """
+    from operaciones_inventario.modelsOrdenTrabajo import DetalleOrdenTrabajo
+
+    filas = (
+        DetalleOrdenTrabajo.objects.filter(orden_trabajo_id=orden_id, item__isnull=False)
+        .order_by()
+        .values('item')
+        .annotate(cantidad=Count('id'))
+    )
+    return {(f"servicio:{fila['item']}", TOTAL, FECHA_TOTAL): fila['cantidad'] for fila in filas}
+
+
+# ===== Escritura incremental =====
+
+def aplicar_diferencia(tenant_id, anterior, nuevo):
+    """
+    Suma a las métricas del tenant la diferencia entre dos aportes
+    """
+    if tenant_id is None:
+        return
+    for clave in set(anterior) | set(nuevo):
+        delta = nuevo.get(clave, 0) - anterior.get(clave, 0)
+        if delta:
+            _sumar(tenant_id, clave, delta)
+
+
+def _sumar(tenant_id, clave, delta):
+    nombre, periodo, fecha = clave
+    filtro = MetricaDashboard.objects.filter(tenant_id=tenant_id, clave=nombre, periodo=periodo, fecha=fecha)
+    if filtro.update(valor=F('valor') + delta, actualizado=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            MetricaDashboard.objects.create(
+                tenant_id=tenant_id, clave=nombre, periodo=periodo, fecha=fecha, valor=delta
+            )
+    except IntegrityError:
+        # Otro proceso creó la fila al mismo tiempo
+        filtro.update(valor=F('valor') + delta, actualizado=timezone.now())
+
+
+def invalidar_metricas(tenant_id):
+    """
+    Marca las métricas del tenant para recalcularlas en la próxima lectura
+    (ej. tras una restauración, que inserta con bulk_create sin señales)
+    """
+    MetricaDashboard.objects.filter(tenant_id=tenant_id, clave=CLAVE_CALCULADO).delete()
+    invalidar_dashboard(tenant_id)
+
+
+# ===== Recalculo completo =====
+
+def calcular_desde_origen(tenant_id):
+    """
+    Calcula todas las métricas del tenant leyendo las tablas de origen
+
+    Returns:
+        Dict {(clave, periodo, fecha): valor}
+    """
+    from finanzas_facturacion.models import Pago
+    from operaciones_inventario.modelsOrdenTrabajo import OrdenTrabajo, DetalleOrdenTrabajo
+    from clientes_servicios.models import Cita
+
+    metricas = defaultdict(Decimal)
+
+    ingresos_por_dia = (
+        Pago.objects.filter(tenant_id=tenant_id, estado='completado')
+        .annotate(dia=TruncDate('fecha_pago'))
+        .order_by()
+        .values('dia')
+        .annotate(total=Sum('monto'))
+    )
+    for fila in ingresos_por_dia:
+        if fila['dia'] is None or not fila['total']:
+            continue
+        total = Decimal(fila['total']).quantize(CENTAVOS)
+        metricas[('ingresos', DIA, fila['dia'])] += total
+        metricas[('ingresos', MES, fila['dia'].replace(day=1))] += total
+        metricas[('ingresos', TOTAL, FECHA_TOTAL)] += total
+
+    ordenes_por_estado = (
+        OrdenTrabajo.objects.filter(tenant_id=tenant_id)
+        .order_by()
+        .values('estado')
+        .annotate(cantidad=Count('id'))
+    )
+    for fila in ordenes_por_estado:
+        metricas[('ordenes', TOTAL, FECHA_TOTAL)] += fila['cantidad']
+        metricas[(f"ordenes_estado:{fila['estado']}", TOTAL, FECHA_TOTAL)] += fila['cantidad']
+
+    servicios = (
+        DetalleOrdenTrabajo.objects.filter(
+            tenant_id=tenant_id,
+            item__isnull=False,
+            orden_trabajo__estado__in=ESTADOS_ORDEN_SERVICIO,
+        )
+        .order_by()
+        .values('item')
+        .annotate(cantidad=Count('id'))
+    )
+    for fila in servicios:
+        metricas[(f"servicio:{fila['item']}", TOTAL, FECHA_TOTAL)] += fila['cantidad']
+
+    citas_pendientes = Cita.objects.filter(tenant_id=tenant_id, estado__in=ESTADOS_CITA_PENDIENTE).count()
+    if citas_pendientes:
+        metricas[('citas_pendientes', TOTAL, FECHA_TOTAL)] += citas_pendientes
+
+    metricas[(CLAVE_CALCULADO, TOTAL, FECHA_TOTAL)] = Decimal(1)
+    return dict(metricas)
+
+
+def recalcular_metricas(tenant_id):
+    """
+    Reemplaza las métricas del tenant por las calculadas desde el origen
+
+    Bloquea la fila del tenant y las métricas guardadas antes de leer el
+    origen: dos recálculos (ej. dos primeras lecturas) se ejecutan uno
+    detrás de otro, y los deltas de _sumar() de otras transacciones quedan
+    antes del cálculo (ya incluidos) o esperan a que termine (se suman a
+    las métricas nuevas).
+
+    Returns:
+        Cantidad de métricas que no coincidían con las guardadas
+    """
+    with transaction.atomic():
+        Tenant.objects.select_for_update().filter(pk=tenant_id).exists()
+        guardadas = {
+            (fila.clave, fila.periodo, fila.fecha): fila.valor
+            for fila in MetricaDashboard.objects.select_for_update().filter(tenant_id=tenant_id)
+        }
+        nuevas = calcular_desde_origen(tenant_id)
+        diferencias = sum(
+            1 for clave in set(nuevas) | set(guardadas)
+            if clave[0] != CLAVE_CALCULADO and nuevas.get(clave, 0) != guardadas.get(clave, 0)
+        )
+        if diferencias or CLAVE_CALCULADO not in {clave[0] for clave in guardadas}:
+            MetricaDashboard.objects.filter(tenant_id=tenant_id).delete()
+            MetricaDashboard.objects.bulk_create([
+                MetricaDashboard(tenant_id=tenant_id, clave=clave, periodo=periodo, fecha=fecha, valor=valor)
+                for (clave, periodo, fecha), valor in nuevas.items()
+                if valor
+            ])
+    if diferencias:
+        invalidar_dashboard(tenant_id)
+    return diferencias
+
+
+# ===== Lectura =====
+
+def _inicio_meses_atras(hoy, meses):
+    mes = hoy.month - meses
+    año = hoy.year
+    while mes <= 0:
+        mes += 12
+        año -= 1
+    return date(año, mes, 1)
+
+
+def leer_metricas(tenant, meses=6):
+    """
+    Métricas del dashboard del tenant en dos consultas a la tabla de métricas
+
+    Returns:
+        Dict con ingresos_totales, ingresos_mes_actual, ingresos_mensuales
+        (últimos `meses` meses, incluido el actual), ordenes_por_estado,
+        total_ordenes, citas_pendientes y servicios_mas_usados
+        (lista de (item_id, veces_usado), los 5 más usados)
+    """
+    hoy = timezone.localdate()
+    inicio = _inicio_meses_atras(hoy, meses - 1)
+    consulta = MetricaDashboard.objects.filter(tenant=tenant).filter(
+        (Q(periodo=TOTAL) & ~Q(clave__startswith='servicio:'))
+        | Q(clave='ingresos', periodo=MES, fecha__gte=inicio)
+    ).values_list('clave', 'periodo', 'fecha', 'valor')
+
+    filas = list(consulta)
+    if not any(clave == CLAVE_CALCULADO for clave, _, _, _ in filas):
+        # Primera lectura (o tras invalidar_metricas): calcular completo
+        recalcular_metricas(tenant.id)
+        filas = list(consulta.all())
+
+    totales = {}
+    ingresos_por_mes = {}
+    for clave, periodo, fecha, valor in filas:
+        if periodo == MES:
+            ingresos_por_mes[fecha] = valor
+        else:
+            totales[clave] = valor
+
+    ingresos_mensuales = []
+    mes = inicio
+    for _ in range(meses):
+        ingresos_mensuales.append({
+            'mes': mes.strftime('%Y-%m'),
+            'total': float(ingresos_por_mes.get(mes, 0)),
+        })
+        mes = date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+    servicios = (
+        MetricaDashboard.objects.filter(tenant=tenant, periodo=TOTAL, clave__startswith='servicio:', valor__gt=0)
+        .order_by('-valor', 'clave')
+        .values_list('clave', 'valor')[:5]
+    )
+
+    return {
+        'ingresos_totales': totales.get('ingresos', Decimal('0.00')),
+        'ingresos_mes_actual': ingresos_por_mes.get(hoy.replace(day=1), Decimal('0.00')),
+        'ingresos_mensuales': ingresos_mensuales,
+        'ordenes_por_estado': {
+            clave.split(':', 1)[1]: int(valor)
+            for clave, valor in totales.items()
+            if clave.startswith('ordenes_estado:') and valor > 0
+        },
+        'total_ordenes': int(totales.get('ordenes', 0)),
+        'citas_pendientes': int(totales.get('citas_pendientes', 0)),
+        'servicios_mas_usados': [(int(clave.split(':', 1)[1]), int(valor)) for clave, valor in servicios],
+    }
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personal_admin', '0018_merge_20251125_0503'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenant',
+            name='retencion_reportes_dias',
+            field=models.PositiveIntegerField(blank=True, help_text='Días que se conservan los reportes generados (vacío: según el plan, REPORTES_RETENCION_DIAS)', null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:31
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personal_admin', '0019_tenant_retencion_reportes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricaDashboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=60)),
+                ('periodo', models.CharField(choices=[('DIA', 'Día'), ('MES', 'Mes'), ('TOTAL', 'Total')], max_length=5)),
+                ('fecha', models.DateField(default=datetime.date(2000, 1, 1))),
+                ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metricas_dashboard', to='personal_admin.tenant')),
+            ],
+            options={
+                'verbose_name': 'Métrica de Dashboard',
+                'verbose_name_plural': 'Métricas de Dashboard',
+                'db_table': 'metrica_dashboard',
+                'unique_together': {('tenant', 'clave', 'periodo', 'fecha')},
+            },
+        ),
+    ]
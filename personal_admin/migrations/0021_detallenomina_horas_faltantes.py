@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:41
+
+from django.db import migrations, models
+
+
+def rellenar_horas_faltantes(apps, schema_editor):
+    """
+    Las nóminas pendientes pasan a actualizarse de forma incremental desde la
+    asistencia: sus detalles necesitan las horas faltantes ya sumadas
+    """
+    Nomina = apps.get_model('personal_admin', 'Nomina')
+    DetalleNomina = apps.get_model('personal_admin', 'DetalleNomina')
+    Asistencia = apps.get_model('personal_admin', 'Asistencia')
+
+    for nomina in Nomina.objects.filter(estado='Pendiente').iterator():
+        faltantes = dict(
+            Asistencia.objects.filter(
+                tenant_id=nomina.tenant_id,
+                fecha__gte=nomina.fecha_inicio,
+                fecha__lte=nomina.fecha_corte,
+            )
+            .order_by()
+            .values('empleado')
+            .annotate(total=models.Sum('horas_faltantes'))
+            .values_list('empleado', 'total')
+        )
+        detalles = list(DetalleNomina.objects.filter(nomina=nomina, empleado_id__in=faltantes))
+        for detalle in detalles:
+            detalle.horas_faltantes = faltantes[detalle.empleado_id] or 0
+        DetalleNomina.objects.bulk_update(detalles, ['horas_faltantes'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personal_admin', '0020_metrica_dashboard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detallenomina',
+            name='horas_faltantes',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=6, verbose_name='Horas Faltantes'),
+        ),
+        migrations.RunPython(rellenar_horas_faltantes, migrations.RunPython.noop),
+    ]
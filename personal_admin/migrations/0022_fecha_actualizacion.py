@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personal_admin', '0021_detallenomina_horas_faltantes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detallenomina',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='nomina',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from .models import Empleado
 from .models_saas import Tenant
 
@@ -19,6 +20,7 @@ class Nomina(models.Model):
     fecha_inicio = models.DateField(verbose_name="Fecha de Inicio")
     fecha_corte = models.DateField(verbose_name="Fecha de Corte")
     fecha_registro = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     estado = models.CharField(
         max_length=20, 
         choices=Estado.choices, 
@@ -62,6 +64,71 @@ class Nomina(models.Model):
         self.total_nomina = total
         return total
     
+    @classmethod
+    def recalcular_totales_en_lote(cls, nomina_ids):
+        """
+        Recalcula total_nomina de varias nóminas con una sola consulta
+        agregada (GROUP BY nómina) y un bulk_update.
+        """
+        nomina_ids = set(nomina_ids)
+        if not nomina_ids:
+            return 0
+        totales = dict(
+            DetalleNomina.objects.filter(nomina__in=nomina_ids)
+            .order_by()
+            .values('nomina')
+            .annotate(total=models.Sum('sueldo_neto'))
+            .values_list('nomina', 'total')
+        )
+        nominas = list(cls.objects.filter(id__in=nomina_ids).only('id'))
+        # bulk_update no aplica auto_now: se asigna para los backups incrementales
+        ahora = timezone.now()
+        for nomina in nominas:
+            nomina.total_nomina = totales.get(nomina.id) or 0.00
+            nomina.fecha_actualizacion = ahora
+        cls.objects.bulk_update(nominas, ['total_nomina', 'fecha_actualizacion'], batch_size=500)
+        return len(nominas)
+
+    def calcular_detalles_en_lote(self, empleado_ids=()):
+        """
+        Recalcula todos los detalles de la nómina y crea los de los empleados
+        de `empleado_ids` que aún no tengan uno, sin pasar por DetalleNomina.save():
+        las horas de asistencia se agregan en una sola consulta
+        (ver DetalleNomina.calcular_campos_en_lote), los detalles se escriben
+        con bulk_create/bulk_update y total_nomina se actualiza una vez.
+
+        Returns:
+            Tupla (detalles creados, detalles actualizados)
+        """
+        with transaction.atomic():
+            # Bloquear la nómina para que dos cálculos simultáneos no dupliquen detalles
+            Nomina.objects.select_for_update().filter(pk=self.pk).exists()
+
+            existentes = list(DetalleNomina.objects.filter(nomina=self))
+            con_detalle = {detalle.empleado_id for detalle in existentes}
+            nuevos = [
+                DetalleNomina(nomina=self, empleado_id=empleado_id, tenant_id=self.tenant_id)
+                for empleado_id in dict.fromkeys(empleado_ids)
+                if empleado_id not in con_detalle
+            ]
+
+            DetalleNomina.calcular_campos_en_lote(existentes + nuevos)
+            DetalleNomina.objects.bulk_create(nuevos, batch_size=500)
+            # bulk_update y update() no aplican auto_now
+            ahora = timezone.now()
+            for detalle in existentes:
+                detalle.fecha_actualizacion = ahora
+            DetalleNomina.objects.bulk_update(
+                existentes,
+                ['sueldo', 'horas_extras', 'horas_faltantes', 'total_bruto', 'total_descuento', 'sueldo_neto',
+                 'fecha_actualizacion'],
+                batch_size=500
+            )
+
+            self.calcular_total_nomina()
+            Nomina.objects.filter(pk=self.pk).update(total_nomina=self.total_nomina, fecha_actualizacion=ahora)
+        return len(nuevos), len(existentes)
+
     def get_periodo(self):
         """
         Retorna el periodo formateado de la nómina.
@@ -81,7 +148,7 @@ class Nomina(models.Model):
         self.calcular_total_nomina()
         if kwargs.get('update_fields') is None:
             # Evitar recursión infinita
-            super().save(update_fields=['total_nomina'])
+            super().save(update_fields=['total_nomina', 'fecha_actualizacion'])
     
     def __str__(self):
         return f"Nómina {self.mes}/{self.fecha_inicio.year} - {self.estado}"
@@ -117,6 +184,12 @@ class DetalleNomina(models.Model):
         default=0.00,
         verbose_name="Horas Extras"
     )
+    horas_faltantes = models.DecimalField(
+        max_digits=6, 
+        decimal_places=2, 
+        default=0.00,
+        verbose_name="Horas Faltantes"
+    )
     total_bruto = models.DecimalField(
         max_digits=10, 
         decimal_places=2,
@@ -135,6 +208,7 @@ class DetalleNomina(models.Model):
         default=0.00,
         verbose_name="Sueldo Neto"
     )
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = "detalle_nomina"
@@ -210,6 +284,8 @@ class DetalleNomina(models.Model):
             total=models.Sum('horas_faltantes')
         )['total'] or Decimal('0.00')
         
+        self.horas_faltantes = total_horas_faltantes
+        
         # Calcular descuento por horas faltantes
         # Asumiendo jornada de 8 horas/día y 30 días/mes = 240 horas/mes
         horas_mes = Decimal('240.00')
@@ -229,6 +305,23 @@ class DetalleNomina(models.Model):
         self.sueldo_neto = self.total_bruto - self.total_descuento
         return self.sueldo_neto
     
+    @staticmethod
+    def calcular_importes(sueldo, horas_extras, horas_faltantes):
+        """
+        Mismo cálculo que calcular_sueldo_bruto() y calcular_descuentos()
+        a partir de las horas ya sumadas.
+        
+        Returns:
+            Tupla (total_bruto, total_descuento, sueldo_neto)
+        """
+        from decimal import Decimal
+        
+        valor_hora_normal = sueldo / Decimal('240.00')
+        valor_hora_extra = valor_hora_normal * Decimal('1.5')
+        total_bruto = sueldo + horas_extras * valor_hora_extra
+        total_descuento = horas_faltantes * valor_hora_normal
+        return total_bruto, total_descuento, total_bruto - total_descuento
+    
     def calcular_todos_los_campos(self):
         """
         Método auxiliar para calcular todos los campos de una vez.
@@ -236,7 +329,61 @@ class DetalleNomina(models.Model):
         self.calcular_sueldo_bruto()
         self.calcular_descuentos()
         self.calcular_sueldo_neto()
-    
+
+    @classmethod
+    def calcular_campos_en_lote(cls, detalles):
+        """
+        Equivalente por lotes a calcular_todos_los_campos() para varios
+        detalles (guardados o no): los empleados se cargan en una consulta y las horas de
+        asistencia se agregan con una consulta por nómina (GROUP BY empleado),
+        en lugar de dos agregados por detalle.
+        """
+        from decimal import Decimal
+        from .models import Asistencia
+
+        detalles = list(detalles)
+        if not detalles:
+            return detalles
+
+        empleados = Empleado.objects.select_related('cargo').in_bulk(
+            {d.empleado_id for d in detalles}
+        )
+        nominas = Nomina.objects.in_bulk({d.nomina_id for d in detalles})
+
+        # Agrupar por (nómina, tenant) para una sola consulta de asistencias por grupo
+        grupos = {}
+        for detalle in detalles:
+            grupos.setdefault((detalle.nomina_id, detalle.tenant_id), []).append(detalle)
+
+        for (nomina_id, tenant_id), grupo in grupos.items():
+            nomina = nominas[nomina_id]
+            horas = {
+                fila['empleado']: fila
+                for fila in Asistencia.objects.filter(
+                    empleado__in={d.empleado_id for d in grupo},
+                    fecha__gte=nomina.fecha_inicio,
+                    fecha__lte=nomina.fecha_corte,
+                    tenant_id=tenant_id
+                ).order_by().values('empleado').annotate(
+                    extras=models.Sum('horas_extras'),
+                    faltantes=models.Sum('horas_faltantes')
+                )
+            }
+            for detalle in grupo:
+                empleado = empleados[detalle.empleado_id]
+                sueldo_base = empleado.sueldo
+                if not sueldo_base and empleado.cargo:
+                    sueldo_base = empleado.cargo.sueldo
+                fila = horas.get(detalle.empleado_id, {})
+
+                detalle.sueldo = sueldo_base
+                detalle.horas_extras = fila.get('extras') or Decimal('0.00')
+                detalle.horas_faltantes = fila.get('faltantes') or Decimal('0.00')
+                detalle.total_bruto, detalle.total_descuento, detalle.sueldo_neto = cls.calcular_importes(
+                    sueldo_base, detalle.horas_extras, detalle.horas_faltantes
+                )
+        return detalles
+
     def save(self, *args, **kwargs):
         """
         Sobrescribe save para calcular automáticamente los campos
@@ -249,7 +396,7 @@ class DetalleNomina(models.Model):
         
         # Actualizar el total de la nómina padre
         self.nomina.calcular_total_nomina()
-        self.nomina.save(update_fields=['total_nomina'])
+        self.nomina.save(update_fields=['total_nomina', 'fecha_actualizacion'])
     
     def __str__(self):
         return f"{self.empleado} - Nómina {self.nomina.mes}/{self.nomina.fecha_inicio.year}"
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from operaciones_inventario.modelsArea import Area
 from .models_saas import Tenant
@@ -161,10 +161,25 @@ class Asistencia(models.Model):
             self.estado = self.Estado.INCOMPLETO
     
     def save(self, *args, **kwargs):
+        from .nomina_asistencia import aplicar_cambio_asistencia, horas_de, horas_guardadas
+
         # Calcular horas antes de guardar
         if self.hora_salida:
             self.calcular_horas()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            anterior = horas_guardadas(self.pk) if self.pk else None
+            super().save(*args, **kwargs)
+            # Llevar la diferencia de horas a las nóminas abiertas
+            aplicar_cambio_asistencia(anterior, horas_de(self))
+    
+    def delete(self, *args, **kwargs):
+        from .nomina_asistencia import aplicar_cambio_asistencia, horas_guardadas
+
+        with transaction.atomic():
+            anterior = horas_guardadas(self.pk)
+            resultado = super().delete(*args, **kwargs)
+            aplicar_cambio_asistencia(anterior, None)
+        return resultado
     
     def __str__(self):
         return f"{self.empleado} - {self.fecha} ({self.estado})"
@@ -0,0 +1,42 @@
+from datetime import date
+
+from django.db import models
+
+from .models_saas import Tenant
+
+# Fecha fija de las métricas acumuladas (periodo TOTAL), que no tienen fecha
+FECHA_TOTAL = date(2000, 1, 1)
+
+
+class MetricaDashboard(models.Model):
+    """
+    Métricas precalculadas del dashboard por taller. Se mantienen con las
+    señales de personal_admin.signals (Pago, OrdenTrabajo, DetalleOrdenTrabajo
+    y Cita) y se reconcilian cada noche con reconciliar_metricas_dashboard.
+
+    Ejemplos de filas:
+    - ('ingresos', DIA, 2025-11-03): ingresos completados de ese día
+    - ('ingresos', MES, 2025-11-01): ingresos completados del mes
+    - ('ordenes_estado:pendiente', TOTAL): órdenes en ese estado
+    - ('servicio:15', TOTAL): veces que se usó el item 15 en órdenes terminadas
+    """
+    class Periodo(models.TextChoices):
+        DIA = 'DIA', 'Día'
+        MES = 'MES', 'Mes'
+        TOTAL = 'TOTAL', 'Total'
+
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='metricas_dashboard')
+    clave = models.CharField(max_length=60)
+    periodo = models.CharField(max_length=5, choices=Periodo.choices)
+    fecha = models.DateField(default=FECHA_TOTAL)
+    valor = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'metrica_dashboard'
+        verbose_name = 'Métrica de Dashboard'
+        verbose_name_plural = 'Métricas de Dashboard'
+        unique_together = ('tenant', 'clave', 'periodo', 'fecha')
+
+    def __str__(self):
+        return f"{self.tenant} - {self.clave} ({self.periodo} {self.fecha}): {self.valor}"
@@ -26,6 +26,10 @@ class Tenant(models.Model):
     fecha_fin_suscripcion = models.DateTimeField(null=True, blank=True) 
     stripe_customer_id = models.CharField(max_length=100, blank=True, null=True)
     stripe_subscription_id = models.CharField(max_length=100, blank=True, null=True)
+    retencion_reportes_dias = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text="Días que se conservan los reportes generados (vacío: según el plan, REPORTES_RETENCION_DIAS)"
+    )
     
     def __str__(self):
         return self.nombre_taller
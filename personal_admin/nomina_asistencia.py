@@ -0,0 +1,140 @@
+"""
+Actualización incremental de las nóminas abiertas a partir de la asistencia.
+
+Cada vez que se guarda o elimina una Asistencia (Asistencia.save/delete) se
+calcula cuántas horas extras y faltantes cambiaron y se suman al
+DetalleNomina del empleado en las nóminas pendientes cuyo periodo incluye
+la fecha. Los importes del detalle se vuelven a derivar de las horas
+acumuladas (sin arrastrar redondeos) y total_nomina recibe solo la
+diferencia del sueldo neto con un UPDATE ... SET total = total + delta.
+
+Lo que no pasa por save() (update(), bulk_create, cambios de sueldo del
+empleado) se corrige con verificar_nomina(), que el comando
+verificar_nominas ejecuta como red de seguridad.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .model_nomina import Nomina, DetalleNomina
+
+CENTAVOS = Decimal('0.01')
+
+CAMPOS_HORAS = ('horas_extras', 'horas_faltantes')
+CAMPOS_IMPORTES = ('total_bruto', 'total_descuento', 'sueldo_neto')
+
+
+def _redondear(valor):
+    # Mismo redondeo que aplica la base al guardar decimal_places=2
+    return Decimal(valor).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+
+
+def horas_guardadas(asistencia_id):
+    """
+    Empleado, fecha y horas con que la asistencia está guardada en la base
+    (None si no existe)
+    """
+    from .models import Asistencia
+
+    return (
+        Asistencia.objects.filter(pk=asistencia_id)
+        .values('empleado_id', 'tenant_id', 'fecha', *CAMPOS_HORAS)
+        .first()
+    )
+
+
+def horas_de(asistencia):
+    return {
+        'empleado_id': asistencia.empleado_id,
+        'tenant_id': asistencia.tenant_id,
+        'fecha': asistencia.fecha,
+        # calcular_horas() deja floats redondeados a 2 decimales
+        **{campo: _redondear(str(getattr(asistencia, campo) or 0)) for campo in CAMPOS_HORAS},
+    }
+
+
+def aplicar_cambio_asistencia(anterior, nueva):
+    """
+    Lleva a las nóminas abiertas la diferencia entre dos estados de una
+    asistencia (dicts de horas_guardadas/horas_de; None si no existía o
+    se eliminó)
+    """
+    cambios = {}
+    for horas, signo in ((anterior, -1), (nueva, 1)):
+        if not horas:
+            continue
+        clave = (horas['empleado_id'], horas['tenant_id'], horas['fecha'])
+        acumulado = cambios.setdefault(clave, [Decimal('0.00'), Decimal('0.00')])
+        for i, campo in enumerate(CAMPOS_HORAS):
+            acumulado[i] += signo * Decimal(horas[campo] or 0)
+
+    for (empleado_id, tenant_id, fecha), (delta_extras, delta_faltantes) in cambios.items():
+        if delta_extras or delta_faltantes:
+            _sumar_horas(empleado_id, tenant_id, fecha, delta_extras, delta_faltantes)
+
+
+def _sumar_horas(empleado_id, tenant_id, fecha, delta_extras, delta_faltantes):
+    with transaction.atomic():
+        # Solo se bloquea el detalle: total_nomina se actualiza con F() y
+        # asistencias de distintos empleados no se esperan entre sí
+        detalles = (
+            DetalleNomina.objects.select_for_update(of=('self',))
+            .filter(
+                empleado_id=empleado_id,
+                tenant_id=tenant_id,
+                nomina__estado=Nomina.Estado.PENDIENTE,
+                nomina__fecha_inicio__lte=fecha,
+                nomina__fecha_corte__gte=fecha,
+            )
+            .order_by('id')
+            .values('id', 'nomina_id', 'sueldo', 'sueldo_neto', *CAMPOS_HORAS)
+        )
+        for detalle in detalles:
+            horas_extras = detalle['horas_extras'] + delta_extras
+            horas_faltantes = detalle['horas_faltantes'] + delta_faltantes
+            importes = dict(zip(
+                CAMPOS_IMPORTES,
+                map(_redondear, DetalleNomina.calcular_importes(detalle['sueldo'], horas_extras, horas_faltantes))
+            ))
+            # update() no aplica auto_now: se asigna para los backups incrementales
+            ahora = timezone.now()
+            DetalleNomina.objects.filter(pk=detalle['id']).update(
+                horas_extras=horas_extras, horas_faltantes=horas_faltantes, fecha_actualizacion=ahora, **importes
+            )
+            delta_neto = importes['sueldo_neto'] - detalle['sueldo_neto']
+            if delta_neto:
+                Nomina.objects.filter(pk=detalle['nomina_id']).update(
+                    total_nomina=F('total_nomina') + delta_neto, fecha_actualizacion=ahora
+                )
+
+
+def verificar_nomina(nomina, reparar=False):
+    """
+    Compara los detalles y el total de la nómina con un cálculo completo
+    desde la asistencia; con reparar=True la reconstruye si hay diferencias
+
+    Returns:
+        Cantidad de valores que no coincidían
+    """
+    guardados = list(DetalleNomina.objects.filter(nomina=nomina))
+    esperados = DetalleNomina.calcular_campos_en_lote([
+        DetalleNomina(nomina_id=nomina.id, empleado_id=detalle.empleado_id, tenant_id=detalle.tenant_id)
+        for detalle in guardados
+    ])
+
+    campos = ('sueldo', *CAMPOS_HORAS, *CAMPOS_IMPORTES)
+    diferencias = sum(
+        1
+        for guardado, esperado in zip(guardados, esperados)
+        for campo in campos
+        if _redondear(getattr(guardado, campo)) != _redondear(getattr(esperado, campo))
+    )
+    total = sum((_redondear(detalle.sueldo_neto) for detalle in guardados), Decimal('0.00'))
+    if _redondear(nomina.total_nomina) != total:
+        diferencias += 1
+
+    if diferencias and reparar:
+        nomina.calcular_detalles_en_lote()
+    return diferencias
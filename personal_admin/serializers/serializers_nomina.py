@@ -9,7 +9,7 @@ class DetalleNominaMiniSerializer(serializers.ModelSerializer):
     class Meta:
         model = DetalleNomina
         fields = (
-            "id", "empleado", "sueldo", "horas_extras", 
+            "id", "empleado", "sueldo", "horas_extras", "horas_faltantes",
             "total_bruto", "total_descuento", "sueldo_neto"
         )
 
@@ -23,11 +23,11 @@ class DetalleNominaReadSerializer(serializers.ModelSerializer):
         model = DetalleNomina
         fields = (
             "id", "nomina", "empleado", "empleado_nombre_completo",
-            "sueldo", "horas_extras", "total_bruto", 
+            "sueldo", "horas_extras", "horas_faltantes", "total_bruto", 
             "total_descuento", "sueldo_neto"
         )
         read_only_fields = (
-            "horas_extras", "total_bruto", "total_descuento", "sueldo_neto"
+            "horas_extras", "horas_faltantes", "total_bruto", "total_descuento", "sueldo_neto"
         )
     
     def get_empleado_nombre_completo(self, obj):
@@ -194,20 +194,14 @@ class NominaWriteSerializer(serializers.ModelSerializer):
             # Crear la nómina
             nomina = Nomina.objects.create(**validated_data)
             
-            # Generar detalles automáticamente para empleados activos
+            # Generar detalles automáticamente para empleados activos (en lote)
             if generar_detalles:
                 empleados_activos = Empleado.objects.filter(
                     estado=True,
                     tenant=tenant
-                )
+                ).values_list('id', flat=True)
                 
-                for empleado in empleados_activos:
-                    DetalleNomina.objects.create(
-                        nomina=nomina,
-                        empleado=empleado,
-                        tenant=tenant,
-                        sueldo=empleado.sueldo
-                    )
+                nomina.calcular_detalles_en_lote(empleados_activos)
         
         return nomina
     
@@ -216,6 +210,8 @@ class NominaWriteSerializer(serializers.ModelSerializer):
         # Remover generar_detalles si existe (no se usa en updates)
         validated_data.pop("generar_detalles", None)
         
+        periodo_anterior = (instance.fecha_inicio, instance.fecha_corte)
+        
         # Actualizar campos
         instance.mes = validated_data.get('mes', instance.mes)
         instance.fecha_inicio = validated_data.get('fecha_inicio', instance.fecha_inicio)
@@ -223,6 +219,10 @@ class NominaWriteSerializer(serializers.ModelSerializer):
         instance.estado = validated_data.get('estado', instance.estado)
         instance.save()
         
+        # Las horas acumuladas en los detalles dependen del periodo
+        if (instance.fecha_inicio, instance.fecha_corte) != periodo_anterior:
+            instance.calcular_detalles_en_lote()
+        
         return instance
 
 
@@ -0,0 +1,227 @@
+"""
+Señales que mantienen las métricas precalculadas del dashboard
+(ver personal_admin.metricas_dashboard) e invalidan las respuestas
+cacheadas de los dashboards (ver personal_admin.cache_dashboard)
+
+En pre_save se lee el aporte que el registro tenía en la base y en
+post_save se aplica la diferencia con el aporte nuevo; en post_delete se
+resta el aporte completo.
+
+senales_suspendidas() desactiva estos receivers (y los de la caché de
+reportes en servicios_IA.signals) en el hilo actual durante borrados e
+inserciones masivas que luego invalidan todo de una vez, como la
+restauración de backups. Dentro de ese bloque borrar_sin_senales() borra
+como si los modelos no tuvieran receivers (un solo DELETE por tabla).
+"""
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.db.models.deletion import Collector
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from finanzas_facturacion.models import Pago
+from clientes_servicios.models import Cita, Cliente
+from operaciones_inventario.modelsOrdenTrabajo import OrdenTrabajo, DetalleOrdenTrabajo, AsignacionTecnico
+from operaciones_inventario.modelsItem import Item
+from operaciones_inventario.modelsVehiculos import Vehiculo
+
+from .models import Empleado
+from .cache_dashboard import invalidar_dashboard
+from .metricas_dashboard import (
+    ESTADOS_ORDEN_SERVICIO,
+    aplicar_diferencia,
+    aporte_cita,
+    aporte_detalle,
+    aporte_orden,
+    aporte_pago,
+    servicios_de_orden,
+)
+
+APORTES = {
+    Pago: aporte_pago,
+    Cita: aporte_cita,
+}
+
+# Nivel de senales_suspendidas() activo en el hilo
+_suspension = threading.local()
+
+
+@contextmanager
+def senales_suspendidas():
+    """
+    Omite en el hilo actual los receivers que mantienen datos derivados
+    (métricas y caché de dashboards, versiones de la caché de reportes).
+    Quien lo usa debe invalidar esos datos al terminar (invalidar_metricas,
+    invalidar_tenant). Los bloques anidados se suman al exterior.
+    """
+    _suspension.nivel = getattr(_suspension, 'nivel', 0) + 1
+    try:
+        yield
+    finally:
+        _suspension.nivel -= 1
+
+
+def senales_activas():
+    return not getattr(_suspension, 'nivel', 0)
+
+
+class _CollectorSinSenales(Collector):
+    # Con receivers de borrado Django carga y borra fila por fila cada
+    # tabla; sin ellos vuelve a borrar por consulta donde no hay cascadas
+    def _has_signal_listeners(self, model):
+        return False
+
+
+def borrar_sin_senales(queryset):
+    """
+    queryset.delete() sin cargar las filas para los receivers de borrado.
+    Solo dentro de senales_suspendidas(): las señales que sí se envían
+    (modelos con cascadas) las ignoran los receivers suspendidos, pero
+    cualquier otro receiver de post_delete no se entera del borrado.
+    """
+    collector = _CollectorSinSenales(using=queryset.db, origin=queryset)
+    collector.collect(queryset)
+    return collector.delete()
+
+
+def _omitir_si_suspendidas(funcion):
+    @wraps(funcion)
+    def envoltura(*args, **kwargs):
+        if senales_activas():
+            return funcion(*args, **kwargs)
+    return envoltura
+
+
+# ===== Pago y Cita: el aporte depende solo del propio registro =====
+
+@receiver(pre_save, sender=Pago, dispatch_uid='metricas_pago_pre_save')
+@receiver(pre_save, sender=Cita, dispatch_uid='metricas_cita_pre_save')
+@_omitir_si_suspendidas
+def _guardar_aporte_previo(sender, instance, raw=False, **kwargs):
+    anterior = sender.objects.filter(pk=instance.pk).first() if instance.pk and not raw else None
+    instance._aporte_metricas = APORTES[sender](anterior) if anterior else {}
+
+
+@receiver(post_save, sender=Pago, dispatch_uid='metricas_pago_post_save')
+@receiver(post_save, sender=Cita, dispatch_uid='metricas_cita_post_save')
+@_omitir_si_suspendidas
+def _aplicar_aporte(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = getattr(instance, '_aporte_metricas', {})
+    instance._aporte_metricas = APORTES[sender](instance)
+    aplicar_diferencia(instance.tenant_id, anterior, instance._aporte_metricas)
+
+
+@receiver(post_delete, sender=Pago, dispatch_uid='metricas_pago_post_delete')
+@receiver(post_delete, sender=Cita, dispatch_uid='metricas_cita_post_delete')
+@_omitir_si_suspendidas
+def _quitar_aporte(sender, instance, **kwargs):
+    aplicar_diferencia(instance.tenant_id, APORTES[sender](instance), {})
+
+
+# ===== OrdenTrabajo: cuenta por estado y habilita sus servicios =====
+
+@receiver(pre_save, sender=OrdenTrabajo, dispatch_uid='metricas_orden_pre_save')
+@_omitir_si_suspendidas
+def _guardar_estado_orden(sender, instance, raw=False, update_fields=None, **kwargs):
+    # recalcular_totales() guarda solo importes: no cambia ninguna métrica
+    if raw or (update_fields is not None and 'estado' not in update_fields):
+        instance._estado_metricas = False
+        return
+    instance._estado_metricas = None
+    if instance.pk:
+        instance._estado_metricas = (
+            sender.objects.filter(pk=instance.pk).values_list('estado', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=OrdenTrabajo, dispatch_uid='metricas_orden_post_save')
+@_omitir_si_suspendidas
+def _aplicar_estado_orden(sender, instance, created=False, **kwargs):
+    estado_anterior = getattr(instance, '_estado_metricas', False)
+    if estado_anterior is False or estado_anterior == instance.estado:
+        return
+    anterior = aporte_orden(estado_anterior) if estado_anterior is not None else {}
+    aplicar_diferencia(instance.tenant_id, anterior, aporte_orden(instance.estado))
+
+    # Al entrar o salir de finalizada/entregada sus items suman o dejan de sumar
+    contaba = estado_anterior in ESTADOS_ORDEN_SERVICIO
+    cuenta = instance.estado in ESTADOS_ORDEN_SERVICIO
+    if contaba != cuenta and not created:
+        servicios = servicios_de_orden(instance.pk)
+        if cuenta:
+            aplicar_diferencia(instance.tenant_id, {}, servicios)
+        else:
+            aplicar_diferencia(instance.tenant_id, servicios, {})
+    instance._estado_metricas = instance.estado
+
+
+@receiver(post_delete, sender=OrdenTrabajo, dispatch_uid='metricas_orden_post_delete')
+@_omitir_si_suspendidas
+def _quitar_orden(sender, instance, **kwargs):
+    # Sus detalles se eliminan antes en cascada y restan sus propios servicios
+    aplicar_diferencia(instance.tenant_id, aporte_orden(instance.estado), {})
+
+
+# ===== DetalleOrdenTrabajo: un uso del item si la orden está terminada =====
+
+def _estado_orden(orden_id):
+    return OrdenTrabajo.objects.filter(pk=orden_id).values_list('estado', flat=True).first()
+
+
+@receiver(pre_save, sender=DetalleOrdenTrabajo, dispatch_uid='metricas_detalle_pre_save')
+@_omitir_si_suspendidas
+def _guardar_aporte_detalle(sender, instance, raw=False, **kwargs):
+    instance._aporte_metricas = {}
+    if instance.pk and not raw:
+        anterior = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list('item_id', 'orden_trabajo__estado')
+            .first()
+        )
+        if anterior:
+            instance._aporte_metricas = aporte_detalle(*anterior)
+
+
+@receiver(post_save, sender=DetalleOrdenTrabajo, dispatch_uid='metricas_detalle_post_save')
+@_omitir_si_suspendidas
+def _aplicar_aporte_detalle(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = getattr(instance, '_aporte_metricas', {})
+    nuevo = aporte_detalle(instance.item_id, _estado_orden(instance.orden_trabajo_id)) if instance.item_id else {}
+    instance._aporte_metricas = nuevo
+    aplicar_diferencia(instance.tenant_id, anterior, nuevo)
+
+
+@receiver(post_delete, sender=DetalleOrdenTrabajo, dispatch_uid='metricas_detalle_post_delete')
+@_omitir_si_suspendidas
+def _quitar_aporte_detalle(sender, instance, **kwargs):
+    if instance.item_id:
+        aplicar_diferencia(
+            instance.tenant_id, aporte_detalle(instance.item_id, _estado_orden(instance.orden_trabajo_id)), {}
+        )
+
+
+# ===== Caché de los dashboards =====
+
+# Modelos cuyos datos muestran DashboardAdminView o DashboardEmpleadoView
+MODELOS_DASHBOARD = (
+    Pago, Cita, OrdenTrabajo, DetalleOrdenTrabajo, AsignacionTecnico,
+    Cliente, Vehiculo, Empleado, Item,
+)
+
+
+@_omitir_si_suspendidas
+def _invalidar_dashboard(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidar_dashboard(getattr(instance, 'tenant_id', None))
+
+
+for _modelo in MODELOS_DASHBOARD:
+    _uid = f'cache_dashboard_{_modelo._meta.label}'
+    post_save.connect(_invalidar_dashboard, sender=_modelo, dispatch_uid=f'{_uid}_save')
+    post_delete.connect(_invalidar_dashboard, sender=_modelo, dispatch_uid=f'{_uid}_delete')
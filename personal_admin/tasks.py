@@ -0,0 +1,18 @@
+"""
+Tareas Celery del módulo de Personal y Administración.
+reconciliar_metricas_dashboard_programado y verificar_nominas_programado se
+pueden programar con Celery beat (equivalen a los comandos
+reconciliar_metricas_dashboard y verificar_nominas --reparar).
+"""
+from celery import shared_task
+from django.core.management import call_command
+
+
+@shared_task
+def reconciliar_metricas_dashboard_programado():
+    call_command('reconciliar_metricas_dashboard')
+
+
+@shared_task
+def verificar_nominas_programado():
+    call_command('verificar_nominas', reparar=True)
@@ -1,3 +1,234 @@
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
 from django.test import TestCase
+from django.utils import timezone
+
+from clientes_servicios.models import Cliente
+from finanzas_facturacion.models import Pago
+from operaciones_inventario.modelsItem import Item
+from operaciones_inventario.modelsOrdenTrabajo import OrdenTrabajo, DetalleOrdenTrabajo
+from operaciones_inventario.modelsVehiculos import Marca, Modelo, Vehiculo
+from .cache_dashboard import clave_admin, invalidar_dashboard
+from .metricas_dashboard import CLAVE_CALCULADO, calcular_desde_origen, recalcular_metricas
+from .model_nomina import Nomina
+from .models import Asistencia, Cargo, Empleado
+from .models_dashboard import MetricaDashboard
+from .models_saas import Tenant, UserProfile
+from .nomina_asistencia import verificar_nomina
+
+
+def _crear_tenant():
+    propietario = User.objects.create_user(username='propietario', password='x')
+    tenant = Tenant.objects.create(nombre_taller='Taller Test', propietario=propietario)
+    UserProfile.objects.create(usuario=propietario, tenant=tenant)
+    return tenant
+
+
+class NominaIncrementalTest(TestCase):
+    """Las nóminas pendientes siguen a la asistencia igual que un cálculo completo."""
+
+    def setUp(self):
+        self.tenant = _crear_tenant()
+        cargo = Cargo.objects.create(nombre='Mecánico', descripcion='', sueldo=Decimal('2400'), tenant=self.tenant)
+        # Sueldos y horas en medias horas: importes exactos también en SQLite
+        self.empleados = [
+            Empleado.objects.create(
+                cargo=cargo, tenant=self.tenant, nombre=f'E{i}', apellido='A', ci=f'CI{i}', sueldo=sueldo
+            )
+            for i, sueldo in enumerate([Decimal('2400'), Decimal('4800')])
+        ]
+        self.septiembre = self._crear_nomina(9, date(2026, 9, 1), date(2026, 9, 30))
+        self.octubre = self._crear_nomina(10, date(2026, 10, 1), date(2026, 10, 31))
+
+    def _crear_nomina(self, mes, inicio, corte):
+        nomina = Nomina.objects.create(tenant=self.tenant, mes=mes, fecha_inicio=inicio, fecha_corte=corte)
+        nomina.calcular_detalles_en_lote(empleado_ids=[empleado.id for empleado in self.empleados])
+        return nomina
+
+    def _asistencia(self, empleado, fecha, salida=time(17, 30)):
+        asistencia = Asistencia(
+            empleado=empleado, tenant=self.tenant, fecha=fecha, hora_entrada=time(8, 0), hora_salida=salida
+        )
+        asistencia.save()
+        return asistencia
+
+    def assertNominasAlDia(self):
+        for nomina in Nomina.objects.filter(estado=Nomina.Estado.PENDIENTE):
+            self.assertEqual(verificar_nomina(nomina), 0, nomina.get_periodo())
+
+    def test_crear_editar_y_eliminar_asistencia(self):
+        asistencia = self._asistencia(self.empleados[0], date(2026, 9, 10), salida=None)
+        self.assertNominasAlDia()
+
+        # Marca la salida: le faltan horas
+        asistencia.hora_salida = time(16, 30)
+        asistencia.save()
+        self.assertNominasAlDia()
+
+        # Corrige la salida: horas extras
+        asistencia.hora_salida = time(20, 0)
+        asistencia.save()
+        self.assertNominasAlDia()
+        detalle = self.septiembre.detalles.get(empleado=self.empleados[0])
+        self.assertEqual(detalle.horas_extras, Decimal('2.00'))
+
+        asistencia.delete()
+        self.assertNominasAlDia()
+        detalle.refresh_from_db()
+        self.assertEqual(detalle.horas_extras, Decimal('0.00'))
+
+    def test_cambio_de_empleado_y_de_fecha(self):
+        asistencia = self._asistencia(self.empleados[0], date(2026, 9, 10))
+        self._asistencia(self.empleados[1], date(2026, 9, 11), salida=time(19, 30))
+
+        asistencia.empleado = self.empleados[1]
+        asistencia.save()
+        self.assertNominasAlDia()
+
+        asistencia.fecha = date(2026, 9, 20)
+        asistencia.hora_salida = time(15, 0)
+        asistencia.save()
+        self.assertNominasAlDia()
+
+    def test_asistencia_que_cambia_de_periodo(self):
+        asistencia = self._asistencia(self.empleados[0], date(2026, 9, 30), salida=time(21, 0))
+
+        asistencia.fecha = date(2026, 10, 1)
+        asistencia.save()
+        self.assertNominasAlDia()
+        self.assertEqual(self.septiembre.detalles.get(empleado=self.empleados[0]).horas_extras, Decimal('0.00'))
+        self.assertEqual(self.octubre.detalles.get(empleado=self.empleados[0]).horas_extras, Decimal('3.00'))
+
+        # Fuera de toda nómina y de vuelta
+        asistencia.fecha = date(2026, 11, 15)
+        asistencia.save()
+        self.assertNominasAlDia()
+        asistencia.fecha = date(2026, 9, 15)
+        asistencia.save()
+        self.assertNominasAlDia()
+
+    def test_nomina_pagada_no_cambia(self):
+        self.octubre.estado = Nomina.Estado.PAGADA
+        self.octubre.save()
+        total = Nomina.objects.get(pk=self.octubre.pk).total_nomina
+
+        asistencia = self._asistencia(self.empleados[0], date(2026, 9, 5), salida=time(20, 0))
+        asistencia.fecha = date(2026, 10, 5)
+        asistencia.save()
+
+        self.assertNominasAlDia()
+        self.assertEqual(Nomina.objects.get(pk=self.octubre.pk).total_nomina, total)
+
+
+class MetricasDashboardIncrementalTest(TestCase):
+    """Las métricas que mantienen las señales coinciden con un cálculo desde el origen."""
+
+    def setUp(self):
+        self.tenant = _crear_tenant()
+        self.cliente = Cliente.objects.create(nombre='Cliente', nit='N1', tenant=self.tenant)
+        marca = Marca.objects.create(nombre='Toyota', tenant=self.tenant)
+        modelo = Modelo.objects.create(nombre='Corolla', marca=marca, tenant=self.tenant)
+        self.vehiculo = Vehiculo.objects.create(
+            cliente=self.cliente, marca=marca, modelo=modelo, numero_placa='ABC123', tenant=self.tenant
+        )
+        self.items = [
+            Item.objects.create(
+                codigo=f'I{i}', nombre=f'Item {i}', tipo='Servicio', precio=Decimal('10.50'), tenant=self.tenant
+            )
+            for i in range(2)
+        ]
+        self.orden = self._orden('pendiente')
+        # A partir de aquí las métricas se mantienen de forma incremental
+        recalcular_metricas(self.tenant.id)
+
+    def _orden(self, estado):
+        return OrdenTrabajo.objects.create(
+            cliente=self.cliente, vehiculo=self.vehiculo, estado=estado, tenant=self.tenant
+        )
+
+    def _detalle(self, orden, item):
+        return DetalleOrdenTrabajo.objects.create(
+            orden_trabajo=orden, item=item, cantidad=1, precio_unitario=Decimal('12.50'), tenant=self.tenant
+        )
+
+    def _pago(self, monto, estado='completado'):
+        return Pago.objects.create(orden_trabajo=self.orden, monto=monto, estado=estado, tenant=self.tenant)
+
+    def assertMetricasAlDia(self):
+        guardadas = {
+            (fila.clave, fila.periodo, fila.fecha): fila.valor
+            for fila in MetricaDashboard.objects.filter(tenant=self.tenant).exclude(clave=CLAVE_CALCULADO)
+            if fila.valor
+        }
+        esperadas = {
+            clave: valor
+            for clave, valor in calcular_desde_origen(self.tenant.id).items()
+            if clave[0] != CLAVE_CALCULADO and valor
+        }
+        self.assertEqual(guardadas, esperadas)
+
+    def test_pagos(self):
+        pago = self._pago(Decimal('150.25'))
+        self._pago(Decimal('80.00'), estado='pendiente')
+        self.assertMetricasAlDia()
+
+        pago.monto = Decimal('99.75')
+        pago.save()
+        self.assertMetricasAlDia()
+
+        # A otro mes y fuera de los ingresos
+        pago.fecha_pago = timezone.now() - timedelta(days=40)
+        pago.save()
+        self.assertMetricasAlDia()
+        pago.estado = 'reembolsado'
+        pago.save()
+        self.assertMetricasAlDia()
+
+        pago.delete()
+        self.assertMetricasAlDia()
+
+    def test_ordenes_y_sus_detalles(self):
+        detalle = self._detalle(self.orden, self.items[0])
+        self._detalle(self.orden, self.items[1])
+        self.assertMetricasAlDia()
+
+        # Al terminar la orden sus items cuentan como servicios usados
+        self.orden.estado = 'finalizada'
+        self.orden.save()
+        self.assertMetricasAlDia()
+
+        detalle.item = self.items[1]
+        detalle.save()
+        self.assertMetricasAlDia()
+
+        otra = self._orden('entregada')
+        self._detalle(otra, self.items[0])
+        self.assertMetricasAlDia()
+
+        self.orden.estado = 'cancelada'
+        self.orden.save()
+        self.assertMetricasAlDia()
+
+        detalle.delete()
+        otra.delete()
+        self.assertMetricasAlDia()
+
+
+class InvalidarDashboardTest(TestCase):
+    """La versión del dashboard cambia al confirmar cada transacción."""
 
-# Create your tests here.
+    def test_bloque_atomic_reutilizado(self):
+        tenant_id = 1
+        # Como @transaction.atomic: la misma instancia de Atomic en cada llamada
+        bloque = transaction.atomic()
+        claves = {clave_admin(tenant_id)}
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                with bloque:
+                    invalidar_dashboard(tenant_id)
+                    invalidar_dashboard(tenant_id)
+            claves.add(clave_admin(tenant_id))
+        self.assertEqual(len(claves), 3)
@@ -31,6 +31,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from .serializers.serializers_user import UserSerializer
 from .models_saas import UserProfile, Tenant
+from .cache_dashboard import obtener_o_calcular, clave_admin, clave_empleado
 from .serializers.serializers_tenant import TallerRegistrationSerializer
 from .serializers.serializers_tenantProfile import TenantProfileSerializer
 from .serializers.serializers_userInvit import ClienteRegistrationSerializer
@@ -39,8 +40,8 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 import requests
 from django.conf import settings
-from django.db.models import Sum, Count, Q, DecimalField
-from django.db.models.functions import TruncMonth, TruncDay
+from django.db.models import Q
+from django.db.models.functions import TruncDay
 from datetime import datetime, timedelta, date
 import calendar
 from decimal import Decimal
@@ -889,109 +890,48 @@ class DashboardAdminView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
+        # Respuesta cacheada por taller (ver cache_dashboard)
+        datos = obtener_o_calcular(clave_admin(user_tenant.id), lambda: self._calcular(user_tenant))
+        return Response(datos, status=status.HTTP_200_OK)
+    
+    def _calcular(self, user_tenant):
+        """
+        Calcula las estadísticas del dashboard del taller
+        """
         # Importar modelos necesarios
         from operaciones_inventario.modelsOrdenTrabajo import OrdenTrabajo
-        from finanzas_facturacion.models import Pago
-        from clientes_servicios.models import Cita
         from operaciones_inventario.modelsItem import Item
+        from .metricas_dashboard import leer_metricas
         
         # Estadísticas generales
         total_clientes = Cliente.objects.filter(tenant=user_tenant, activo=True).count()
         total_empleados = Empleado.objects.filter(tenant=user_tenant, estado=True).count()
-        total_ordenes = OrdenTrabajo.objects.filter(tenant=user_tenant).count()
         
-        # Ingresos
-        pagos_completados = Pago.objects.filter(
-            orden_trabajo__tenant=user_tenant,
-            estado='completado'
+        # Ingresos, órdenes por estado, servicios y citas: métricas precalculadas
+        # (MetricaDashboard) en lugar de agregar Pago/OrdenTrabajo en cada carga.
+        # Los meses usan la zona horaria del proyecto (America/La_Paz)
+        metricas = leer_metricas(user_tenant, meses=6)
+        total_ordenes = metricas['total_ordenes']
+        ingresos_totales = metricas['ingresos_totales']
+        ingresos_mes = metricas['ingresos_mes_actual']
+        ingresos_mensuales = metricas['ingresos_mensuales']
+        estados_ordenes = metricas['ordenes_por_estado']
+        citas_pendientes = metricas['citas_pendientes']
+        
+        # Servicios más utilizados (items más usados en órdenes finalizadas/entregadas)
+        nombres_items = dict(
+            Item.objects.filter(
+                id__in=[item_id for item_id, _ in metricas['servicios_mas_usados']]
+            ).values_list('id', 'nombre')
         )
-        ingresos_totales = pagos_completados.aggregate(
-            total=Sum('monto', output_field=DecimalField())
-        )['total'] or Decimal('0.00')
-        
-        # Obtener fecha actual con zona horaria de Bolivia (America/La_Paz)
-        tz_bolivia = pytz.timezone('America/La_Paz')
-        ahora_utc = timezone.now()
-        ahora_bolivia = ahora_utc.astimezone(tz_bolivia)
-        
-        # Ingresos del mes actual (en Bolivia)
-        mes_actual_bolivia = ahora_bolivia.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        ingresos_mes = Pago.objects.filter(
-            orden_trabajo__tenant=user_tenant,
-            estado='completado',
-            fecha_pago__gte=mes_actual_bolivia
-        ).aggregate(
-            total=Sum('monto', output_field=DecimalField())
-        )['total'] or Decimal('0.00')
-        
-        # Ingresos últimos 6 meses para gráfico (usando fecha de Bolivia)
-        # Calcular los últimos 6 meses desde la fecha actual de Bolivia
-        ingresos_por_mes = Pago.objects.filter(
-            orden_trabajo__tenant=user_tenant,
-            estado='completado'
-        ).annotate(
-            mes=TruncMonth('fecha_pago')
-        ).values('mes').annotate(
-            total=Sum('monto', output_field=DecimalField())
-        ).order_by('mes')
-        
-        # Convertir a diccionario para facilitar búsqueda
-        ingresos_dict = {}
-        for item in ingresos_por_mes:
-            if item['mes']:
-                mes_str = item['mes'].strftime('%Y-%m')
-                ingresos_dict[mes_str] = float(item['total'] or 0)
-        
-        # Generar datos para los últimos 6 meses (desde la fecha actual de Bolivia)
-        ingresos_mensuales = []
-        fecha_actual_bolivia = ahora_bolivia.date()
-        año_actual = fecha_actual_bolivia.year
-        mes_actual = fecha_actual_bolivia.month
-        
-        # Calcular los últimos 6 meses correctamente (incluyendo el mes actual)
-        # Desde hace 5 meses hasta el mes actual (total 6 meses)
-        for i in range(5, -1, -1):  # i va de 5 a 0
-            # Calcular el mes objetivo: mes_actual - i
-            # Si mes_actual = 11 (noviembre) y i = 0, entonces mes_objetivo = 11 (noviembre) ✓
-            # Si mes_actual = 11 y i = 1, entonces mes_objetivo = 10 (octubre) ✓
-            mes_objetivo = mes_actual - i
-            año_objetivo = año_actual
-            
-            # Ajustar si el mes es negativo o cero (cambio de año hacia atrás)
-            if mes_objetivo <= 0:
-                mes_objetivo += 12
-                año_objetivo -= 1
-            
-            mes_str = f"{año_objetivo}-{mes_objetivo:02d}"
-            ingresos_mensuales.append({
-                'mes': mes_str,
-                'total': ingresos_dict.get(mes_str, 0.0)
-            })
-        
-        # Órdenes por estado
-        ordenes_por_estado = OrdenTrabajo.objects.filter(
-            tenant=user_tenant
-        ).values('estado').annotate(
-            cantidad=Count('id')
-        )
-        
-        estados_ordenes = {item['estado']: item['cantidad'] for item in ordenes_por_estado}
-        
-        # Servicios más utilizados (items más usados en órdenes)
-        servicios_mas_usados = Item.objects.filter(
-            detalles_orden__orden_trabajo__tenant=user_tenant,
-            detalles_orden__orden_trabajo__estado__in=['finalizada', 'entregada']
-        ).annotate(
-            veces_usado=Count('detalles_orden')
-        ).order_by('-veces_usado')[:5]
-        
         servicios_data = [
             {
-                'nombre': servicio.nombre,
-                'nombre_corto': servicio.nombre[:30] + '...' if len(servicio.nombre) > 30 else servicio.nombre,
-                'veces_usado': servicio.veces_usado
+                'nombre': nombres_items[item_id],
+                'nombre_corto': nombres_items[item_id][:30] + '...' if len(nombres_items[item_id]) > 30 else nombres_items[item_id],
+                'veces_usado': veces_usado
             }
-            for servicio in servicios_mas_usados
+            for item_id, veces_usado in metricas['servicios_mas_usados']
+            if item_id in nombres_items
         ]
         
         # Órdenes recientes (últimas 5)
@@ -1010,13 +950,7 @@ class DashboardAdminView(APIView):
             for orden in ordenes_recientes
         ]
         
-        # Citas pendientes
-        citas_pendientes = Cita.objects.filter(
-            tenant=user_tenant,
-            estado__in=['pendiente', 'confirmada']
-        ).count()
-        
-        return Response({
+        return {
             'estadisticas': {
                 'total_clientes': total_clientes,
                 'total_empleados': total_empleados,
@@ -1031,7 +965,7 @@ class DashboardAdminView(APIView):
                 'servicios_mas_usados': servicios_data
             },
             'ordenes_recientes': ordenes_recientes_data
-        }, status=status.HTTP_200_OK)
+        }
 
 
 class DashboardEmpleadoView(APIView):
@@ -1062,6 +996,17 @@ class DashboardEmpleadoView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
+        # Respuesta cacheada por empleado (ver cache_dashboard)
+        datos = obtener_o_calcular(
+            clave_empleado(user_tenant.id, empleado.id),
+            lambda: self._calcular(empleado, user_tenant)
+        )
+        return Response(datos, status=status.HTTP_200_OK)
+    
+    def _calcular(self, empleado, user_tenant):
+        """
+        Calcula las estadísticas del dashboard del empleado
+        """
         # Importar modelos necesarios
         from clientes_servicios.models import Cita
         from operaciones_inventario.modelsOrdenTrabajo import OrdenTrabajo, AsignacionTecnico
@@ -1162,7 +1107,7 @@ class DashboardEmpleadoView(APIView):
             for orden in ordenes_recientes
         ]
         
-        return Response({
+        return {
             'estadisticas': {
                 'citas_hoy': citas_hoy,
                 'citas_semana': citas_semana,
@@ -1176,7 +1121,7 @@ class DashboardEmpleadoView(APIView):
             'citas_hoy': citas_hoy_data,
             'proximas_citas': proximas_citas_data,
             'ordenes_recientes': ordenes_recientes_data
-        }, status=status.HTTP_200_OK)
+        }
 
 
 # ===== ASISTENCIA ENDPOINTS =====
@@ -1459,7 +1404,7 @@ class MarcarAsistenciaView(APIView):
                 logger.error(f"[MARCAR ASISTENCIA] ❌ ERROR: Asistencia {asistencia.id} NO tiene tenant después de guardar")
                 # Intentar guardar manualmente
                 asistencia.tenant = user_tenant
-                asistencia.save(update_fields=['tenant'])
+                asistencia.save(update_fields=['tenant', 'fecha_actualizacion'])
                 asistencia.refresh_from_db()
                 logger.info(f"[MARCAR ASISTENCIA] Tenant forzado manualmente: {asistencia.tenant.id if asistencia.tenant else 'SIGUE SIN TENANT'}")
             
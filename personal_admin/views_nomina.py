@@ -2,7 +2,7 @@ from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q, Sum, Count
+from django.db.models import Q, Sum, Count, Prefetch
 from django.shortcuts import get_object_or_404
 from decimal import Decimal
 
@@ -17,6 +17,12 @@ from personal_admin.serializers.serializers_nomina import (
     DetalleNominaWriteSerializer,
 )
 
+# Detalles con su empleado para NominaReadSerializer (evita consultas por detalle)
+DETALLES_CON_EMPLEADO = Prefetch(
+    'detalles',
+    queryset=DetalleNomina.objects.select_related('empleado__cargo', 'empleado__usuario', 'empleado__area')
+)
+
 
 def registrar_bitacora(usuario, accion, modulo, descripcion, request=None):
     """
@@ -81,6 +87,9 @@ class NominaViewSet(viewsets.ModelViewSet):
         if año:
             queryset = queryset.filter(fecha_inicio__year=año)
         
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(DETALLES_CON_EMPLEADO)
+        
         return queryset
     
     def get_serializer_class(self):
@@ -212,16 +221,9 @@ class NominaViewSet(viewsets.ModelViewSet):
         """
         nomina = self.get_object()
         
-        # Recalcular cada detalle
-        detalles_actualizados = 0
-        for detalle in nomina.detalles.all():
-            detalle.calcular_todos_los_campos()
-            detalle.save()
-            detalles_actualizados += 1
-        
-        # Actualizar total de la nómina
-        nomina.calcular_total_nomina()
-        nomina.save(update_fields=['total_nomina'])
+        # Recalcular todos los detalles y el total en lote
+        _, detalles_actualizados = nomina.calcular_detalles_en_lote()
+        nomina = Nomina.objects.prefetch_related(DETALLES_CON_EMPLEADO).get(pk=nomina.pk)
         
         # Registrar en bitácora
         descripcion = (
@@ -529,7 +531,7 @@ class DetalleNominaViewSet(viewsets.ModelViewSet):
         
         # Actualizar total de la nómina padre
         detalle.nomina.calcular_total_nomina()
-        detalle.nomina.save(update_fields=['total_nomina'])
+        detalle.nomina.save(update_fields=['total_nomina', 'fecha_actualizacion'])
         
         # Registrar en bitácora
         descripcion = (
@@ -5,3 +5,8 @@ class ServiciosIaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'servicios_IA'
     verbose_name = 'Servicios de Inteligencia Artificial'
+
+    def ready(self):
+        # Invalidación de la caché de reportes al guardar/eliminar datos
+        from .signals import conectar_senales
+        conectar_senales()
@@ -0,0 +1,203 @@
+"""
+Generación de reportes en segundo plano.
+
+Los reportes pedidos con "asincrono": true se guardan como PENDIENTE y se
+generan en un pool de hilos del propio proceso web (REPORTES_JOBS_BACKEND=
+'thread') o en una tarea Celery (REPORTES_JOBS_BACKEND='celery', requiere
+worker y broker). Cada worker toma el reporte pendiente más antiguo cuyo
+tenant no haya llegado a REPORTES_MAX_POR_TENANT reportes en proceso, así un
+taller con muchos reportes en cola no deja sin workers a los demás. El cupo
+se controla en la base de datos (bloqueo de la fila del tenant), de modo que
+también se respeta entre procesos y workers de Celery.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Reporte
+from .utils.descargas import guardar_archivo
+from personal_admin.views import registrar_bitacora
+from personal_admin.models import Bitacora
+from personal_admin.models_saas import Tenant
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'REPORTES_JOB_WORKERS', 2),
+                thread_name_prefix='reporte-job',
+            )
+        return _executor
+
+
+def encolar_reporte(reporte):
+    """
+    Programa el procesamiento de la cola. Se despacha con on_commit para que
+    el worker nunca lea un Reporte que todavía no está confirmado.
+    """
+    if getattr(settings, 'REPORTES_JOBS_BACKEND', 'thread') == 'celery':
+        from .tasks import procesar_cola_reportes
+        transaction.on_commit(lambda: procesar_cola_reportes.delay())
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(_procesar_en_hilo))
+
+
+def _procesar_en_hilo():
+    try:
+        procesar_cola()
+    finally:
+        # Cada hilo del pool abre su propia conexión; cerrarla al terminar
+        connection.close()
+
+
+def procesar_cola():
+    """
+    Genera reportes pendientes hasta que no quede ninguno que se pueda tomar.
+    Un reporte que espera por el límite de su tenant lo toma el worker que
+    termine el reporte en curso de ese tenant.
+    """
+    while True:
+        reporte_id = _tomar_siguiente()
+        if reporte_id is None:
+            return
+        run_reporte(reporte_id)
+
+
+def _vencer_reportes_colgados():
+    """
+    Marca como ERROR los reportes EN_PROCESO sin escrituras (progreso) durante
+    REPORTES_JOB_TIMEOUT (p. ej. el proceso se reinició), para que no ocupen
+    el cupo del tenant. Si el worker sigue vivo, run_reporte no sobrescribe
+    el ERROR al terminar.
+    """
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'REPORTES_JOB_TIMEOUT', 1800))
+    Reporte.objects.filter(estado='EN_PROCESO', fecha_actualizacion__lt=limite).update(
+        estado='ERROR',
+        error='Tiempo de generación agotado',
+        fecha_actualizacion=timezone.now(),
+    )
+
+
+def _tomar_siguiente():
+    """
+    Pasa a EN_PROCESO el reporte pendiente más antiguo de un tenant con cupo.
+
+    Returns:
+        ID del reporte tomado o None
+    """
+    max_por_tenant = getattr(settings, 'REPORTES_MAX_POR_TENANT', 1)
+    _vencer_reportes_colgados()
+    # Filtro previo sin bloqueos; el cupo se vuelve a comprobar en _tomar_con_cupo
+    saturados = (
+        Reporte.objects.filter(estado='EN_PROCESO')
+        .order_by()
+        .values('tenant')
+        .annotate(cantidad=Count('id'))
+        .filter(cantidad__gte=max_por_tenant)
+        .values('tenant')
+    )
+    pendientes = (
+        Reporte.objects.filter(estado='PENDIENTE')
+        .exclude(tenant__in=saturados)
+        .order_by('fecha_generacion', 'id')
+        .values_list('id', 'tenant')[:50]
+    )
+    revisados = set()
+    for reporte_id, tenant_id in pendientes:
+        if tenant_id in revisados:
+            continue
+        revisados.add(tenant_id)
+        if _tomar_con_cupo(reporte_id, tenant_id, max_por_tenant):
+            return reporte_id
+    return None
+
+
+def _tomar_con_cupo(reporte_id, tenant_id, max_por_tenant):
+    """
+    Toma el reporte si su tenant tiene cupo. El bloqueo de la fila del tenant
+    serializa la cuenta de reportes en proceso entre workers de cualquier
+    proceso, y el UPDATE condicionado a PENDIENTE hace que cada reporte lo
+    tome un solo worker.
+    """
+    with transaction.atomic():
+        Tenant.objects.select_for_update().filter(pk=tenant_id).exists()
+        en_proceso = Reporte.objects.filter(tenant_id=tenant_id, estado='EN_PROCESO').count()
+        if en_proceso >= max_por_tenant:
+            return False
+        ahora = timezone.now()
+        return bool(Reporte.objects.filter(pk=reporte_id, estado='PENDIENTE').update(
+            estado='EN_PROCESO',
+            fecha_inicio=ahora,
+            fecha_actualizacion=ahora,
+        ))
+
+
+def _registrar_progreso(reporte):
+    def progreso(procesados, total):
+        Reporte.objects.filter(pk=reporte.pk).update(
+            registros_procesados=procesados,
+            registros_totales=total,
+            fecha_actualizacion=timezone.now(),
+        )
+    return progreso
+
+
+def run_reporte(reporte_id):
+    """
+    Genera el archivo de un reporte ya tomado (EN_PROCESO)
+    """
+    from .viewsReportes import ReporteViewSet
+
+    reporte = Reporte.objects.select_related('tenant', 'usuario').get(pk=reporte_id)
+    tiempo_inicio = time.time()
+    try:
+        archivo, nombre_archivo, total_registros, huella = ReporteViewSet()._generar_archivo(
+            reporte.tipo, reporte.parametros, reporte.tenant, progreso=_registrar_progreso(reporte)
+        )
+        guardar_archivo(reporte, nombre_archivo, archivo, save=False, huella=huella)
+        reporte.registros_procesados = total_registros
+        reporte.registros_totales = total_registros
+        reporte.tiempo_generacion = round(time.time() - tiempo_inicio, 2)
+        reporte.estado = 'COMPLETADO'
+        # Solo si sigue EN_PROCESO: un reporte vencido mientras se generaba
+        # queda en ERROR (el archivo sin fila lo borra eliminar_huerfanos)
+        completados = Reporte.objects.filter(pk=reporte_id, estado='EN_PROCESO').update(
+            archivo=reporte.archivo.name,
+            hash_contenido=reporte.hash_contenido,
+            registros_procesados=total_registros,
+            registros_totales=total_registros,
+            tiempo_generacion=reporte.tiempo_generacion,
+            estado='COMPLETADO',
+            fecha_actualizacion=timezone.now(),
+        )
+    except Exception as e:
+        logger.error(f"Error al generar el reporte {reporte_id}: {str(e)}", exc_info=True)
+        Reporte.objects.filter(pk=reporte_id, estado='EN_PROCESO').update(
+            estado='ERROR', error=str(e), fecha_actualizacion=timezone.now()
+        )
+        return
+
+    if not completados:
+        logger.warning(f"El reporte {reporte_id} venció antes de terminar; se descarta el resultado")
+        return
+
+    registrar_bitacora(
+        usuario=reporte.usuario,
+        accion=Bitacora.Accion.CREAR,
+        modulo=Bitacora.Modulo.REPORTE,
+        descripcion=f"Reporte '{reporte.nombre}' generado en segundo plano (ID: {reporte.id}) en formato {reporte.formato}. Registros: {total_registros}, Tiempo: {reporte.tiempo_generacion}s",
+    )
@@ -0,0 +1,85 @@
+"""
+Comando de Django para medir el intérprete de consultas en lenguaje natural
+de punta a punta (interpretar_consulta).
+
+Mide dos grupos de consultas:
+- los ejemplos de generar_ejemplos_consultas()
+- consultas con fechas absolutas ("desde 01/03/2024"), el caso más costoso
+
+y cada grupo en dos casos:
+- sin caché: se vacían las interpretaciones memorizadas antes de cada ronda
+  (costo real de interpretar una consulta nueva)
+- con caché: la misma consulta repetida (ejemplos de la interfaz, reintentos)
+
+Uso:
+    python manage.py benchmark_nl_parser
+    python manage.py benchmark_nl_parser --rondas 200
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from servicios_IA.utils.nl_parser import (
+    generar_ejemplos_consultas,
+    interpretar_consulta,
+    limpiar_cache_interpretaciones,
+)
+from servicios_IA.utils.whitelist import ENTIDADES_DISPONIBLES
+
+CONSULTAS_FECHAS_ABSOLUTAS = [
+    'órdenes desde 01/03/2024 hasta 31/03/2024',
+    'órdenes completadas desde 5-6-24',
+    'vehículos hasta 15/03/2024 en pdf',
+    'clientes desde 1/1/2024',
+    'items desde 10-01-2024 hasta 20-01-2024 en excel',
+]
+
+
+class Command(BaseCommand):
+    help = 'Mide el tiempo por consulta de interpretar_consulta con y sin caché'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rondas',
+            type=int,
+            default=50,
+            help='Veces que se interpretan todas las consultas en cada caso'
+        )
+
+    def handle(self, *args, **options):
+        # Solo las entidades habilitadas para reportes (las demás no se pueden interpretar)
+        ejemplos = [
+            consulta
+            for entidad, consultas in generar_ejemplos_consultas().items()
+            if entidad in ENTIDADES_DISPONIBLES
+            for consulta in consultas
+        ]
+        rondas = options['rondas']
+        self.stdout.write(f"Rondas: {rondas}")
+
+        for nombre, consultas in (
+            ('Ejemplos', ejemplos),
+            ('Fechas absolutas', CONSULTAS_FECHAS_ABSOLUTAS),
+        ):
+            sin_cache = self._medir(consultas, rondas, limpiar=True)
+            con_cache = self._medir(consultas, rondas, limpiar=False)
+            self.stdout.write(f"{nombre} ({len(consultas)} consultas)")
+            self.stdout.write(f"  Sin caché: {sin_cache:.1f} µs por consulta")
+            self.stdout.write(f"  Con caché: {con_cache:.1f} µs por consulta")
+            self.stdout.write(self.style.SUCCESS(f"  Aceleración por caché: {sin_cache / con_cache:.1f}x"))
+
+    def _medir(self, consultas, rondas, limpiar):
+        limpiar_cache_interpretaciones()
+        # Ronda de calentamiento (y llenado de la caché para el caso con caché)
+        for consulta in consultas:
+            interpretar_consulta(consulta)
+
+        transcurrido = 0.0
+        for _ in range(rondas):
+            if limpiar:
+                limpiar_cache_interpretaciones()
+            inicio = time.perf_counter()
+            for consulta in consultas:
+                interpretar_consulta(consulta)
+            transcurrido += time.perf_counter() - inicio
+        return transcurrido / (rondas * len(consultas)) * 1_000_000
@@ -0,0 +1,90 @@
+"""
+Comando de Django para aplicar la retención de los reportes generados:
+borra por lotes los reportes más antiguos que la retención de cada taller
+(plan o Tenant.retencion_reportes_dias), unifica archivos con el mismo
+contenido y elimina los archivos que ya ningún reporte referencia.
+
+Pensado para ejecutarse a diario (cron o Celery beat con
+servicios_IA.tasks.depurar_reportes_programado).
+
+Uso:
+    python manage.py depurar_reportes
+    python manage.py depurar_reportes --tenant 3 --simular
+    python manage.py depurar_reportes --lote 1000 --sin-huerfanos
+"""
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from personal_admin.models_saas import Tenant
+from servicios_IA.utils.retencion import (
+    LOTE_DEFAULT,
+    deduplicar,
+    depurar_vencidos,
+    dias_retencion,
+    eliminar_huerfanos,
+)
+
+
+class Command(BaseCommand):
+    help = 'Elimina reportes vencidos según la retención de cada taller y libera sus archivos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=int,
+            help='Depurar solo los reportes de este tenant'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=LOTE_DEFAULT,
+            help=f'Filas eliminadas por consulta (por defecto {LOTE_DEFAULT})'
+        )
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Solo informa lo que se eliminaría'
+        )
+        parser.add_argument(
+            '--sin-huerfanos',
+            action='store_true',
+            help='No buscar archivos sin reporte en la carpeta de reportes'
+        )
+
+    def handle(self, *args, **options):
+        simular = options['simular']
+        tenants = Tenant.objects.order_by('id')
+        if options['tenant']:
+            tenants = tenants.filter(id=options['tenant'])
+
+        total_filas = 0
+        total_archivos = 0
+        total_bytes = 0
+        for tenant in tenants.iterator():
+            vencidos = depurar_vencidos(tenant, lote=options['lote'], simular=simular)
+            duplicados = deduplicar(tenant, simular=simular)
+            archivos = vencidos['archivos'] + duplicados['archivos']
+            liberados = vencidos['bytes'] + duplicados['bytes']
+            total_filas += vencidos['filas']
+            total_archivos += archivos
+            total_bytes += liberados
+            if vencidos['filas'] or archivos:
+                self.stdout.write(
+                    f"🗑️  {tenant.nombre_taller} (retención {dias_retencion(tenant)} días): "
+                    f"{vencidos['filas']} reportes, {archivos} archivos ({filesizeformat(liberados)})"
+                )
+
+        # Los huérfanos no pertenecen a un tenant identificable: solo en la pasada general
+        if not options['sin_huerfanos'] and not options['tenant']:
+            huerfanos = eliminar_huerfanos(simular=simular)
+            total_archivos += huerfanos['archivos']
+            total_bytes += huerfanos['bytes']
+            if huerfanos['archivos']:
+                self.stdout.write(
+                    f"🗑️  Archivos sin reporte: {huerfanos['archivos']} ({filesizeformat(huerfanos['bytes'])})"
+                )
+
+        accion = 'se eliminarían' if simular else 'eliminados'
+        self.stdout.write(self.style.SUCCESS(
+            f"\n{total_filas} reportes y {total_archivos} archivos {accion} ({filesizeformat(total_bytes)})"
+        ))
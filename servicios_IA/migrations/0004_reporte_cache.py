@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personal_admin', '0018_merge_20251125_0503'),
+        ('servicios_IA', '0003_lecturaplaca_tenant_reporte_tenant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reporte',
+            name='clave_cache',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='Hash de la consulta normalizada y de las versiones de datos usadas', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='VersionDatos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(help_text='app_label.Modelo', max_length=100)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versiones_datos', to='personal_admin.tenant')),
+            ],
+            options={
+                'verbose_name': 'Versión de datos',
+                'verbose_name_plural': 'Versiones de datos',
+                'db_table': 'version_datos',
+                'unique_together': {('tenant', 'modelo')},
+            },
+        ),
+    ]
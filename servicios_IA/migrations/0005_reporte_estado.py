@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personal_admin', '0018_merge_20251125_0503'),
+        ('servicios_IA', '0004_reporte_cache'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reporte',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En proceso'), ('COMPLETADO', 'Completado'), ('ERROR', 'Error')], default='COMPLETADO', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='fecha_inicio',
+            field=models.DateTimeField(blank=True, help_text='Inicio de la generación en el worker', null=True),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='parametros',
+            field=models.JSONField(blank=True, default=dict, help_text='Definición del reporte para generarlo en segundo plano'),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='registros_totales',
+            field=models.IntegerField(default=0, help_text='Filas a procesar (para el porcentaje de avance)'),
+        ),
+        migrations.AddIndex(
+            model_name='reporte',
+            index=models.Index(fields=['estado', 'fecha_generacion'], name='reporte_estado_3632b6_idx'),
+        ),
+    ]
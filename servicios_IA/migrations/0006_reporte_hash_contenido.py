@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios_IA', '0005_reporte_estado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reporte',
+            name='hash_contenido',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 del archivo generado (ETag de la descarga)', max_length=64),
+        ),
+    ]
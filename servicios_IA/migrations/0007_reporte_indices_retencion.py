@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personal_admin', '0019_tenant_retencion_reportes'),
+        ('servicios_IA', '0006_reporte_hash_contenido'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reporte',
+            index=models.Index(fields=['tenant', 'fecha_generacion'], name='reporte_tenant__35d649_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reporte',
+            index=models.Index(fields=['tenant', 'hash_contenido'], name='reporte_tenant__d09299_idx'),
+        ),
+    ]
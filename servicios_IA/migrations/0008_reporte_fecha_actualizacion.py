@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios_IA', '0007_reporte_indices_retencion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reporte',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios_IA', '0008_reporte_fecha_actualizacion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reporte',
+            name='hash_contenido',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 de la consulta y las filas del archivo (deduplicación y ETag de la descarga)', max_length=64),
+        ),
+    ]
@@ -36,6 +36,15 @@ class Reporte(models.Model):
         ('XLSX', 'Excel'),
     ]
     
+    # Los reportes síncronos se crean ya COMPLETADOS; los asíncronos pasan
+    # por PENDIENTE -> EN_PROCESO -> COMPLETADO/ERROR en el worker
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('EN_PROCESO', 'En proceso'),
+        ('COMPLETADO', 'Completado'),
+        ('ERROR', 'Error'),
+    ]
+    
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reportes')
     tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
     nombre = models.CharField(max_length=200)
@@ -47,12 +56,63 @@ class Reporte(models.Model):
     registros_procesados = models.IntegerField(default=0)
     tiempo_generacion = models.FloatField(default=0.0, help_text="Tiempo en segundos")
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='reportes')
+    clave_cache = models.CharField(
+        max_length=64, blank=True, default='', db_index=True,
+        help_text="Hash de la consulta normalizada y de las versiones de datos usadas"
+    )
+    estado = models.CharField(max_length=12, choices=ESTADO_CHOICES, default='COMPLETADO')
+    parametros = models.JSONField(default=dict, blank=True, help_text="Definición del reporte para generarlo en segundo plano")
+    registros_totales = models.IntegerField(default=0, help_text="Filas a procesar (para el porcentaje de avance)")
+    error = models.TextField(blank=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True, help_text="Inicio de la generación en el worker")
+    hash_contenido = models.CharField(
+        max_length=64, blank=True, default='',
+        help_text="SHA-256 de la consulta y las filas del archivo (deduplicación y ETag de la descarga)"
+    )
+    # auto_now solo aplica en save(): los update() lo asignan explícitamente.
+    # Es la fecha con que los backups incrementales detectan cambios
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = "reporte"
         ordering = ['-fecha_generacion']
         verbose_name = "Reporte"
         verbose_name_plural = "Reportes"
+        indexes = [
+            models.Index(fields=['estado', 'fecha_generacion']),
+            # Depuración por antigüedad y deduplicación por contenido, por taller
+            models.Index(fields=['tenant', 'fecha_generacion']),
+            models.Index(fields=['tenant', 'hash_contenido']),
+        ]
+    
+    @property
+    def porcentaje(self):
+        if self.estado == 'COMPLETADO':
+            return 100
+        if not self.registros_totales:
+            return 0
+        return min(round(self.registros_procesados * 100 / self.registros_totales), 99)
     
     def __str__(self):
         return f"{self.nombre} - {self.get_tipo_display()} ({self.formato}) - {self.fecha_generacion:%d/%m/%Y}"
+
+
+class VersionDatos(models.Model):
+    """
+    Contador de cambios por tenant y modelo. Se incrementa al guardar o
+    eliminar registros de los modelos usados en reportes; forma parte de la
+    clave de caché, así que cualquier cambio invalida los reportes cacheados.
+    """
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='versiones_datos')
+    modelo = models.CharField(max_length=100, help_text="app_label.Modelo")
+    version = models.PositiveBigIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = "version_datos"
+        unique_together = ('tenant', 'modelo')
+        verbose_name = "Versión de datos"
+        verbose_name_plural = "Versiones de datos"
+    
+    def __str__(self):
+        return f"{self.modelo} v{self.version} (tenant {self.tenant_id})"
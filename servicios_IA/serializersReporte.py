@@ -15,6 +15,7 @@ class ReporteSerializer(serializers.ModelSerializer):
     usuario_detalle = UsuarioSimpleSerializer(source='usuario', read_only=True)
     tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
     formato_display = serializers.CharField(source='get_formato_display', read_only=True)
+    porcentaje = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Reporte
@@ -33,8 +34,11 @@ class ReporteSerializer(serializers.ModelSerializer):
             'fecha_generacion',
             'registros_procesados',
             'tiempo_generacion',
+            'estado',
+            'porcentaje',
+            'error',
         ]
-        read_only_fields = ['fecha_generacion', 'archivo']
+        read_only_fields = ['fecha_generacion', 'archivo', 'estado', 'error']
 
 
 class GenerarReporteEstaticoSerializer(serializers.Serializer):
@@ -56,6 +60,7 @@ class ReporteHistorialSerializer(serializers.ModelSerializer):
     usuario_nombre = serializers.CharField(source='usuario.get_full_name', read_only=True)
     tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
     formato_display = serializers.CharField(source='get_formato_display', read_only=True)
+    porcentaje = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Reporte
@@ -69,6 +74,9 @@ class ReporteHistorialSerializer(serializers.ModelSerializer):
             'formato_display',
             'fecha_generacion',
             'registros_procesados',
+            'estado',
+            'porcentaje',
+            'error',
         ]
 
 
@@ -0,0 +1,30 @@
+"""
+Señales que mantienen los contadores de versión usados por la caché de reportes
+"""
+from django.apps import apps
+from django.db.models.signals import post_save, post_delete
+
+from personal_admin.signals import senales_activas
+
+from .utils.reportes_cache import modelos_versionados, registrar_cambio
+
+
+def _datos_modificados(sender, instance, **kwargs):
+    # Suspendidas durante restauraciones, que invalidan el tenant al final
+    if not senales_activas():
+        return
+    tenant_id = getattr(instance, 'tenant_id', None)
+    if tenant_id is not None:
+        registrar_cambio(tenant_id, sender._meta.label)
+
+
+def conectar_senales():
+    """
+    Conecta los receivers solo a los modelos que leen los reportes, para no
+    agregar trabajo (ni desactivar el borrado rápido) en el resto
+    """
+    for label in modelos_versionados():
+        Model = apps.get_model(label)
+        uid = f'reportes_cache_{label}'
+        post_save.connect(_datos_modificados, sender=Model, dispatch_uid=f'{uid}_save')
+        post_delete.connect(_datos_modificados, sender=Model, dispatch_uid=f'{uid}_delete')
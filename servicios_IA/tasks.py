@@ -0,0 +1,20 @@
+"""
+Tareas Celery del módulo de Reportes.
+procesar_cola_reportes solo se usa con REPORTES_JOBS_BACKEND='celery';
+depurar_reportes_programado se puede programar con Celery beat (equivale
+al comando depurar_reportes).
+"""
+from celery import shared_task
+from django.core.management import call_command
+
+from .jobsReportes import procesar_cola
+
+
+@shared_task
+def procesar_cola_reportes():
+    procesar_cola()
+
+
+@shared_task
+def depurar_reportes_programado():
+    call_command('depurar_reportes')
@@ -1,3 +1,360 @@
-from django.test import TestCase
+import gzip
+import io
+import re
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from openpyxl import load_workbook
+from django.db import transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from clientes_servicios.models import Cliente
+from operaciones_inventario.modelsOrdenTrabajo import OrdenTrabajo
+from operaciones_inventario.modelsVehiculos import Marca, Modelo, Vehiculo
+from personal_admin.models_saas import Tenant, UserProfile
+from .jobsReportes import _tomar_siguiente, _vencer_reportes_colgados, procesar_cola, run_reporte
+from .models import Reporte
+from .utils.agregaciones import ejecutar_agregacion
+from .utils.excel_generator import generar_excel_streaming
+from .utils.nl_parser import detectar_resumen
+from .utils.pdf_generator import generar_pdf_tabla
+from .utils.query_planner import evaluar_costo, iterar_filas
+from .utils.reportes_cache import buscar_reporte_cacheado, calcular_clave
+from .utils.whitelist import ENTIDADES_DISPONIBLES
+from .viewsReportes import ReporteViewSet
+from .utils.retencion import depurar_vencidos
+from .utils.descargas import _parsear_rango, guardar_archivo, nombre_variante_gzip, respuesta_descarga
+
+
+class ReportesTestCase(TestCase):
+    """Tenant, usuario y MEDIA_ROOT temporal para los archivos generados."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='propietario', password='x')
+        self.tenant = Tenant.objects.create(nombre_taller='Taller Test', propietario=self.usuario)
+        UserProfile.objects.create(usuario=self.usuario, tenant=self.tenant)
+        self.media = tempfile.mkdtemp()
+        ajuste = override_settings(MEDIA_ROOT=self.media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+
+    def crear_reporte(self, tenant=None, estado='PENDIENTE', formato='XLSX', **campos):
+        return Reporte.objects.create(
+            usuario=self.usuario,
+            tenant=tenant or self.tenant,
+            tipo='ESTATICO',
+            nombre='Órdenes por estado',
+            consulta_original='ordenes_estado',
+            formato=formato,
+            estado=estado,
+            parametros={'tipo_reporte': 'ordenes_estado', 'formato': formato},
+            **campos
+        )
+
+    def crear_ordenes(self, estados):
+        """Una orden por estado; las impares con un vehículo sin marca ni modelo"""
+        marca = Marca.objects.create(nombre='Toyota', tenant=self.tenant)
+        modelo = Modelo.objects.create(nombre='Hilux', marca=marca, tenant=self.tenant)
+        ordenes = []
+        for i, estado in enumerate(estados):
+            cliente = Cliente.objects.create(nombre=f'Cliente {i}', nit=f'{i}', tenant=self.tenant)
+            vehiculo = Vehiculo.objects.create(
+                cliente=cliente,
+                marca=None if i % 2 else marca,
+                modelo=None if i % 2 else modelo,
+                numero_placa=f'ABC{i}',
+                tenant=self.tenant,
+            )
+            ordenes.append(OrdenTrabajo.objects.create(
+                cliente=cliente, vehiculo=vehiculo, estado=estado, tenant=self.tenant
+            ))
+        return ordenes
+
+
+class ColaReportesTest(ReportesTestCase):
+    """Cola de reportes en segundo plano: cupo por tenant y estados finales."""
+
+    def test_pendiente_pasa_a_completado(self):
+        reporte = self.crear_reporte()
+        procesar_cola()
+        reporte.refresh_from_db()
+        self.assertEqual(reporte.estado, 'COMPLETADO')
+        self.assertTrue(reporte.archivo.name.endswith('.xlsx'))
+        self.assertEqual(len(reporte.hash_contenido), 64)
+
+    @override_settings(REPORTES_MAX_POR_TENANT=1)
+    def test_respeta_el_cupo_del_tenant(self):
+        self.crear_reporte(estado='EN_PROCESO', fecha_inicio=timezone.now())
+        self.crear_reporte()
+        self.assertIsNone(_tomar_siguiente())
+
+        # Otro taller sí tiene cupo
+        propietario = User.objects.create_user(username='otro', password='x')
+        otro = Tenant.objects.create(nombre_taller='Otro Taller', propietario=propietario)
+        pendiente = self.crear_reporte(tenant=otro)
+        self.assertEqual(_tomar_siguiente(), pendiente.id)
+
+    @override_settings(REPORTES_JOB_TIMEOUT=60)
+    def test_reporte_vencido_no_vuelve_a_completado(self):
+        reporte = self.crear_reporte(estado='EN_PROCESO', fecha_inicio=timezone.now())
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        Reporte.objects.filter(pk=reporte.pk).update(fecha_actualizacion=hace_una_hora)
+        _vencer_reportes_colgados()
+        reporte.refresh_from_db()
+        self.assertEqual(reporte.estado, 'ERROR')
+
+        # El worker termina después y no sobrescribe el ERROR
+        run_reporte(reporte.id)
+        reporte.refresh_from_db()
+        self.assertEqual(reporte.estado, 'ERROR')
+        self.assertFalse(reporte.archivo)
+
+
+class DescargasTest(ReportesTestCase):
+    """Descargas condicionales, por rangos y con la variante gzip."""
+
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        self.contenido = b'%PDF-1.4 ' + b'fila de reporte ' * 4096
+        self.reporte = self.crear_reporte(estado='COMPLETADO', formato='PDF')
+        guardar_archivo(self.reporte, 'reporte.pdf', io.BytesIO(self.contenido))
+
+    def descargar(self, **cabeceras):
+        response, _ = respuesta_descarga(self.factory.get('/', **cabeceras), self.reporte)
+        return response
+
+    def test_parsear_rango(self):
+        self.assertEqual(_parsear_rango('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(_parsear_rango('bytes=900-', 1000), (900, 999))
+        self.assertEqual(_parsear_rango('bytes=-100', 1000), (900, 999))
+        self.assertEqual(_parsear_rango('bytes=990-2000', 1000), (990, 999))
+        self.assertIsNone(_parsear_rango('bytes=0-1,5-9', 1000))
+        self.assertIsNone(_parsear_rango('items=0-9', 1000))
+        self.assertFalse(_parsear_rango('bytes=1000-', 1000))
+        self.assertFalse(_parsear_rango('bytes=-0', 1000))
+
+    def test_etag_coincidente_responde_304(self):
+        etag = self.descargar()['ETag']
+        response = self.descargar(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_rango_responde_206(self):
+        response = self.descargar(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.contenido)}')
+        self.assertEqual(b''.join(response.streaming_content), self.contenido[10:20])
+
+    def test_rango_fuera_del_archivo_responde_416(self):
+        response = self.descargar(HTTP_RANGE=f'bytes={len(self.contenido)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.contenido)}')
+
+    def test_variante_gzip_del_pdf(self):
+        response = self.descargar(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.contenido)
+
+    def test_xlsx_sin_variante_gzip(self):
+        reporte = self.crear_reporte(estado='COMPLETADO', formato='XLSX')
+        guardar_archivo(reporte, 'reporte.xlsx', io.BytesIO(b'PK' + b'celda ' * 4096))
+        storage = reporte.archivo.storage
+        self.assertTrue(storage.exists(reporte.archivo.name))
+        self.assertFalse(storage.exists(nombre_variante_gzip(reporte.archivo.name)))
+
+
+class RetencionTest(ReportesTestCase):
+    """Deduplicación por contenido y depuración de reportes vencidos."""
+
+    def test_regeneraciones_comparten_archivo(self):
+        primero = self.crear_reporte()
+        procesar_cola()
+        segundo = self.crear_reporte()
+        procesar_cola()
+        primero.refresh_from_db()
+        segundo.refresh_from_db()
+        self.assertEqual(segundo.estado, 'COMPLETADO')
+        self.assertEqual(segundo.hash_contenido, primero.hash_contenido)
+        self.assertEqual(segundo.archivo.name, primero.archivo.name)
+
+    def test_depurar_vencidos_conserva_archivos_referenciados(self):
+        vencido = self.crear_reporte(estado='COMPLETADO', formato='PDF')
+        guardar_archivo(vencido, 'reporte.pdf', io.BytesIO(b'%PDF-1.4 contenido'))
+        vigente = self.crear_reporte(estado='COMPLETADO', formato='PDF', archivo=vencido.archivo.name)
+        hace_un_anio = timezone.now() - timedelta(days=365)
+        Reporte.objects.filter(pk=vencido.pk).update(fecha_generacion=hace_un_anio)
+
+        resultado = depurar_vencidos(self.tenant)
+        self.assertEqual((resultado['filas'], resultado['archivos']), (1, 0))
+        self.assertTrue(vigente.archivo.storage.exists(vigente.archivo.name))
+
+        Reporte.objects.filter(pk=vigente.pk).update(fecha_generacion=hace_un_anio)
+        resultado = depurar_vencidos(self.tenant)
+        self.assertEqual((resultado['filas'], resultado['archivos']), (1, 1))
+        self.assertFalse(vigente.archivo.storage.exists(vigente.archivo.name))
+
+
+class PlanificadorConsultasTest(ReportesTestCase):
+    """Las filas del values_list coinciden con el recorrido por getattr."""
+
+    def test_iterar_filas_con_relaciones_nulas(self):
+        self.crear_ordenes(['pendiente', 'en_proceso', 'finalizada'])
+        campos = list(ENTIDADES_DISPONIBLES['ordenes']['campos_disponibles'])
+        queryset = OrdenTrabajo.objects.filter(tenant=self.tenant).order_by('id')
+
+        vista = ReporteViewSet()
+        esperado = [tuple(vista._obtener_valor_campo(orden, campo) for campo in campos) for orden in queryset]
+        with self.assertNumQueries(1):
+            filas = list(iterar_filas(queryset, campos))
+        self.assertEqual(filas, esperado)
+        # Vehículo sin marca: la columna anidada queda vacía, no None
+        self.assertEqual(filas[1][campos.index('vehiculo__marca__nombre')], '')
+
+
+class ExcelStreamingTest(TestCase):
+    """El XLSX en modo write-only consume un generador y conserva todas las filas."""
+
+    def test_filas_desde_un_generador(self):
+        filas = ((i, f'Orden {i}') for i in range(1, 1001))
+        archivo, total = generar_excel_streaming('Órdenes', ['ID', 'Nombre'], filas)
+        self.assertEqual(total, 1000)
+
+        hoja = load_workbook(archivo, read_only=True).active
+        valores = list(hoja.iter_rows(values_only=True))
+        self.assertEqual(valores[0][0], 'Órdenes')
+        # Título, fecha, fila vacía y encabezados antes de los datos
+        self.assertEqual(valores[3], ('ID', 'Nombre'))
+        self.assertEqual(valores[4:], [(i, f'Orden {i}') for i in range(1, 1001)])
+
+
+class PdfPorBloquesTest(TestCase):
+    """El PDF arma un bloque por página leyendo las filas una sola vez."""
+
+    def _paginas(self, cantidad):
+        leidas = []
+
+        def filas():
+            for i in range(cantidad):
+                leidas.append(i)
+                yield (i, f'Cliente {i}', '150.00')
+
+        archivo = generar_pdf_tabla('Órdenes', 'Prueba', ['ID', 'Cliente', 'Total'], filas())
+        self.assertEqual(len(leidas), cantidad)
+        contenido = archivo.getvalue()
+        self.assertTrue(contenido.startswith(b'%PDF'))
+        return len(re.findall(rb'/Type /Page\b(?!s)', contenido))
+
+    def test_paginas_crecen_linealmente(self):
+        self.assertEqual(self._paginas(10), 1)
+        # Con alturas de fila fijas cada página lleva la misma cantidad de filas
+        mil, dos_mil, tres_mil = self._paginas(1000), self._paginas(2000), self._paginas(3000)
+        self.assertGreater(mil, 1)
+        self.assertAlmostEqual(tres_mil - dos_mil, dos_mil - mil, delta=1)
+
+
+class CacheReportesTest(ReportesTestCase):
+    """Un reporte cacheado se reutiliza hasta que cambian los datos que lee."""
+
+    def clave(self):
+        consulta = {'tipo': 'PERSONALIZADO', 'campos': ['estado', 'vehiculo__marca__nombre'], 'formato': 'XLSX'}
+        return calcular_clave(self.tenant, OrdenTrabajo, consulta, consulta['campos'])
+
+    def test_acierto_y_fallo_alrededor_de_un_save(self):
+        # Las versiones se incrementan al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            orden, = self.crear_ordenes(['pendiente'])
+        clave = self.clave()
+        reporte = self.crear_reporte(estado='COMPLETADO', clave_cache=clave)
+        guardar_archivo(reporte, 'reporte.xlsx', io.BytesIO(b'PK contenido'))
+        reporte.save()
+        self.assertEqual(self.clave(), clave)
+        self.assertEqual(buscar_reporte_cacheado(self.tenant, clave), reporte)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            orden.estado = 'en_proceso'
+            orden.save()
+        nueva = self.clave()
+        self.assertNotEqual(nueva, clave)
+        self.assertIsNone(buscar_reporte_cacheado(self.tenant, nueva))
+
+        # Un modelo relacionado que lee la consulta también invalida
+        with self.captureOnCommitCallbacks(execute=True):
+            Marca.objects.filter(tenant=self.tenant).get().save()
+        self.assertNotEqual(self.clave(), nueva)
+
+    def test_bloque_atomic_reutilizado(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            orden, = self.crear_ordenes(['pendiente'])
+        # Como @transaction.atomic: la misma instancia de Atomic en cada llamada
+        bloque = transaction.atomic()
+        claves = {self.clave()}
+        for estado in ('en_proceso', 'finalizada'):
+            with self.captureOnCommitCallbacks(execute=True):
+                with bloque:
+                    orden.estado = estado
+                    orden.save()
+            claves.add(self.clave())
+        self.assertEqual(len(claves), 3)
+
+
+class EvaluarCostoTest(TestCase):
+    """Umbrales de costo estimado (EXPLAIN) para reportes personalizados."""
+
+    @override_settings(REPORTES_COSTO_ASINCRONO=1000, REPORTES_COSTO_MAXIMO=100000)
+    def test_umbrales(self):
+        self.assertIsNone(evaluar_costo({'costo': 1000}))
+        self.assertEqual(evaluar_costo({'costo': 1000.5}), 'ASINCRONO')
+        self.assertEqual(evaluar_costo({'costo': 100000}), 'ASINCRONO')
+        self.assertEqual(evaluar_costo({'costo': 100001}), 'RECHAZAR')
+        # Motores sin costo estimado (SQLite) no se restringen
+        self.assertIsNone(evaluar_costo({'costo': None}))
+
+    @override_settings(REPORTES_COSTO_ASINCRONO=0, REPORTES_COSTO_MAXIMO=0)
+    def test_umbrales_desactivados(self):
+        self.assertIsNone(evaluar_costo({'costo': 10 ** 9}))
+
+
+class AgregacionesTest(ReportesTestCase):
+    """Resúmenes agrupados calculados en la base de datos."""
+
+    def setUp(self):
+        super().setUp()
+        ordenes = self.crear_ordenes(['pendiente', 'pendiente', 'finalizada'])
+        for orden, (fecha, total) in zip(ordenes, [
+            (datetime(2024, 1, 15, 12), '100.00'),
+            (datetime(2024, 1, 20, 12), '50.00'),
+            (datetime(2024, 3, 5, 12), '30.00'),
+        ]):
+            OrdenTrabajo.objects.filter(pk=orden.pk).update(
+                fecha_creacion=timezone.make_aware(fecha), total=Decimal(total)
+            )
+        self.queryset = OrdenTrabajo.objects.filter(tenant=self.tenant)
+
+    def test_cantidad_por_estado(self):
+        agregacion = detectar_resumen('cantidad de órdenes por estado', 'ordenes')
+        encabezados, filas = ejecutar_agregacion(self.queryset, agregacion)
+        self.assertEqual(encabezados, ['Estado', 'Cantidad'])
+        self.assertEqual(filas, [('Pendiente', 2), ('Finalizada', 1)])
+
+    def test_suma_por_mes(self):
+        agregacion = {
+            'funcion': 'sum',
+            'campo': 'total',
+            'etiqueta': 'Suma de Total',
+            'agrupar_por': 'fecha_creacion__month',
+            'etiqueta_grupo': 'Mes',
+            'limite': None,
+            'direccion': None,
+        }
+        encabezados, filas = ejecutar_agregacion(self.queryset, agregacion)
+        self.assertEqual(encabezados, ['Mes', 'Suma de Total'])
+        self.assertEqual(filas, [('01/2024', Decimal('150.00')), ('03/2024', Decimal('30.00'))])
+
+    def test_sin_agrupacion(self):
+        agregacion = {'funcion': 'count', 'campo': None, 'etiqueta': 'Cantidad', 'agrupar_por': None}
+        self.assertEqual(ejecutar_agregacion(self.queryset, agregacion), (['Cantidad'], [(3,)]))
@@ -0,0 +1,172 @@
+"""
+Motor de agregaciones para reportes en lenguaje natural
+Traduce la agregación detectada por nl_parser.detectar_resumen() (ej. "total
+de ingresos por mes") en una consulta values().annotate() que la base de
+datos resuelve con GROUP BY, devolviendo una fila por grupo en lugar de
+traer todos los registros a Python.
+"""
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Avg, Count, Max, Min, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+
+FUNCIONES = {
+    'count': Count,
+    'sum': Sum,
+    'avg': Avg,
+    'max': Max,
+    'min': Min,
+}
+
+# Sufijos de agrupación por período: (función de truncado, formato de la etiqueta)
+PERIODOS = {
+    '__month': (TruncMonth, '%m/%Y'),
+    '__date': (TruncDate, '%d/%m/%Y'),
+}
+
+
+def _resolver_campo(Model, ruta):
+    """
+    Retorna el campo del modelo al final de una ruta con __ o None
+    """
+    modelo_actual = Model
+    field = None
+    for parte in ruta.split('__'):
+        if modelo_actual is None:
+            return None
+        try:
+            field = modelo_actual._meta.get_field(parte)
+        except FieldDoesNotExist:
+            return None
+        modelo_actual = field.related_model if field.is_relation else None
+    return field
+
+
+def _expresion_valor(agregacion):
+    funcion = FUNCIONES[agregacion['funcion']]
+    if agregacion['funcion'] == 'count':
+        return funcion('pk')
+    return funcion(agregacion['campo'])
+
+
+def _plan_grupo(Model, agrupar_por):
+    """
+    Decide cómo agrupar y cómo mostrar el grupo
+
+    Returns:
+        Dict con:
+        - anotaciones: expresiones a anotar antes del values() (períodos)
+        - claves: columnas del values() (GROUP BY)
+        - mostrar: función (fila) -> texto del grupo
+        - es_periodo: True si se agrupa por mes/día (se ordena cronológicamente)
+    """
+    for sufijo, (truncar, formato) in PERIODOS.items():
+        if agrupar_por.endswith(sufijo):
+            base = agrupar_por[:-len(sufijo)]
+            return {
+                'anotaciones': {'grupo': truncar(base)},
+                'claves': ['grupo'],
+                'mostrar': lambda fila, formato=formato: fila['grupo'].strftime(formato) if fila['grupo'] else '',
+                'es_periodo': True,
+            }
+
+    field = _resolver_campo(Model, agrupar_por)
+    if field is None:
+        raise ValueError(f"No se puede agrupar por '{agrupar_por}'")
+
+    if field.is_relation:
+        # Relación: se agrupa por el ID (grupos distintos aunque compartan
+        # nombre) y se muestra el nombre si el modelo relacionado lo tiene
+        try:
+            field.related_model._meta.get_field('nombre')
+            nombre = f'{agrupar_por}__nombre'
+        except FieldDoesNotExist:
+            nombre = agrupar_por
+        return {
+            'anotaciones': {},
+            'claves': [agrupar_por, nombre] if nombre != agrupar_por else [agrupar_por],
+            'mostrar': lambda fila: fila[nombre] if fila[nombre] is not None else 'Sin asignar',
+            'es_periodo': False,
+        }
+
+    opciones = dict(field.flatchoices) if field.choices else {}
+
+    def mostrar(fila):
+        valor = fila[agrupar_por]
+        if isinstance(valor, bool):
+            return 'Sí' if valor else 'No'
+        if valor is None:
+            return 'Sin asignar'
+        return opciones.get(valor, valor)
+
+    return {
+        'anotaciones': {},
+        'claves': [agrupar_por],
+        'mostrar': mostrar,
+        'es_periodo': False,
+    }
+
+
+def consulta_agregada(queryset, agregacion):
+    """
+    Construye el queryset agrupado (sin ejecutarlo) para una agregación con
+    agrupar_por; sin agrupación retorna el queryset filtrado que se agrega
+
+    Args:
+        queryset: QuerySet ya filtrado por tenant y filtros
+        agregacion: Dict de nl_parser.detectar_resumen()
+    """
+    queryset = queryset.order_by()
+    if not agregacion.get('agrupar_por'):
+        return queryset
+
+    plan = _plan_grupo(queryset.model, agregacion['agrupar_por'])
+    consulta = queryset
+    if plan['anotaciones']:
+        consulta = consulta.annotate(**plan['anotaciones'])
+    consulta = consulta.values(*plan['claves']).annotate(valor=_expresion_valor(agregacion))
+
+    # Períodos en orden cronológico; el resto, del mayor al menor valor
+    descendente = agregacion.get('direccion') != 'asc'
+    if plan['es_periodo']:
+        consulta = consulta.order_by('-grupo' if agregacion.get('direccion') == 'desc' else 'grupo')
+    else:
+        consulta = consulta.order_by('-valor' if descendente else 'valor', *plan['claves'])
+
+    if agregacion.get('limite'):
+        consulta = consulta[:agregacion['limite']]
+    return consulta
+
+
+def _formatear_valor(valor):
+    if valor is None:
+        return 0
+    if isinstance(valor, float):
+        return round(valor, 2)
+    if isinstance(valor, Decimal):
+        return valor.quantize(Decimal('0.01'))
+    return valor
+
+
+def ejecutar_agregacion(queryset, agregacion):
+    """
+    Ejecuta la agregación en la base de datos
+
+    Args:
+        queryset: QuerySet ya filtrado por tenant y filtros
+        agregacion: Dict de nl_parser.detectar_resumen()
+
+    Returns:
+        Tupla (encabezados, filas) con una fila por grupo
+    """
+    if not agregacion.get('agrupar_por'):
+        valor = queryset.order_by().aggregate(valor=_expresion_valor(agregacion))['valor']
+        return [agregacion['etiqueta']], [(_formatear_valor(valor),)]
+
+    plan = _plan_grupo(queryset.model, agregacion['agrupar_por'])
+    filas = [
+        (plan['mostrar'](fila), _formatear_valor(fila['valor']))
+        for fila in consulta_agregada(queryset, agregacion)
+    ]
+    return [agregacion['etiqueta_grupo'], agregacion['etiqueta']], filas
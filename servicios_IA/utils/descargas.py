@@ -0,0 +1,306 @@
+"""
+Descarga de archivos de reportes
+Respuestas con ETag (hash del contenido guardado en Reporte.hash_contenido),
+Last-Modified, peticiones condicionales (304), rangos de bytes (206) para
+reanudar descargas y una variante gzip precomprimida opcional, así una
+descarga repetida del mismo reporte no vuelve a transferir el archivo.
+"""
+import gzip
+import hashlib
+import json
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+# Tamaño de bloque al leer o transmitir archivos
+CHUNK_SIZE = 64 * 1024
+
+# La variante gzip solo se guarda si ahorra al menos esta fracción
+AHORRO_MINIMO_GZIP = 0.10
+
+# Formatos sin variante gzip: los XLSX ya son ZIP y casi no se comprimen
+FORMATOS_SIN_GZIP = {'XLSX'}
+
+# Hasta este tamaño la variante comprimida se arma en memoria; más allá, en disco
+MAX_GZIP_EN_MEMORIA = 5 * 1024 * 1024
+
+_RE_RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+CONTENT_TYPES = {
+    'PDF': 'application/pdf',
+    'XLSX': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def variante_gzip_activa():
+    return getattr(settings, 'REPORTES_VARIANTE_GZIP', True)
+
+
+def nombre_variante_gzip(nombre):
+    return f'{nombre}.gz'
+
+
+def calcular_hash(archivo):
+    """
+    SHA-256 del contenido de un archivo abierto; deja el puntero al inicio
+    """
+    digest = hashlib.sha256()
+    archivo.seek(0)
+    for bloque in iter(lambda: archivo.read(CHUNK_SIZE), b''):
+        digest.update(bloque)
+    archivo.seek(0)
+    return digest.hexdigest()
+
+
+class HuellaContenido:
+    """
+    SHA-256 de la consulta normalizada y de las filas escritas en el archivo.
+
+    Dos generaciones con los mismos datos dan la misma huella aunque los
+    bytes del archivo difieran (fecha de generación en el encabezado,
+    metadatos del PDF/XLSX), así la deduplicación las reconoce.
+    """
+
+    def __init__(self, tipo, parametros):
+        self._digest = hashlib.sha256()
+        # Misma normalización que Reporte.parametros (fechas y decimales como texto)
+        self._digest.update(json.dumps([tipo, parametros], sort_keys=True, cls=DjangoJSONEncoder).encode())
+
+    def filas(self, registros):
+        """Devuelve los registros tal cual, sumándolos a la huella al pasar"""
+        for registro in registros:
+            self._digest.update(b'\n')
+            self._digest.update(json.dumps(list(registro), ensure_ascii=False, default=str).encode())
+            yield registro
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+
+def guardar_archivo(reporte, nombre_archivo, archivo, save=True, huella=None):
+    """
+    Guarda el archivo generado de un reporte junto con su hash de contenido
+    y, si conviene, su variante gzip precomprimida. Si el taller ya tiene un
+    archivo idéntico, el reporte apunta a ese en lugar de escribir otro.
+
+    Args:
+        reporte: Reporte al que pertenece el archivo
+        nombre_archivo: Nombre sugerido (el storage puede ajustarlo)
+        archivo: Archivo en memoria (BytesIO) devuelto por los generadores
+        save: Si se guarda el Reporte completo (como FieldFile.save)
+        huella: HuellaContenido de la generación; sin ella se usa el hash
+            de los bytes del archivo
+    """
+    from .retencion import buscar_archivo_identico
+
+    reporte.hash_contenido = huella.hexdigest() if huella else calcular_hash(archivo)
+    # Mismo contenido que un archivo ya guardado del taller: se reutiliza
+    existente = buscar_archivo_identico(reporte)
+    if existente:
+        reporte.archivo.name = existente
+        if save:
+            reporte.save()
+        return
+    reporte.archivo.save(nombre_archivo, archivo, save=save)
+    if variante_gzip_activa() and reporte.formato not in FORMATOS_SIN_GZIP:
+        archivo.seek(0)
+        _guardar_variante_gzip(reporte.archivo.storage, reporte.archivo.name, archivo)
+
+
+def _guardar_variante_gzip(storage, nombre, archivo):
+    """
+    Comprime el archivo por bloques de CHUNK_SIZE y guarda la variante .gz
+    si ahorra al menos AHORRO_MINIMO_GZIP
+    """
+    original = 0
+    with tempfile.SpooledTemporaryFile(max_size=MAX_GZIP_EN_MEMORIA) as comprimido:
+        # mtime=0: el mismo contenido produce siempre la misma variante
+        with gzip.GzipFile(fileobj=comprimido, mode='wb', compresslevel=6, mtime=0) as destino_gzip:
+            for bloque in iter(lambda: archivo.read(CHUNK_SIZE), b''):
+                original += len(bloque)
+                destino_gzip.write(bloque)
+        if comprimido.tell() > original * (1 - AHORRO_MINIMO_GZIP):
+            return
+        comprimido.seek(0)
+        destino = nombre_variante_gzip(nombre)
+        guardado = storage.save(destino, File(comprimido))
+    if guardado != destino:
+        # Ya existía (otro proceso la creó): se descarta la copia renombrada
+        storage.delete(guardado)
+
+
+def asegurar_hash(reporte):
+    """
+    Hash de contenido del reporte; para reportes anteriores a este campo se
+    calcula una vez y se guarda en todos los registros que comparten archivo
+    """
+    if reporte.hash_contenido:
+        return reporte.hash_contenido
+    with reporte.archivo.open('rb') as archivo:
+        reporte.hash_contenido = calcular_hash(archivo)
+    type(reporte).objects.filter(archivo=reporte.archivo.name, hash_contenido='').update(
+        hash_contenido=reporte.hash_contenido,
+        fecha_actualizacion=timezone.now(),
+    )
+    return reporte.hash_contenido
+
+
+def _acepta_gzip(request):
+    for codificacion in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        partes = [parte.strip() for parte in codificacion.split(';')]
+        if partes[0].lower() != 'gzip':
+            continue
+        # "gzip;q=0" significa que el cliente la rechaza
+        for parametro in partes[1:]:
+            clave, _, valor = parametro.partition('=')
+            if clave.strip() == 'q':
+                try:
+                    return float(valor) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def _parsear_rango(cabecera, tamano):
+    """
+    Interpreta una cabecera Range de un solo rango
+
+    Returns:
+        (inicio, fin) inclusivos, None si la cabecera no aplica (se responde
+        el archivo completo) o False si el rango no es satisfacible
+    """
+    coincidencia = _RE_RANGO.match(cabecera.strip())
+    if not coincidencia:
+        # Sintaxis inválida o varios rangos: se ignora y se envía completo
+        return None
+    inicio, fin = coincidencia.groups()
+    if not inicio and not fin:
+        return None
+    if not inicio:
+        # Sufijo: los últimos N bytes
+        largo = int(fin)
+        if largo == 0:
+            return False
+        return max(tamano - largo, 0), tamano - 1
+    inicio = int(inicio)
+    fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    if inicio >= tamano or fin < inicio:
+        return False
+    return inicio, fin
+
+
+def _leer_tramo(archivo, inicio, largo):
+    try:
+        archivo.seek(inicio)
+        pendiente = largo
+        while pendiente > 0:
+            bloque = archivo.read(min(CHUNK_SIZE, pendiente))
+            if not bloque:
+                break
+            pendiente -= len(bloque)
+            yield bloque
+    finally:
+        archivo.close()
+
+
+def respuesta_descarga(request, reporte):
+    """
+    Construye la respuesta de descarga de un reporte
+
+    - ETag fuerte con el hash del contenido y Last-Modified de la generación;
+      If-None-Match / If-Modified-Since coincidentes responden 304
+    - Range: bytes=inicio-fin responde 206 con solo ese tramo (If-Range con
+      un ETag o fecha que ya no coincide envía el archivo completo)
+    - Con Accept-Encoding: gzip y sin Range se envía la variante .gz si existe
+
+    Returns:
+        Tupla (response, transfiere_archivo): transfiere_archivo es False para
+        304 y para tramos que no empiezan en el byte 0 (reanudaciones)
+    """
+    storage = reporte.archivo.storage
+    nombre = reporte.archivo.name
+    hash_contenido = asegurar_hash(reporte)
+    etag = quote_etag(hash_contenido)
+    ultima_modificacion = reporte.fecha_generacion.timestamp()
+
+    def cabeceras(response, etag_respuesta=etag):
+        response['ETag'] = etag_respuesta
+        response['Last-Modified'] = http_date(ultima_modificacion)
+        # Privado (datos del taller) y siempre revalidado: la copia local se
+        # reutiliza con un 304 mientras el archivo no cambie
+        response['Cache-Control'] = 'private, no-cache'
+        response['Accept-Ranges'] = 'bytes'
+        response['Content-Disposition'] = f'attachment; filename="{nombre.split("/")[-1]}"'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    usar_gzip = (
+        variante_gzip_activa()
+        and 'HTTP_RANGE' not in request.META
+        and _acepta_gzip(request)
+        and storage.exists(nombre_variante_gzip(nombre))
+    )
+    # La variante comprimida es otra representación: su ETag se distingue
+    etag_respuesta = quote_etag(f'{hash_contenido}-gzip') if usar_gzip else etag
+
+    no_modificado = get_conditional_response(
+        request, etag=etag_respuesta, last_modified=int(ultima_modificacion)
+    )
+    if no_modificado is not None:
+        return cabeceras(no_modificado, etag_respuesta), False
+
+    content_type = CONTENT_TYPES.get(reporte.formato, 'application/octet-stream')
+    if usar_gzip:
+        nombre_gzip = nombre_variante_gzip(nombre)
+        tamano_gzip = storage.size(nombre_gzip)
+        response = StreamingHttpResponse(
+            _leer_tramo(storage.open(nombre_gzip, 'rb'), 0, tamano_gzip),
+            content_type=content_type,
+        )
+        response['Content-Encoding'] = 'gzip'
+        response['Content-Length'] = tamano_gzip
+        return cabeceras(response, etag_respuesta), True
+
+    tamano = storage.size(nombre)
+    rango = None
+    if 'HTTP_RANGE' in request.META and request.method == 'GET':
+        if _if_range_vigente(request, etag, ultima_modificacion):
+            rango = _parsear_rango(request.META['HTTP_RANGE'], tamano)
+
+    if rango is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{tamano}'
+        return cabeceras(response), False
+
+    inicio, fin = rango if rango else (0, tamano - 1)
+    largo = fin - inicio + 1 if tamano else 0
+    response = StreamingHttpResponse(
+        _leer_tramo(storage.open(nombre, 'rb'), inicio, largo),
+        content_type=content_type,
+        status=206 if rango else 200,
+    )
+    response['Content-Length'] = largo
+    if rango:
+        response['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+    return cabeceras(response), inicio == 0
+
+
+def _if_range_vigente(request, etag, ultima_modificacion):
+    """
+    If-Range: el rango solo se respeta si el archivo sigue siendo el mismo
+    """
+    valor = request.META.get('HTTP_IF_RANGE')
+    if not valor:
+        return True
+    if valor.startswith('"'):
+        return valor == etag
+    fecha = parse_http_date_safe(valor)
+    return fecha is not None and int(ultima_modificacion) <= fecha
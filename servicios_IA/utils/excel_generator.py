@@ -2,12 +2,19 @@
 Generador de reportes en formato Excel usando openpyxl
 """
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
 from io import BytesIO
-from datetime import datetime
+from datetime import date, datetime
+from itertools import chain, islice
+import tempfile
 from django.utils import timezone
 
+# Filas que se leen por adelantado para estimar el ancho de las columnas
+# (en modo write-only los anchos deben definirse antes de escribir filas)
+FILAS_MUESTRA_ANCHO = 200
+
 
 def generar_excel(titulo, encabezados, datos, hoja_nombre="Reporte"):
     """
@@ -98,6 +105,125 @@ def generar_excel(titulo, encabezados, datos, hoja_nombre="Reporte"):
     return excel_file
 
 
+def _crear_estilos_nombrados():
+    """
+    Crea los estilos nombrados del reporte una sola vez por libro.
+    Las celdas solo referencian el nombre, en lugar de copiar Font/Border por celda.
+    """
+    borde = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+    return [
+        NamedStyle(
+            name='reporte_titulo',
+            font=Font(bold=True, size=14),
+            alignment=Alignment(horizontal="center", vertical="center")
+        ),
+        NamedStyle(
+            name='reporte_fecha_generacion',
+            alignment=Alignment(horizontal="right")
+        ),
+        NamedStyle(
+            name='reporte_encabezado',
+            font=Font(bold=True, color="FFFFFF", size=12),
+            fill=PatternFill(start_color="3498DB", end_color="3498DB", fill_type="solid"),
+            alignment=Alignment(horizontal="center", vertical="center"),
+            border=borde
+        ),
+        NamedStyle(name='reporte_celda', border=borde),
+        NamedStyle(name='reporte_numero', border=borde, alignment=Alignment(horizontal="right")),
+        NamedStyle(name='reporte_fecha_hora', border=borde, number_format='yyyy-mm-dd h:mm:ss'),
+        NamedStyle(name='reporte_fecha', border=borde, number_format='yyyy-mm-dd'),
+    ]
+
+
+def _normalizar_valor(valor):
+    """
+    Convierte datetime con timezone a naive (hora local) para Excel
+    """
+    if isinstance(valor, datetime) and valor.tzinfo is not None:
+        return timezone.localtime(valor).replace(tzinfo=None)
+    return valor
+
+
+def _estilo_valor(valor):
+    """
+    Retorna el nombre del estilo que corresponde al tipo del valor
+    """
+    if isinstance(valor, datetime):
+        return 'reporte_fecha_hora'
+    if isinstance(valor, date):
+        return 'reporte_fecha'
+    if isinstance(valor, (int, float)):
+        return 'reporte_numero'
+    return 'reporte_celda'
+
+
+def _celda(ws, valor, estilo):
+    cell = WriteOnlyCell(ws, value=valor)
+    cell.style = estilo
+    return cell
+
+
+def generar_excel_streaming(titulo, encabezados, filas, hoja_nombre="Reporte"):
+    """
+    Genera un Excel con el mismo formato que generar_excel() pero en modo write-only:
+    las filas se consumen de un iterable (ej. un generador sobre el queryset) y
+    openpyxl las va volcando a disco, por lo que la memoria no crece con el reporte.
+
+    Args:
+        titulo: Título del reporte
+        encabezados: Lista de nombres de columnas
+        filas: Iterable de filas (listas o tuplas)
+        hoja_nombre: Nombre de la hoja
+
+    Returns:
+        Tuple (archivo temporal posicionado al inicio, cantidad de filas escritas)
+    """
+    wb = Workbook(write_only=True)
+    for estilo in _crear_estilos_nombrados():
+        wb.add_named_style(estilo)
+    ws = wb.create_sheet(title=hoja_nombre)
+
+    # Estimar anchos con una muestra de filas y los encabezados
+    filas = iter(filas)
+    muestra = [[_normalizar_valor(v) for v in fila] for fila in islice(filas, FILAS_MUESTRA_ANCHO)]
+    for col_idx, encabezado in enumerate(encabezados, start=1):
+        max_length = len(str(encabezado))
+        for fila in muestra:
+            if col_idx <= len(fila) and fila[col_idx - 1]:
+                max_length = max(max_length, len(str(fila[col_idx - 1])))
+        ws.column_dimensions[get_column_letter(col_idx)].width = min(max_length + 2, 50)
+
+    # Título y fecha de generación (filas 1 y 2 combinadas a lo ancho)
+    ultima_columna = get_column_letter(max(len(encabezados), 1))
+    ws.merged_cells.add(f"A1:{ultima_columna}1")
+    ws.merged_cells.add(f"A2:{ultima_columna}2")
+    ws.append([_celda(ws, titulo, 'reporte_titulo')])
+    ws.append([_celda(ws, f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')}", 'reporte_fecha_generacion')])
+    ws.append([])
+
+    # Encabezados
+    ws.append([_celda(ws, encabezado, 'reporte_encabezado') for encabezado in encabezados])
+
+    # Datos
+    total = 0
+    for fila in chain(muestra, (
+        [_normalizar_valor(v) for v in fila] for fila in filas
+    )):
+        ws.append([_celda(ws, valor, _estilo_valor(valor)) for valor in fila])
+        total += 1
+
+    excel_file = tempfile.TemporaryFile()
+    wb.save(excel_file)
+    excel_file.seek(0)
+
+    return excel_file, total
+
+
 def generar_excel_multiple_hojas(titulo_general, hojas_data):
     """
     Genera un Excel con múltiples hojas
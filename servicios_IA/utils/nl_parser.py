@@ -5,15 +5,21 @@ Soporta múltiples entidades: órdenes, clientes, vehículos, items, citas, pres
 facturas de proveedores, empleados, pagos, áreas y proveedores
 """
 import re
+import unicodedata
 import dateparser
 from datetime import datetime, timedelta
+from functools import lru_cache
 from django.utils import timezone
 from .whitelist import ENTIDADES_DISPONIBLES
 
+# Interpretaciones distintas que se recuerdan (las consultas se repiten mucho:
+# ejemplos de la interfaz, reportes programados, reintentos)
+TAMANIO_CACHE_INTERPRETACIONES = 512
+
 
 # Mapeo de palabras clave a entidades (expandido)
 KEYWORDS_ENTIDADES = {
-    'ordenes': ['orden', 'ordenes', 'órdenes', 'trabajo', 'trabajos', 'ot', 'reparacion', 'reparación'],
+    'ordenes': ['orden', 'ordenes', 'órdenes', 'trabajo', 'trabajos', 'ot', 'reparacion', 'reparación', 'ingreso', 'ingresos'],
     'clientes': ['cliente', 'clientes'],
     'vehiculos': ['vehiculo', 'vehiculos', 'vehículo', 'vehículos', 'auto', 'autos', 'carro', 'carros', 'moto', 'motos'],
     'items': ['item', 'items', 'repuesto', 'repuestos', 'producto', 'productos', 'pieza', 'piezas', 'inventario'],
@@ -123,6 +129,336 @@ COMPARADORES = {
     'entre': ['entre', 'rango', 'desde', 'hasta'],
 }
 
+# Meses por nombre (en orden: si hay varios, gana el primero del año)
+MESES = {
+    'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4,
+    'mayo': 5, 'junio': 6, 'julio': 7, 'agosto': 8,
+    'septiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12
+}
+
+# Expresiones de fechas relativas reconocidas por extraer_fechas
+PALABRAS_FECHAS = [
+    'este mes', 'este año', 'este ano', 'hoy', 'ayer', 'esta semana',
+    'último mes', 'ultimo mes', 'mes pasado',
+]
+
+# Palabras sueltas usadas por interpretar_consulta en filtros booleanos
+ORDEN_PAGADA = ['pagada', 'pagadas', 'con pago', 'cobrada', 'cobradas']
+ORDEN_SIN_PAGAR = ['sin pagar', 'pendiente pago', 'no pagada', 'no pagadas']
+CLIENTE_ACTIVO = ['activo', 'activos', 'habilitado', 'habilitados']
+CLIENTE_INACTIVO = ['inactivo', 'inactivos', 'deshabilitado', 'deshabilitados']
+PRESUPUESTO_CON_IMPUESTOS = ['con impuesto', 'con iva', 'con tax']
+PRESUPUESTO_SIN_IMPUESTOS = ['sin impuesto', 'sin iva', 'sin tax']
+EMPLEADO_ACTIVO = ['activo', 'activos', 'habilitado', 'trabajando']
+EMPLEADO_INACTIVO = ['inactivo', 'inactivos', 'deshabilitado', 'retirado']
+KEYWORDS_STOCK_BAJO = ['stock bajo', 'stock crítico', 'stock critico', 'poco stock', 'sin stock']
+
+# Palabras que piden un resumen (una fila por grupo) en lugar del listado de registros
+PALABRAS_CONTEO = ['cuantos', 'cuántos', 'cuantas', 'cuántas', 'cantidad de', 'numero de', 'número de', 'contar', 'conteo']
+PALABRAS_SUMA = ['suma de', 'sumar', 'total de', 'totales']
+PALABRAS_PROMEDIO = ['promedio', 'media de']
+PALABRAS_MAXIMO = ['máximo', 'maximo']
+PALABRAS_MINIMO = ['mínimo', 'minimo']
+# Con estas palabras "total de" se refiere a dinero (suma) y no a cantidad de registros.
+# Por sí solas no piden un resumen: "listar ingresos de octubre" es un listado
+PALABRAS_MONTO = [
+    'ingreso', 'ingresos', 'monto', 'montos', 'facturado', 'facturación', 'facturacion',
+    'dinero', 'ganancia', 'ganancias', 'recaudado',
+]
+# Los ingresos son lo cobrado: sus sumas y promedios se limitan a las órdenes pagadas
+PALABRAS_INGRESO = ['ingreso', 'ingresos']
+
+# Campo que se suma/promedia cuando la consulta no nombra uno
+CAMPO_MONTO_ENTIDAD = {
+    'ordenes': 'total',
+    'items': 'precio',
+    'presupuestos': 'total',
+    'facturas_proveedor': 'total',
+    'pagos': 'monto',
+    'empleados': 'sueldo',
+}
+
+ETIQUETAS_FUNCION = {
+    'count': 'Cantidad',
+    'sum': 'Suma de {}',
+    'avg': 'Promedio de {}',
+    'max': 'Máximo de {}',
+    'min': 'Mínimo de {}',
+}
+
+# Orden de prioridad al detectar la entidad por palabra clave
+# (más específico primero para evitar falsos positivos)
+ENTIDADES_ORDENADAS = [
+    'facturas_proveedor', 'citas', 'presupuestos', 'pagos',
+    'empleados', 'proveedores', 'areas', 'ordenes',
+    'clientes', 'vehiculos', 'items',
+]
+
+# Patrones de búsqueda de texto por entidad
+PATRONES_BUSQUEDA_TEXTO = {
+    'ordenes': [
+        (r'cliente\s+(?:llamado|con nombre|de nombre)\s+["\']?([^"\']+)["\']?', 'cliente__nombre__icontains'),
+        (r'placa\s+["\']?([A-Z0-9-]+)["\']?', 'vehiculo__numero_placa__icontains'),
+        (r'fallo\s+["\']?([^"\']+)["\']?', 'fallo_requerimiento__icontains'),
+    ],
+    'clientes': [
+        (r'nombre\s+(?:llamado|con nombre|de nombre)\s+["\']?([^"\']+)["\']?', 'nombre__icontains'),
+        (r'apellido\s+["\']?([^"\']+)["\']?', 'apellido__icontains'),
+        (r'nit\s+["\']?([0-9-]+)["\']?', 'nit__icontains'),
+        (r'telefono\s+["\']?([0-9-]+)["\']?', 'telefono__icontains'),
+    ],
+    'vehiculos': [
+        (r'marca\s+["\']?([^"\']+)["\']?', 'marca__nombre__icontains'),
+        (r'modelo\s+["\']?([^"\']+)["\']?', 'modelo__nombre__icontains'),
+        (r'placa\s+["\']?([A-Z0-9-]+)["\']?', 'numero_placa__icontains'),
+        (r'color\s+["\']?([^"\']+)["\']?', 'color__icontains'),
+        (r'vin\s+["\']?([A-Z0-9-]+)["\']?', 'vin__icontains'),
+    ],
+    'items': [
+        (r'nombre\s+["\']?([^"\']+)["\']?', 'nombre__icontains'),
+        (r'codigo\s+["\']?([A-Z0-9-]+)["\']?', 'codigo__icontains'),
+        (r'fabricante\s+["\']?([^"\']+)["\']?', 'fabricante__icontains'),
+    ],
+    'citas': [
+        (r'cliente\s+(?:llamado|con nombre|de nombre)\s+["\']?([^"\']+)["\']?', 'cliente__nombre__icontains'),
+        (r'empleado\s+(?:llamado|con nombre|de nombre)\s+["\']?([^"\']+)["\']?', 'empleado__nombre__icontains'),
+        (r'placa\s+["\']?([A-Z0-9-]+)["\']?', 'vehiculo__numero_placa__icontains'),
+    ],
+    'presupuestos': [
+        (r'cliente\s+(?:llamado|con nombre|de nombre)\s+["\']?([^"\']+)["\']?', 'cliente__nombre__icontains'),
+        (r'placa\s+["\']?([A-Z0-9-]+)["\']?', 'vehiculo__numero_placa__icontains'),
+        (r'diagnostico\s+["\']?([^"\']+)["\']?', 'diagnostico__icontains'),
+    ],
+    'facturas_proveedor': [
+        (r'numero\s+["\']?([A-Z0-9-]+)["\']?', 'numero__icontains'),
+        (r'proveedor\s+(?:llamado|con nombre|de nombre)\s+["\']?([^"\']+)["\']?', 'proveedor__nombre__icontains'),
+    ],
+    'empleados': [
+        (r'nombre\s+(?:llamado|con nombre|de nombre)\s+["\']?([^"\']+)["\']?', 'nombre__icontains'),
+        (r'apellido\s+["\']?([^"\']+)["\']?', 'apellido__icontains'),
+        (r'ci\s+["\']?([0-9-]+)["\']?', 'ci__icontains'),
+        (r'cargo\s+["\']?([^"\']+)["\']?', 'cargo__nombre__icontains'),
+        (r'area\s+["\']?([^"\']+)["\']?', 'area__nombre__icontains'),
+    ],
+    'pagos': [
+        (r'referencia\s+["\']?([A-Z0-9-]+)["\']?', 'numero_referencia__icontains'),
+        (r'orden\s+(?:numero|#)?\s*(\d+)', 'orden_trabajo__id'),
+    ],
+    'proveedores': [
+        (r'nombre\s+["\']?([^"\']+)["\']?', 'nombre__icontains'),
+        (r'nit\s+["\']?([0-9-]+)["\']?', 'nit__icontains'),
+        (r'contacto\s+["\']?([^"\']+)["\']?', 'contacto__icontains'),
+    ],
+    'areas': [
+        (r'nombre\s+["\']?([^"\']+)["\']?', 'nombre__icontains'),
+    ],
+}
+
+# Frases de formato: detectar_formato busca cualquiera, limpiar_formato_de_consulta las elimina
+PATRONES_EXCEL = [
+    r'en excel', r'en xlsx', r'formato excel', r'formato xlsx', r'como excel',
+    r'como xlsx', r'exportar a excel', r'exportar a xlsx', r'generar excel', r'generar xlsx',
+]
+PATRONES_PDF = [
+    r'en pdf', r'formato pdf', r'como pdf', r'exportar a pdf', r'generar pdf',
+]
+PATRONES_LIMPIEZA_FORMATO = [
+    r'\s+en\s+excel\s*',
+    r'\s+en\s+xlsx\s*',
+    r'\s+en\s+pdf\s*',
+    r'\s+formato\s+excel\s*',
+    r'\s+formato\s+xlsx\s*',
+    r'\s+formato\s+pdf\s*',
+    r'\s+como\s+excel\s*',
+    r'\s+como\s+xlsx\s*',
+    r'\s+como\s+pdf\s*',
+    r'\s+exportar\s+a\s+excel\s*',
+    r'\s+exportar\s+a\s+xlsx\s*',
+    r'\s+exportar\s+a\s+pdf\s*',
+    r'\s+generar\s+excel\s*',
+    r'\s+generar\s+xlsx\s*',
+    r'\s+generar\s+pdf\s*',
+]
+
+
+# Expresiones y tablas de búsqueda precompiladas al importar el módulo
+_RE_LISTA_ENTIDAD = re.compile(
+    r'(?:dame|muestra|lista|reporte|reportes?|ver|mostrar|obtener|buscar)\s+(?:de\s+)?(?:los?\s+|las?\s+)?(orden[e]?s?|cliente[s]?|vehiculo[s]?|vehículo[s]?|auto[s]?|item[s]?|repuesto[s]?|servicio[s]?|cita[s]?|presupuesto[s]?|factura[s]?|empleado[s]?|tecnico[s]?|técnico[s]?|pago[s]?|proveedor[e]?s?|area[s]?|área[s]?)'
+)
+_RE_ULTIMOS_DIAS = re.compile(r'últimos? (\d+) días?|ultimos? (\d+) dias?')
+_RE_ULTIMAS_SEMANAS = re.compile(r'últimas? (\d+) semanas?|ultimas? (\d+) semanas?')
+_RE_ANIO = re.compile(r'\b(20\d{2})\b')
+_RE_FECHA_DESDE = re.compile(r'desde (\d{1,2}[-/]\d{1,2}[-/]\d{2,4})')
+_RE_FECHA_HASTA = re.compile(r'hasta (\d{1,2}[-/]\d{1,2}[-/]\d{2,4})')
+_RE_EXCEL = re.compile('|'.join(PATRONES_EXCEL))
+_RE_PDF = re.compile('|'.join(PATRONES_PDF))
+_RE_LIMPIEZA_FORMATO = [re.compile(patron, re.IGNORECASE) for patron in PATRONES_LIMPIEZA_FORMATO]
+_RE_ESPACIOS = re.compile(r'\s+')
+_RE_LIMITES = [
+    re.compile(patron)
+    for patron in (
+        r'top\s+(\d+)',
+        r'primeros?\s+(\d+)',
+        r'ultimos?\s+(\d+)',
+        r'últimos?\s+(\d+)',
+        r'solo\s+(\d+)',
+        r'limit[e]?\s+(\d+)',
+    )
+]
+_RE_BUSQUEDA_TEXTO = {
+    entidad: [(re.compile(patron), filtro_key) for patron, filtro_key in patrones]
+    for entidad, patrones in PATRONES_BUSQUEDA_TEXTO.items()
+}
+
+
+def _indexar_tabla(tabla):
+    """
+    Convierte una tabla {clave: [palabras]} en {palabra: (prioridad, clave)}.
+    La prioridad es el orden de la clave en la tabla: con varias coincidencias
+    gana la primera clave, igual que al recorrer la tabla en orden.
+    """
+    indice = {}
+    for prioridad, (clave, keywords) in enumerate(tabla.items()):
+        for keyword in keywords:
+            indice.setdefault(keyword, (prioridad, clave))
+    return indice
+
+
+_INDICE_ENTIDADES = _indexar_tabla({entidad: KEYWORDS_ENTIDADES[entidad] for entidad in ENTIDADES_ORDENADAS})
+_INDICE_ESTADOS_ORDENES = _indexar_tabla(ESTADOS_ORDENES)
+_INDICE_ESTADOS_CITAS = _indexar_tabla(ESTADOS_CITAS)
+_INDICE_TIPOS_CITA = _indexar_tabla(TIPOS_CITA)
+_INDICE_ESTADOS_PRESUPUESTOS = _indexar_tabla(ESTADOS_PRESUPUESTOS)
+_INDICE_ESTADOS_PAGOS = _indexar_tabla(ESTADOS_PAGOS)
+_INDICE_METODOS_PAGO = _indexar_tabla(METODOS_PAGO)
+_INDICE_TIPOS_ITEMS = _indexar_tabla(TIPOS_ITEMS)
+_INDICE_ESTADOS_ITEMS = _indexar_tabla(ESTADOS_ITEMS)
+_INDICE_TIPOS_CLIENTE = _indexar_tabla(TIPOS_CLIENTE)
+_INDICE_TIPOS_VEHICULO = _indexar_tabla(TIPOS_VEHICULO)
+_INDICE_SEXO_EMPLEADO = _indexar_tabla(SEXO_EMPLEADO)
+
+
+def _recolectar_palabras():
+    palabras = set(PALABRAS_FECHAS) | set(MESES)
+    for indice in (
+        _INDICE_ENTIDADES, _INDICE_ESTADOS_ORDENES, _INDICE_ESTADOS_CITAS, _INDICE_TIPOS_CITA,
+        _INDICE_ESTADOS_PRESUPUESTOS, _INDICE_ESTADOS_PAGOS, _INDICE_METODOS_PAGO,
+        _INDICE_TIPOS_ITEMS, _INDICE_ESTADOS_ITEMS, _INDICE_TIPOS_CLIENTE,
+        _INDICE_TIPOS_VEHICULO, _INDICE_SEXO_EMPLEADO,
+    ):
+        palabras.update(indice)
+    for lista in (
+        ORDEN_PAGADA, ORDEN_SIN_PAGAR, CLIENTE_ACTIVO, CLIENTE_INACTIVO,
+        PRESUPUESTO_CON_IMPUESTOS, PRESUPUESTO_SIN_IMPUESTOS,
+        EMPLEADO_ACTIVO, EMPLEADO_INACTIVO, KEYWORDS_STOCK_BAJO,
+        PALABRAS_CONTEO, PALABRAS_SUMA, PALABRAS_PROMEDIO, PALABRAS_MAXIMO,
+        PALABRAS_MINIMO, PALABRAS_MONTO,
+    ):
+        palabras.update(lista)
+    return palabras
+
+
+def _patron_trie(palabras):
+    """
+    Arma una expresión regular con forma de trie (prefijos comunes
+    factorizados): en cada posición el motor avanza carácter a carácter en
+    lugar de probar cada palabra. Los opcionales codiciosos hacen que la
+    coincidencia sea siempre la palabra más larga que empieza ahí.
+    """
+    trie = {}
+    for palabra in palabras:
+        nodo = trie
+        for caracter in palabra:
+            nodo = nodo.setdefault(caracter, {})
+        nodo[''] = {}
+
+    def construir(nodo):
+        es_final = '' in nodo
+        ramas = [re.escape(caracter) + construir(hijo) for caracter, hijo in sorted(nodo.items()) if caracter]
+        if not ramas:
+            return ''
+        if len(ramas) == 1 and not es_final:
+            return ramas[0]
+        return '(?:' + '|'.join(ramas) + ')' + ('?' if es_final else '')
+
+    return construir(trie)
+
+
+# Todas las palabras clave en una sola expresión. El lookahead permite
+# coincidencias superpuestas: en cada posición se obtiene la palabra más larga
+# y las más cortas que empiezan en esa misma posición son prefijos suyos, que
+# se agregan con _CONTENIDAS. Así el resultado es exactamente el conjunto de
+# palabras para las que `palabra in consulta` es verdadero.
+_PALABRAS_CLAVE = sorted(_recolectar_palabras())
+_RE_PALABRAS_CLAVE = re.compile('(?=(' + _patron_trie(_PALABRAS_CLAVE) + '))')
+_CONTENIDAS = {
+    palabra: frozenset(otra for otra in _PALABRAS_CLAVE if otra in palabra)
+    for palabra in _PALABRAS_CLAVE
+}
+
+
+class _ConsultaAnalizada:
+    """
+    Consulta en minúsculas (con y sin acentos) con el conjunto de palabras
+    clave que contiene, calculado en una sola pasada
+    """
+    __slots__ = ('texto', 'sin_acentos', 'palabras')
+
+    def __init__(self, consulta):
+        self.texto = consulta.lower()
+        self.sin_acentos = _sin_acentos(self.texto)
+        palabras = set()
+        for match in _RE_PALABRAS_CLAVE.finditer(self.texto):
+            palabras |= _CONTENIDAS[match.group(1)]
+        self.palabras = frozenset(palabras)
+
+    def contiene(self, keywords):
+        return not self.palabras.isdisjoint(keywords)
+
+
+@lru_cache(maxsize=TAMANIO_CACHE_INTERPRETACIONES)
+def _analizar(consulta):
+    return _ConsultaAnalizada(consulta)
+
+
+def _buscar_en_tabla(consulta, indice):
+    """
+    Retorna la primera clave de la tabla (según su orden) con alguna
+    palabra presente en la consulta, o None
+    """
+    coincidencias = [indice[palabra] for palabra in _analizar(consulta).palabras if palabra in indice]
+    return min(coincidencias)[1] if coincidencias else None
+
+
+def _parsear_fecha(texto):
+    """
+    Fecha dd/mm/aaaa (o dd-mm-aa) de _RE_FECHA_DESDE/_RE_FECHA_HASTA. Se
+    interpreta directamente; dateparser solo se usa si no es una fecha válida
+    en ese orden (mismo resultado, sin su costo en el caso común)
+    """
+    dia, mes, anio = re.split(r'[-/]', texto)
+    formato = {2: '%d/%m/%y', 4: '%d/%m/%Y'}.get(len(anio))
+    if formato:
+        try:
+            return datetime.strptime(f'{dia}/{mes}/{anio}', formato)
+        except ValueError:
+            pass
+    return dateparser.parse(texto, languages=['es'])
+
+
+@lru_cache(maxsize=None)
+def _patrones_comparacion(campo_base):
+    patrones = [
+        (rf'{campo_base}\s+mayor\s+(?:a|que|de)\s+(\d+(?:\.\d+)?)', f'{campo_base}__gt'),
+        (rf'{campo_base}\s+menor\s+(?:a|que|de)\s+(\d+(?:\.\d+)?)', f'{campo_base}__lt'),
+        (rf'{campo_base}\s+igual\s+(?:a|que)\s+(\d+(?:\.\d+)?)', campo_base),
+        (rf'mayor\s+(?:a|que|de)\s+(\d+(?:\.\d+)?)', f'{campo_base}__gt'),
+        (rf'menor\s+(?:a|que|de)\s+(\d+(?:\.\d+)?)', f'{campo_base}__lt'),
+        (rf'más\s+de\s+(\d+(?:\.\d+)?)', f'{campo_base}__gt'),
+        (rf'menos\s+de\s+(\d+(?:\.\d+)?)', f'{campo_base}__lt'),
+    ]
+    return [(re.compile(patron), filtro_key) for patron, filtro_key in patrones]
+
 
 def detectar_entidad(consulta):
     """
@@ -135,12 +471,11 @@ def detectar_entidad(consulta):
     Returns:
         String con el ID de la entidad o None
     """
-    consulta_lower = consulta.lower()
+    consulta_lower = _analizar(consulta).texto
     
     # Buscar patrones que indiquen claramente la entidad principal
     # "dame/muestra/lista de X" donde X es la entidad principal
-    patron_lista = r'(?:dame|muestra|lista|reporte|reportes?|ver|mostrar|obtener|buscar)\s+(?:de\s+)?(?:los?\s+|las?\s+)?(orden[e]?s?|cliente[s]?|vehiculo[s]?|vehículo[s]?|auto[s]?|item[s]?|repuesto[s]?|servicio[s]?|cita[s]?|presupuesto[s]?|factura[s]?|empleado[s]?|tecnico[s]?|técnico[s]?|pago[s]?|proveedor[e]?s?|area[s]?|área[s]?)'
-    match = re.search(patron_lista, consulta_lower)
+    match = _RE_LISTA_ENTIDAD.search(consulta_lower)
     if match:
         entidad_texto = match.group(1)
         # Mapear el texto a la entidad
@@ -168,18 +503,8 @@ def detectar_entidad(consulta):
             return 'areas'
     
     # Si no hay patrón específico, buscar la primera coincidencia por peso
-    # (más específico primero para evitar falsos positivos)
-    entidades_ordenadas = ['facturas_proveedor', 'citas', 'presupuestos', 'pagos', 
-                           'empleados', 'proveedores', 'areas', 'ordenes', 
-                           'clientes', 'vehiculos', 'items']
-    
-    for entidad_id in entidades_ordenadas:
-        keywords = KEYWORDS_ENTIDADES.get(entidad_id, [])
-        for keyword in keywords:
-            if keyword in consulta_lower:
-                return entidad_id
-    
-    return None
+    # (ENTIDADES_ORDENADAS: más específico primero)
+    return _buscar_en_tabla(consulta, _INDICE_ENTIDADES)
 
 
 def extraer_fechas(consulta):
@@ -193,11 +518,13 @@ def extraer_fechas(consulta):
         Dict con fecha_desde y fecha_hasta si se encuentran
     """
     fechas = {}
-    consulta_lower = consulta.lower()
+    analizada = _analizar(consulta)
+    consulta_lower = analizada.texto
+    palabras = analizada.palabras
     now = timezone.now()
     
     # Este mes
-    if 'este mes' in consulta_lower:
+    if 'este mes' in palabras:
         fecha_desde = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         fecha_hasta = now
         fechas['fecha_desde'] = fecha_desde
@@ -205,7 +532,7 @@ def extraer_fechas(consulta):
         return fechas
     
     # Este año
-    if 'este año' in consulta_lower or 'este ano' in consulta_lower:
+    if 'este año' in palabras or 'este ano' in palabras:
         fecha_desde = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
         fecha_hasta = now
         fechas['fecha_desde'] = fecha_desde
@@ -213,7 +540,7 @@ def extraer_fechas(consulta):
         return fechas
     
     # Hoy
-    if 'hoy' in consulta_lower:
+    if 'hoy' in palabras:
         fecha_desde = now.replace(hour=0, minute=0, second=0, microsecond=0)
         fecha_hasta = now
         fechas['fecha_desde'] = fecha_desde
@@ -221,7 +548,7 @@ def extraer_fechas(consulta):
         return fechas
     
     # Ayer
-    if 'ayer' in consulta_lower:
+    if 'ayer' in palabras:
         ayer = now - timedelta(days=1)
         fecha_desde = ayer.replace(hour=0, minute=0, second=0, microsecond=0)
         fecha_hasta = ayer.replace(hour=23, minute=59, second=59)
@@ -230,7 +557,7 @@ def extraer_fechas(consulta):
         return fechas
     
     # Esta semana
-    if 'esta semana' in consulta_lower:
+    if 'esta semana' in palabras:
         fecha_desde = now - timedelta(days=now.weekday())
         fecha_hasta = now
         fechas['fecha_desde'] = fecha_desde
@@ -238,7 +565,7 @@ def extraer_fechas(consulta):
         return fechas
     
     # Último mes / mes pasado
-    if 'último mes' in consulta_lower or 'ultimo mes' in consulta_lower or 'mes pasado' in consulta_lower:
+    if 'último mes' in palabras or 'ultimo mes' in palabras or 'mes pasado' in palabras:
         primer_dia_mes_actual = now.replace(day=1)
         ultimo_dia_mes_pasado = primer_dia_mes_actual - timedelta(days=1)
         primer_dia_mes_pasado = ultimo_dia_mes_pasado.replace(day=1)
@@ -247,7 +574,7 @@ def extraer_fechas(consulta):
         return fechas
     
     # Últimos X días
-    match_dias = re.search(r'últimos? (\d+) días?|ultimos? (\d+) dias?', consulta_lower)
+    match_dias = _RE_ULTIMOS_DIAS.search(consulta_lower)
     if match_dias:
         dias = int(match_dias.group(1) or match_dias.group(2))
         fecha_desde = now - timedelta(days=dias)
@@ -257,7 +584,7 @@ def extraer_fechas(consulta):
         return fechas
     
     # Últimas X semanas
-    match_semanas = re.search(r'últimas? (\d+) semanas?|ultimas? (\d+) semanas?', consulta_lower)
+    match_semanas = _RE_ULTIMAS_SEMANAS.search(consulta_lower)
     if match_semanas:
         semanas = int(match_semanas.group(1) or match_semanas.group(2))
         fecha_desde = now - timedelta(weeks=semanas)
@@ -267,16 +594,10 @@ def extraer_fechas(consulta):
         return fechas
     
     # Buscar meses específicos (enero, febrero, etc.)
-    meses = {
-        'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4,
-        'mayo': 5, 'junio': 6, 'julio': 7, 'agosto': 8,
-        'septiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12
-    }
-    
-    for mes_nombre, mes_num in meses.items():
-        if mes_nombre in consulta_lower:
+    for mes_nombre, mes_num in MESES.items():
+        if mes_nombre in palabras:
             # Extraer año si está presente
-            year_match = re.search(r'\b(20\d{2})\b', consulta)
+            year_match = _RE_ANIO.search(consulta)
             year = int(year_match.group(1)) if year_match else timezone.now().year
             
             fecha_inicio = timezone.datetime(year, mes_num, 1)
@@ -290,16 +611,16 @@ def extraer_fechas(consulta):
             return fechas
     
     # Intentar parsear fechas absolutas con dateparser
-    fecha_desde_match = re.search(r'desde (\d{1,2}[-/]\d{1,2}[-/]\d{2,4})', consulta_lower)
-    fecha_hasta_match = re.search(r'hasta (\d{1,2}[-/]\d{1,2}[-/]\d{2,4})', consulta_lower)
+    fecha_desde_match = _RE_FECHA_DESDE.search(consulta_lower)
+    fecha_hasta_match = _RE_FECHA_HASTA.search(consulta_lower)
     
     if fecha_desde_match:
-        fecha_desde = dateparser.parse(fecha_desde_match.group(1), languages=['es'])
+        fecha_desde = _parsear_fecha(fecha_desde_match.group(1))
         if fecha_desde:
             fechas['fecha_desde'] = timezone.make_aware(fecha_desde) if timezone.is_naive(fecha_desde) else fecha_desde
     
     if fecha_hasta_match:
-        fecha_hasta = dateparser.parse(fecha_hasta_match.group(1), languages=['es'])
+        fecha_hasta = _parsear_fecha(fecha_hasta_match.group(1))
         if fecha_hasta:
             fechas['fecha_hasta'] = timezone.make_aware(fecha_hasta) if timezone.is_naive(fecha_hasta) else fecha_hasta
     
@@ -316,14 +637,7 @@ def extraer_estado_orden(consulta):
     Returns:
         String con el estado o None
     """
-    consulta_lower = consulta.lower()
-    
-    for estado_key, keywords in ESTADOS_ORDENES.items():
-        for keyword in keywords:
-            if keyword in consulta_lower:
-                return estado_key
-    
-    return None
+    return _buscar_en_tabla(consulta, _INDICE_ESTADOS_ORDENES)
 
 
 def extraer_estado_cita(consulta):
@@ -336,14 +650,7 @@ def extraer_estado_cita(consulta):
     Returns:
         String con el estado o None
     """
-    consulta_lower = consulta.lower()
-    
-    for estado_key, keywords in ESTADOS_CITAS.items():
-        for keyword in keywords:
-            if keyword in consulta_lower:
-                return estado_key
-    
-    return None
+    return _buscar_en_tabla(consulta, _INDICE_ESTADOS_CITAS)
 
 
 def extraer_tipo_cita(consulta):
@@ -356,14 +663,7 @@ def extraer_tipo_cita(consulta):
     Returns:
         String con el tipo o None
     """
-    consulta_lower = consulta.lower()
-    
-    for tipo_key, keywords in TIPOS_CITA.items():
-        for keyword in keywords:
-            if keyword in consulta_lower:
-                return tipo_key
-    
-    return None
+    return _buscar_en_tabla(consulta, _INDICE_TIPOS_CITA)
 
 
 def extraer_estado_presupuesto(consulta):
@@ -376,14 +676,7 @@ def extraer_estado_presupuesto(consulta):
     Returns:
         String con el estado o None
     """
-    consulta_lower = consulta.lower()
-    
-    for estado_key, keywords in ESTADOS_PRESUPUESTOS.items():
-        for keyword in keywords:
-            if keyword in consulta_lower:
-                return estado_key
-    
-    return None
+    return _buscar_en_tabla(consulta, _INDICE_ESTADOS_PRESUPUESTOS)
 
 
 def extraer_estado_pago(consulta):
@@ -396,14 +689,7 @@ def extraer_estado_pago(consulta):
     Returns:
         String con el estado o None
     """
-    consulta_lower = consulta.lower()
-    
-    for estado_key, keywords in ESTADOS_PAGOS.items():
-        for keyword in keywords:
-            if keyword in consulta_lower:
-                return estado_key
-    
-    return None
+    return _buscar_en_tabla(consulta, _INDICE_ESTADOS_PAGOS)
 
 
 def extraer_metodo_pago(consulta):
@@ -416,14 +702,7 @@ def extraer_metodo_pago(consulta):
     Returns:
         String con el método o None
     """
-    consulta_lower = consulta.lower()
-    
-    for metodo_key, keywords in METODOS_PAGO.items():
-        for keyword in keywords:
-            if keyword in consulta_lower:
-                return metodo_key
-    
-    return None
+    return _buscar_en_tabla(consulta, _INDICE_METODOS_PAGO)
 
 
 def extraer_tipo_cliente(consulta):
@@ -436,14 +715,7 @@ def extraer_tipo_cliente(consulta):
     Returns:
         String con el tipo o None
     """
-    consulta_lower = consulta.lower()
-    
-    for tipo_key, keywords in TIPOS_CLIENTE.items():
-        for keyword in keywords:
-            if keyword in consulta_lower:
-                return tipo_key
-    
-    return None
+    return _buscar_en_tabla(consulta, _INDICE_TIPOS_CLIENTE)
 
 
 def extraer_tipo_vehiculo(consulta):
@@ -456,14 +728,7 @@ def extraer_tipo_vehiculo(consulta):
     Returns:
         String con el tipo o None
     """
-    consulta_lower = consulta.lower()
-    
-    for tipo_key, keywords in TIPOS_VEHICULO.items():
-        for keyword in keywords:
-            if keyword in consulta_lower:
-                return tipo_key
-    
-    return None
+    return _buscar_en_tabla(consulta, _INDICE_TIPOS_VEHICULO)
 
 
 def extraer_sexo_empleado(consulta):
@@ -476,14 +741,7 @@ def extraer_sexo_empleado(consulta):
     Returns:
         String con el sexo o None
     """
-    consulta_lower = consulta.lower()
-    
-    for sexo_key, keywords in SEXO_EMPLEADO.items():
-        for keyword in keywords:
-            if keyword in consulta_lower:
-                return sexo_key
-    
-    return None
+    return _buscar_en_tabla(consulta, _INDICE_SEXO_EMPLEADO)
 
 
 def extraer_estado_item(consulta):
@@ -496,14 +754,7 @@ def extraer_estado_item(consulta):
     Returns:
         String con el estado o None
     """
-    consulta_lower = consulta.lower()
-    
-    for estado_key, keywords in ESTADOS_ITEMS.items():
-        for keyword in keywords:
-            if keyword in consulta_lower:
-                return estado_key
-    
-    return None
+    return _buscar_en_tabla(consulta, _INDICE_ESTADOS_ITEMS)
 
 
 def extraer_tipo_item(consulta):
@@ -516,14 +767,7 @@ def extraer_tipo_item(consulta):
     Returns:
         String con el tipo o None
     """
-    consulta_lower = consulta.lower()
-    
-    for tipo_key, keywords in TIPOS_ITEMS.items():
-        for keyword in keywords:
-            if keyword in consulta_lower:
-                return tipo_key
-    
-    return None
+    return _buscar_en_tabla(consulta, _INDICE_TIPOS_ITEMS)
 
 
 def extraer_comparacion_numerica(consulta, campo_base):
@@ -538,21 +782,11 @@ def extraer_comparacion_numerica(consulta, campo_base):
         Dict con los filtros numéricos
     """
     filtros = {}
-    consulta_lower = consulta.lower()
-    
-    # Patrones para extraer números
-    patrones = [
-        (rf'{campo_base}\s+mayor\s+(?:a|que|de)\s+(\d+(?:\.\d+)?)', f'{campo_base}__gt'),
-        (rf'{campo_base}\s+menor\s+(?:a|que|de)\s+(\d+(?:\.\d+)?)', f'{campo_base}__lt'),
-        (rf'{campo_base}\s+igual\s+(?:a|que)\s+(\d+(?:\.\d+)?)', campo_base),
-        (rf'mayor\s+(?:a|que|de)\s+(\d+(?:\.\d+)?)', f'{campo_base}__gt'),
-        (rf'menor\s+(?:a|que|de)\s+(\d+(?:\.\d+)?)', f'{campo_base}__lt'),
-        (rf'más\s+de\s+(\d+(?:\.\d+)?)', f'{campo_base}__gt'),
-        (rf'menos\s+de\s+(\d+(?:\.\d+)?)', f'{campo_base}__lt'),
-    ]
+    consulta_lower = _analizar(consulta).texto
     
-    for patron, filtro_key in patrones:
-        match = re.search(patron, consulta_lower)
+    # Patrones para extraer números (compilados una vez por campo)
+    for patron, filtro_key in _patrones_comparacion(campo_base):
+        match = patron.search(consulta_lower)
         if match:
             valor = float(match.group(1))
             filtros[filtro_key] = valor
@@ -571,10 +805,7 @@ def extraer_stock_bajo(consulta):
     Returns:
         Bool indicando si se debe filtrar por stock bajo
     """
-    consulta_lower = consulta.lower()
-    keywords_stock_bajo = ['stock bajo', 'stock crítico', 'stock critico', 'poco stock', 'sin stock']
-    
-    return any(keyword in consulta_lower for keyword in keywords_stock_bajo)
+    return _analizar(consulta).contiene(KEYWORDS_STOCK_BAJO)
 
 
 def extraer_busqueda_texto(consulta, entidad):
@@ -589,71 +820,12 @@ def extraer_busqueda_texto(consulta, entidad):
         Dict con filtros de texto
     """
     filtros = {}
-    consulta_lower = consulta.lower()
+    consulta_lower = _analizar(consulta).texto
     
-    # Patrones comunes por entidad
-    patrones = {
-        'ordenes': [
-            (r'cliente\s+(?:llamado|con nombre|de nombre)\s+["\']?([^"\']+)["\']?', 'cliente__nombre__icontains'),
-            (r'placa\s+["\']?([A-Z0-9-]+)["\']?', 'vehiculo__numero_placa__icontains'),
-            (r'fallo\s+["\']?([^"\']+)["\']?', 'fallo_requerimiento__icontains'),
-        ],
-        'clientes': [
-            (r'nombre\s+(?:llamado|con nombre|de nombre)\s+["\']?([^"\']+)["\']?', 'nombre__icontains'),
-            (r'apellido\s+["\']?([^"\']+)["\']?', 'apellido__icontains'),
-            (r'nit\s+["\']?([0-9-]+)["\']?', 'nit__icontains'),
-            (r'telefono\s+["\']?([0-9-]+)["\']?', 'telefono__icontains'),
-        ],
-        'vehiculos': [
-            (r'marca\s+["\']?([^"\']+)["\']?', 'marca__nombre__icontains'),
-            (r'modelo\s+["\']?([^"\']+)["\']?', 'modelo__nombre__icontains'),
-            (r'placa\s+["\']?([A-Z0-9-]+)["\']?', 'numero_placa__icontains'),
-            (r'color\s+["\']?([^"\']+)["\']?', 'color__icontains'),
-            (r'vin\s+["\']?([A-Z0-9-]+)["\']?', 'vin__icontains'),
-        ],
-        'items': [
-            (r'nombre\s+["\']?([^"\']+)["\']?', 'nombre__icontains'),
-            (r'codigo\s+["\']?([A-Z0-9-]+)["\']?', 'codigo__icontains'),
-            (r'fabricante\s+["\']?([^"\']+)["\']?', 'fabricante__icontains'),
-        ],
-        'citas': [
-            (r'cliente\s+(?:llamado|con nombre|de nombre)\s+["\']?([^"\']+)["\']?', 'cliente__nombre__icontains'),
-            (r'empleado\s+(?:llamado|con nombre|de nombre)\s+["\']?([^"\']+)["\']?', 'empleado__nombre__icontains'),
-            (r'placa\s+["\']?([A-Z0-9-]+)["\']?', 'vehiculo__numero_placa__icontains'),
-        ],
-        'presupuestos': [
-            (r'cliente\s+(?:llamado|con nombre|de nombre)\s+["\']?([^"\']+)["\']?', 'cliente__nombre__icontains'),
-            (r'placa\s+["\']?([A-Z0-9-]+)["\']?', 'vehiculo__numero_placa__icontains'),
-            (r'diagnostico\s+["\']?([^"\']+)["\']?', 'diagnostico__icontains'),
-        ],
-        'facturas_proveedor': [
-            (r'numero\s+["\']?([A-Z0-9-]+)["\']?', 'numero__icontains'),
-            (r'proveedor\s+(?:llamado|con nombre|de nombre)\s+["\']?([^"\']+)["\']?', 'proveedor__nombre__icontains'),
-        ],
-        'empleados': [
-            (r'nombre\s+(?:llamado|con nombre|de nombre)\s+["\']?([^"\']+)["\']?', 'nombre__icontains'),
-            (r'apellido\s+["\']?([^"\']+)["\']?', 'apellido__icontains'),
-            (r'ci\s+["\']?([0-9-]+)["\']?', 'ci__icontains'),
-            (r'cargo\s+["\']?([^"\']+)["\']?', 'cargo__nombre__icontains'),
-            (r'area\s+["\']?([^"\']+)["\']?', 'area__nombre__icontains'),
-        ],
-        'pagos': [
-            (r'referencia\s+["\']?([A-Z0-9-]+)["\']?', 'numero_referencia__icontains'),
-            (r'orden\s+(?:numero|#)?\s*(\d+)', 'orden_trabajo__id'),
-        ],
-        'proveedores': [
-            (r'nombre\s+["\']?([^"\']+)["\']?', 'nombre__icontains'),
-            (r'nit\s+["\']?([0-9-]+)["\']?', 'nit__icontains'),
-            (r'contacto\s+["\']?([^"\']+)["\']?', 'contacto__icontains'),
-        ],
-        'areas': [
-            (r'nombre\s+["\']?([^"\']+)["\']?', 'nombre__icontains'),
-        ],
-    }
-    
-    if entidad in patrones:
-        for patron, filtro_key in patrones[entidad]:
-            match = re.search(patron, consulta_lower)
+    # Patrones comunes por entidad (PATRONES_BUSQUEDA_TEXTO)
+    if entidad in _RE_BUSQUEDA_TEXTO:
+        for patron, filtro_key in _RE_BUSQUEDA_TEXTO[entidad]:
+            match = patron.search(consulta_lower)
             if match:
                 valor = match.group(1).strip()
                 # Convertir a int si el filtro es para ID
@@ -671,6 +843,9 @@ def interpretar_consulta(consulta):
     """
     Función principal que interpreta una consulta en lenguaje natural
     
+    Las interpretaciones se memorizan por (consulta, día): las fechas
+    relativas ("este mes", "hoy") dependen del día en que se interpretan.
+    
     Args:
         consulta: String con la consulta del usuario
     
@@ -682,12 +857,38 @@ def interpretar_consulta(consulta):
         - formato: Formato de salida solicitado (PDF o XLSX)
         - error: String con mensaje de error si no se puede interpretar
     """
+    resultado = _interpretar_cacheado(consulta, timezone.now().date())
+    # Copia: quien llama puede modificar el resultado sin alterar la caché
+    # (los valores de filtros y campos son inmutables)
+    return {
+        **resultado,
+        'filtros': dict(resultado['filtros']),
+        'campos_sugeridos': list(resultado['campos_sugeridos']),
+        'agregacion': dict(resultado['agregacion']) if resultado['agregacion'] else None,
+    }
+
+
+@lru_cache(maxsize=TAMANIO_CACHE_INTERPRETACIONES)
+def _interpretar_cacheado(consulta, dia):
+    return _interpretar(consulta)
+
+
+def limpiar_cache_interpretaciones():
+    """
+    Vacía las interpretaciones y análisis memorizados
+    """
+    _interpretar_cacheado.cache_clear()
+    _analizar.cache_clear()
+
+
+def _interpretar(consulta):
     resultado = {
         'entidad': None,
         'filtros': {},
         'campos_sugeridos': [],
         'consulta_original': consulta,
         'formato': None,
+        'agregacion': None,
         'error': None
     }
     
@@ -704,6 +905,7 @@ def interpretar_consulta(consulta):
     
     resultado['entidad'] = entidad
     config_entidad = ENTIDADES_DISPONIBLES[entidad]
+    analizada = _analizar(consulta_limpia)
     
     # 2. Extraer fechas si aplica
     if entidad in ['ordenes', 'clientes', 'citas', 'presupuestos', 'facturas_proveedor', 'pagos', 'empleados']:
@@ -753,9 +955,9 @@ def interpretar_consulta(consulta):
             resultado['filtros']['estado'] = estado
         
         # Pago
-        if any(kw in consulta_limpia.lower() for kw in ['pagada', 'pagadas', 'con pago', 'cobrada', 'cobradas']):
+        if analizada.contiene(ORDEN_PAGADA):
             resultado['filtros']['pago'] = True
-        elif any(kw in consulta_limpia.lower() for kw in ['sin pagar', 'pendiente pago', 'no pagada', 'no pagadas']):
+        elif analizada.contiene(ORDEN_SIN_PAGAR):
             resultado['filtros']['pago'] = False
         
         # Total
@@ -780,9 +982,9 @@ def interpretar_consulta(consulta):
             resultado['filtros']['tipo_cliente'] = tipo_cliente
         
         # Estado activo
-        if any(kw in consulta_limpia.lower() for kw in ['activo', 'activos', 'habilitado', 'habilitados']):
+        if analizada.contiene(CLIENTE_ACTIVO):
             resultado['filtros']['activo'] = True
-        elif any(kw in consulta_limpia.lower() for kw in ['inactivo', 'inactivos', 'deshabilitado', 'deshabilitados']):
+        elif analizada.contiene(CLIENTE_INACTIVO):
             resultado['filtros']['activo'] = False
         
         # Campos sugeridos
@@ -870,9 +1072,9 @@ def interpretar_consulta(consulta):
             resultado['filtros']['estado'] = estado
         
         # Con impuestos
-        if any(kw in consulta_limpia.lower() for kw in ['con impuesto', 'con iva', 'con tax']):
+        if analizada.contiene(PRESUPUESTO_CON_IMPUESTOS):
             resultado['filtros']['con_impuestos'] = True
-        elif any(kw in consulta_limpia.lower() for kw in ['sin impuesto', 'sin iva', 'sin tax']):
+        elif analizada.contiene(PRESUPUESTO_SIN_IMPUESTOS):
             resultado['filtros']['con_impuestos'] = False
         
         # Total
@@ -907,9 +1109,9 @@ def interpretar_consulta(consulta):
             resultado['filtros']['sexo'] = sexo
         
         # Estado (activo/inactivo)
-        if any(kw in consulta_limpia.lower() for kw in ['activo', 'activos', 'habilitado', 'trabajando']):
+        if analizada.contiene(EMPLEADO_ACTIVO):
             resultado['filtros']['estado'] = True
-        elif any(kw in consulta_limpia.lower() for kw in ['inactivo', 'inactivos', 'deshabilitado', 'retirado']):
+        elif analizada.contiene(EMPLEADO_INACTIVO):
             resultado['filtros']['estado'] = False
         
         # Sueldo
@@ -960,7 +1162,17 @@ def interpretar_consulta(consulta):
     filtros_texto = extraer_busqueda_texto(consulta_limpia, entidad)
     resultado['filtros'].update(filtros_texto)
     
-    # 5. Validar que los filtros estén en la whitelist
+    # 5. Detectar resúmenes: conteos, sumas y agrupaciones "por X"
+    resultado['agregacion'] = detectar_resumen(consulta_limpia, entidad)
+    agregacion = resultado['agregacion']
+    if (
+        entidad == 'ordenes' and agregacion and agregacion['campo']
+        and analizada.contiene(PALABRAS_INGRESO)
+    ):
+        # "total de ingresos" (o su promedio) no incluye órdenes sin cobrar, salvo que se pidan
+        resultado['filtros'].setdefault('pago', True)
+    
+    # 6. Validar que los filtros estén en la whitelist
     filtros_validos = {}
     filtros_disponibles = set(config_entidad['filtros_disponibles'].keys())
     
@@ -1234,20 +1446,11 @@ def detectar_limite(consulta):
     Returns:
         Int con el límite o None
     """
-    consulta_lower = consulta.lower()
+    consulta_lower = _analizar(consulta).texto
     
     # Buscar "top N", "primeros N", "últimos N"
-    patrones = [
-        r'top\s+(\d+)',
-        r'primeros?\s+(\d+)',
-        r'ultimos?\s+(\d+)',
-        r'últimos?\s+(\d+)',
-        r'solo\s+(\d+)',
-        r'limit[e]?\s+(\d+)',
-    ]
-    
-    for patron in patrones:
-        match = re.search(patron, consulta_lower)
+    for patron in _RE_LIMITES:
+        match = patron.search(consulta_lower)
         if match:
             try:
                 return int(match.group(1))
@@ -1257,6 +1460,157 @@ def detectar_limite(consulta):
     return None
 
 
+def _sin_acentos(texto):
+    if texto.isascii():
+        return texto
+    return ''.join(
+        caracter for caracter in unicodedata.normalize('NFD', texto)
+        if unicodedata.category(caracter) != 'Mn'
+    )
+
+
+@lru_cache(maxsize=None)
+def _frases_agrupacion(entidad):
+    """
+    Frases "por X" reconocidas para la entidad, a partir de
+    sugerir_agrupaciones(). Cada etiqueta "Por Marca de Vehículo" acepta la
+    frase completa y la corta ("por marca"); las más largas se prueban primero.
+    """
+    frases = {}
+    for sugerencia in sugerir_agrupaciones(entidad):
+        etiqueta = sugerencia['label']
+        if not etiqueta.lower().startswith('por '):
+            continue
+        grupo = etiqueta[4:]
+        completa = _sin_acentos(etiqueta.lower())
+        variantes = [completa, ' '.join(completa.split()[:2])]
+        if sugerencia['campo'].endswith('__month'):
+            variantes += ['mensual', 'mensuales']
+        elif sugerencia['campo'].endswith('__date'):
+            variantes += ['por dia', 'diario', 'diarios']
+        for frase in variantes:
+            frases.setdefault(frase, {'campo': sugerencia['campo'], 'etiqueta': grupo})
+    return [
+        (frase, re.compile(rf'\b{re.escape(frase)}\b'), agrupacion)
+        for frase, agrupacion in sorted(frases.items(), key=lambda item: -len(item[0]))
+    ]
+
+
+def detectar_agrupacion(consulta, entidad):
+    """
+    Detecta una agrupación "por X" (por estado, por mes, por cliente...)
+    
+    Args:
+        consulta: String con la consulta
+        entidad: String con el ID de la entidad
+    
+    Returns:
+        Dict con campo y etiqueta del grupo, o None
+    """
+    texto = _analizar(consulta).sin_acentos
+    for frase, patron, agrupacion in _frases_agrupacion(entidad):
+        # El `in` descarta casi todas las frases sin correr la expresión regular
+        if frase in texto and patron.search(texto):
+            return dict(agrupacion)
+    return None
+
+
+@lru_cache(maxsize=None)
+def _campos_numericos(entidad):
+    config = ENTIDADES_DISPONIBLES.get(entidad, {})
+    return [
+        (campo, re.compile(rf'\b{re.escape(campo)}\b'))
+        for campo, info in config.get('campos_disponibles', {}).items()
+        if info['tipo'] in ('number', 'decimal') and campo != 'id' and '__' not in campo
+    ]
+
+
+def _campo_numerico_mencionado(texto, entidad):
+    """
+    Campo numérico de la entidad nombrado en la consulta ("suma de stock").
+    'total' se usa solo si no se nombra otro, porque también significa "cantidad".
+    """
+    mencionados = [
+        campo
+        for campo, patron in _campos_numericos(entidad)
+        if campo in texto and patron.search(texto)
+    ]
+    especificos = [campo for campo in mencionados if campo != 'total']
+    if especificos:
+        return especificos[0]
+    return mencionados[0] if mencionados else None
+
+
+def detectar_resumen(consulta, entidad):
+    """
+    Detecta si la consulta pide un resumen calculado en la base de datos
+    ("cantidad de órdenes por estado", "total de ingresos por mes") en lugar
+    del listado de registros. Combina detectar_agrupacion(), las palabras de
+    conteo/suma/promedio de detectar_agregaciones(), detectar_limite() y
+    detectar_ordenamiento().
+    
+    Args:
+        consulta: String con la consulta
+        entidad: String con el ID de la entidad
+    
+    Returns:
+        Dict con funcion (count, sum, avg, max, min), campo, agrupar_por,
+        etiquetas, limite y direccion; o None si se pide un listado
+    """
+    analizada = _analizar(consulta)
+    agrupacion = detectar_agrupacion(consulta, entidad)
+    
+    if analizada.contiene(PALABRAS_CONTEO):
+        funcion = 'count'
+    elif analizada.contiene(PALABRAS_PROMEDIO):
+        funcion = 'avg'
+    elif analizada.contiene(PALABRAS_MAXIMO):
+        funcion = 'max'
+    elif analizada.contiene(PALABRAS_MINIMO):
+        funcion = 'min'
+    elif (
+        'suma de' in analizada.palabras or 'sumar' in analizada.palabras
+        or (analizada.contiene(PALABRAS_SUMA) and analizada.contiene(PALABRAS_MONTO))
+    ):
+        # Solo con una palabra de agregación explícita: "total de ingresos"
+        funcion = 'sum'
+    elif analizada.contiene(PALABRAS_SUMA) or agrupacion:
+        # "total de órdenes por estado" o solo "órdenes por estado": se cuentan
+        funcion = 'count'
+    else:
+        return None
+    
+    campo = None
+    if funcion != 'count':
+        campo = _campo_numerico_mencionado(analizada.texto, entidad) or CAMPO_MONTO_ENTIDAD.get(entidad)
+        campos_disponibles = ENTIDADES_DISPONIBLES.get(entidad, {}).get('campos_disponibles', {})
+        if campo not in campos_disponibles:
+            # La entidad no tiene un campo numérico para sumar: se cuenta
+            funcion = 'count'
+            campo = None
+    
+    if campo:
+        etiqueta_campo = ENTIDADES_DISPONIBLES[entidad]['campos_disponibles'][campo]['label']
+        etiqueta = ETIQUETAS_FUNCION[funcion].format(etiqueta_campo)
+    else:
+        etiqueta = ETIQUETAS_FUNCION['count']
+    
+    # "últimos 30 días" es un rango de fechas, no un límite de filas
+    limite = None
+    if not _RE_ULTIMOS_DIAS.search(analizada.texto) and not _RE_ULTIMAS_SEMANAS.search(analizada.texto):
+        limite = detectar_limite(consulta)
+    
+    return {
+        'funcion': funcion,
+        'campo': campo,
+        'etiqueta': etiqueta,
+        'agrupar_por': agrupacion['campo'] if agrupacion else None,
+        'etiqueta_grupo': agrupacion['etiqueta'] if agrupacion else None,
+        'limite': limite,
+        'direccion': (detectar_ordenamiento(consulta) or {}).get('direccion'),
+    }
+
+
 def analizar_complejidad_consulta(consulta):
     """
     Analiza la complejidad de una consulta para determinar el mejor enfoque
@@ -1328,38 +1682,13 @@ def detectar_formato(consulta):
     """
     consulta_lower = consulta.lower()
     
-    # Patrones para Excel/XLSX
-    patrones_excel = [
-        r'en excel',
-        r'en xlsx',
-        r'formato excel',
-        r'formato xlsx',
-        r'como excel',
-        r'como xlsx',
-        r'exportar a excel',
-        r'exportar a xlsx',
-        r'generar excel',
-        r'generar xlsx',
-    ]
-    
-    # Patrones para PDF
-    patrones_pdf = [
-        r'en pdf',
-        r'formato pdf',
-        r'como pdf',
-        r'exportar a pdf',
-        r'generar pdf',
-    ]
-    
     # Verificar Excel primero (más específico)
-    for patron in patrones_excel:
-        if re.search(patron, consulta_lower):
-            return 'XLSX'
+    if _RE_EXCEL.search(consulta_lower):
+        return 'XLSX'
     
     # Verificar PDF
-    for patron in patrones_pdf:
-        if re.search(patron, consulta_lower):
-            return 'PDF'
+    if _RE_PDF.search(consulta_lower):
+        return 'PDF'
     
     # Por defecto, retornar PDF
     return 'PDF'
@@ -1377,29 +1706,15 @@ def limpiar_formato_de_consulta(consulta):
     """
     consulta_limpia = consulta
     
-    # Patrones a eliminar
-    patrones = [
-        r'\s+en\s+excel\s*',
-        r'\s+en\s+xlsx\s*',
-        r'\s+en\s+pdf\s*',
-        r'\s+formato\s+excel\s*',
-        r'\s+formato\s+xlsx\s*',
-        r'\s+formato\s+pdf\s*',
-        r'\s+como\s+excel\s*',
-        r'\s+como\s+xlsx\s*',
-        r'\s+como\s+pdf\s*',
-        r'\s+exportar\s+a\s+excel\s*',
-        r'\s+exportar\s+a\s+xlsx\s*',
-        r'\s+exportar\s+a\s+pdf\s*',
-        r'\s+generar\s+excel\s*',
-        r'\s+generar\s+xlsx\s*',
-        r'\s+generar\s+pdf\s*',
-    ]
+    # Todos los patrones nombran excel, xlsx o pdf: sin ellos no hay nada que quitar
+    consulta_lower = consulta.lower()
+    tiene_formato = 'excel' in consulta_lower or 'xlsx' in consulta_lower or 'pdf' in consulta_lower
     
-    for patron in patrones:
-        consulta_limpia = re.sub(patron, ' ', consulta_limpia, flags=re.IGNORECASE)
+    # Patrones a eliminar (PATRONES_LIMPIEZA_FORMATO), en el mismo orden
+    for patron in (_RE_LIMPIEZA_FORMATO if tiene_formato else []):
+        consulta_limpia = patron.sub(' ', consulta_limpia)
     
     # Limpiar espacios múltiples
-    consulta_limpia = re.sub(r'\s+', ' ', consulta_limpia).strip()
+    consulta_limpia = _RE_ESPACIOS.sub(' ', consulta_limpia).strip()
     
     return consulta_limpia
@@ -8,18 +8,163 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from datetime import datetime
+from itertools import chain, islice
+
+
+# Página y márgenes de los reportes tabulares
+MARGENES = {
+    'rightMargin': 0.5*inch,
+    'leftMargin': 0.5*inch,
+    'topMargin': 0.75*inch,
+    'bottomMargin': 0.5*inch,
+}
+
+# Relleno interno del Frame de SimpleDocTemplate (6pt por lado)
+PADDING_FRAME = 6
+
+# Alturas fijas de fila: con alturas conocidas se calcula cuántas filas
+# entran por página sin que ReportLab tenga que medir y partir la tabla
+# (interlineado 12: FONTSIZE no cambia el interlineado por defecto de la celda)
+FUENTE_ENCABEZADO = ('Helvetica-Bold', 10)
+FUENTE_DATOS = ('Helvetica', 8)
+INTERLINEADO_CELDA = 12
+ALTO_ENCABEZADO = INTERLINEADO_CELDA + 24
+ALTO_FILA = INTERLINEADO_CELDA + 12
+PADDING_CELDA = 12
+
+# Filas usadas para estimar el ancho de las columnas
+FILAS_MUESTRA_ANCHO = 200
+
+# Estilo de tabla compartido por todos los bloques (no depende de los datos)
+TABLA_ESTILO = TableStyle([
+    # Encabezado
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), FUENTE_ENCABEZADO[0]),
+    ('FONTSIZE', (0, 0), (-1, 0), FUENTE_ENCABEZADO[1]),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('TOPPADDING', (0, 0), (-1, 0), 12),
+    
+    # Datos
+    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#333333')),
+    ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 1), (-1, -1), FUENTE_DATOS[0]),
+    ('FONTSIZE', (0, 1), (-1, -1), FUENTE_DATOS[1]),
+    ('TOPPADDING', (0, 1), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
+    
+    # Bordes
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#bdc3c7')),
+    
+    # Filas alternadas
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')])
+])
+
+_ESTILOS = None
+
+
+def _obtener_estilos():
+    """
+    Retorna los ParagraphStyle del reporte, creados una sola vez por proceso
+    """
+    global _ESTILOS
+    if _ESTILOS is None:
+        styles = getSampleStyleSheet()
+        _ESTILOS = {
+            'titulo': ParagraphStyle(
+                'CustomTitle',
+                parent=styles['Heading1'],
+                fontSize=18,
+                textColor=colors.HexColor('#2c3e50'),
+                spaceAfter=12,
+                alignment=TA_CENTER,
+                fontName='Helvetica-Bold'
+            ),
+            'subtitulo': ParagraphStyle(
+                'CustomSubtitle',
+                parent=styles['Normal'],
+                fontSize=11,
+                textColor=colors.HexColor('#34495e'),
+                spaceAfter=6,
+                alignment=TA_CENTER
+            ),
+            'info': ParagraphStyle(
+                'InfoStyle',
+                parent=styles['Normal'],
+                fontSize=9,
+                textColor=colors.HexColor('#7f8c8d'),
+                alignment=TA_RIGHT
+            ),
+            'footer': ParagraphStyle(
+                'FooterStyle',
+                parent=styles['Normal'],
+                fontSize=8,
+                textColor=colors.HexColor('#7f8c8d'),
+                alignment=TA_CENTER
+            ),
+        }
+    return _ESTILOS
+
+
+def _texto_celda(valor):
+    """
+    Convierte el valor a una sola línea para que la fila respete ALTO_FILA
+    """
+    texto = str(valor)
+    if '\n' in texto or '\r' in texto:
+        texto = ' '.join(texto.split())
+    return texto
+
+
+def _anchos_columnas(encabezados, muestra, ancho_disponible):
+    """
+    Calcula anchos de columna a partir de los encabezados y una muestra de filas.
+    Todos los bloques usan los mismos anchos; si no entran en la página se
+    reducen proporcionalmente.
+    """
+    anchos = [
+        stringWidth(str(encabezado), *FUENTE_ENCABEZADO) + PADDING_CELDA
+        for encabezado in encabezados
+    ]
+    for fila in muestra:
+        for idx, texto in enumerate(fila[:len(anchos)]):
+            anchos[idx] = max(anchos[idx], stringWidth(texto, *FUENTE_DATOS) + PADDING_CELDA)
+    
+    total = sum(anchos)
+    if total > ancho_disponible:
+        factor = ancho_disponible / total
+        anchos = [ancho * factor for ancho in anchos]
+    return anchos
+
+
+def _alto_ocupado(flowables, ancho, alto):
+    """
+    Mide el alto que ocupan los flowables iniciales de la primera página
+    """
+    ocupado = 0
+    for flowable in flowables:
+        _, h = flowable.wrap(ancho, alto)
+        ocupado += h + flowable.getSpaceBefore() + flowable.getSpaceAfter()
+    return ocupado
 
 
 def generar_pdf_tabla(titulo, subtitulo, encabezados, datos, datos_adicionales=None):
     """
     Genera un PDF con una tabla de datos
     
+    La tabla se arma en bloques de una página (cada uno con su encabezado)
+    con alturas de fila fijas, de modo que el tiempo crece linealmente con
+    la cantidad de filas en lugar de re-partir una única tabla gigante.
+    
     Args:
         titulo: Título del reporte
         subtitulo: Subtítulo o descripción
         encabezados: Lista de nombres de columnas
-        datos: Lista de listas con los datos
+        datos: Iterable de filas (puede ser un generador)
         datos_adicionales: Dict con información extra (opcional)
     
     Returns:
@@ -28,107 +173,61 @@ def generar_pdf_tabla(titulo, subtitulo, encabezados, datos, datos_adicionales=N
     buffer = BytesIO()
     
     # Crear el documento
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        rightMargin=0.5*inch,
-        leftMargin=0.5*inch,
-        topMargin=0.75*inch,
-        bottomMargin=0.5*inch
-    )
+    doc = SimpleDocTemplate(buffer, pagesize=letter, **MARGENES)
+    ancho_frame = doc.width - 2 * PADDING_FRAME
+    alto_frame = doc.height - 2 * PADDING_FRAME
     
-    # Estilos
-    styles = getSampleStyleSheet()
-    titulo_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor('#2c3e50'),
-        spaceAfter=12,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    subtitulo_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor=colors.HexColor('#34495e'),
-        spaceAfter=6,
-        alignment=TA_CENTER
-    )
-    
-    info_style = ParagraphStyle(
-        'InfoStyle',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#7f8c8d'),
-        alignment=TA_RIGHT
-    )
+    estilos = _obtener_estilos()
     
     # Elementos del PDF
     elements = []
     
     # Título
-    elements.append(Paragraph(titulo, titulo_style))
-    elements.append(Paragraph(subtitulo, subtitulo_style))
+    elements.append(Paragraph(titulo, estilos['titulo']))
+    elements.append(Paragraph(subtitulo, estilos['subtitulo']))
     
     # Fecha de generación
     fecha_hora = datetime.now().strftime('%d/%m/%Y %H:%M')
-    elements.append(Paragraph(f"Generado: {fecha_hora}", info_style))
+    elements.append(Paragraph(f"Generado: {fecha_hora}", estilos['info']))
     
     # Información adicional
     if datos_adicionales:
         for key, value in datos_adicionales.items():
-            elements.append(Paragraph(f"{key}: {value}", info_style))
+            elements.append(Paragraph(f"{key}: {value}", estilos['info']))
     
     elements.append(Spacer(1, 0.3*inch))
     
-    # Preparar datos de la tabla
-    tabla_data = [encabezados] + datos
-    
-    # Crear la tabla
-    tabla = Table(tabla_data, repeatRows=1)
-    
-    # Estilo de la tabla
-    tabla.setStyle(TableStyle([
-        # Encabezado
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 0), (-1, 0), 12),
-        
-        # Datos
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#333333')),
-        ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('TOPPADDING', (0, 1), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-        
-        # Bordes
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#bdc3c7')),
-        
-        # Filas alternadas
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')])
-    ]))
-    
-    elements.append(tabla)
+    # Filas por página: la primera descuenta el bloque de títulos
+    # (una fila de margen para absorber redondeos)
+    filas_por_pagina = max(int((alto_frame - ALTO_ENCABEZADO) // ALTO_FILA), 1)
+    alto_libre = alto_frame - _alto_ocupado(elements, ancho_frame, alto_frame)
+    filas_primera_pagina = max(int((alto_libre - ALTO_ENCABEZADO) // ALTO_FILA) - 1, 1)
+    
+    filas = ([_texto_celda(valor) for valor in fila] for fila in datos)
+    muestra = list(islice(filas, FILAS_MUESTRA_ANCHO))
+    anchos = _anchos_columnas(encabezados, muestra, ancho_frame)
+    filas = chain(muestra, filas)
+    
+    # Un bloque (Table) por página, cada uno repite el encabezado
+    encabezado = list(encabezados)
+    capacidad = filas_primera_pagina
+    while True:
+        bloque = list(islice(filas, capacidad))
+        if not bloque:
+            break
+        tabla = Table(
+            [encabezado] + bloque,
+            colWidths=anchos,
+            rowHeights=[ALTO_ENCABEZADO] + [ALTO_FILA] * len(bloque),
+            repeatRows=1
+        )
+        tabla.setStyle(TABLA_ESTILO)
+        elements.append(tabla)
+        capacidad = filas_por_pagina
     
     # Footer
     elements.append(Spacer(1, 0.3*inch))
-    footer_style = ParagraphStyle(
-        'FooterStyle',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.HexColor('#7f8c8d'),
-        alignment=TA_CENTER
-    )
-    elements.append(Paragraph("Sistema de Gestión de Taller - Reporte Automático", footer_style))
+    elements.append(Paragraph("Sistema de Gestión de Taller - Reporte Automático", estilos['footer']))
     
     # Generar el PDF
     doc.build(elements)
@@ -0,0 +1,236 @@
+"""
+Planificador de consultas para reportes
+Convierte las rutas de campos de la whitelist (ej. 'vehiculo__marca__nombre')
+en una sola consulta values_list con los JOIN que Django resuelve automáticamente,
+evitando instanciar modelos y recorrer relaciones con getattr fila por fila.
+"""
+import json
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+
+# Tamaño de lote al leer filas con .iterator()
+CHUNK_SIZE = 2000
+
+# Clasificación de cada ruta de campo
+COLUMNA = 'columna'     # Columna alcanzable por FK/OneToOne -> va al values_list
+AUSENTE = 'ausente'     # No existe en el modelo -> se reporta vacío
+ATRIBUTO = 'atributo'   # Propiedad, relación u otra cosa que requiere la instancia
+
+
+def _clasificar_campo(Model, campo):
+    """
+    Determina cómo se puede obtener una ruta de campo sobre el modelo
+
+    Solo se aceptan como columna los saltos por relaciones de un solo valor
+    (ForeignKey / OneToOne) terminando en un campo concreto no relacional;
+    así el values_list produce exactamente una fila por objeto.
+    """
+    modelo_actual = Model
+    partes = campo.split('__')
+    for i, parte in enumerate(partes):
+        try:
+            field = modelo_actual._meta.get_field(parte)
+        except FieldDoesNotExist:
+            # Puede ser una propiedad o método del modelo
+            if hasattr(modelo_actual, parte):
+                return ATRIBUTO
+            return AUSENTE
+
+        es_ultimo = i == len(partes) - 1
+        if field.is_relation:
+            if field.many_to_many or field.one_to_many or es_ultimo:
+                return ATRIBUTO
+            modelo_actual = field.related_model
+        elif not es_ultimo:
+            # Un campo simple no tiene sub-campos
+            return AUSENTE
+        elif not getattr(field, 'concrete', False):
+            return ATRIBUTO
+    return COLUMNA
+
+
+def planificar_consulta(Model, campos):
+    """
+    Arma el plan de extracción para una lista de campos
+
+    Returns:
+        Dict con:
+        - columnas: rutas únicas que se piden al values_list
+        - indices: por cada campo, su posición en la tupla o None si está ausente
+        - requiere_instancia: True si algún campo solo se obtiene desde el objeto
+    """
+    columnas = []
+    indices = []
+    requiere_instancia = False
+
+    for campo in campos:
+        clase = _clasificar_campo(Model, campo)
+        if clase == ATRIBUTO:
+            requiere_instancia = True
+            indices.append(None)
+        elif clase == AUSENTE:
+            indices.append(None)
+        else:
+            if campo not in columnas:
+                columnas.append(campo)
+            indices.append(columnas.index(campo))
+
+    return {
+        'columnas': columnas,
+        'indices': indices,
+        'requiere_instancia': requiere_instancia,
+    }
+
+
+def consulta_de_filas(queryset, campos):
+    """
+    Retorna la consulta que iterar_filas() ejecuta para esos campos: el
+    values_list con los JOIN necesarios, o el queryset si se necesitan
+    las instancias
+    """
+    plan = planificar_consulta(queryset.model, campos)
+    if plan['requiere_instancia'] or not plan['columnas']:
+        return queryset
+    return queryset.values_list(*plan['columnas'])
+
+
+def iterar_filas(queryset, campos, obtener_valor=None):
+    """
+    Genera las filas del queryset como tuplas en el orden de `campos`,
+    leyendo de la base en lotes sin cargar el resultado completo en memoria
+
+    Los valores conservan la semántica del recorrido por getattr que usaban
+    los reportes: una relación nula o un campo relacionado nulo se muestra
+    como '' y un campo inexistente también.
+
+    Args:
+        queryset: QuerySet ya filtrado y ordenado
+        campos: Lista de rutas de campos (con __ para relaciones)
+        obtener_valor: Función (obj, campo) usada solo si algún campo no es
+            una columna (propiedades, relaciones completas)
+    """
+    plan = planificar_consulta(queryset.model, campos)
+
+    if plan['requiere_instancia'] and obtener_valor is not None:
+        for obj in queryset.iterator(chunk_size=CHUNK_SIZE):
+            yield tuple(obtener_valor(obj, campo) for campo in campos)
+        return
+
+    indices = plan['indices']
+    anidados = ['__' in campo for campo in campos]
+
+    if not plan['columnas']:
+        for _ in range(queryset.count()):
+            yield ('',) * len(campos)
+        return
+
+    consulta = consulta_de_filas(queryset, campos)
+    for valores in consulta.iterator(chunk_size=CHUNK_SIZE):
+        fila = []
+        for indice, anidado in zip(indices, anidados):
+            if indice is None:
+                fila.append('')
+                continue
+            valor = valores[indice]
+            if valor is None and anidado:
+                valor = ''
+            fila.append(valor)
+        yield tuple(fila)
+
+
+def extraer_filas(queryset, campos, obtener_valor=None):
+    """
+    Igual que iterar_filas() pero retorna la lista completa de tuplas
+    (necesaria cuando el reporte se recorre más de una vez, ej. PDF)
+    """
+    return list(iterar_filas(queryset, campos, obtener_valor))
+
+
+def explicar_consulta(queryset):
+    """
+    Ejecuta EXPLAIN sobre la consulta (sin ejecutarla) y resume el plan
+
+    Returns:
+        Dict con:
+        - motor: Motor de base de datos
+        - costo: Costo total estimado por el planificador (None si el motor
+          no lo informa, ej. SQLite)
+        - filas_estimadas: Filas que el planificador espera devolver (o None)
+        - escaneos_secuenciales: Tablas que se recorren completas
+        - nodos: Pasos del plan
+    """
+    motor = connections[queryset.db].vendor
+    if motor == 'postgresql':
+        return _explicar_postgresql(queryset)
+
+    # Otros motores: plan en texto; en SQLite las líneas "SCAN tabla" son
+    # recorridos completos y "SEARCH tabla USING INDEX" usan índice
+    nodos = []
+    escaneos = []
+    for linea in queryset.explain().splitlines():
+        partes = linea.split(' ', 3)
+        detalle = partes[3] if len(partes) == 4 and all(p.isdigit() for p in partes[:3]) else linea
+        nodos.append({'detalle': detalle})
+        if detalle.startswith('SCAN '):
+            escaneos.append(detalle.split()[1])
+    return {
+        'motor': motor,
+        'costo': None,
+        'filas_estimadas': None,
+        'escaneos_secuenciales': escaneos,
+        'nodos': nodos,
+    }
+
+
+def _explicar_postgresql(queryset):
+    plan = json.loads(queryset.explain(format='json'))
+    if isinstance(plan, list):
+        plan = plan[0]
+    raiz = plan['Plan']
+
+    nodos = []
+    escaneos = []
+    pendientes = [raiz]
+    while pendientes:
+        nodo = pendientes.pop(0)
+        tabla = nodo.get('Relation Name')
+        nodos.append({
+            'tipo': nodo.get('Node Type'),
+            'tabla': tabla,
+            'filas': nodo.get('Plan Rows'),
+            'costo': nodo.get('Total Cost'),
+        })
+        if nodo.get('Node Type') == 'Seq Scan' and tabla:
+            escaneos.append(tabla)
+        pendientes.extend(nodo.get('Plans', []))
+
+    return {
+        'motor': 'postgresql',
+        'costo': raiz.get('Total Cost'),
+        'filas_estimadas': raiz.get('Plan Rows'),
+        'escaneos_secuenciales': escaneos,
+        'nodos': nodos,
+    }
+
+
+def evaluar_costo(plan):
+    """
+    Decide cómo ejecutar una consulta según su costo estimado
+
+    Returns:
+        'RECHAZAR' si supera REPORTES_COSTO_MAXIMO, 'ASINCRONO' si supera
+        REPORTES_COSTO_ASINCRONO, o None si se puede generar en la petición.
+        Sin costo estimado (motor que no lo informa) no se restringe.
+    """
+    costo = plan.get('costo')
+    if costo is None:
+        return None
+    maximo = getattr(settings, 'REPORTES_COSTO_MAXIMO', 0)
+    if maximo and costo > maximo:
+        return 'RECHAZAR'
+    limite_asincrono = getattr(settings, 'REPORTES_COSTO_ASINCRONO', 0)
+    if limite_asincrono and costo > limite_asincrono:
+        return 'ASINCRONO'
+    return None
@@ -0,0 +1,219 @@
+"""
+Caché de reportes generados
+
+Un reporte se identifica por (tenant, modelo, consulta normalizada, versiones
+de datos). Las versiones son contadores por tenant y modelo (VersionDatos)
+que se incrementan al guardar o eliminar registros, así que una clave solo
+vuelve a coincidir si nada de lo que lee el reporte cambió; en ese caso se
+reutiliza el archivo ya guardado en Reporte.archivo en lugar de regenerarlo.
+"""
+import hashlib
+import json
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+def cache_activo():
+    return getattr(settings, 'REPORTES_CACHE_ACTIVO', True)
+
+
+def modelos_involucrados(Model, rutas):
+    """
+    Retorna los modelos (app_label.Modelo) que lee una consulta: el modelo base
+    más los que se recorren en las rutas de campos, filtros u ordenamiento.
+    Los sufijos de lookup (__gte, __month, __in...) se ignoran.
+    """
+    labels = {Model._meta.label}
+    for ruta in rutas:
+        modelo_actual = Model
+        for parte in ruta.lstrip('-').split('__'):
+            try:
+                field = modelo_actual._meta.get_field(parte)
+            except FieldDoesNotExist:
+                break
+            if not field.is_relation or field.related_model is None:
+                break
+            modelo_actual = field.related_model
+            labels.add(modelo_actual._meta.label)
+    return sorted(labels)
+
+
+@lru_cache(maxsize=None)
+def modelos_versionados():
+    """
+    Modelos cuyos cambios invalidan reportes: los de las entidades de la
+    whitelist y de los reportes estáticos, con sus relaciones usadas.
+    """
+    from .whitelist import ENTIDADES_DISPONIBLES
+    from .reportes_config import REPORTES_ESTATICOS
+
+    labels = set()
+    for config in ENTIDADES_DISPONIBLES.values():
+        Model = apps.get_model(config['modelo'])
+        rutas = list(config['campos_disponibles']) + list(config['filtros_disponibles'])
+        labels.update(modelos_involucrados(Model, rutas))
+    for config in REPORTES_ESTATICOS.values():
+        Model = apps.get_model(config['modelo'])
+        rutas = list(config['campos']) + list(config['filtros_default'])
+        labels.update(modelos_involucrados(Model, rutas))
+    return frozenset(labels)
+
+
+def obtener_versiones(tenant_id, labels):
+    """
+    Versiones actuales de los modelos indicados (0 si nunca cambiaron)
+    """
+    from ..models import VersionDatos
+
+    versiones = dict(
+        VersionDatos.objects.filter(tenant_id=tenant_id, modelo__in=labels)
+        .values_list('modelo', 'version')
+    )
+    return {label: versiones.get(label, 0) for label in labels}
+
+
+def incrementar_versiones(tenant_id, labels):
+    """
+    Incrementa en la base el contador de cada modelo para el tenant
+    """
+    from ..models import VersionDatos
+
+    for label in labels:
+        filtro = VersionDatos.objects.filter(tenant_id=tenant_id, modelo=label)
+        if filtro.update(version=F('version') + 1, actualizado=timezone.now()):
+            continue
+        try:
+            with transaction.atomic():
+                VersionDatos.objects.create(tenant_id=tenant_id, modelo=label, version=1)
+        except IntegrityError:
+            # Otro proceso creó la fila al mismo tiempo, o el tenant ya no existe
+            filtro.update(version=F('version') + 1, actualizado=timezone.now())
+
+
+def _aplicar_pendientes(pendientes):
+    por_tenant = {}
+    for tenant_id, label in pendientes:
+        por_tenant.setdefault(tenant_id, set()).add(label)
+    for tenant_id, labels in por_tenant.items():
+        incrementar_versiones(tenant_id, sorted(labels))
+
+
+def _pendientes_en_curso(conexion):
+    """
+    Cambios acumulados de la transacción en curso, o None si su on_commit ya
+    se ejecutó o se descartó con un rollback
+    """
+    actual = getattr(conexion, '_versiones_pendientes', None)
+    if actual is None:
+        return None
+    pendientes, aplicar = actual
+    if any(funcion is aplicar for _, funcion, _ in conexion.run_on_commit):
+        return pendientes
+    return None
+
+
+def registrar_cambio(tenant_id, label):
+    """
+    Marca un cambio en (tenant, modelo). Dentro de una transacción los cambios
+    se acumulan y se aplican una sola vez por modelo al confirmar (on_commit);
+    si la transacción se revierte, se descartan.
+    """
+    conexion = transaction.get_connection()
+    if not conexion.in_atomic_block:
+        incrementar_versiones(tenant_id, [label])
+        return
+
+    # Se guardan en la conexión y no en el bloque atomic: un mismo Atomic
+    # (p. ej. @transaction.atomic) se reutiliza en cada llamada
+    pendientes = _pendientes_en_curso(conexion)
+    if pendientes is None:
+        pendientes = set()
+
+        def aplicar():
+            if getattr(conexion, '_versiones_pendientes', (None,))[0] is pendientes:
+                conexion._versiones_pendientes = None
+            _aplicar_pendientes(pendientes)
+
+        conexion._versiones_pendientes = (pendientes, aplicar)
+        transaction.on_commit(aplicar)
+    pendientes.add((tenant_id, label))
+
+
+def invalidar_tenant(tenant_id):
+    """
+    Invalida todos los reportes cacheados del tenant (ej. tras una
+    restauración, que inserta con bulk_create sin disparar señales)
+    """
+    for label in modelos_versionados():
+        registrar_cambio(tenant_id, label)
+
+
+def normalizar_filtros(filtros):
+    """
+    Los valores de lookups __in se ordenan: el orden no cambia el resultado
+    """
+    normalizados = {}
+    for clave, valor in (filtros or {}).items():
+        if clave.endswith('__in') and isinstance(valor, (list, tuple)):
+            valor = sorted(valor, key=str)
+        normalizados[clave] = valor
+    return normalizados
+
+
+def calcular_clave(tenant, Model, consulta, rutas):
+    """
+    Calcula la clave de caché de un reporte
+
+    Args:
+        tenant: Tenant del reporte
+        Model: Modelo base de la consulta
+        consulta: Dict con todo lo que define el archivo (tipo, campos,
+            filtros normalizados, ordenamiento, formato, título)
+        rutas: Rutas de campos, filtros y ordenamiento (para saber qué
+            modelos lee la consulta)
+
+    Returns:
+        Hash hexadecimal, o None si el reporte no se puede cachear
+    """
+    if not cache_activo():
+        return None
+    labels = modelos_involucrados(Model, rutas)
+    if not set(labels) <= modelos_versionados():
+        # Lee modelos sin contador de versión: no habría forma de invalidarlo
+        return None
+
+    contenido = {
+        'tenant': tenant.id,
+        'modelo': Model._meta.label,
+        'consulta': consulta,
+        'versiones': obtener_versiones(tenant.id, labels),
+    }
+    serializado = json.dumps(contenido, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
+
+
+def buscar_reporte_cacheado(tenant, clave):
+    """
+    Retorna el último Reporte del tenant con la misma clave cuyo archivo
+    sigue existiendo en el storage, o None
+    """
+    from ..models import Reporte
+
+    if not clave:
+        return None
+    candidatos = (
+        Reporte.objects.filter(tenant=tenant, clave_cache=clave)
+        .exclude(archivo='')
+        .order_by('-fecha_generacion')[:3]
+    )
+    for reporte in candidatos:
+        if reporte.archivo and reporte.archivo.storage.exists(reporte.archivo.name):
+            return reporte
+    return None
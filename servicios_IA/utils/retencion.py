@@ -0,0 +1,197 @@
+"""
+Retención de los archivos de reportes
+Cada taller conserva sus reportes los días que indica su plan
+(REPORTES_RETENCION_DIAS) o Tenant.retencion_reportes_dias. La depuración
+borra filas vencidas por lotes y solo elimina un archivo cuando ya ningún
+Reporte lo referencia (los aciertos de caché comparten archivo). Los
+archivos con el mismo contenido (hash_contenido) dentro de un taller se
+unifican en uno solo.
+"""
+import posixpath
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Count
+from django.utils import timezone
+
+from .descargas import nombre_variante_gzip
+
+# Filas que se borran por consulta
+LOTE_DEFAULT = 500
+
+# Carpeta de Reporte.archivo (upload_to='reportes/%Y/%m/')
+CARPETA_REPORTES = 'reportes'
+
+
+def dias_retencion(tenant):
+    """
+    Días que se conservan los reportes del tenant
+    """
+    if tenant.retencion_reportes_dias is not None:
+        return tenant.retencion_reportes_dias
+    por_plan = getattr(settings, 'REPORTES_RETENCION_DIAS', {})
+    return por_plan.get(tenant.plan, getattr(settings, 'REPORTES_RETENCION_DIAS_DEFAULT', 30))
+
+
+def buscar_archivo_identico(reporte):
+    """
+    Nombre del archivo de otro reporte del mismo taller con el mismo
+    contenido, si sigue existiendo en el storage; None si no hay
+    """
+    from ..models import Reporte
+
+    if not reporte.hash_contenido:
+        return None
+    nombres = (
+        Reporte.objects.filter(tenant_id=reporte.tenant_id, hash_contenido=reporte.hash_contenido)
+        .exclude(archivo='')
+        .exclude(pk=reporte.pk)
+        .order_by('fecha_generacion')
+        .values_list('archivo', flat=True)[:3]
+    )
+    for nombre in nombres:
+        if default_storage.exists(nombre):
+            return nombre
+    return None
+
+
+def _borrar_archivo(nombre, simular):
+    """
+    Borra el archivo y su variante .gz
+
+    Returns:
+        Bytes liberados
+    """
+    liberados = 0
+    for ruta in (nombre, nombre_variante_gzip(nombre)):
+        if default_storage.exists(ruta):
+            liberados += default_storage.size(ruta)
+            if not simular:
+                default_storage.delete(ruta)
+    return liberados
+
+
+def depurar_vencidos(tenant, lote=LOTE_DEFAULT, simular=False):
+    """
+    Elimina los reportes del tenant más antiguos que su retención
+
+    Los reportes pendientes o en proceso nunca se eliminan.
+
+    Returns:
+        Dict con filas eliminadas, archivos eliminados y bytes liberados
+    """
+    from ..models import Reporte
+
+    limite = timezone.now() - timedelta(days=dias_retencion(tenant))
+    vencidos = (
+        Reporte.objects.filter(tenant=tenant, fecha_generacion__lt=limite)
+        .exclude(estado__in=['PENDIENTE', 'EN_PROCESO'])
+        .order_by('id')
+    )
+
+    resultado = {'filas': 0, 'archivos': 0, 'bytes': 0}
+    revisados = set()
+    ultimo_id = 0
+    while True:
+        filas = list(vencidos.filter(id__gt=ultimo_id).values_list('id', 'archivo')[:lote])
+        if not filas:
+            break
+        ultimo_id = filas[-1][0]
+        if not simular:
+            Reporte.objects.filter(id__in=[reporte_id for reporte_id, _ in filas]).delete()
+        resultado['filas'] += len(filas)
+
+        # Un archivo compartido con un reporte vigente (acierto de caché o
+        # deduplicado) sigue referenciado y se conserva
+        for nombre in {nombre for _, nombre in filas if nombre} - revisados:
+            revisados.add(nombre)
+            en_uso = Reporte.objects.filter(archivo=nombre).exclude(id__in=vencidos.values('id')).exists()
+            if en_uso:
+                continue
+            liberados = _borrar_archivo(nombre, simular)
+            if liberados:
+                resultado['archivos'] += 1
+                resultado['bytes'] += liberados
+    return resultado
+
+
+def deduplicar(tenant, simular=False):
+    """
+    Unifica los reportes del tenant con el mismo hash de contenido en un
+    solo archivo (el más antiguo que exista) y borra las copias
+
+    Returns:
+        Dict con archivos eliminados y bytes liberados
+    """
+    from ..models import Reporte
+
+    con_archivo = (
+        Reporte.objects.filter(tenant=tenant)
+        .exclude(hash_contenido='')
+        .exclude(archivo='')
+        .exclude(archivo__isnull=True)
+    )
+    duplicados = (
+        con_archivo.order_by()
+        .values('hash_contenido')
+        .annotate(archivos=Count('archivo', distinct=True))
+        .filter(archivos__gt=1)
+        .values_list('hash_contenido', flat=True)
+    )
+
+    resultado = {'archivos': 0, 'bytes': 0}
+    for hash_contenido in list(duplicados):
+        reportes = con_archivo.filter(hash_contenido=hash_contenido)
+        nombres = list(dict.fromkeys(reportes.order_by('fecha_generacion').values_list('archivo', flat=True)))
+        canonico = next((nombre for nombre in nombres if default_storage.exists(nombre)), None)
+        if canonico is None:
+            continue
+        copias = [nombre for nombre in nombres if nombre != canonico]
+        if not simular:
+            reportes.filter(archivo__in=copias).update(
+                archivo=canonico, fecha_actualizacion=timezone.now()
+            )
+        for nombre in copias:
+            liberados = _borrar_archivo(nombre, simular)
+            if liberados:
+                resultado['archivos'] += 1
+                resultado['bytes'] += liberados
+    return resultado
+
+
+def _listar_archivos(carpeta):
+    directorios, archivos = default_storage.listdir(carpeta)
+    for archivo in archivos:
+        yield posixpath.join(carpeta, archivo)
+    for directorio in directorios:
+        yield from _listar_archivos(posixpath.join(carpeta, directorio))
+
+
+def eliminar_huerfanos(simular=False, antiguedad_minima=timedelta(days=1)):
+    """
+    Borra archivos de la carpeta de reportes que ningún Reporte referencia
+    (p. ej. filas eliminadas a mano). Los archivos recientes se respetan: un
+    worker puede haber guardado el archivo y todavía no la fila.
+
+    Returns:
+        Dict con archivos eliminados y bytes liberados
+    """
+    from ..models import Reporte
+
+    resultado = {'archivos': 0, 'bytes': 0}
+    if not default_storage.exists(CARPETA_REPORTES):
+        return resultado
+
+    limite = timezone.now() - antiguedad_minima
+    for ruta in _listar_archivos(CARPETA_REPORTES):
+        nombre = ruta[:-len('.gz')] if ruta.endswith('.gz') else ruta
+        if Reporte.objects.filter(archivo=nombre).exists():
+            continue
+        if default_storage.get_modified_time(ruta) >= limite:
+            continue
+        resultado['archivos'] += 1
+        resultado['bytes'] += default_storage.size(ruta)
+        if not simular:
+            default_storage.delete(ruta)
+    return resultado
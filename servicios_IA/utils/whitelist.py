@@ -46,6 +46,14 @@ ENTIDADES_DISPONIBLES = {
                     {'value': 'cancelada', 'label': 'Cancelada'},
                 ]
             },
+            'pago': {
+                'label': 'Pago',
+                'tipo': 'choice',
+                'opciones': [
+                    {'value': True, 'label': 'Pagada'},
+                    {'value': False, 'label': 'Sin pagar'},
+                ]
+            },
             'fecha_creacion__gte': {
                 'label': 'Fecha de creación desde',
                 'tipo': 'date',
@@ -5,7 +5,6 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.http import FileResponse
 from django.utils import timezone
 from django.db.models import Sum, Count, Q, F
 from django.apps import apps
@@ -13,6 +12,8 @@ from datetime import datetime, timedelta
 import time
 import json
 
+from django.core.serializers.json import DjangoJSONEncoder
+
 from .models import Reporte
 from personal_admin.views import registrar_bitacora
 from personal_admin.models import Bitacora
@@ -24,8 +25,17 @@ from .serializersReporte import (
 )
 from .utils.reportes_config import obtener_config_reporte, listar_reportes_disponibles
 from .utils.pdf_generator import generar_pdf_simple
-from .utils.excel_generator import generar_excel
+from .utils.excel_generator import generar_excel_streaming
 from .utils.nl_parser import interpretar_consulta, generar_ejemplos_consultas
+from .utils.query_planner import extraer_filas, iterar_filas, consulta_de_filas, explicar_consulta, evaluar_costo
+from .utils.agregaciones import consulta_agregada, ejecutar_agregacion
+from .utils.reportes_cache import calcular_clave, normalizar_filtros, buscar_reporte_cacheado
+from .utils.whitelist import obtener_config_entidad
+from .utils.descargas import HuellaContenido, guardar_archivo, respuesta_descarga
+from .jobsReportes import encolar_reporte
+
+# Filas entre actualizaciones del avance de un reporte en segundo plano
+FILAS_POR_AVANCE = 500
 
 
 class ReporteViewSet(viewsets.ModelViewSet):
@@ -112,7 +122,8 @@ class ReporteViewSet(viewsets.ModelViewSet):
             "tipo_reporte": "ordenes_estado",
             "formato": "PDF",
             "fecha_inicio": "2025-01-01",  // opcional
-            "fecha_fin": "2025-01-31"      // opcional
+            "fecha_fin": "2025-01-31",     // opcional
+            "asincrono": true              // opcional: responde 202 y se genera en segundo plano
         }
         """
         serializer = GenerarReporteEstaticoSerializer(data=request.data)
@@ -159,16 +170,66 @@ class ReporteViewSet(viewsets.ModelViewSet):
         try:
             tiempo_inicio = time.time()
             
-            # Generar los datos del reporte filtrados por tenant
-            datos = self._generar_datos_reporte(config, fecha_inicio, fecha_fin, tenant)
+            consulta_original = json.dumps({
+                'tipo_reporte': tipo_reporte,
+                'fecha_inicio': str(fecha_inicio) if fecha_inicio else None,
+                'fecha_fin': str(fecha_fin) if fecha_fin else None
+            })
             
-            # Generar el archivo según formato
-            if formato == 'PDF':
-                archivo = self._generar_pdf_reporte(config, datos)
-                nombre_archivo = f"{tipo_reporte}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            else:  # XLSX
-                archivo = self._generar_excel_reporte(config, datos)
-                nombre_archivo = f"{tipo_reporte}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+            # Reutilizar el archivo si la misma consulta ya se generó y los datos no cambiaron
+            filtros_clave = normalizar_filtros(self._construir_filtros(config['filtros_default'], fecha_inicio, fecha_fin))
+            clave = calcular_clave(
+                tenant,
+                apps.get_model(config['modelo']),
+                {
+                    'tipo': 'ESTATICO',
+                    'reporte': tipo_reporte,
+                    'campos': config['campos'],
+                    'filtros': filtros_clave,
+                    'formato': formato,
+                },
+                list(config['campos']) + list(filtros_clave)
+            )
+            reporte = self._reporte_desde_cache(
+                request, tenant, clave, tiempo_inicio,
+                tipo='ESTATICO',
+                nombre=config['nombre'],
+                descripcion=config['descripcion'],
+                consulta_original=consulta_original,
+                formato=formato
+            )
+            if reporte:
+                return Response({
+                    'success': True,
+                    'message': 'Reporte obtenido desde caché',
+                    'cache': True,
+                    'reporte': ReporteSerializer(reporte).data
+                }, status=status.HTTP_201_CREATED)
+            
+            parametros = {
+                'tipo_reporte': tipo_reporte,
+                'formato': formato,
+                'fecha_inicio': fecha_inicio,
+                'fecha_fin': fecha_fin
+            }
+            
+            if self._parametro_booleano(request, 'asincrono'):
+                reporte = self._encolar_reporte(
+                    request, tenant, parametros, clave,
+                    tipo='ESTATICO',
+                    nombre=config['nombre'],
+                    descripcion=config['descripcion'],
+                    consulta_original=consulta_original,
+                    formato=formato
+                )
+                return Response({
+                    'success': True,
+                    'message': 'Reporte en cola de generación',
+                    'reporte': ReporteSerializer(reporte).data
+                }, status=status.HTTP_202_ACCEPTED)
+            
+            # Generar los datos filtrados por tenant y el archivo según formato
+            archivo, nombre_archivo, total_registros, huella = self._generar_archivo('ESTATICO', parametros, tenant)
             
             tiempo_fin = time.time()
             tiempo_generacion = tiempo_fin - tiempo_inicio
@@ -180,21 +241,18 @@ class ReporteViewSet(viewsets.ModelViewSet):
                 tipo='ESTATICO',
                 nombre=config['nombre'],
                 descripcion=config['descripcion'],
-                consulta_original=json.dumps({
-                    'tipo_reporte': tipo_reporte,
-                    'fecha_inicio': str(fecha_inicio) if fecha_inicio else None,
-                    'fecha_fin': str(fecha_fin) if fecha_fin else None
-                }),
+                consulta_original=consulta_original,
                 formato=formato,
-                registros_procesados=len(datos['registros']),
-                tiempo_generacion=round(tiempo_generacion, 2)
+                registros_procesados=total_registros,
+                tiempo_generacion=round(tiempo_generacion, 2),
+                clave_cache=clave or ''
             )
             
             # Guardar el archivo
-            reporte.archivo.save(nombre_archivo, archivo, save=True)
+            guardar_archivo(reporte, nombre_archivo, archivo, huella=huella)
             
             # Registrar en bitácora
-            descripcion = f"Reporte estático '{config['nombre']}' generado en formato {formato}. Registros procesados: {len(datos['registros'])}, Tiempo: {round(tiempo_generacion, 2)}s"
+            descripcion = f"Reporte estático '{config['nombre']}' generado en formato {formato}. Registros procesados: {total_registros}, Tiempo: {round(tiempo_generacion, 2)}s"
             registrar_bitacora(
                 usuario=request.user,
                 accion=Bitacora.Accion.CREAR,
@@ -220,15 +278,38 @@ class ReporteViewSet(viewsets.ModelViewSet):
         """
         Descarga un reporte generado
         GET /api/ia/reportes/{id}/descargar/
+        
+        Soporta If-None-Match / If-Modified-Since (304), Range (206, para
+        reanudar descargas) y Accept-Encoding: gzip (variante precomprimida).
         """
         reporte = self.get_object()
         
+        # Reporte en segundo plano: informar el estado en lugar del archivo
+        if reporte.estado in ('PENDIENTE', 'EN_PROCESO'):
+            return Response({
+                'success': False,
+                'estado': reporte.estado,
+                'porcentaje': reporte.porcentaje,
+                'message': 'El reporte todavía se está generando'
+            }, status=status.HTTP_202_ACCEPTED)
+        if reporte.estado == 'ERROR':
+            return Response({
+                'success': False,
+                'estado': reporte.estado,
+                'error': reporte.error
+            }, status=status.HTTP_409_CONFLICT)
+        
         if not reporte.archivo:
             return Response({
                 'success': False,
                 'error': 'Este reporte no tiene archivo asociado'
             }, status=status.HTTP_404_NOT_FOUND)
         
+        response, transfiere_archivo = respuesta_descarga(request, reporte)
+        if not transfiere_archivo:
+            # Revalidaciones (304) y reanudaciones no son descargas nuevas
+            return response
+        
         # Registrar en bitácora la descarga
         descripcion = f"Descarga de reporte '{reporte.nombre}' (ID: {reporte.id}, Tipo: {reporte.tipo}, Formato: {reporte.formato})"
         registrar_bitacora(
@@ -239,13 +320,7 @@ class ReporteViewSet(viewsets.ModelViewSet):
             request=request
         )
         
-        # Devolver el archivo
-        response = FileResponse(
-            reporte.archivo.open('rb'),
-            content_type='application/pdf' if reporte.formato == 'PDF' else 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{reporte.archivo.name.split("/")[-1]}"'
-        
+        # Devolver el archivo (304 si el cliente ya lo tiene, 206 para un tramo)
         return response
     
     @action(detail=False, methods=['get'])
@@ -286,12 +361,11 @@ class ReporteViewSet(viewsets.ModelViewSet):
             "campos": ["id", "fecha_creacion", "cliente__nombre", "total"],
             "filtros": {"estado": "pendiente"},
             "ordenamiento": ["-fecha_creacion"],
-            "formato": "PDF"
+            "formato": "PDF",
+            "asincrono": true              // opcional: responde 202 y se genera en segundo plano
         }
         """
         from .serializersReporte import ReportePersonalizadoSerializer
-        from .utils.whitelist import obtener_config_entidad
-        from django.core.serializers.json import DjangoJSONEncoder
         
         serializer = ReportePersonalizadoSerializer(data=request.data)
         if not serializer.is_valid():
@@ -338,50 +412,71 @@ class ReporteViewSet(viewsets.ModelViewSet):
             app_label, model_name = config_entidad['modelo'].split('.')
             Model = apps.get_model(app_label, model_name)
             
-            # Construir queryset filtrado por tenant
-            queryset = Model.objects.filter(tenant=tenant)
-            
-            # Aplicar select_related según el modelo para optimizar queries
-            if model_name == 'OrdenTrabajo':
-                queryset = queryset.select_related('cliente', 'vehiculo', 'vehiculo__marca', 'vehiculo__modelo')
-            elif model_name == 'Item':
-                queryset = queryset.select_related('area')
-            elif model_name == 'Vehiculo':
-                queryset = queryset.select_related('cliente', 'marca', 'modelo')
-            
-            # Aplicar filtros si existen
-            if data.get('filtros'):
-                queryset = queryset.filter(**data['filtros'])
-            
-            # Aplicar ordenamiento
-            if data.get('ordenamiento'):
-                queryset = queryset.order_by(*data['ordenamiento'])
-            
-            # Obtener datos
-            registros = []
-            for obj in queryset:
-                registro = {}
-                for campo in data['campos']:
-                    valor = self._obtener_valor_campo(obj, campo)
-                    registro[campo] = valor
-                registros.append(registro)
-            
-            # Preparar datos para generación
-            datos_reporte = {
-                'nombre': data['nombre'],
-                'entidad': config_entidad['nombre'],
-                'campos': data['campos'],
-                'registros': registros,
-                'total_registros': len(registros)
-            }
+            # Reutilizar el archivo si la misma consulta ya se generó y los datos no cambiaron
+            filtros_clave = normalizar_filtros(data.get('filtros'))
+            ordenamiento = list(data.get('ordenamiento') or [])
+            clave = calcular_clave(
+                tenant,
+                Model,
+                {
+                    'tipo': 'PERSONALIZADO',
+                    'entidad': data['entidad'],
+                    'nombre': data['nombre'],
+                    'campos': data['campos'],
+                    'filtros': filtros_clave,
+                    'ordenamiento': ordenamiento,
+                    'formato': data['formato'],
+                },
+                list(data['campos']) + list(filtros_clave) + ordenamiento
+            )
+            reporte = self._reporte_desde_cache(
+                request, tenant, clave, tiempo_inicio,
+                tipo='PERSONALIZADO',
+                nombre=data['nombre'],
+                descripcion=f"Reporte personalizado de {config_entidad['nombre']}",
+                consulta_original=json.dumps(data, cls=DjangoJSONEncoder),
+                formato=data['formato']
+            )
+            if reporte:
+                return Response({
+                    'success': True,
+                    'message': 'Reporte personalizado obtenido desde caché',
+                    'cache': True,
+                    'reporte': ReporteSerializer(reporte).data
+                }, status=status.HTTP_201_CREATED)
             
-            # Generar archivo según formato
-            if data['formato'] == 'PDF':
-                archivo = self._generar_pdf_personalizado(datos_reporte, config_entidad)
-                nombre_archivo = f"{data['entidad']}_personalizado_{timezone.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            else:  # XLSX
-                archivo = self._generar_excel_personalizado(datos_reporte, config_entidad)
-                nombre_archivo = f"{data['entidad']}_personalizado_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+            # Estimar el costo de la consulta (EXPLAIN) antes de ejecutarla
+            queryset = self._queryset_entidad(config_entidad, tenant, data.get('filtros'), data.get('ordenamiento'))
+            plan_consulta = explicar_consulta(consulta_de_filas(queryset, data['campos']))
+            decision = evaluar_costo(plan_consulta)
+            if decision == 'RECHAZAR':
+                return Response({
+                    'success': False,
+                    'error': 'La consulta es demasiado costosa. Agregue filtros más específicos (fechas, estado) para acotarla.',
+                    'plan_consulta': plan_consulta
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Las consultas costosas se generan siempre en segundo plano
+            asincrono = self._parametro_booleano(request, 'asincrono')
+            if asincrono or decision == 'ASINCRONO':
+                reporte = self._encolar_reporte(
+                    request, tenant, data, clave,
+                    tipo='PERSONALIZADO',
+                    nombre=data['nombre'],
+                    descripcion=f"Reporte personalizado de {config_entidad['nombre']}",
+                    consulta_original=json.dumps(data, cls=DjangoJSONEncoder),
+                    formato=data['formato']
+                )
+                return Response({
+                    'success': True,
+                    'message': 'Reporte personalizado en cola de generación',
+                    'asincrono_forzado': not asincrono,
+                    'reporte': ReporteSerializer(reporte).data,
+                    'plan_consulta': plan_consulta
+                }, status=status.HTTP_202_ACCEPTED)
+            
+            # Obtener datos y generar el archivo según formato
+            archivo, nombre_archivo, total_registros, huella = self._generar_archivo('PERSONALIZADO', data, tenant)
             
             tiempo_fin = time.time()
             tiempo_generacion = tiempo_fin - tiempo_inicio
@@ -395,15 +490,16 @@ class ReporteViewSet(viewsets.ModelViewSet):
                 descripcion=f"Reporte personalizado de {config_entidad['nombre']}",
                 consulta_original=json.dumps(data, cls=DjangoJSONEncoder),
                 formato=data['formato'],
-                registros_procesados=len(registros),
-                tiempo_generacion=round(tiempo_generacion, 2)
+                registros_procesados=total_registros,
+                tiempo_generacion=round(tiempo_generacion, 2),
+                clave_cache=clave or ''
             )
             
             # Guardar el archivo
-            reporte.archivo.save(nombre_archivo, archivo, save=True)
+            guardar_archivo(reporte, nombre_archivo, archivo, huella=huella)
             
             # Registrar en bitácora
-            descripcion = f"Reporte personalizado '{data['nombre']}' generado para entidad {config_entidad['nombre']} en formato {data['formato']}. Campos: {len(data['campos'])}, Filtros: {len(data.get('filtros', {}))}, Registros: {len(registros)}, Tiempo: {round(tiempo_generacion, 2)}s"
+            descripcion = f"Reporte personalizado '{data['nombre']}' generado para entidad {config_entidad['nombre']} en formato {data['formato']}. Campos: {len(data['campos'])}, Filtros: {len(data.get('filtros', {}))}, Registros: {total_registros}, Tiempo: {round(tiempo_generacion, 2)}s"
             registrar_bitacora(
                 usuario=request.user,
                 accion=Bitacora.Accion.CREAR,
@@ -412,11 +508,11 @@ class ReporteViewSet(viewsets.ModelViewSet):
                 request=request
             )
             
-            from .serializersReporte import ReporteSerializer
             return Response({
                 'success': True,
                 'message': 'Reporte personalizado generado exitosamente',
-                'reporte': ReporteSerializer(reporte).data
+                'reporte': ReporteSerializer(reporte).data,
+                'plan_consulta': plan_consulta
             }, status=status.HTTP_201_CREATED)
             
         except Exception as e:
@@ -433,17 +529,18 @@ class ReporteViewSet(viewsets.ModelViewSet):
         Body: {
             "consulta": "Órdenes completadas este mes en excel",
             "nombre": "Mi reporte" (opcional),
-            "formato": "PDF" o "XLSX" (opcional, se detecta de la consulta)
+            "formato": "PDF" o "XLSX" (opcional, se detecta de la consulta),
+            "asincrono": true (opcional: responde 202 y se genera en segundo plano)
         }
         
         El formato se puede especificar en la consulta con frases como:
         - "en excel", "en formato excel", "como excel"
         - "en pdf", "en formato pdf", "como pdf"
         Si no se especifica, por defecto es PDF.
-        """
-        from django.core.serializers.json import DjangoJSONEncoder
-        from .utils.whitelist import obtener_config_entidad
         
+        Las consultas de resumen ("total de ingresos por mes", "cantidad de
+        órdenes por estado") generan una fila por grupo calculada en la base.
+        """
         serializer = ReporteNaturalSerializer(data=request.data)
         if not serializer.is_valid():
             return Response({
@@ -501,6 +598,9 @@ class ReporteViewSet(viewsets.ModelViewSet):
             # Usar campos sugeridos o todos los campos disponibles
             campos = interpretacion.get('campos_sugeridos', list(config_entidad['campos_disponibles'].keys())[:8])
             filtros = interpretacion.get('filtros', {})
+            # Resumen pedido en la consulta (ej. "total de ingresos por mes"):
+            # se resuelve con GROUP BY en la base en lugar de listar registros
+            agregacion = interpretacion.get('agregacion')
             
             # Obtener formato detectado de la consulta, si no, del data, si no, PDF por defecto
             formato = interpretacion.get('formato')
@@ -511,52 +611,113 @@ class ReporteViewSet(viewsets.ModelViewSet):
             app_label, model_name = config_entidad['modelo'].split('.')
             Model = apps.get_model(app_label, model_name)
             
-            # Construir queryset filtrado por tenant
-            queryset = Model.objects.filter(tenant=tenant)
-            
-            # Aplicar select_related según el modelo para optimizar queries
-            if model_name == 'OrdenTrabajo':
-                queryset = queryset.select_related('cliente', 'vehiculo', 'vehiculo__marca', 'vehiculo__modelo')
-            elif model_name == 'Item':
-                queryset = queryset.select_related('area')
-            elif model_name == 'Vehiculo':
-                queryset = queryset.select_related('cliente', 'marca', 'modelo')
-            elif model_name == 'Cliente':
-                pass  # Cliente no tiene relaciones que optimizar en este contexto
-            
-            # Aplicar filtros
-            if filtros:
-                queryset = queryset.filter(**filtros)
-            
-            # Obtener datos
-            registros = []
-            for obj in queryset:
-                registro = {}
-                for campo in campos:
-                    valor = self._obtener_valor_campo(obj, campo)
-                    registro[campo] = valor
-                registros.append(registro)
-            
             # Generar nombre automático si no se proporcionó
             nombre = data.get('nombre') or f"Reporte: {consulta[:50]}"
             
-            # Preparar datos para generación
-            datos_reporte = {
+            consulta_original = json.dumps({
+                'consulta': consulta,
+                'interpretacion': interpretacion,
+                'campos': campos,
+                'filtros': filtros,
+                'formato': formato
+            }, cls=DjangoJSONEncoder)
+            
+            # Reutilizar el archivo si la misma interpretación ya se generó y los datos
+            # no cambiaron (la clave usa la consulta interpretada, no el texto)
+            filtros_clave = normalizar_filtros(filtros)
+            clave = calcular_clave(
+                tenant,
+                Model,
+                {
+                    'tipo': 'NATURAL',
+                    'entidad': entidad,
+                    'nombre': nombre,
+                    'campos': campos,
+                    'filtros': filtros_clave,
+                    'formato': formato,
+                    'agregacion': agregacion,
+                },
+                list(campos) + list(filtros_clave) + self._rutas_agregacion(agregacion)
+            )
+            reporte = self._reporte_desde_cache(
+                request, tenant, clave, tiempo_inicio,
+                tipo='NATURAL',
+                nombre=nombre,
+                descripcion=f"Consulta: {consulta}",
+                consulta_original=consulta_original,
+                formato=formato
+            )
+            if reporte:
+                return Response({
+                    'success': True,
+                    'message': 'Reporte obtenido desde caché',
+                    'cache': True,
+                    'reporte': ReporteSerializer(reporte).data,
+                    'interpretacion': {
+                        'entidad': config_entidad['nombre'],
+                        'filtros_aplicados': filtros,
+                        'campos_incluidos': campos,
+                        'agregacion': agregacion,
+                        'registros_encontrados': reporte.registros_procesados
+                    }
+                }, status=status.HTTP_201_CREATED)
+            
+            parametros = {
+                'entidad': entidad,
                 'nombre': nombre,
-                'entidad': config_entidad['nombre'],
                 'campos': campos,
-                'registros': registros,
-                'total_registros': len(registros),
-                'consulta_interpretada': interpretacion
+                'filtros': filtros,
+                'formato': formato,
+                'agregacion': agregacion
             }
             
-            # Generar archivo según formato detectado
-            if formato == 'PDF':
-                archivo = self._generar_pdf_personalizado(datos_reporte, config_entidad)
-                nombre_archivo = f"{entidad}_natural_{timezone.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            else:  # XLSX
-                archivo = self._generar_excel_personalizado(datos_reporte, config_entidad)
-                nombre_archivo = f"{entidad}_natural_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+            # Estimar el costo de la consulta (EXPLAIN) antes de ejecutarla
+            queryset = self._queryset_entidad(config_entidad, tenant, filtros)
+            if agregacion:
+                plan_consulta = explicar_consulta(consulta_agregada(queryset, agregacion))
+            else:
+                plan_consulta = explicar_consulta(consulta_de_filas(queryset, campos))
+            decision = evaluar_costo(plan_consulta)
+            if decision == 'RECHAZAR':
+                return Response({
+                    'success': False,
+                    'error': 'La consulta es demasiado costosa. Agregue filtros más específicos (fechas, estado) para acotarla.',
+                    'interpretacion': {
+                        'entidad': config_entidad['nombre'],
+                        'filtros_aplicados': filtros,
+                        'campos_incluidos': campos,
+                        'agregacion': agregacion,
+                        'plan_consulta': plan_consulta
+                    }
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Las consultas costosas se generan siempre en segundo plano
+            asincrono = self._parametro_booleano(request, 'asincrono')
+            if asincrono or decision == 'ASINCRONO':
+                reporte = self._encolar_reporte(
+                    request, tenant, parametros, clave,
+                    tipo='NATURAL',
+                    nombre=nombre,
+                    descripcion=f"Consulta: {consulta}",
+                    consulta_original=consulta_original,
+                    formato=formato
+                )
+                return Response({
+                    'success': True,
+                    'message': 'Reporte en cola de generación',
+                    'asincrono_forzado': not asincrono,
+                    'reporte': ReporteSerializer(reporte).data,
+                    'interpretacion': {
+                        'entidad': config_entidad['nombre'],
+                        'filtros_aplicados': filtros,
+                        'campos_incluidos': campos,
+                        'agregacion': agregacion,
+                        'plan_consulta': plan_consulta
+                    }
+                }, status=status.HTTP_202_ACCEPTED)
+            
+            # Obtener datos y generar el archivo según formato detectado
+            archivo, nombre_archivo, total_registros, huella = self._generar_archivo('NATURAL', parametros, tenant)
             
             tiempo_fin = time.time()
             tiempo_generacion = tiempo_fin - tiempo_inicio
@@ -568,23 +729,18 @@ class ReporteViewSet(viewsets.ModelViewSet):
                 tipo='NATURAL',
                 nombre=nombre,
                 descripcion=f"Consulta: {consulta}",
-                consulta_original=json.dumps({
-                    'consulta': consulta,
-                    'interpretacion': interpretacion,
-                    'campos': campos,
-                    'filtros': filtros,
-                    'formato': formato
-                }, cls=DjangoJSONEncoder),
+                consulta_original=consulta_original,
                 formato=formato,
-                registros_procesados=len(registros),
-                tiempo_generacion=round(tiempo_generacion, 2)
+                registros_procesados=total_registros,
+                tiempo_generacion=round(tiempo_generacion, 2),
+                clave_cache=clave or ''
             )
             
             # Guardar el archivo
-            reporte.archivo.save(nombre_archivo, archivo, save=True)
+            guardar_archivo(reporte, nombre_archivo, archivo, huella=huella)
             
             # Registrar en bitácora
-            descripcion = f"Reporte con lenguaje natural '{nombre}' generado. Consulta: '{consulta}'. Entidad: {config_entidad['nombre']}, Formato: {formato}, Registros: {len(registros)}, Tiempo: {round(tiempo_generacion, 2)}s"
+            descripcion = f"Reporte con lenguaje natural '{nombre}' generado. Consulta: '{consulta}'. Entidad: {config_entidad['nombre']}, Formato: {formato}, Registros: {total_registros}, Tiempo: {round(tiempo_generacion, 2)}s"
             registrar_bitacora(
                 usuario=request.user,
                 accion=Bitacora.Accion.CREAR,
@@ -601,7 +757,9 @@ class ReporteViewSet(viewsets.ModelViewSet):
                     'entidad': config_entidad['nombre'],
                     'filtros_aplicados': filtros,
                     'campos_incluidos': campos,
-                    'registros_encontrados': len(registros)
+                    'agregacion': agregacion,
+                    'registros_encontrados': total_registros,
+                    'plan_consulta': plan_consulta
                 }
             }, status=status.HTTP_201_CREATED)
             
@@ -613,9 +771,209 @@ class ReporteViewSet(viewsets.ModelViewSet):
                 'traceback': traceback.format_exc()
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
-    def _generar_datos_reporte(self, config, fecha_inicio=None, fecha_fin=None, tenant=None):
+    def _reporte_desde_cache(self, request, tenant, clave, tiempo_inicio, **campos):
+        """
+        Busca un reporte del tenant con la misma clave de caché y, si su archivo
+        existe, crea el registro del usuario apuntando a ese mismo archivo (sin
+        volver a consultar ni renderizar). Con "refrescar": true se ignora la caché.
+        
+        Returns:
+            Reporte creado o None si no hay coincidencia
+        """
+        if not clave or self._parametro_booleano(request, 'refrescar'):
+            return None
+        
+        origen = buscar_reporte_cacheado(tenant, clave)
+        if origen is None:
+            return None
+        
+        reporte = Reporte.objects.create(
+            usuario=request.user,
+            tenant=tenant,
+            archivo=origen.archivo.name,
+            hash_contenido=origen.hash_contenido,
+            registros_procesados=origen.registros_procesados,
+            tiempo_generacion=round(time.time() - tiempo_inicio, 2),
+            clave_cache=clave,
+            **campos
+        )
+        
+        # Registrar en bitácora
+        descripcion = f"Reporte '{reporte.nombre}' obtenido desde caché (reporte origen ID: {origen.id}). Formato: {reporte.formato}, Registros: {reporte.registros_procesados}"
+        registrar_bitacora(
+            usuario=request.user,
+            accion=Bitacora.Accion.CREAR,
+            modulo=Bitacora.Modulo.REPORTE,
+            descripcion=descripcion,
+            request=request
+        )
+        return reporte
+    
+    def _parametro_booleano(self, request, nombre):
+        """
+        Lee una opción booleana del cuerpo o de la query string
+        """
+        valor = request.data.get(nombre, request.query_params.get(nombre, ''))
+        return str(valor).lower() in ('1', 'true', 'si', 'sí')
+    
+    def _encolar_reporte(self, request, tenant, parametros, clave, **campos):
+        """
+        Crea el Reporte en estado PENDIENTE con los parámetros necesarios para
+        generarlo y lo entrega a la cola de jobsReportes. El avance se consulta
+        con historial/ y descargar/.
+        """
+        reporte = Reporte.objects.create(
+            usuario=request.user,
+            tenant=tenant,
+            estado='PENDIENTE',
+            # Ida y vuelta por JSON: fechas y decimales quedan como texto
+            parametros=json.loads(json.dumps(parametros, cls=DjangoJSONEncoder)),
+            clave_cache=clave or '',
+            **campos
+        )
+        encolar_reporte(reporte)
+        
+        # Registrar en bitácora
+        descripcion = f"Reporte '{reporte.nombre}' encolado para generación en segundo plano (ID: {reporte.id}). Formato: {reporte.formato}"
+        registrar_bitacora(
+            usuario=request.user,
+            accion=Bitacora.Accion.CREAR,
+            modulo=Bitacora.Modulo.REPORTE,
+            descripcion=descripcion,
+            request=request
+        )
+        return reporte
+    
+    def _generar_archivo(self, tipo, parametros, tenant, progreso=None):
+        """
+        Genera el archivo de un reporte a partir de sus parámetros. Lo usan las
+        acciones en modo sincrónico y los workers de jobsReportes.
+        
+        Args:
+            tipo: 'ESTATICO', 'PERSONALIZADO' o 'NATURAL'
+            parametros: Dict con la definición del reporte (Reporte.parametros)
+            tenant: Tenant cuyos datos se leen
+            progreso: Función opcional (procesados, total) que se llama cada
+                FILAS_POR_AVANCE filas
+        
+        Returns:
+            Tupla (archivo, nombre_archivo, total_registros, huella), huella es
+            la HuellaContenido de la consulta y las filas (hash_contenido)
+        """
+        formato = parametros['formato']
+        extension = 'pdf' if formato == 'PDF' else 'xlsx'
+        marca_tiempo = timezone.now().strftime('%Y%m%d_%H%M%S')
+        huella = HuellaContenido(tipo, parametros)
+        
+        if tipo == 'ESTATICO':
+            config = obtener_config_reporte(parametros['tipo_reporte'])
+            # En Excel las filas se escriben a medida que se leen de la base
+            datos = self._generar_datos_reporte(
+                config, parametros.get('fecha_inicio'), parametros.get('fecha_fin'), tenant,
+                en_flujo=(formato != 'PDF')
+            )
+            datos['registros'] = huella.filas(datos['registros'])
+            if progreso:
+                datos['registros'] = self._con_progreso(datos['registros'], datos, progreso)
+            
+            if formato == 'PDF':
+                archivo = self._generar_pdf_reporte(config, datos)
+            else:  # XLSX
+                archivo = self._generar_excel_reporte(config, datos)
+            nombre_archivo = f"{parametros['tipo_reporte']}_{marca_tiempo}.{extension}"
+            return archivo, nombre_archivo, datos['total_registros'], huella
+        
+        config_entidad = obtener_config_entidad(parametros['entidad'])
+        queryset = self._queryset_entidad(
+            config_entidad, tenant, parametros.get('filtros'), parametros.get('ordenamiento')
+        )
+        
+        agregacion = parametros.get('agregacion')
+        if agregacion:
+            # Resumen: una fila por grupo calculada con GROUP BY en la base
+            encabezados, registros = ejecutar_agregacion(queryset, agregacion)
+            datos_reporte = {
+                'nombre': parametros['nombre'],
+                'entidad': config_entidad['nombre'],
+                'campos': parametros['campos'],
+                'encabezados': encabezados,
+                'subtitulo': f"Resumen de {config_entidad['nombre']}",
+                'registros': registros,
+                'total_registros': len(registros),
+                'consulta': queryset
+            }
+        else:
+            # Obtener datos (una sola consulta values_list con los JOIN necesarios).
+            # En Excel las filas se escriben a medida que se leen de la base
+            campos = parametros['campos']
+            if formato != 'PDF':
+                registros = iterar_filas(queryset, campos, self._obtener_valor_campo)
+            else:
+                registros = extraer_filas(queryset, campos, self._obtener_valor_campo)
+            
+            datos_reporte = {
+                'nombre': parametros['nombre'],
+                'entidad': config_entidad['nombre'],
+                'campos': campos,
+                'registros': registros,
+                'total_registros': None if formato != 'PDF' else len(registros),
+                'consulta': queryset
+            }
+        datos_reporte['registros'] = huella.filas(datos_reporte['registros'])
+        if progreso:
+            datos_reporte['registros'] = self._con_progreso(datos_reporte['registros'], datos_reporte, progreso)
+        
+        if formato == 'PDF':
+            archivo = self._generar_pdf_personalizado(datos_reporte, config_entidad)
+        else:  # XLSX
+            archivo = self._generar_excel_personalizado(datos_reporte, config_entidad)
+        sufijo = 'personalizado' if tipo == 'PERSONALIZADO' else 'natural'
+        nombre_archivo = f"{parametros['entidad']}_{sufijo}_{marca_tiempo}.{extension}"
+        return archivo, nombre_archivo, datos_reporte['total_registros'], huella
+    
+    def _rutas_agregacion(self, agregacion):
+        """
+        Rutas de campos que lee una agregación (para la clave de caché)
+        """
+        if not agregacion:
+            return []
+        return [ruta for ruta in (agregacion.get('campo'), agregacion.get('agrupar_por')) if ruta]
+    
+    def _queryset_entidad(self, config_entidad, tenant, filtros=None, ordenamiento=None):
+        """
+        Construye el queryset de una entidad de la whitelist filtrado por tenant
+        """
+        app_label, model_name = config_entidad['modelo'].split('.')
+        Model = apps.get_model(app_label, model_name)
+        
+        queryset = Model.objects.filter(tenant=tenant)
+        if filtros:
+            queryset = queryset.filter(**filtros)
+        if ordenamiento:
+            queryset = queryset.order_by(*ordenamiento)
+        return queryset
+    
+    def _con_progreso(self, registros, datos, progreso, cada=FILAS_POR_AVANCE):
+        """
+        Recorre los registros informando el avance. Si las filas se leen en
+        flujo (total aún desconocido) el total sale de un COUNT de la consulta.
+        """
+        total = datos['total_registros']
+        if total is None:
+            total = datos['consulta'].count()
+        progreso(0, total)
+        procesados = 0
+        for registro in registros:
+            yield registro
+            procesados += 1
+            if procesados % cada == 0:
+                progreso(procesados, total)
+    
+    def _generar_datos_reporte(self, config, fecha_inicio=None, fecha_fin=None, tenant=None, en_flujo=False):
         """
         Genera los datos para el reporte según la configuración
+        Con en_flujo=True los registros son un generador y total_registros
+        se completa al escribir el archivo
         """
         # Obtener el modelo dinámicamente
         app_label, model_name = config['modelo'].split('.')
@@ -631,30 +989,23 @@ class ReporteViewSet(viewsets.ModelViewSet):
         # Construir queryset base
         queryset = Model.objects.filter(**filtros) if filtros else Model.objects.all()
         
-        # Aplicar select_related solo si el modelo es OrdenTrabajo
-        if model_name == 'OrdenTrabajo':
-            queryset = queryset.select_related('cliente', 'vehiculo', 'vehiculo__marca', 'vehiculo__modelo')
-            # Manejo especial para órdenes pendientes (sin filtros en config)
-            if not filtros:
-                queryset = queryset.filter(estado__in=['pendiente', 'en_proceso'])
-        elif model_name == 'Item':
-            queryset = queryset.select_related('area')
-        
-        # Extraer valores
-        registros = []
-        for obj in queryset:
-            registro = {}
-            for campo in config['campos']:
-                valor = self._obtener_valor_campo(obj, campo)
-                registro[campo] = valor
-            registros.append(registro)
+        # Manejo especial para órdenes pendientes (sin filtros en config)
+        if model_name == 'OrdenTrabajo' and not filtros:
+            queryset = queryset.filter(estado__in=['pendiente', 'en_proceso'])
+        
+        # Extraer valores como tuplas en el orden de config['campos']
+        if en_flujo:
+            registros = iterar_filas(queryset, config['campos'], self._obtener_valor_campo)
+        else:
+            registros = extraer_filas(queryset, config['campos'], self._obtener_valor_campo)
         
         return {
             'nombre': config['nombre'],
             'descripcion': config['descripcion'],
             'campos': config['campos'],
             'registros': registros,
-            'total_registros': len(registros)
+            'total_registros': None if en_flujo else len(registros),
+            'consulta': queryset
         }
     
     def _construir_filtros(self, filtros_default, fecha_inicio, fecha_fin):
@@ -711,11 +1062,8 @@ class ReporteViewSet(viewsets.ModelViewSet):
             for campo in datos['campos']
         ]
         
-        # Preparar datos
-        filas = []
-        for registro in datos['registros']:
-            fila = [str(registro.get(campo, '')) for campo in datos['campos']]
-            filas.append(fila)
+        # Preparar datos (generador: el PDF arma los bloques por página a medida que lee)
+        filas = ([str(valor) for valor in registro] for registro in datos['registros'])
         
         # Preparar información adicional
         info_adicional = {
@@ -743,36 +1091,30 @@ class ReporteViewSet(viewsets.ModelViewSet):
             for campo in datos['campos']
         ]
         
-        # Preparar datos
-        filas = []
-        for registro in datos['registros']:
-            fila = [registro.get(campo, '') for campo in datos['campos']]
-            filas.append(fila)
-        
-        return generar_excel(
+        archivo, datos['total_registros'] = generar_excel_streaming(
             titulo=datos['nombre'],
             encabezados=encabezados,
-            datos=filas,
+            filas=datos['registros'],
             hoja_nombre="Reporte"
         )
+        return archivo
     
     def _generar_pdf_personalizado(self, datos_reporte, config_entidad):
         """
         Genera el PDF para un reporte personalizado
         """
-        # Preparar encabezados con etiquetas amigables
-        encabezados = []
-        for campo in datos_reporte['campos']:
-            if campo in config_entidad['campos_disponibles']:
-                encabezados.append(config_entidad['campos_disponibles'][campo]['label'])
-            else:
-                encabezados.append(campo.replace('__', ' ').replace('_', ' ').title())
+        # Preparar encabezados con etiquetas amigables (los resúmenes traen los suyos)
+        encabezados = datos_reporte.get('encabezados')
+        if encabezados is None:
+            encabezados = []
+            for campo in datos_reporte['campos']:
+                if campo in config_entidad['campos_disponibles']:
+                    encabezados.append(config_entidad['campos_disponibles'][campo]['label'])
+                else:
+                    encabezados.append(campo.replace('__', ' ').replace('_', ' ').title())
         
-        # Preparar datos
-        filas = []
-        for registro in datos_reporte['registros']:
-            fila = [str(registro.get(campo, '')) for campo in datos_reporte['campos']]
-            filas.append(fila)
+        # Preparar datos (generador: el PDF arma los bloques por página a medida que lee)
+        filas = ([str(valor) for valor in registro] for registro in datos_reporte['registros'])
         
         # Preparar información adicional
         info_adicional = {
@@ -783,7 +1125,7 @@ class ReporteViewSet(viewsets.ModelViewSet):
         # Generar PDF
         datos_pdf = {
             'titulo': datos_reporte['nombre'],
-            'subtitulo': f"Reporte personalizado de {datos_reporte['entidad']}",
+            'subtitulo': datos_reporte.get('subtitulo', f"Reporte personalizado de {datos_reporte['entidad']}"),
             'encabezados': encabezados,
             'datos': filas,
             'info_adicional': info_adicional
@@ -795,23 +1137,20 @@ class ReporteViewSet(viewsets.ModelViewSet):
         """
         Genera el Excel para un reporte personalizado
         """
-        # Preparar encabezados con etiquetas amigables
-        encabezados = []
-        for campo in datos_reporte['campos']:
-            if campo in config_entidad['campos_disponibles']:
-                encabezados.append(config_entidad['campos_disponibles'][campo]['label'])
-            else:
-                encabezados.append(campo.replace('__', ' ').replace('_', ' ').title())
-        
-        # Preparar datos
-        filas = []
-        for registro in datos_reporte['registros']:
-            fila = [registro.get(campo, '') for campo in datos_reporte['campos']]
-            filas.append(fila)
+        # Preparar encabezados con etiquetas amigables (los resúmenes traen los suyos)
+        encabezados = datos_reporte.get('encabezados')
+        if encabezados is None:
+            encabezados = []
+            for campo in datos_reporte['campos']:
+                if campo in config_entidad['campos_disponibles']:
+                    encabezados.append(config_entidad['campos_disponibles'][campo]['label'])
+                else:
+                    encabezados.append(campo.replace('__', ' ').replace('_', ' ').title())
         
-        return generar_excel(
+        archivo, datos_reporte['total_registros'] = generar_excel_streaming(
             titulo=datos_reporte['nombre'],
             encabezados=encabezados,
-            datos=filas,
+            filas=datos_reporte['registros'],
             hoja_nombre="Reporte Personalizado"
         )
+        return archivo